@@ -0,0 +1,249 @@
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+
+FRACTION_RE = re.compile(r"\.(\d+)")
+# An edge of `terraform graph` output: the first node depends on the second
+GRAPH_EDGE_RE = re.compile(r'"((?:[^"\\]|\\.)*)"\s*->\s*"((?:[^"\\]|\\.)*)"')
+# Terraform before 1.7 decorates node names, e.g. "[root] aws_vpc.x (expand)"
+GRAPH_NODE_RE = re.compile(r"^(?:\[root\] )?(.*?)(?: \((?:expand|close)\))?$")
+INSTANCE_KEY_RE = re.compile(r"\[[^\]]*\]")
+
+
+def parse_event_timestamp(raw: str) -> datetime:
+    """Parse the @timestamp of a Terraform JSON UI event."""
+    raw = raw.replace("Z", "+00:00")
+    # Python 3.9's fromisoformat only accepts 3 or 6 fractional digits
+    raw = FRACTION_RE.sub(lambda m: "." + m.group(1)[:6].ljust(6, "0"), raw, count=1)
+    return datetime.fromisoformat(raw)
+
+
+def parse_graph(dot: str) -> dict:
+    """
+    Map each node of `terraform graph` output to the nodes it depends on.
+    Besides resources, the graph has variable, output, module and provider
+    nodes that dependencies pass through.
+    """
+    dependencies = {}
+    for dependent, dependency in GRAPH_EDGE_RE.findall(dot):
+        dependencies.setdefault(_graph_node(dependent), set()).add(
+            _graph_node(dependency)
+        )
+    return dependencies
+
+
+def _graph_node(name: str) -> str:
+    return GRAPH_NODE_RE.match(name.replace('\\"', '"')).group(1)
+
+
+def config_address(address: str) -> str:
+    """A resource instance's address without its count or for_each keys."""
+    return INSTANCE_KEY_RE.sub("", address)
+
+
+class ApplyEventRecorder:
+    """
+    Consume Terraform's -json event stream as it arrives, printing compact
+    progress and recording when each resource operation started and ended.
+    Operations are keyed by (address, action), so the delete and the create
+    of a replaced resource are timed separately.
+    """
+
+    def __init__(self):
+        self.resources = {}
+        self.first_ts = None
+        self.last_ts = None
+
+    def __call__(self, line: str):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            print(line, end="")
+            return
+
+        raw_ts = event.get("@timestamp")
+        ts = parse_event_timestamp(raw_ts) if raw_ts else None
+        if ts is not None:
+            self.first_ts = self.first_ts or ts
+            self.last_ts = ts
+
+        handler = getattr(self, f"_on_{event.get('type')}", None)
+        if handler is not None:
+            handler(event, ts)
+
+    def _on_planned_change(self, event, _ts):
+        change = event["change"]
+        print(f"  • {change['resource']['addr']} ({change['action']})")
+
+    def _on_change_summary(self, event, _ts):
+        print(f"INFRABOX: 📋 {event['@message']}")
+
+    def _on_diagnostic(self, event, _ts):
+        diagnostic = event["diagnostic"]
+        icon = "❌" if diagnostic.get("severity") == "error" else "⚠️"
+        print(
+            f"INFRABOX: {icon} {diagnostic['summary']} {diagnostic.get('detail', '')}"
+        )
+
+    def _on_apply_start(self, event, ts):
+        hook = event["hook"]
+        address = hook["resource"]["addr"]
+        self.resources[(address, hook["action"])] = {
+            "start": ts,
+            "end": None,
+            "status": "running",
+        }
+        print(f"  ⏳ {address} ({hook['action']})")
+
+    def _on_apply_complete(self, event, ts):
+        self._finish(event, ts, "complete")
+
+    def _on_apply_errored(self, event, ts):
+        self._finish(event, ts, "errored")
+
+    def _finish(self, event, ts, status):
+        hook = event["hook"]
+        key = (hook["resource"]["addr"], hook["action"])
+        resource = self.resources.setdefault(key, {"start": ts, "status": status})
+        resource["end"] = ts
+        resource["status"] = status
+        elapsed = hook.get("elapsed_seconds", self.duration(key))
+        icon = "✅" if status == "complete" else "❌"
+        print(f"  {icon} {key[0]} ({key[1]}) in {elapsed}s")
+
+    def duration(self, key) -> float:
+        resource = self.resources[key]
+        if resource["start"] is None or resource["end"] is None:
+            return 0.0
+        return (resource["end"] - resource["start"]).total_seconds()
+
+    def total_seconds(self) -> float:
+        if self.first_ts is None:
+            return 0.0
+        return (self.last_ts - self.first_ts).total_seconds()
+
+    def critical_path(self, dependencies) -> list:
+        """
+        The chain of operations, each waiting on the one before it in
+        Terraform's dependency graph (as parsed by parse_graph), with the
+        longest total duration. Deletes wait on the deletes of the resources
+        that depend on them, everything else on the resources it depends on,
+        and the two halves of a replace on each other. Returns [] without a
+        graph.
+        """
+        finished = sorted(
+            (
+                key
+                for key, resource in self.resources.items()
+                if resource["start"] is not None and resource["end"] is not None
+            ),
+            key=lambda key: self.resources[key]["start"],
+        )
+        if not finished or not dependencies:
+            return []
+
+        operations = {}
+        for key in finished:
+            operations.setdefault(config_address(key[0]), []).append(key)
+        requires = {
+            address: _resource_dependencies(address, dependencies, operations)
+            for address in operations
+        }
+        required_by = {address: set() for address in operations}
+        for address, required in requires.items():
+            for dependency in required:
+                required_by[dependency].add(address)
+
+        # Operations start only after those they wait on, so start order is
+        # a topological order of the graph
+        longest = {}
+        for key in finished:
+            address, action = key
+            config = config_address(address)
+            deleting = action == "delete"
+            waited_on = [
+                other
+                for waited in (required_by if deleting else requires)[config]
+                for other in operations[waited]
+                if (other[1] == "delete") == deleting
+            ]
+            waited_on += [other for other in operations[config] if other[0] == address]
+            seconds, previous = max(
+                ((longest[other][0], other) for other in waited_on if other in longest),
+                default=(0.0, None),
+            )
+            longest[key] = (seconds + self.duration(key), previous)
+
+        path = [max(longest, key=lambda key: longest[key][0])]
+        while longest[path[-1]][1] is not None:
+            path.append(longest[path[-1]][1])
+        return [list(key) for key in reversed(path)]
+
+    def to_dict(self, dependencies=None) -> dict:
+        return {
+            "total_seconds": self.total_seconds(),
+            "resources": [
+                {
+                    "address": address,
+                    "action": action,
+                    "status": resource["status"],
+                    "seconds": self.duration((address, action)),
+                }
+                for (address, action), resource in self.resources.items()
+            ],
+            "critical_path": self.critical_path(dependencies),
+        }
+
+
+def _resource_dependencies(address, dependencies, operations) -> set:
+    """
+    The resources with recorded operations that address depends on, directly
+    or through variable, output and module nodes.
+    """
+    found, seen = set(), set()
+    pending = list(dependencies.get(address, ()))
+    while pending:
+        node = pending.pop()
+        if node in seen or node == address:
+            continue
+        seen.add(node)
+        if node in operations:
+            found.add(node)
+        else:
+            pending.extend(dependencies.get(node, ()))
+    return found
+
+
+def print_timing_report(timings: dict):
+    """Print the per-resource duration table and the critical path."""
+    if not timings["resources"]:
+        return
+
+    print("\nINFRABOX: ⏱️ Apply time per resource")
+    ranked = sorted(timings["resources"], key=lambda resource: -resource["seconds"])
+    width = max(len(resource["address"]) for resource in ranked)
+    for resource in ranked:
+        print(
+            f"  {resource['address']:<{width}}  {resource['action']:<8} "
+            f"{resource['seconds']:8.1f}s  {resource['status']}"
+        )
+
+    critical_path = timings["critical_path"]
+    if critical_path:
+        seconds = {
+            (resource["address"], resource["action"]): resource["seconds"]
+            for resource in timings["resources"]
+        }
+        path_seconds = sum(seconds[tuple(key)] for key in critical_path)
+        print(f"\nINFRABOX: 🧭 Critical path ({path_seconds:.1f}s):")
+        for address, action in critical_path:
+            print(f"  → {address} ({action}, {seconds[(address, action)]:.1f}s)")
+
+
+def save_timings(timings_dir: Path, run_id: str, timings: dict) -> Path:
+    """Save apply timings as JSON so runs can be compared later."""
+    timings_dir.mkdir(parents=True, exist_ok=True)
+    path = timings_dir / f"{run_id}.json"
+    path.write_text(json.dumps({"run_id": run_id, **timings}, indent=2))
+    return path
@@ -0,0 +1,474 @@
+import base64
+import hashlib
+import hmac
+import json
+import mimetypes
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from pathlib import Path
+
+from cli.state import get_state_dir
+
+API_VERSION = "2020-10-02"
+DEFAULT_CONTAINER = "artifacts"
+# Files above this size are sent as blocks, uploaded concurrently
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+# The largest block Put Block accepts since API version 2019-12-12
+MAX_CHUNK_SIZE = 4000 * 1024 * 1024
+UPLOAD_WORKERS = 8
+HASH_BUFFER_SIZE = 1024 * 1024
+# Block IDs must all have the same length within a blob
+BLOCK_ID_DIGITS = 6
+REQUEST_RETRIES = 3
+REQUEST_TIMEOUT_SECONDS = 60
+RETRY_STATUSES = (500, 502, 503, 504)
+HTTP_NOT_FOUND = 404
+HTTP_CONFLICT = 409
+MANIFEST_SAVE_INTERVAL_SECONDS = 1.0
+# The published development account of the Azurite emulator
+AZURITE_ACCOUNT = "devstoreaccount1"
+AZURITE_KEY = "Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=="
+AZURITE_BLOB_ENDPOINT = f"http://127.0.0.1:10000/{AZURITE_ACCOUNT}"
+
+
+class BlobStorageError(RuntimeError):
+    def __init__(self, status, code, message=""):
+        super().__init__(
+            f"Blob service returned {status} {code or ''} {message}".strip()
+        )
+        self.status = status
+        self.code = code
+
+
+@dataclass(frozen=True)
+class StorageCredentials:
+    account: str
+    key: str
+    endpoint: str
+
+    def __post_init__(self):
+        if urllib.parse.urlsplit(self.endpoint).scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported blob endpoint: {self.endpoint}")
+
+
+def parse_connection_string(text: str) -> StorageCredentials:
+    """Credentials from an Azure Storage connection string (Azurite's included)."""
+    settings = dict(part.split("=", 1) for part in text.split(";") if "=" in part)
+    if settings.get("UseDevelopmentStorage", "").lower() == "true":
+        return StorageCredentials(AZURITE_ACCOUNT, AZURITE_KEY, AZURITE_BLOB_ENDPOINT)
+    account, key = settings.get("AccountName"), settings.get("AccountKey")
+    if not account or not key:
+        raise ValueError("The connection string needs AccountName and AccountKey")
+    endpoint = settings.get("BlobEndpoint") or (
+        f"{settings.get('DefaultEndpointsProtocol', 'https')}://{account}.blob."
+        f"{settings.get('EndpointSuffix', 'core.windows.net')}"
+    )
+    return StorageCredentials(account, key, endpoint.rstrip("/"))
+
+
+def md5_base64(data: bytes) -> str:
+    return base64.b64encode(hashlib.md5(data, usedforsecurity=False).digest()).decode()
+
+
+def file_md5(path: Path) -> str:
+    """Base64 MD5 of a file, the form the Blob service reports as Content-MD5."""
+    digest = hashlib.md5(usedforsecurity=False)
+    with open(path, "rb") as f:
+        for buffer in iter(lambda: f.read(HASH_BUFFER_SIZE), b""):
+            digest.update(buffer)
+    return base64.b64encode(digest.digest()).decode()
+
+
+class BlobClient:
+    """The few Blob service REST calls an upload needs, signed with Shared Key."""
+
+    def __init__(self, credentials: StorageCredentials):
+        self.credentials = credentials
+        self._key = base64.b64decode(credentials.key)
+        endpoint = urllib.parse.urlsplit(credentials.endpoint)
+        self._origin = f"{endpoint.scheme}://{endpoint.netloc}"
+        # Azurite puts the account in the path instead of the host name
+        self._base_path = endpoint.path.rstrip("/")
+
+    def _string_to_sign(self, method, path, query, headers) -> str:
+        ms_headers = sorted(
+            (name.lower(), value.strip())
+            for name, value in headers.items()
+            if name.lower().startswith("x-ms-")
+        )
+        length = headers.get("Content-Length", "")
+        fields_to_sign = [
+            method,
+            "",  # Content-Encoding
+            "",  # Content-Language
+            "" if length == "0" else length,
+            headers.get("Content-MD5", ""),
+            headers.get("Content-Type", ""),
+            *[""] * 6,  # Date (x-ms-date is used), conditional headers, Range
+        ]
+        resource = f"/{self.credentials.account}{urllib.parse.quote(path)}" + "".join(
+            f"\n{name.lower()}:{value}" for name, value in sorted(query.items())
+        )
+        return (
+            "\n".join(fields_to_sign)
+            + "\n"
+            + "".join(f"{name}:{value}\n" for name, value in ms_headers)
+            + resource
+        )
+
+    def _send(self, method, path, query, body, headers):
+        headers = {
+            "x-ms-date": formatdate(usegmt=True),
+            "x-ms-version": API_VERSION,
+            **headers,
+        }
+        if body is not None:
+            headers["Content-Length"] = str(len(body))
+            # urllib would add a form Content-Type the signature does not cover
+            headers.setdefault("Content-Type", "application/octet-stream")
+        signature = hmac.new(
+            self._key,
+            self._string_to_sign(method, path, query, headers).encode(),
+            hashlib.sha256,
+        ).digest()
+        headers["Authorization"] = (
+            f"SharedKey {self.credentials.account}:"
+            f"{base64.b64encode(signature).decode()}"
+        )
+        url = self._origin + urllib.parse.quote(path)
+        if query:
+            url += "?" + urllib.parse.urlencode(query)
+        request = urllib.request.Request(url, data=body, headers=headers, method=method)
+        # The endpoint scheme is checked to be http(s) in StorageCredentials
+        with urllib.request.urlopen(  # nosec B310
+            request, timeout=REQUEST_TIMEOUT_SECONDS
+        ) as response:
+            response.read()
+            return response.headers
+
+    def _request(self, method, path, query=None, body=None, headers=None):
+        """Send a signed request, retrying throttling, server and network errors."""
+        for attempt in range(REQUEST_RETRIES + 1):
+            try:
+                return self._send(method, path, query or {}, body, headers or {})
+            except urllib.error.HTTPError as e:
+                if e.code not in RETRY_STATUSES or attempt == REQUEST_RETRIES:
+                    raise BlobStorageError(
+                        e.code, e.headers.get("x-ms-error-code"), e.reason
+                    ) from e
+            except urllib.error.URLError:
+                if attempt == REQUEST_RETRIES:
+                    raise
+            time.sleep(0.5 * 2**attempt)
+        return None
+
+    def _path(self, container, blob=None) -> str:
+        path = f"{self._base_path}/{container}"
+        return path if blob is None else f"{path}/{blob}"
+
+    def create_container(self, container) -> bool:
+        """Create the container, returning False if it already exists."""
+        try:
+            self._request(
+                "PUT", self._path(container), {"restype": "container"}, body=b""
+            )
+        except BlobStorageError as e:
+            if e.status == HTTP_CONFLICT:
+                return False
+            raise
+        return True
+
+    def blob_md5(self, container, blob):
+        """The blob's Content-MD5, or None if it does not exist or has none."""
+        try:
+            headers = self._request("HEAD", self._path(container, blob))
+        except BlobStorageError as e:
+            if e.status == HTTP_NOT_FOUND:
+                return None
+            raise
+        return headers.get("Content-MD5")
+
+    def put_blob(self, container, blob, data, md5, content_type):
+        self._request(
+            "PUT",
+            self._path(container, blob),
+            body=data,
+            headers={
+                "x-ms-blob-type": "BlockBlob",
+                "x-ms-blob-content-type": content_type,
+                "Content-MD5": md5,
+            },
+        )
+
+    def put_block(self, container, blob, block_id, data):
+        self._request(
+            "PUT",
+            self._path(container, blob),
+            {"comp": "block", "blockid": block_id},
+            body=data,
+            headers={"Content-MD5": md5_base64(data)},
+        )
+
+    def put_block_list(self, container, blob, block_ids, md5, content_type):
+        """Commit uploaded blocks, in order, as the blob's content."""
+        latest = "".join(f"<Latest>{block_id}</Latest>" for block_id in block_ids)
+        body = (
+            '<?xml version="1.0" encoding="utf-8"?>' f"<BlockList>{latest}</BlockList>"
+        ).encode()
+        self._request(
+            "PUT",
+            self._path(container, blob),
+            {"comp": "blocklist"},
+            body=body,
+            headers={
+                "Content-Type": "application/xml",
+                "x-ms-blob-content-type": content_type,
+                "x-ms-blob-content-md5": md5,
+            },
+        )
+
+
+def get_manifest_path(environment, account, container) -> Path:
+    return get_state_dir() / "uploads" / environment / f"{account}-{container}.json"
+
+
+class UploadManifest:
+    """
+    Per blob: the local file's size, mtime and MD5 (so unchanged files are
+    not hashed again), whether it was committed and the blocks already sent
+    (so an interrupted upload resumes where it stopped).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._saved_at = 0.0
+        self.blobs = {}
+        if path.exists():
+            try:
+                self.blobs = json.loads(path.read_text()).get("blobs", {})
+            except ValueError:
+                self.blobs = {}
+
+    def entry(self, blob) -> dict:
+        with self.lock:
+            return dict(self.blobs.get(blob, {}))
+
+    def local_md5(self, blob, stat):
+        entry = self.entry(blob)
+        if entry.get("size") == stat.st_size and entry.get("mtime_ns") == (
+            stat.st_mtime_ns
+        ):
+            return entry.get("md5")
+        return None
+
+    def update(self, blob, **fields):
+        with self.lock:
+            self.blobs.setdefault(blob, {}).update(fields)
+            self._save_if_due()
+
+    def add_block(self, blob, block_id):
+        with self.lock:
+            self.blobs[blob].setdefault("blocks", []).append(block_id)
+            self._save_if_due()
+
+    def _save_if_due(self):
+        if time.monotonic() - self._saved_at >= MANIFEST_SAVE_INTERVAL_SECONDS:
+            self._write()
+
+    def _write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"blobs": self.blobs}, indent=2, sort_keys=True))
+        tmp_path.replace(self.path)
+        self._saved_at = time.monotonic()
+
+    def save(self):
+        with self.lock:
+            self._write()
+
+
+@dataclass
+class PendingFile:
+    path: Path
+    blob: str
+    size: int
+    md5: str
+    content_type: str
+    # Blocks still to send in this run, as (block ID, offset, length)
+    blocks: list = field(default_factory=list)
+    # Every block ID of the blob, in order
+    block_ids: list = field(default_factory=list)
+
+
+def collect_files(path: Path, prefix: str = "") -> list:
+    """(file, blob name) pairs of a file or of a directory tree, sorted."""
+    prefix = f"{prefix.strip('/')}/" if prefix.strip("/") else ""
+    if path.is_file():
+        return [(path, prefix + path.name)]
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in sorted(names):
+            file = Path(root) / name
+            if file.is_file():
+                files.append((file, prefix + file.relative_to(path).as_posix()))
+    return files
+
+
+class Uploader:
+    """
+    Upload files as block blobs on a bounded thread pool. Large files are
+    split into blocks that upload concurrently with everything else, and the
+    last block of a file to finish commits it.
+    """
+
+    def __init__(
+        self,
+        client: BlobClient,
+        container: str,
+        manifest: UploadManifest,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        workers: int = UPLOAD_WORKERS,
+    ):
+        self.client = client
+        self.container = container
+        self.manifest = manifest
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._remaining = {}
+        self.sent_bytes = 0
+
+    def _plan_file(self, path, blob):
+        """A PendingFile for `path`, or None if the blob already holds it."""
+        stat = path.stat()
+        md5 = self.manifest.local_md5(blob, stat) or file_md5(path)
+        previous = self.manifest.entry(blob)
+        if previous.get("md5") != md5 or previous.get("chunk_size") != (
+            self.chunk_size
+        ):
+            previous = {}
+        self.manifest.update(
+            blob,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            md5=md5,
+            chunk_size=self.chunk_size,
+            committed=previous.get("committed", False),
+            blocks=previous.get("blocks", []),
+        )
+        if self.client.blob_md5(self.container, blob) == md5:
+            self.manifest.update(blob, committed=True, blocks=[])
+            return None
+
+        content_type = mimetypes.guess_type(blob)[0] or "application/octet-stream"
+        pending = PendingFile(path, blob, stat.st_size, md5, content_type)
+        if stat.st_size > self.chunk_size:
+            sent = set(previous.get("blocks", []))
+            for index, offset in enumerate(range(0, stat.st_size, self.chunk_size)):
+                block_id = base64.b64encode(
+                    f"{index:0{BLOCK_ID_DIGITS}d}".encode()
+                ).decode()
+                pending.block_ids.append(block_id)
+                if block_id not in sent:
+                    length = min(self.chunk_size, stat.st_size - offset)
+                    pending.blocks.append((block_id, offset, length))
+        return pending
+
+    def plan(self, files):
+        """Split (file, blob name) pairs into files to upload and unchanged ones."""
+        with ThreadPoolExecutor(self.workers) as executor:
+            planned = list(executor.map(lambda item: self._plan_file(*item), files))
+        pending = [item for item in planned if item is not None]
+        return pending, len(planned) - len(pending)
+
+    def _count_sent(self, size):
+        with self._lock:
+            self.sent_bytes += size
+
+    def _put_whole(self, pending):
+        data = pending.path.read_bytes()
+        self.client.put_blob(
+            self.container, pending.blob, data, pending.md5, pending.content_type
+        )
+        self._count_sent(len(data))
+        self.manifest.update(pending.blob, committed=True, blocks=[])
+
+    def _read_block(self, pending, offset, length) -> bytes:
+        with open(pending.path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def _put_block(self, pending, block_id, offset, length):
+        data = self._read_block(pending, offset, length)
+        self.client.put_block(self.container, pending.blob, block_id, data)
+        self._count_sent(len(data))
+        self.manifest.add_block(pending.blob, block_id)
+        with self._lock:
+            self._remaining[pending.blob] -= 1
+            last = self._remaining[pending.blob] == 0
+        if last:
+            self._commit(pending)
+
+    def _commit(self, pending):
+        try:
+            self.client.put_block_list(
+                self.container,
+                pending.blob,
+                pending.block_ids,
+                pending.md5,
+                pending.content_type,
+            )
+        except BlobStorageError as e:
+            # Uncommitted blocks of an old run expire after a week: send them all
+            if e.code != "InvalidBlockList" or len(pending.blocks) == len(
+                pending.block_ids
+            ):
+                raise
+            self.manifest.update(pending.blob, blocks=[])
+            for index, block_id in enumerate(pending.block_ids):
+                offset = index * self.chunk_size
+                length = min(self.chunk_size, pending.size - offset)
+                data = self._read_block(pending, offset, length)
+                self.client.put_block(self.container, pending.blob, block_id, data)
+                self._count_sent(len(data))
+            self.client.put_block_list(
+                self.container,
+                pending.blob,
+                pending.block_ids,
+                pending.md5,
+                pending.content_type,
+            )
+        self.manifest.update(pending.blob, committed=True, blocks=[])
+
+    def upload(self, pending_files) -> dict:
+        """Upload planned files, returning {blob name: error} for the failures."""
+        failed = {}
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = {}
+            for pending in pending_files:
+                if not pending.block_ids:
+                    futures[executor.submit(self._put_whole, pending)] = pending
+                elif not pending.blocks:
+                    # Every block was sent by an earlier run, only the commit is left
+                    futures[executor.submit(self._commit, pending)] = pending
+                else:
+                    self._remaining[pending.blob] = len(pending.blocks)
+                    for block in pending.blocks:
+                        future = executor.submit(self._put_block, pending, *block)
+                        futures[future] = pending
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except (BlobStorageError, OSError) as e:
+                    failed.setdefault(futures[future].blob, str(e))
+        self.manifest.save()
+        return failed
@@ -0,0 +1,162 @@
+"""
+Build a single-file InfraBox zipapp: python3 -m cli.build_zipapp [--bench]
+"""
+
+import argparse
+import hashlib
+import json
+import py_compile
+import shutil
+import statistics
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+import zipapp
+from importlib.util import find_spec
+from pathlib import Path
+
+from cli.bundle import BUILD_INFO
+from cli.state import BUNDLE_ROOT
+
+DEFAULT_OUTPUT = BUNDLE_ROOT / "dist" / "infrabox.pyz"
+BUNDLED_TREES = ("cli", "templates", "modules")
+# Runtime dependencies only: Jinja2 and what it imports
+RUNTIME_PACKAGES = ("jinja2", "markupsafe")
+SKIPPED_PARTS = {"__pycache__", ".terraform"}
+# Build tooling, of no use at runtime
+BUILD_ONLY_FILES = ("cli/build_zipapp.py",)
+# Native extensions cannot be imported from a zip; MarkupSafe falls back to
+# its pure Python implementation
+SKIPPED_SUFFIXES = {".pyc", ".so", ".pyd", ".c", ".pyi"}
+MAIN_SOURCE = "from infrabox import main\n\nmain()\n"
+INTERPRETER = "/usr/bin/env python3"
+
+
+def _copy_tree(source: Path, target: Path):
+    for path in sorted(source.rglob("*")):
+        relative = path.relative_to(source)
+        if (
+            path.is_dir()
+            or SKIPPED_PARTS & set(relative.parts)
+            or path.suffix in SKIPPED_SUFFIXES
+        ):
+            continue
+        destination = target / relative
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, destination)
+
+
+def stage_files(staging: Path, bundle_root: Path = BUNDLE_ROOT):
+    """Copy the CLI, its data trees and its runtime dependencies."""
+    shutil.copy2(bundle_root / "infrabox.py", staging / "infrabox.py")
+    for tree in BUNDLED_TREES:
+        _copy_tree(bundle_root / tree, staging / tree)
+    for name in BUILD_ONLY_FILES:
+        (staging / name).unlink()
+    for package in RUNTIME_PACKAGES:
+        package_dir = Path(find_spec(package).origin).parent
+        _copy_tree(package_dir, staging / package)
+    (staging / "__main__.py").write_text(MAIN_SOURCE)
+
+
+def content_hash(staging: Path) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(staging.rglob("*")):
+        if path.is_file():
+            digest.update(path.relative_to(staging).as_posix().encode() + b"\0")
+            digest.update(path.read_bytes() + b"\0")
+    return digest.hexdigest()
+
+
+def compile_bytecode(staging: Path):
+    """
+    Write a .pyc next to every module, where zipimport looks for it.
+    Unchecked hash-based pycs are used without comparing them to the source;
+    another Python version ignores them and compiles the bundled source.
+    """
+    for source in sorted(staging.rglob("*.py")):
+        py_compile.compile(
+            str(source),
+            cfile=str(source.with_suffix(".pyc")),
+            dfile=source.relative_to(staging).as_posix(),
+            doraise=True,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        )
+
+
+def build(output: Path = DEFAULT_OUTPUT, bundle_root: Path = BUNDLE_ROOT) -> Path:
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        staging = Path(tmp)
+        stage_files(staging, bundle_root)
+        info = {
+            "build_id": content_hash(staging),
+            "python": f"{sys.version_info.major}.{sys.version_info.minor}",
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        (staging / BUILD_INFO).write_text(json.dumps(info, indent=2))
+        compile_bytecode(staging)
+        zipapp.create_archive(staging, output, interpreter=INTERPRETER, compressed=True)
+    size_kb = output.stat().st_size / 1024
+    print(
+        f"INFRABOX: 📦 Built {output} ({size_kb:.0f} KiB, "
+        f"bytecode for Python {info['python']})"
+    )
+    return output
+
+
+def _time_command(cmd, runs, prepare=None):
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            command = prepare(Path(tmp)) if prepare else cmd
+            start = time.perf_counter()
+            subprocess.run(  # nosec B603
+                command, check=True, stdout=subprocess.DEVNULL, cwd=tmp
+            )
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def measure_startup(archive: Path, runs: int = 10, bundle_root: Path = BUNDLE_ROOT):
+    """
+    Median wall time of `infrabox.py --help` from a fresh clone (no cached
+    bytecode), a warm checkout and the zipapp.
+    """
+
+    def fresh_clone(tmp: Path):
+        shutil.copy2(bundle_root / "infrabox.py", tmp / "infrabox.py")
+        _copy_tree(bundle_root / "cli", tmp / "cli")
+        return [sys.executable, str(tmp / "infrabox.py"), "--help"]
+
+    checkout = [sys.executable, str(bundle_root / "infrabox.py"), "--help"]
+    results = {
+        "fresh clone": _time_command(None, runs, fresh_clone),
+        "checkout": _time_command(checkout, runs),
+        "zipapp": _time_command([sys.executable, str(archive), "--help"], runs),
+    }
+    print(f"\nINFRABOX: ⏱️ Startup time (median of {runs} runs of --help):")
+    for label, seconds in results.items():
+        print(f"  {label:<12} {seconds * 1000:7.1f} ms")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the InfraBox zipapp")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="Compare the archive's startup time with the source checkout",
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    archive = build(args.output)
+    if args.bench:
+        measure_startup(archive, args.runs)
+
+
+if __name__ == "__main__":
+    main()
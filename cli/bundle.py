@@ -0,0 +1,62 @@
+import json
+import zipfile
+from pathlib import Path
+
+from jinja2 import FunctionLoader
+
+from cli.state import BUNDLE_ROOT, INFRA_ROOT
+
+BUILD_INFO = "BUILD_INFO.json"
+MODULES_STAMP = ".infrabox-build"
+
+
+def read_bundled_text(relative: str, bundle_root: Path = BUNDLE_ROOT):
+    """Read a file shipped with InfraBox, or return None if it is missing."""
+    if bundle_root.is_file():
+        with zipfile.ZipFile(bundle_root) as archive:
+            try:
+                return archive.read(relative).decode("utf-8")
+            except KeyError:
+                return None
+    path = bundle_root / relative
+    return path.read_text() if path.is_file() else None
+
+
+def archive_template_loader(bundle_root: Path = BUNDLE_ROOT):
+    """Jinja2 loader reading templates/ from inside the zipapp."""
+    return FunctionLoader(
+        lambda name: read_bundled_text(f"templates/{name}", bundle_root)
+    )
+
+
+def build_id(bundle_root: Path = BUNDLE_ROOT):
+    info = read_bundled_text(BUILD_INFO, bundle_root)
+    return json.loads(info)["build_id"] if info else None
+
+
+def ensure_modules(bundle_root: Path = BUNDLE_ROOT, infra_root: Path = INFRA_ROOT):
+    """
+    Terraform reads modules from disk, so a zipapp extracts its modules/
+    tree next to the environments. Extraction is skipped while the modules
+    already come from the same build.
+    """
+    if not bundle_root.is_file():
+        return False
+    current = build_id(bundle_root)
+    stamp = infra_root / "modules" / MODULES_STAMP
+    if stamp.exists() and stamp.read_text().strip() == current:
+        return False
+
+    with zipfile.ZipFile(bundle_root) as archive:
+        for member in archive.infolist():
+            if not member.filename.startswith("modules/") or member.is_dir():
+                continue
+            target = (infra_root / member.filename).resolve()
+            if infra_root.resolve() not in target.parents:
+                raise ValueError(f"Unsafe path in archive: {member.filename}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(archive.read(member))
+    stamp.parent.mkdir(parents=True, exist_ok=True)
+    stamp.write_text(f"{current}\n")
+    print(f"INFRABOX: 📦 Extracted Terraform modules to {infra_root / 'modules'}")
+    return True
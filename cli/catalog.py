@@ -0,0 +1,169 @@
+import fcntl
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from cli.env_config import load_environment_config, scan_environment_configs
+from cli.state import INFRA_ROOT, get_state_dir
+from cli.workspaces import state_file
+
+CATALOG_VERSION = 1
+# The parsed catalog of this process, keyed by the identity of its file
+_loaded = {}
+# Written by the Terraform run itself, so kept across rescans
+RUN_FIELDS = ("last_run_status", "last_run_at", "last_applied_serial")
+SUCCESS_STATUS = {"apply": "applied", "destroy": "destroyed"}
+
+
+def get_catalog_path() -> Path:
+    return get_state_dir() / "catalog.json"
+
+
+@contextmanager
+def catalog_lock():
+    """Serialize read-modify-write updates of the catalog across processes."""
+    lock_path = get_state_dir() / "catalog.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read():
+    """The catalogued environments, or None if there is no usable catalog."""
+    path = get_catalog_path()
+    if not path.exists():
+        return None
+    try:
+        catalog = json.loads(path.read_text())
+    except ValueError:
+        return None
+    if catalog.get("version") != CATALOG_VERSION:
+        return None
+    return catalog["environments"]
+
+
+def _write(environments: dict):
+    path = get_catalog_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"version": CATALOG_VERSION, "environments": environments}
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(payload, indent=2, sort_keys=True))
+    tmp_path.replace(path)
+
+
+def _entry_for(config, previous=None) -> dict:
+    entry = {
+        "location": config.location,
+        # VNet and subnet ranges, or the literals a hand-written root passes on
+        "cidrs": list(config.cidrs),
+        "dns_zone_name": config.dns_zone_name,
+    }
+    for key in RUN_FIELDS:
+        entry[key] = (previous or {}).get(key)
+    return entry
+
+
+def _scan(environments_dir: Path, previous: dict) -> dict:
+    return {
+        config.name: _entry_for(config, previous.get(config.name))
+        for config in scan_environment_configs(environments_dir)
+    }
+
+
+def rescan(environments_dir=None) -> dict:
+    """Rebuild the catalog from the environments directory."""
+    environments_dir = environments_dir or INFRA_ROOT / "environments"
+    with catalog_lock():
+        environments = _scan(environments_dir, _read() or {})
+        _write(environments)
+    return environments
+
+
+def load_catalog(environments_dir=None) -> dict:
+    """
+    Environment name -> metadata. The environments directory is only walked
+    when there is no catalog yet (or after `list --rescan`).
+    """
+    environments = _read()
+    if environments is None:
+        try:
+            environments = rescan(environments_dir)
+        except OSError:
+            # Read-only state directory: still answer, just without caching
+            environments = _scan(environments_dir or INFRA_ROOT / "environments", {})
+    return environments
+
+
+def _cached_catalog() -> dict:
+    """load_catalog, parsing the file again only after it was replaced."""
+    path = get_catalog_path()
+    try:
+        stat = path.stat()
+    except OSError:
+        return load_catalog()
+    key = (str(path), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if key not in _loaded:
+        _loaded.clear()
+        _loaded[key] = load_catalog()
+    return _loaded[key]
+
+
+def contains(environment) -> bool:
+    return environment in _cached_catalog()
+
+
+def _update(update, environments_dir=None):
+    with catalog_lock():
+        environments = _read()
+        if environments is None:
+            environments = _scan(environments_dir or INFRA_ROOT / "environments", {})
+        update(environments)
+        _write(environments)
+
+
+def register_environment(env_path):
+    """Add or refresh an environment's entry from its generated files."""
+    env_path = Path(env_path)
+    config = load_environment_config(env_path)
+
+    def update(environments):
+        environments[config.name] = _entry_for(config, environments.get(config.name))
+
+    _update(update, env_path.parent)
+
+
+def unregister_environment(environment):
+    def update(environments):
+        environments.pop(environment, None)
+
+    _update(update)
+
+
+def record_run(env_path, operation, returncode):
+    """Record the outcome of an apply or destroy, and the state serial it left."""
+    env_path = Path(env_path)
+    status = SUCCESS_STATUS[operation] if returncode == 0 else f"{operation} failed"
+    serial = None
+    local_state = state_file(env_path)
+    if local_state.is_file():
+        try:
+            serial = json.loads(local_state.read_text()).get("serial")
+        except ValueError:
+            serial = None
+
+    def update(environments):
+        entry = environments.get(env_path.name)
+        if entry is None:
+            entry = _entry_for(load_environment_config(env_path))
+            environments[env_path.name] = entry
+        entry["last_run_status"] = status
+        entry["last_run_at"] = time.time()
+        if serial is not None:
+            entry["last_applied_serial"] = serial
+
+    _update(update, env_path.parent)
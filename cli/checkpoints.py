@@ -0,0 +1,179 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from cli.state import get_state_dir
+from cli.workspaces import WORKSPACE_TFVARS, terraform_dir
+
+STEPS = ("rendered", "initialized", "validated", "planned", "applied")
+# Steps whose outcome depends on whether the run creates or destroys
+OPERATION_STEPS = ("planned", "applied")
+
+
+def get_checkpoints_dir() -> Path:
+    return get_state_dir() / "checkpoints"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_hash(env_path: Path) -> str:
+    """
+    Hash of the environment's Terraform files and provider lock file, which
+    for a workspace environment are its values and the shared root's files.
+    """
+    digest = hashlib.sha256()
+    root = Path(terraform_dir(env_path))
+    files = sorted(root.glob("*.tf")) + sorted(root.glob("*.tf.json"))
+    files += [root / ".terraform.lock.hcl", env_path / WORKSPACE_TFVARS]
+    for path in files:
+        if path.is_file():
+            digest.update(path.name.encode() + b"\0" + path.read_bytes() + b"\0")
+    return digest.hexdigest()
+
+
+def _succeeded(result) -> bool:
+    # Dry runs return None and are never recorded
+    return result is not None and getattr(result, "returncode", None) == 0
+
+
+class Checkpoint:
+    """
+    Completed pipeline steps of one environment, saved after every step.
+    A step only counts as completed while the environment's Terraform files
+    are unchanged and every earlier step still counts as completed.
+    Without resume, recorded steps are ignored and overwritten.
+    """
+
+    def __init__(self, environment, env_path, operation="apply", *, resume=False):
+        self.environment = environment
+        self.env_path = Path(env_path)
+        self.operation = operation
+        self.resume = resume
+        self.enabled = True
+        self.path = get_checkpoints_dir() / f"{environment}.json"
+        self.plan_file = get_checkpoints_dir() / f"{environment}.tfplan"
+        self.steps = {}
+        if self.path.exists():
+            try:
+                self.steps = json.loads(self.path.read_text()).get("steps", {})
+            except ValueError:
+                self.steps = {}
+
+    @classmethod
+    def disabled(cls, environment, env_path):
+        """A checkpoint that never skips or records anything (dry runs)."""
+        checkpoint = cls(environment, env_path)
+        checkpoint.enabled = False
+        checkpoint.steps = {}
+        return checkpoint
+
+    @classmethod
+    def for_run(cls, environment, env_path, operation, args):
+        if args.dry_run:
+            return cls.disabled(environment, env_path)
+        return cls(
+            environment, env_path, operation, resume=getattr(args, "resume", False)
+        )
+
+    def _step_valid(self, step, current_hash):
+        entry = self.steps.get(step)
+        if entry is None or entry.get("config_hash") != current_hash:
+            return False
+        if step in OPERATION_STEPS and entry.get("operation") != self.operation:
+            return False
+        if step == "initialized":
+            return (Path(terraform_dir(self.env_path)) / ".terraform").is_dir()
+        if step == "planned" and entry.get("plan_hash"):
+            return (
+                self.plan_file.exists()
+                and file_sha256(self.plan_file) == entry["plan_hash"]
+            )
+        return True
+
+    def completed(self, step) -> bool:
+        if not (self.enabled and self.resume):
+            return False
+        current_hash = config_hash(self.env_path)
+        for earlier in STEPS[: STEPS.index(step) + 1]:
+            if earlier in self.steps and not self._step_valid(earlier, current_hash):
+                return False
+        return step in self.steps
+
+    def record(self, step, **details):
+        """Save a completed step, forgetting every later step."""
+        if not self.enabled:
+            return
+        for later in STEPS[STEPS.index(step) + 1 :]:
+            self.steps.pop(later, None)
+        self.steps[step] = {
+            "completed_at": time.time(),
+            "config_hash": config_hash(self.env_path),
+            **({"operation": self.operation} if step in OPERATION_STEPS else {}),
+            **details,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"environment": self.environment, "steps": self.steps}, indent=2)
+        )
+        tmp_path.replace(self.path)
+
+    def step(self, name, func, *args, **kwargs):
+        """Run a Terraform step unless a valid checkpoint says it already ran."""
+        if self.completed(name):
+            print(f"INFRABOX: ⏭️ Skipping '{name}' step, checkpoint is still valid.")
+            return None
+        result = func(*args, **kwargs)
+        if _succeeded(result):
+            self.record(name)
+        return result
+
+    def plan(self, has_changes_func, env_path, **kwargs) -> bool:
+        """
+        Check for changes, saving the plan to a file so a resumed run can
+        apply exactly what was planned without planning again.
+        """
+        if self.completed("planned"):
+            has_changes = self.steps["planned"]["has_changes"]
+            print(
+                "INFRABOX: ⏭️ Reusing saved plan "
+                f"({'changes detected' if has_changes else 'no changes'})."
+            )
+            return has_changes
+
+        if not self.enabled:
+            return has_changes_func(env_path, **kwargs)
+        self.plan_file.parent.mkdir(parents=True, exist_ok=True)
+        self.plan_file.unlink(missing_ok=True)
+        has_changes = has_changes_func(env_path, plan_file=self.plan_file, **kwargs)
+        if self.plan_file.exists():
+            self.record(
+                "planned",
+                has_changes=bool(has_changes),
+                plan_hash=file_sha256(self.plan_file),
+            )
+        return has_changes
+
+    def apply(self, apply_func, env_path, **kwargs):
+        """Apply the saved plan when there is one, then mark the run applied."""
+        if self.enabled and self.plan_file.exists():
+            kwargs["plan_file"] = self.plan_file
+        result = apply_func(env_path, **kwargs)
+        if _succeeded(result):
+            self.record("applied")
+            self.plan_file.unlink(missing_ok=True)
+        return result
+
+    def clear(self):
+        if not self.enabled:
+            return
+        self.steps = {}
+        self.path.unlink(missing_ok=True)
+        self.plan_file.unlink(missing_ok=True)
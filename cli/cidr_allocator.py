@@ -0,0 +1,435 @@
+import fcntl
+import ipaddress
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from cli.env_config import load_environment_config, scan_environment_configs
+from cli.state import get_state_dir
+from cli.workspaces import is_shared_root
+
+DEFAULT_ADDRESS_POOL = "10.0.0.0/8"
+VNET_PREFIX_LENGTH = 16
+SUBNET_PREFIX_LENGTH = 24
+# Reservations of environments that never got written to disk expire after this
+RESERVATION_TTL_SECONDS = 24 * 3600
+NO_FREE_BLOCK = 33
+ADDRESS_POOL_VERSION = 1
+
+_lock_held = threading.local()
+
+
+class _Node:
+    """A block of the buddy tree; children split it into two aligned halves."""
+
+    __slots__ = ("children", "full", "largest_free", "prefixlen")
+
+    def __init__(self, prefixlen):
+        self.prefixlen = prefixlen
+        self.children = None
+        self.full = False
+        # Prefix length of the largest free aligned block in this subtree
+        self.largest_free = prefixlen
+
+    def split(self):
+        if self.children is None:
+            self.children = (_Node(self.prefixlen + 1), _Node(self.prefixlen + 1))
+            if self.full:
+                for child in self.children:
+                    child.mark_full()
+
+    def refresh(self):
+        left, right = self.children
+        self.full = left.full and right.full
+        self.largest_free = min(left.largest_free, right.largest_free)
+        if self.full:
+            self.mark_full()
+        elif left.largest_free == right.largest_free == self.prefixlen + 1:
+            # Both halves completely free: merge back into a free block
+            self.children = None
+            self.largest_free = self.prefixlen
+
+    def mark_free(self):
+        self.children = None
+        self.full = False
+        self.largest_free = self.prefixlen
+
+    def mark_full(self):
+        self.children = None
+        self.full = True
+        self.largest_free = NO_FREE_BLOCK
+
+    def encode(self):
+        """0 for a free block, 1 for a used one, or a pair of halves."""
+        if self.children is None:
+            return int(self.full)
+        return [child.encode() for child in self.children]
+
+    @classmethod
+    def decode(cls, data, prefixlen):
+        node = cls(prefixlen)
+        if isinstance(data, list):
+            node.children = tuple(cls.decode(child, prefixlen + 1) for child in data)
+            node.refresh()
+        elif data:
+            node.mark_full()
+        return node
+
+
+class AddressPool:
+    """
+    Free-space tree over a supernet. Marking a used block and allocating the
+    first free aligned block both walk a single root-to-leaf path, so they
+    cost O(prefix length) regardless of how many blocks are in use.
+    owners maps each environment or reservation to the blocks it uses, so
+    releasing them keeps blocks that other owners still use.
+    """
+
+    def __init__(self, supernet=DEFAULT_ADDRESS_POOL):
+        self.network = ipaddress.IPv4Network(supernet, strict=True)
+        self.root = _Node(self.network.prefixlen)
+        self.owners = {}
+
+    def _bit(self, address: int, prefixlen: int) -> int:
+        return (address >> (32 - prefixlen - 1)) & 1
+
+    def _path_to(self, network):
+        """Split down to the block of network, returning the nodes walked."""
+        address = int(network.network_address)
+        path = [self.root]
+        node = self.root
+        while node.prefixlen < network.prefixlen:
+            node.split()
+            node = node.children[self._bit(address, node.prefixlen)]
+            path.append(node)
+        return path
+
+    def mark_used(self, cidr: str):
+        """Record a block as used. Blocks outside the pool are ignored."""
+        used = ipaddress.IPv4Network(cidr, strict=False)
+        if not used.overlaps(self.network):
+            return
+        if used.prefixlen <= self.network.prefixlen:
+            self.root.mark_full()
+            return
+
+        address = int(used.network_address)
+        path = [self.root]
+        node = self.root
+        while node.prefixlen < used.prefixlen:
+            if node.full:
+                return
+            node.split()
+            node = node.children[self._bit(address, node.prefixlen)]
+            path.append(node)
+        node.mark_full()
+        for parent in reversed(path[:-1]):
+            parent.refresh()
+
+    def mark_free(self, cidr: str):
+        """Record a block as free again. Blocks outside the pool are ignored."""
+        freed = ipaddress.IPv4Network(cidr, strict=False)
+        if not freed.overlaps(self.network):
+            return
+        if freed.prefixlen <= self.network.prefixlen:
+            self.root.mark_free()
+            return
+        path = self._path_to(freed)
+        path[-1].mark_free()
+        for parent in reversed(path[:-1]):
+            parent.refresh()
+
+    def set_owner(self, owner, cidrs) -> bool:
+        """
+        Replace the blocks an owner uses. Blocks it gives up are freed, then
+        other owners' blocks overlapping them are marked used again.
+        Returns whether anything changed.
+        """
+        cidrs = list(cidrs)
+        old = self.owners.pop(owner, [])
+        if cidrs:
+            self.owners[owner] = cidrs
+        if old == cidrs:
+            return False
+        for cidr in old:
+            self.mark_free(cidr)
+        freed = [ipaddress.IPv4Network(cidr, strict=False) for cidr in old]
+        for owned in self.owners.values():
+            for cidr in owned:
+                network = ipaddress.IPv4Network(cidr, strict=False)
+                if any(network.overlaps(block) for block in freed):
+                    self.mark_used(cidr)
+        for cidr in cidrs:
+            self.mark_used(cidr)
+        return True
+
+    def allocate(self, prefixlen: int) -> str:
+        """Mark and return the first free aligned block of the given size."""
+        if prefixlen < self.network.prefixlen or self.root.largest_free > prefixlen:
+            raise ValueError(
+                f"No free /{prefixlen} block left in address pool {self.network}"
+            )
+
+        address = int(self.network.network_address)
+        path = [self.root]
+        node = self.root
+        while node.prefixlen < prefixlen:
+            node.split()
+            left, right = node.children
+            if left.largest_free <= prefixlen:
+                node = left
+            else:
+                address |= 1 << (32 - node.prefixlen - 1)
+                node = right
+            path.append(node)
+        node.mark_full()
+        for parent in reversed(path[:-1]):
+            parent.refresh()
+        return str(ipaddress.IPv4Network((address, prefixlen)))
+
+
+def _reservations_path() -> Path:
+    return get_state_dir() / "cidr_reservations.json"
+
+
+def _load_reservations() -> dict:
+    path = _reservations_path()
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def _save_reservations(reservations: dict):
+    path = _reservations_path()
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(reservations, indent=2, sort_keys=True))
+    tmp_path.replace(path)
+
+
+@contextmanager
+def allocation_lock():
+    """
+    Serialize allocations across concurrent `initialize` runs. A thread
+    already holding the lock may take it again, so a check and the
+    reservation that follows it can share one critical section.
+    """
+    if getattr(_lock_held, "depth", 0):
+        _lock_held.depth += 1
+        try:
+            yield
+        finally:
+            _lock_held.depth -= 1
+        return
+    lock_path = get_state_dir() / "cidr.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        _lock_held.depth = 1
+        try:
+            yield
+        finally:
+            _lock_held.depth = 0
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _live_reservations(environments_dir: Path, exclude_env=None) -> dict:
+    now = time.time()
+    return {
+        env: reservation["cidrs"]
+        for env, reservation in _load_reservations().items()
+        if env != exclude_env
+        and (
+            (environments_dir / env).exists()
+            or now - reservation["reserved_at"] <= RESERVATION_TTL_SECONDS
+        )
+    }
+
+
+def reserved_cidrs(environments_dir: Path, exclude_env=None):
+    """
+    Yield (environment, cidr) for every live reservation. Call with the
+    allocation lock held.
+    """
+    for env, cidrs in _live_reservations(environments_dir, exclude_env).items():
+        for cidr in cidrs:
+            yield env, cidr
+
+
+def _address_pool_path() -> Path:
+    return get_state_dir() / "cidr_pool.json"
+
+
+def _environment_mtimes(environments_dir: Path) -> dict:
+    """mtime of every environment directory, which changes as files are added."""
+    if not environments_dir.exists():
+        return {}
+    with os.scandir(environments_dir) as entries:
+        return {
+            entry.name: entry.stat().st_mtime_ns
+            for entry in entries
+            if entry.is_dir() and not is_shared_root(entry.name)
+        }
+
+
+def _read_address_pool():
+    """
+    The saved tree, the environments directory it covers and the directory
+    mtimes it reflects, or (None, None, {}).
+    """
+    try:
+        data = json.loads(_address_pool_path().read_text())
+    except (OSError, ValueError):
+        return None, None, {}
+    if data.get("version") != ADDRESS_POOL_VERSION:
+        return None, None, {}
+    address_pool = AddressPool(data["pool"])
+    address_pool.root = _Node.decode(data["tree"], address_pool.network.prefixlen)
+    address_pool.owners = data["owners"]
+    return address_pool, Path(data["environments_dir"]), data["environments"]
+
+
+def _save_address_pool(address_pool, environments_dir: Path, mtimes):
+    path = _address_pool_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {
+                "version": ADDRESS_POOL_VERSION,
+                "pool": str(address_pool.network),
+                "environments_dir": str(environments_dir.resolve()),
+                "environments": mtimes,
+                "owners": address_pool.owners,
+                "tree": address_pool.root.encode(),
+            }
+        )
+    )
+    tmp_path.replace(path)
+
+
+def build_address_pool(environments_dir: Path, pool=None):
+    """Build the free-space tree from a scan of every environment."""
+    address_pool = AddressPool(pool or DEFAULT_ADDRESS_POOL)
+    for config in scan_environment_configs(environments_dir):
+        address_pool.set_owner(f"env:{config.name}", config.cidrs)
+    return address_pool
+
+
+def load_address_pool(environments_dir: Path, pool=DEFAULT_ADDRESS_POOL):
+    """
+    The saved free-space tree, updated for environment directories added,
+    removed or changed since it was saved and for the live reservations.
+    Only changed environments are read again; a full scan happens only when
+    the saved tree is missing or was built for another pool or directory.
+    Call with the allocation lock held.
+    """
+    mtimes = _environment_mtimes(environments_dir)
+    address_pool, saved_dir, saved_mtimes = _read_address_pool()
+    changed = (
+        address_pool is None
+        or address_pool.network != ipaddress.IPv4Network(pool)
+        or saved_dir != environments_dir.resolve()
+    )
+    if changed:
+        address_pool = build_address_pool(environments_dir, pool)
+        saved_mtimes = mtimes
+    for name, mtime in mtimes.items():
+        if saved_mtimes.get(name) != mtime:
+            config = load_environment_config(environments_dir / name)
+            changed |= address_pool.set_owner(f"env:{name}", config.cidrs)
+    for name in saved_mtimes.keys() - mtimes.keys():
+        changed |= address_pool.set_owner(f"env:{name}", ())
+    reservations = _live_reservations(environments_dir)
+    for owner in list(address_pool.owners):
+        kind, _, name = owner.partition(":")
+        if kind == "reservation" and name not in reservations:
+            changed |= address_pool.set_owner(owner, ())
+    for name, cidrs in reservations.items():
+        changed |= address_pool.set_owner(f"reservation:{name}", cidrs)
+    if changed or mtimes != saved_mtimes:
+        _save_address_pool(address_pool, environments_dir, mtimes)
+    return address_pool
+
+
+def _update_address_pool(environment, cidrs):
+    """Apply a changed reservation to the saved tree, if there is one."""
+    address_pool, environments_dir, mtimes = _read_address_pool()
+    if address_pool is not None and address_pool.set_owner(
+        f"reservation:{environment}", cidrs
+    ):
+        _save_address_pool(address_pool, environments_dir, mtimes)
+
+
+def allocate_vnet_cidr(
+    environment,
+    environments_dir: Path,
+    pool=DEFAULT_ADDRESS_POOL,
+    prefixlen=VNET_PREFIX_LENGTH,
+    reserve=True,
+) -> str:
+    """
+    Return the first free VNet block for an environment. The block is
+    reserved so that concurrent runs do not hand out the same range.
+    """
+    with allocation_lock():
+        address_pool = load_address_pool(environments_dir, pool)
+        # The environment's own earlier reservation is free for it to reuse
+        address_pool.set_owner(f"reservation:{environment}", ())
+        cidr = address_pool.allocate(prefixlen)
+        if reserve:
+            _reserve(environment, [cidr])
+    return cidr
+
+
+def allocate_vnet_cidrs(
+    environments,
+    environments_dir: Path,
+    pool=DEFAULT_ADDRESS_POOL,
+    prefixlen=VNET_PREFIX_LENGTH,
+    reserve=True,
+) -> dict:
+    """
+    Allocate one VNet block per environment from a single view of the pool,
+    so that environments initialized together never share a range.
+    """
+    cidrs = {}
+    with allocation_lock():
+        address_pool = load_address_pool(environments_dir, pool)
+        for environment in environments:
+            cidrs[environment] = address_pool.allocate(prefixlen)
+            if reserve:
+                _reserve(environment, [cidrs[environment]])
+    return cidrs
+
+
+def first_subnet(vnet_cidr: str, prefixlen=SUBNET_PREFIX_LENGTH) -> str:
+    """Return the first block of the given size inside a VNet."""
+    vnet = ipaddress.IPv4Network(vnet_cidr, strict=True)
+    if prefixlen < vnet.prefixlen:
+        return str(vnet)
+    return str(next(vnet.subnets(new_prefix=prefixlen)))
+
+
+def _reserve(environment, cidrs):
+    reservations = _load_reservations()
+    reservations[environment] = {"cidrs": cidrs, "reserved_at": time.time()}
+    _save_reservations(reservations)
+    _update_address_pool(environment, cidrs)
+
+
+def reserve_cidrs(environment, cidrs):
+    """Record the CIDRs an environment ended up using."""
+    with allocation_lock():
+        _reserve(environment, list(cidrs))
+
+
+def release_cidrs(environment):
+    """Drop an environment's reservation (e.g. after an aborted initialize)."""
+    with allocation_lock():
+        reservations = _load_reservations()
+        if reservations.pop(environment, None) is not None:
+            _save_reservations(reservations)
+            _update_address_pool(environment, ())
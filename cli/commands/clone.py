@@ -0,0 +1,183 @@
+import re
+import shutil
+import time
+
+from cli.catalog import register_environment, unregister_environment
+from cli.cidr_allocator import (
+    allocate_vnet_cidr,
+    allocation_lock,
+    first_subnet,
+    release_cidrs,
+    reserve_cidrs,
+)
+from cli.env_config import load_environment_config
+from cli.file_links import link_tree
+from cli.infrastructure_templates import (
+    generate_main_tf,
+    generate_outputs_tf,
+    generate_provider_tf,
+    generate_variables_tf,
+    generate_workspace_tfvars,
+)
+from cli.tf_json import generate_tf_json, uses_tf_json, write_config
+from cli.utils import (
+    ENVIRONMENTS_DIR,
+    check_cidr_overlap,
+    sanitize_input,
+    validate_cidr,
+)
+from cli.workspaces import is_workspace_environment
+
+# Parts of .terraform/ that do not depend on the environment. The backend
+# settings in .terraform/terraform.tfstate are left out on purpose: they
+# would point the clone at the source's state.
+# Provider binaries are never written after init, so they can be linked.
+SHARED_TERRAFORM_DIRS = ("providers",)
+# Terraform rewrites files here (e.g. modules.json) in place, so the clone
+# gets its own copy
+COPIED_TERRAFORM_DIRS = ("modules",)
+LOCK_FILE = ".terraform.lock.hcl"
+
+
+def _rename_zone(dns_zone_name, source, target):
+    """
+    Replace the source name where it is a whole part of a DNS label, e.g.
+    infrabox-dev.com but not devops.com, or prefix the zone with target.
+    """
+    pattern = rf"(?<![a-z0-9]){re.escape(source)}(?![a-z0-9])"
+    renamed, count = re.subn(pattern, target, dns_zone_name)
+    return renamed if count else f"{target}.{dns_zone_name}"
+
+
+def clone_context(context, source, target, overrides):
+    """The source's template context with the target's name and overrides."""
+    dns_zone_name = _rename_zone(context["dns_zone_name"], source, target)
+    cloned = {**context, "environment": target, "dns_zone_name": dns_zone_name}
+    cloned.update({key: value for key, value in overrides.items() if value})
+    return cloned
+
+
+def link_terraform_dir(source_path, target_path):
+    """
+    Share the source's providers with the clone instead of downloading them,
+    and copy its installed modules.
+    """
+    methods = {}
+    for name in SHARED_TERRAFORM_DIRS:
+        source_dir = source_path / ".terraform" / name
+        if source_dir.is_dir():
+            for method, count in link_tree(
+                source_dir, target_path / ".terraform" / name
+            ).items():
+                methods[method] = methods.get(method, 0) + count
+    for name in COPIED_TERRAFORM_DIRS:
+        source_dir = source_path / ".terraform" / name
+        if source_dir.is_dir():
+            shutil.copytree(
+                source_dir, target_path / ".terraform" / name, symlinks=True
+            )
+    if (source_path / LOCK_FILE).exists():
+        shutil.copy2(source_path / LOCK_FILE, target_path / LOCK_FILE)
+    return methods
+
+
+def _render_clone(source_path, target_path, context, dry_run=False):
+    """
+    Write the clone in the source's layout and output format, sharing the
+    source's providers. Returns the link methods used and their file counts.
+    """
+    if is_workspace_environment(source_path):
+        # The shared root is already initialized, the values are all it needs
+        generate_workspace_tfvars(target_path, context, dry_run=dry_run)
+        return {}
+    if dry_run:
+        if uses_tf_json(source_path):
+            write_config("variables", context, target_path, dry_run=True)
+        else:
+            generate_variables_tf(target_path, context, dry_run=True)
+        return {}
+    if uses_tf_json(source_path):
+        generate_tf_json(target_path, context)
+    else:
+        generate_variables_tf(target_path, context)
+        generate_main_tf(target_path, context)
+        generate_outputs_tf(target_path, context)
+        generate_provider_tf(target_path, context)
+    return link_terraform_dir(source_path, target_path)
+
+
+def run(args):
+    started = time.perf_counter()
+    source = sanitize_input(args.source.lower())
+    target = sanitize_input(args.target.lower())
+    source_path = ENVIRONMENTS_DIR / source
+    target_path = ENVIRONMENTS_DIR / target
+
+    if not source_path.exists():
+        print(f"INFRABOX: ❌ Environment directory '{source}' does not exist.")
+        return
+    if target_path.exists():
+        print(
+            f"INFRABOX: ⚠️ Environment files for environment '{target}' already exist. Aborting."
+        )
+        return
+
+    try:
+        vnet_cidr = validate_cidr(
+            args.vnet_cidr
+            or allocate_vnet_cidr(target, ENVIRONMENTS_DIR, reserve=not args.dry_run)
+        )
+        subnet_cidr = validate_cidr(args.subnet_cidr or first_subnet(vnet_cidr))
+        with allocation_lock():
+            check_cidr_overlap(vnet_cidr, target, ENVIRONMENTS_DIR)
+            check_cidr_overlap(subnet_cidr, target, ENVIRONMENTS_DIR)
+            if not args.dry_run:
+                reserve_cidrs(target, [vnet_cidr, subnet_cidr])
+    except ValueError as e:
+        print(f"INFRABOX: ❌ {e}")
+        if not args.dry_run:
+            release_cidrs(target)
+        return
+
+    context = clone_context(
+        load_environment_config(source_path).template_context(),
+        source,
+        target,
+        {
+            "location": args.location,
+            "vnet_address_space": vnet_cidr,
+            "subnet_address_space": subnet_cidr,
+        },
+    )
+
+    if args.dry_run:
+        print(f"INFRABOX: 🔍 Dry-run mode: would clone '{source}' into '{target}'.")
+        _render_clone(source_path, target_path, context, dry_run=True)
+        return
+
+    try:
+        target_path.mkdir(parents=True)
+        methods = _render_clone(source_path, target_path, context)
+        register_environment(target_path)
+    except (OSError, KeyboardInterrupt):
+        release_cidrs(target)
+        unregister_environment(target)
+        shutil.rmtree(target_path, ignore_errors=True)
+        print(f"INFRABOX: 🧹 Removed environment directory {target_path} due to error.")
+        raise
+
+    linked = ", ".join(f"{count} {method}" for method, count in methods.items())
+    print(
+        f"INFRABOX: ✅ Cloned '{source}' into '{target}' "
+        f"({vnet_cidr}, subnet {subnet_cidr}) in "
+        f"{time.perf_counter() - started:.2f}s."
+    )
+    if is_workspace_environment(target_path):
+        print(f"INFRABOX: 🔗 '{target}' is a workspace of the root '{source}' uses.")
+    elif linked:
+        print(f"INFRABOX: 🔗 Provider files shared with '{source}': {linked}.")
+    else:
+        print(
+            f"INFRABOX: 💡 '{source}' has no initialized providers; "
+            f"`create {target}` will download them."
+        )
@@ -1,4 +1,9 @@
+from cli.checkpoints import Checkpoint
+from cli.plan_cache import skip_unchanged
+from cli.preflight import require_preflight
+from cli.regions import deploy_regions
 from cli.terraform_utils import (
+    TerraformOptions,
     terraform_apply,
     terraform_init,
     terraform_state_has_changes,
@@ -8,13 +13,50 @@ from cli.utils import get_env_path, prompt_user_confirmation
 
 
 def run(args):
+    if args.regions:
+        return deploy_regions(args, destroy=True)
+
     env_path = get_env_path(args.environment)
+    if skip_unchanged(env_path, args, destroy=True):
+        return None
+    checkpoint = Checkpoint.for_run(args.environment, env_path, "destroy", args)
+    if checkpoint.completed("applied"):
+        print(f"INFRABOX: ✅ Environment '{args.environment}' is already destroyed.")
+        return None
 
-    terraform_init(env_path, dry_run=args.dry_run)
-    terraform_validate(env_path, dry_run=args.dry_run)
+    require_preflight(env_path, args)
+    # --no-cache also reruns init and validate that `warm` already did
+    no_cache = getattr(args, "no_cache", False)
+    checkpoint.step(
+        "initialized",
+        terraform_init,
+        env_path,
+        dry_run=args.dry_run,
+        no_cache=no_cache,
+    )
+    checkpoint.step(
+        "validated",
+        terraform_validate,
+        env_path,
+        dry_run=args.dry_run,
+        no_cache=no_cache,
+    )
 
     if (
-        terraform_state_has_changes(env_path, destroy=True, dry_run=args.dry_run)
+        checkpoint.plan(
+            terraform_state_has_changes,
+            env_path,
+            destroy=True,
+            dry_run=args.dry_run,
+            options=TerraformOptions.from_args(args),
+        )
         and prompt_user_confirmation()
     ):
-        terraform_apply(env_path, destroy=True, dry_run=args.dry_run)
+        return checkpoint.apply(
+            terraform_apply,
+            env_path,
+            destroy=True,
+            dry_run=args.dry_run,
+            options=TerraformOptions.from_args(args),
+        )
+    return None
@@ -0,0 +1,107 @@
+import json
+from collections import Counter
+from pathlib import Path
+
+from cli.env_config import load_environment_config
+from cli.fleet import fleet_context_from_variables
+from cli.terraform_utils import terraform_output
+from cli.utils import ENVIRONMENTS_DIR, read_cmd_output
+
+
+def _az_json(args, env_path):
+    """Run an Azure CLI query, returning its parsed JSON or None on failure."""
+    try:
+        result = read_cmd_output(["az", *args, "--output", "json"], cwd=env_path)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        return json.loads(result.stdout or "null")
+    except ValueError:
+        return None
+
+
+def fleet_status(env_path: Path):
+    """
+    The fleet's configured bounds, the instance count autoscale currently
+    wants and the instances that are actually running, or None if the
+    environment runs a single VM. Live counts are None when Azure cannot be
+    asked.
+    """
+    fleet = fleet_context_from_variables(load_environment_config(env_path).variables)
+    if not fleet["fleet"]:
+        return None
+    status = {
+        "min_instances": fleet["fleet_min_instances"],
+        "max_instances": fleet["fleet_max_instances"],
+        "name": None,
+        "desired": None,
+        "running": None,
+        "transitioning": {},
+    }
+    try:
+        outputs = terraform_output(env_path)
+    except RuntimeError:
+        return status
+    name = outputs.get("fleet_name")
+    resource_group = outputs.get("resource_group_name")
+    if not name or not resource_group:
+        return status
+    status["name"] = name
+    scope = ["--resource-group", resource_group, "--name", name]
+
+    scale_set = _az_json(["vmss", "show", *scope], env_path)
+    if isinstance(scale_set, dict):
+        status["desired"] = scale_set.get("sku", {}).get("capacity")
+    instances = _az_json(["vmss", "list-instances", *scope], env_path)
+    if isinstance(instances, list):
+        states = Counter(
+            instance.get("provisioningState", "Unknown") for instance in instances
+        )
+        status["running"] = states.pop("Succeeded", 0)
+        status["transitioning"] = dict(states)
+    return status
+
+
+def _count(value) -> str:
+    return "unknown" if value is None else str(value)
+
+
+def run(args):
+    env_path = ENVIRONMENTS_DIR / args.environment
+    if not env_path.is_dir():
+        print(
+            f"INFRABOX: ❌ Environment directory '{args.environment}' does not exist."
+        )
+        return
+
+    status = fleet_status(env_path)
+    if status is None:
+        print(
+            f"INFRABOX: 📭 Environment '{args.environment}' runs a single VM. "
+            "Initialize it with --fleet for an autoscaled fleet."
+        )
+        return
+
+    print(
+        f"INFRABOX: 🚜 Fleet of environment '{args.environment}'"
+        + (f" ({status['name']}):" if status["name"] else ":")
+    )
+    print(f"  Bounds:  {status['min_instances']}-{status['max_instances']} instances")
+    print(f"  Desired: {_count(status['desired'])}")
+    running = _count(status["running"])
+    transitioning = ", ".join(
+        f"{count} {state}" for state, count in sorted(status["transitioning"].items())
+    )
+    print(
+        f"  Current: {running} running"
+        + (f", {transitioning}" if transitioning else "")
+    )
+    if status["name"] is None:
+        print(
+            "INFRABOX: ⚠️ No fleet outputs yet. Run `infrabox.py create "
+            f"{args.environment}` first."
+        )
+    elif status["desired"] is None or status["running"] is None:
+        print("INFRABOX: ⚠️ Could not query Azure. Is the Azure CLI logged in?")
@@ -0,0 +1,41 @@
+import time
+
+from cli.run_history import (
+    SUCCESS_CODES,
+    format_duration,
+    recent_runs,
+    slowest_phases,
+)
+from cli.utils import sanitize_env_name
+
+
+def run(args):
+    environment = sanitize_env_name(args.environment) if args.environment else None
+
+    if args.slowest:
+        rows = slowest_phases(environment, args.limit)
+        if not rows:
+            print("INFRABOX: 📭 No run history recorded yet.")
+            return
+        print("INFRABOX: 🐢 Slowest phases (median of recent successful runs):")
+        width = max(len(row[0]) for row in rows)
+        for env, phase, runs, median, longest in rows:
+            print(
+                f"  {env:<{width}}  {phase:<10} {format_duration(median):>8}  "
+                f"max {format_duration(longest):>8}  ({runs} runs)"
+            )
+        return
+
+    rows = recent_runs(environment, args.limit)
+    if not rows:
+        print("INFRABOX: 📭 No run history recorded yet.")
+        return
+    print("INFRABOX: 📚 Recent Terraform runs:")
+    width = max(len(row[0]) for row in rows)
+    for env, phase, seconds, returncode, finished_at in rows:
+        finished = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(finished_at))
+        icon = "✅" if returncode in SUCCESS_CODES else "❌"
+        print(
+            f"  {finished}  {icon} {env:<{width}}  {phase:<10} "
+            f"{format_duration(seconds):>8}"
+        )
@@ -1,12 +1,31 @@
+import argparse
 import shutil
 
+from cli.catalog import register_environment, unregister_environment
+from cli.checkpoints import Checkpoint
+from cli.cidr_allocator import (
+    allocate_vnet_cidr,
+    allocate_vnet_cidrs,
+    allocation_lock,
+    first_subnet,
+    release_cidrs,
+    reserve_cidrs,
+)
+from cli.fleet import fleet_context, fleet_context_from_args
 from cli.infrastructure_templates import (
     generate_main_tf,
     generate_outputs_tf,
     generate_provider_tf,
     generate_variables_tf,
+    generate_workspace_tfvars,
 )
+from cli.parallel import print_summary, run_parallel
+from cli.parser import new_region_environments
+from cli.profiles import DEFAULT_PROFILE, profile_context
+from cli.regions import INIT_PHASES, check_result, region_environment
+from cli.run_history import expected_durations
 from cli.terraform_utils import terraform_init, terraform_validate
+from cli.tf_json import generate_tf_json
 from cli.utils import (
     ENVIRONMENTS_DIR,
     check_cidr_overlap,
@@ -14,17 +33,124 @@ from cli.utils import (
     sanitize_input,
     validate_cidr,
 )
+from cli.workspaces import shared_root, workspace_from_args
+
+
+def _render_shared_root(environments_dir, context, dry_run):
+    """
+    Render the root every workspace environment shares, unless it exists.
+    Its variable defaults come from the first environment; every workspace
+    overrides all of them with its own var file.
+    """
+    root = shared_root(environments_dir)
+    if (root / "main.tf").exists():
+        return
+    if not dry_run:
+        root.mkdir(parents=True, exist_ok=True)
+        print(f"INFRABOX: 📁 Created the shared workspace root at {root}")
+    context = {**context, **fleet_context()}
+    generate_variables_tf(root, context, dry_run=dry_run)
+    generate_main_tf(root, context, dry_run=dry_run)
+    generate_outputs_tf(root, context, dry_run=dry_run)
+    generate_provider_tf(root, context, dry_run=dry_run)
+
+
+def _render_environment(
+    env_path, context, dry_run, output_format="hcl", workspace=False
+):
+    if workspace:
+        _render_shared_root(env_path.parent, context, dry_run)
+        generate_workspace_tfvars(env_path, context, dry_run=dry_run)
+    elif output_format == "json":
+        generate_tf_json(env_path, context, dry_run=dry_run)
+    else:
+        # Render all Terraform files using jinja2 templates
+        generate_variables_tf(env_path, context, dry_run=dry_run)
+        generate_main_tf(env_path, context, dry_run=dry_run)
+        generate_outputs_tf(env_path, context, dry_run=dry_run)
+        generate_provider_tf(env_path, context, dry_run=dry_run)
+    if not dry_run:
+        register_environment(env_path)
+
+
+def _discard_environment(environment, env_path, checkpoint, dry_run, resume_args=None):
+    if dry_run:
+        return
+    if "rendered" in checkpoint.steps:
+        # Rendering finished, so the files are complete and worth keeping
+        print(
+            f"INFRABOX: 💡 Environment files kept. Run `infrabox.py initialize "
+            f"{resume_args or environment} --resume` to continue."
+        )
+        return
+    release_cidrs(environment)
+    unregister_environment(environment)
+    if env_path.exists():
+        shutil.rmtree(env_path)
+        print(f"INFRABOX: 🧹 Removed environment directory {env_path} due to error.")
+
+
+def _init_and_validate(checkpoint, env_path, dry_run):
+    return (
+        checkpoint.step("initialized", terraform_init, env_path, dry_run=dry_run),
+        checkpoint.step("validated", terraform_validate, env_path, dry_run=dry_run),
+    )
+
+
+def _layout_from_args(args, environment):
+    """
+    The fleet context, and whether to use the workspace layout. Raises
+    ValueError for invalid options or region environment names.
+    """
+    fleet = fleet_context_from_args(args)
+    workspace = workspace_from_args(args, fleet)
+    if getattr(args, "regions", None):
+        try:
+            new_region_environments(environment, args.regions)
+        except argparse.ArgumentTypeError as e:
+            raise ValueError(str(e)) from e
+    return fleet, workspace
+
+
+def _check_and_reserve(environment, cidrs, dry_run):
+    """
+    Check the CIDRs for overlaps and reserve them under one lock, so no
+    concurrent run can take them in between. Raises ValueError on overlap.
+    """
+    with allocation_lock():
+        for cidr in cidrs:
+            check_cidr_overlap(cidr, environment, ENVIRONMENTS_DIR)
+        if not dry_run:
+            reserve_cidrs(environment, cidrs)
 
 
 def run(args):
     environment = sanitize_input(args.environment.lower())
+    try:
+        fleet, workspace = _layout_from_args(args, environment)
+    except ValueError as e:
+        print(f"INFRABOX: ❌ {e}")
+        return
+    if getattr(args, "regions", None):
+        _initialize_regions(args, environment, (fleet, workspace))
+        return
+
     env_path = ENVIRONMENTS_DIR / environment
+    checkpoint = Checkpoint.for_run(environment, env_path, "apply", args)
 
     if env_path.exists():
+        if checkpoint.completed("rendered"):
+            print(f"INFRABOX: ⏭️ Resuming initialization of environment: {environment}")
+            _init_and_validate(checkpoint, env_path, args.dry_run)
+            print(
+                f"INFRABOX: ✅ Initialization and validation complete for environment: {environment}"
+            )
+            return
         print(
             f"INFRABOX: ⚠️ Environment files for environment '{environment}' already exist. Aborting."
         )
         return
+    checkpoint.clear()
 
     try:
         # Prompt user for core environment values
@@ -38,17 +164,22 @@ def run(args):
             "Enter path to SSH public key", "~/.ssh/id_rsa_infrabox.pub"
         )
 
-        vnet_cidr = validate_cidr(prompt_with_default("Enter VNet CIDR", "10.0.0.0/16"))
+        # Propose the first free blocks of the shared address pool
+        default_vnet = allocate_vnet_cidr(
+            environment, ENVIRONMENTS_DIR, reserve=not args.dry_run
+        )
+        vnet_cidr = validate_cidr(prompt_with_default("Enter VNet CIDR", default_vnet))
         subnet_cidr = validate_cidr(
-            prompt_with_default("Enter Subnet CIDR", "10.0.1.0/24")
+            prompt_with_default("Enter Subnet CIDR", first_subnet(vnet_cidr))
         )
 
         # CIDR overlap checks
         try:
-            check_cidr_overlap(vnet_cidr, environment, ENVIRONMENTS_DIR)
-            check_cidr_overlap(subnet_cidr, environment, ENVIRONMENTS_DIR)
+            _check_and_reserve(environment, [vnet_cidr, subnet_cidr], args.dry_run)
         except ValueError as e:
             print(f"INFRABOX: ❌ {e}")
+            if not args.dry_run:
+                release_cidrs(environment)
             return
 
         if not args.dry_run:
@@ -65,17 +196,21 @@ def run(args):
             "ssh_public_key_path": ssh_public_key_path,
             "vnet_address_space": vnet_cidr,
             "subnet_address_space": subnet_cidr,
+            **profile_context(getattr(args, "profile", DEFAULT_PROFILE)),
+            **fleet,
         }
 
-        # Render all Terraform files using jinja2 templates
-        generate_variables_tf(env_path, context, dry_run=args.dry_run)
-        generate_main_tf(env_path, context, dry_run=args.dry_run)
-        generate_outputs_tf(env_path, context, dry_run=args.dry_run)
-        generate_provider_tf(env_path, context, dry_run=args.dry_run)
+        _render_environment(
+            env_path,
+            context,
+            args.dry_run,
+            getattr(args, "output_format", "hcl"),
+            workspace,
+        )
+        checkpoint.record("rendered")
 
         # Run Terraform initialization & validation
-        terraform_init(env_path, dry_run=args.dry_run)
-        terraform_validate(env_path, dry_run=args.dry_run)
+        _init_and_validate(checkpoint, env_path, args.dry_run)
 
         if not args.dry_run:
             print(
@@ -84,16 +219,135 @@ def run(args):
             )
     except KeyboardInterrupt:
         print("\nINFRABOX: ⚠️ Initialization interrupted by user.")
-        if not args.dry_run and env_path.exists():
-            shutil.rmtree(env_path)
-            print(
-                f"INFRABOX: 🧹 Removed environment directory {env_path} due to error."
+        _discard_environment(environment, env_path, checkpoint, args.dry_run)
+    except Exception as e:
+        print(f"INFRABOX: ❌ Unexpected error: {e}")
+        _discard_environment(environment, env_path, checkpoint, args.dry_run)
+        raise
+
+
+def _init_job(checkpoint, dry_run):
+    def job():
+        initialized, validated = _init_and_validate(
+            checkpoint, checkpoint.env_path, dry_run
+        )
+        check_result(initialized, "init")
+        check_result(validated, "validate")
+
+    return job
+
+
+def _initialize_regions(args, environment, layout):
+    """
+    Initialize one environment per region (named <environment>-<region>).
+    Shared values are prompted once, every region gets its own VNet block,
+    and Terraform init/validate run for all regions concurrently.
+    With --resume, regions whose files were already rendered are kept.
+    layout is the (fleet, workspace) pair from _layout_from_args.
+    """
+    names = {region: region_environment(environment, region) for region in args.regions}
+    checkpoints = {
+        name: Checkpoint.for_run(name, ENVIRONMENTS_DIR / name, "apply", args)
+        for name in names.values()
+    }
+    pending = {
+        region: name
+        for region, name in names.items()
+        if not checkpoints[name].completed("rendered")
+    }
+    existing = [
+        name for name in pending.values() if checkpoints[name].env_path.exists()
+    ]
+    if existing:
+        print(
+            f"INFRABOX: ⚠️ Environment files for {', '.join(existing)} already exist. Aborting."
+        )
+        return
+
+    try:
+        if pending:
+            _render_regions(args, environment, pending, checkpoints, layout)
+    except KeyboardInterrupt:
+        print("\nINFRABOX: ⚠️ Initialization interrupted by user.")
+        for name in pending.values():
+            checkpoint = checkpoints[name]
+            _discard_environment(
+                name,
+                checkpoint.env_path,
+                checkpoint,
+                args.dry_run,
+                f"{environment} --regions {','.join(args.regions)}",
             )
+        return
     except Exception as e:
         print(f"INFRABOX: ❌ Unexpected error: {e}")
-        if not args.dry_run and env_path.exists():
-            shutil.rmtree(env_path)
-            print(
-                f"INFRABOX: 🧹 Removed environment directory {env_path} due to error."
+        for name in pending.values():
+            checkpoint = checkpoints[name]
+            _discard_environment(
+                name,
+                checkpoint.env_path,
+                checkpoint,
+                args.dry_run,
+                f"{environment} --regions {','.join(args.regions)}",
             )
         raise
+
+    results = run_parallel(
+        [
+            (name, _init_job(checkpoint, args.dry_run))
+            for name, checkpoint in checkpoints.items()
+        ],
+        expected=expected_durations(checkpoints, INIT_PHASES),
+    )
+    print_summary("Initialization summary", results)
+
+
+def _render_regions(args, environment, pending, checkpoints, layout):
+    fleet, workspace = layout
+    name_prefix = prompt_with_default("Enter name prefix", "Infrabox")
+    dns_zone_name = prompt_with_default(
+        "Enter DNS zone name", f"{name_prefix}-{environment}.com"
+    )
+    admin_username = prompt_with_default("Enter admin username", "azureuser")
+    ssh_public_key_path = prompt_with_default(
+        "Enter path to SSH public key", "~/.ssh/id_rsa_infrabox.pub"
+    )
+
+    vnet_cidrs = allocate_vnet_cidrs(
+        pending.values(), ENVIRONMENTS_DIR, reserve=not args.dry_run
+    )
+    for region, name in pending.items():
+        checkpoint = checkpoints[name]
+        checkpoint.clear()
+        subnet_cidr = first_subnet(vnet_cidrs[name])
+        print(
+            f"INFRABOX: 🌍 {name}: {region}, VNet {vnet_cidrs[name]}, Subnet {subnet_cidr}"
+        )
+        if not args.dry_run:
+            reserve_cidrs(name, [vnet_cidrs[name], subnet_cidr])
+            checkpoint.env_path.mkdir(parents=True)
+            print(
+                f"INFRABOX: 📁 Created environment directory at {checkpoint.env_path}"
+            )
+
+        context = {
+            "name_prefix": name_prefix,
+            "environment": name,
+            "location": region,
+            # Each region gets its own zone under the shared domain
+            "dns_zone_name": f"{region}.{dns_zone_name}",
+            "admin_username": admin_username,
+            "ssh_public_key_path": ssh_public_key_path,
+            "vnet_address_space": vnet_cidrs[name],
+            "subnet_address_space": subnet_cidr,
+            **profile_context(getattr(args, "profile", DEFAULT_PROFILE)),
+            **fleet,
+        }
+        _render_environment(
+            checkpoint.env_path,
+            context,
+            args.dry_run,
+            getattr(args, "output_format", "hcl"),
+            workspace,
+        )
+        checkpoint.record("rendered")
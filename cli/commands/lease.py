@@ -0,0 +1,35 @@
+import getpass
+import time
+
+from cli import pool
+from cli.commands.pool import spawn_maintenance
+from cli.utils import ENVIRONMENTS_DIR
+
+
+def run(args):
+    owner = args.owner or getpass.getuser()
+    leased = pool.lease(owner, args.ttl)
+    if leased is None:
+        print(
+            "INFRABOX: ❌ No ready environment in the pool. See `infrabox.py pool "
+            "status`."
+        )
+    else:
+        name, entry = leased
+        pool.write_lease_tags(ENVIRONMENTS_DIR / name, owner, entry["expires_at"])
+        expires = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["expires_at"]))
+        print(f"INFRABOX: 🎟️ Leased '{name}' to {owner} until {expires}.")
+        if args.no_refill:
+            print(
+                f"INFRABOX: 💡 It is already applied. `infrabox.py create {name}` "
+                "adds the lease tags to its resources."
+            )
+        else:
+            print(
+                "INFRABOX: 💡 It is already applied. The background maintenance "
+                "run adds the lease tags to its resources."
+            )
+    # Replace what was just taken, or fill a pool that ran dry
+    if not args.no_refill:
+        spawn_maintenance()
+    return leased
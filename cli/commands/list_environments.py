@@ -0,0 +1,40 @@
+import time
+
+from cli.catalog import load_catalog, rescan
+from cli.utils import ENVIRONMENTS_DIR
+
+
+def _format_row(name, entry):
+    last_run = "never"
+    if entry.get("last_run_at"):
+        finished = time.localtime(entry["last_run_at"])
+        last_run = (
+            f"{entry['last_run_status']} {time.strftime('%Y-%m-%d %H:%M', finished)}"
+        )
+    serial = entry.get("last_applied_serial")
+    return (
+        name,
+        entry.get("location") or "-",
+        ", ".join(entry.get("cidrs") or []) or "-",
+        "-" if serial is None else str(serial),
+        last_run,
+    )
+
+
+def run(args):
+    if args.rescan:
+        environments = rescan(ENVIRONMENTS_DIR)
+        print(f"INFRABOX: 🔄 Catalog rebuilt from {ENVIRONMENTS_DIR}.")
+    else:
+        environments = load_catalog(ENVIRONMENTS_DIR)
+
+    if not environments:
+        print("INFRABOX: 📭 No environments yet. Run `infrabox.py initialize` first.")
+        return
+
+    rows = [("NAME", "LOCATION", "CIDRS", "SERIAL", "LAST RUN")]
+    rows += [_format_row(name, entry) for name, entry in sorted(environments.items())]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]) - 1)]
+    for row in rows:
+        cells = [cell.ljust(widths[i]) for i, cell in enumerate(row[:-1])]
+        print("  ".join([*cells, row[-1]]))
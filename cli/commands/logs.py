@@ -0,0 +1,37 @@
+import re
+
+from cli.run_logs import find_runs, iter_run_lines, run_id_for, search_runs
+from cli.state import get_run_logs_dir
+from cli.utils import sanitize_env_name
+
+
+def run(args):
+    environment = sanitize_env_name(args.environment)
+    logs_dir = get_run_logs_dir(environment)
+    runs = find_runs(logs_dir, args.run)
+
+    if not runs:
+        print(f"INFRABOX: 📭 No archived runs found for environment '{environment}'.")
+        return
+
+    if args.grep:
+        try:
+            re.compile(args.grep)
+        except re.error as e:
+            print(f"INFRABOX: ❌ Invalid --grep pattern '{args.grep}': {e}")
+            return
+        matches = 0
+        for run_id, line_number, line in search_runs(logs_dir, args.grep, args.run):
+            print(f"{run_id}:{line_number}: {line}")
+            matches += 1
+        print(f"\nINFRABOX: 🔎 {matches} matching line(s) in {len(runs)} run(s).")
+    elif args.run:
+        for log_path in runs:
+            print(f"INFRABOX: 📜 Run {run_id_for(log_path)}")
+            for line in iter_run_lines(log_path):
+                print(line)
+    else:
+        print(f"INFRABOX: 📚 Archived runs for environment '{environment}':")
+        for log_path in runs:
+            size_kb = log_path.stat().st_size / 1024
+            print(f"  {run_id_for(log_path)}  ({size_kb:.1f} KiB)")
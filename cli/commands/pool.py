@@ -0,0 +1,184 @@
+import shutil
+import subprocess  # nosec B404
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from cli import pool
+from cli.catalog import unregister_environment
+from cli.cidr_allocator import release_cidrs
+from cli.commands import clone
+from cli.parallel import print_summary, run_parallel
+from cli.regions import check_result
+from cli.run_history import format_duration
+from cli.terraform_utils import terraform_apply, terraform_init
+from cli.utils import ENVIRONMENTS_DIR
+from cli.workspaces import state_file
+
+
+def _provision_job(name, base):
+    def job():
+        env_path = ENVIRONMENTS_DIR / name
+        try:
+            clone.run(
+                SimpleNamespace(
+                    source=base,
+                    target=name,
+                    vnet_cidr=None,
+                    subnet_cidr=None,
+                    location=None,
+                    dry_run=False,
+                )
+            )
+            if not env_path.is_dir():
+                raise RuntimeError(f"could not clone '{base}'")
+            check_result(terraform_init(env_path), "init")
+            check_result(terraform_apply(env_path), "apply")
+        except Exception:
+            # Whatever was created is destroyed by the next maintenance run
+            pool.set_state(name, pool.FAILED)
+            raise
+        pool.set_state(name, pool.READY)
+
+    return job
+
+
+def _reap_job(name):
+    def job():
+        env_path = ENVIRONMENTS_DIR / name
+        try:
+            if state_file(env_path).exists():
+                check_result(terraform_init(env_path), "init")
+                check_result(terraform_apply(env_path, destroy=True), "destroy")
+            shutil.rmtree(env_path, ignore_errors=True)
+            release_cidrs(name)
+            unregister_environment(name)
+        except Exception:
+            pool.set_state(name, pool.FAILED)
+            raise
+        pool.forget(name)
+
+    return job
+
+
+def _tag_job(name):
+    def job():
+        env_path = ENVIRONMENTS_DIR / name
+        try:
+            check_result(terraform_init(env_path), "init")
+            check_result(terraform_apply(env_path), "apply")
+        except Exception:
+            # The next maintenance run tries again
+            pool.finish_lease_tags(name, applied=False)
+            raise
+        pool.finish_lease_tags(name, applied=True)
+
+    return job
+
+
+def maintain(size=None, base=None, workers=pool.POOL_WORKERS):
+    """
+    Reap expired leases, refill the pool to its size and apply the tags of
+    new leases, all concurrently. Returns the per-environment results.
+    """
+    to_reap, to_provision, base = pool.claim_work(size, base)
+    to_tag = pool.claim_lease_tags()
+    if not to_reap and not to_provision and not to_tag:
+        print("INFRABOX: ✅ Pool is full and no lease has expired.")
+        return {}
+    if to_reap:
+        print(f"INFRABOX: 🧹 Reaping {', '.join(to_reap)}.")
+    if to_provision:
+        print(f"INFRABOX: 🏗️ Provisioning {', '.join(to_provision)} from '{base}'.")
+    if to_tag:
+        print(f"INFRABOX: 🏷️ Applying the lease tags of {', '.join(to_tag)}.")
+    results = run_parallel(
+        [(name, _reap_job(name)) for name in to_reap]
+        + [(name, _provision_job(name, base)) for name in to_provision]
+        + [(name, _tag_job(name)) for name in to_tag],
+        max_workers=workers,
+    )
+    print_summary("Pool summary", results)
+    return results
+
+
+def spawn_maintenance(size=None, base=None):
+    """Run `pool maintain` detached, with its output to a log."""
+    log_path = pool.get_pool_path().with_suffix(".log")
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, str(Path(sys.argv[0]).resolve()), "pool", "maintain"]
+    cmd.append("--foreground")
+    if size is not None:
+        cmd += ["--size", str(size)]
+    if base is not None:
+        cmd += ["--base", base]
+    with log_path.open("a") as log:
+        process = subprocess.Popen(  # nosec B603
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    print(
+        f"INFRABOX: 🔁 Maintaining the pool in the background (pid {process.pid}). "
+        f"Log: {log_path}"
+    )
+    return process
+
+
+def show_status():
+    state = pool.load_pool()
+    environments = state["environments"]
+    print(
+        f"INFRABOX: 🏊 Pool of {state['size']} environments cloned from "
+        f"'{state['base']}':"
+    )
+    if not environments:
+        print("  (empty) Run `infrabox.py pool maintain` to fill it.")
+        return
+    now = time.time()
+    expired = False
+    for name, entry in sorted(environments.items()):
+        line = f"  {name:<10} {entry['state']:<12}"
+        if entry["state"] == pool.LEASED:
+            remaining = entry["expires_at"] - now
+            expiry = (
+                f"expires in {format_duration(remaining)}"
+                if remaining > 0
+                else "expired"
+            )
+            expired = expired or remaining <= 0
+            line += f" {entry['owner']}, {expiry}"
+        print(line.rstrip())
+    if expired:
+        print(
+            "INFRABOX: 💡 Expired leases are destroyed by the next `pool maintain`. "
+            "Keep `pool maintain --interval 300` running to reap them on time."
+        )
+
+
+def release(name):
+    if not pool.end_lease(name):
+        print(f"INFRABOX: ❌ '{name}' is not a leased pool environment.")
+        return False
+    print(f"INFRABOX: 👋 Lease of '{name}' ended. It is destroyed on the next refill.")
+    return True
+
+
+def run(args):
+    if args.pool_command == "status":
+        show_status()
+    elif args.pool_command == "release":
+        if release(args.environment) and not args.no_refill:
+            spawn_maintenance()
+    elif args.pool_command == "maintain":
+        if not args.foreground and not args.interval:
+            spawn_maintenance(args.size, args.base)
+            return
+        while True:
+            maintain(args.size, args.base, args.workers)
+            if not args.interval:
+                return
+            time.sleep(args.interval)
@@ -0,0 +1,24 @@
+from cli.daemon import JobManager, get_token_path, make_server, warm_caches
+
+
+def run(args):
+    environments = warm_caches()
+    print(f"INFRABOX: 🔥 Templates compiled, {environments} environment(s) loaded.")
+
+    with JobManager(workers=args.workers) as manager:
+        server = make_server(
+            manager, host=args.host, port=args.port, socket_path=args.socket
+        )
+        address = args.socket or f"http://{args.host}:{args.port}"
+        print(
+            f"INFRABOX: 🛰️ Serving on {address} with {args.workers} worker(s). "
+            "Press Ctrl+C to stop."
+        )
+        if server.token is not None:
+            print(f"INFRABOX: 🔑 Clients send the bearer token in {get_token_path()}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nINFRABOX: 🛑 Shutting down, waiting for running jobs...")
+        finally:
+            server.server_close()
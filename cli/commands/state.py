@@ -0,0 +1,66 @@
+import time
+
+from cli.run_history import format_duration
+from cli.state_snapshots import find_snapshot, list_snapshots, restore_snapshot
+from cli.utils import ENVIRONMENTS_DIR, prompt_user_confirmation, sanitize_env_name
+
+
+def _format_size(size) -> str:
+    return f"{size / 1024:.1f} KiB"
+
+
+def show_history(environment, limit):
+    snapshots = list_snapshots(environment)
+    if not snapshots:
+        print(f"INFRABOX: 📭 No state snapshots for environment '{environment}'.")
+        return
+    print(f"INFRABOX: 🗄️ State snapshots for environment '{environment}':")
+    for entry in reversed(snapshots[-limit:]):
+        taken = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["taken_at"]))
+        print(
+            f"  #{entry['id']:<4} {taken}  {entry['object'][:12]}  "
+            f"{entry['reason']:<18} serial {entry.get('serial')}, "
+            f"{entry.get('resources', '?')} resources, "
+            f"{_format_size(entry['size'])}"
+        )
+
+
+def restore(environment, snapshot_id, assume_yes=False):
+    env_path = ENVIRONMENTS_DIR / environment
+    if not env_path.is_dir():
+        print(f"INFRABOX: ❌ Environment directory '{environment}' does not exist.")
+        return None
+    entry = find_snapshot(environment, snapshot_id)
+    if entry is None:
+        print(
+            f"INFRABOX: ❌ No single snapshot '{snapshot_id}' for environment "
+            f"'{environment}'. See `infrabox.py state history {environment}`."
+        )
+        return None
+
+    age = format_duration(time.time() - entry["taken_at"])
+    print(
+        f"INFRABOX: ⏪ Restoring state #{entry['id']} ({entry['reason']}, {age} ago, "
+        f"serial {entry.get('serial')}) into '{environment}'."
+    )
+    if not assume_yes and not prompt_user_confirmation(
+        "INFRABOX: Replace the current state?"
+    ):
+        print("INFRABOX: ❌ Restore cancelled.")
+        return None
+    started = time.perf_counter()
+    restore_snapshot(env_path, entry)
+    print(
+        f"INFRABOX: ✅ State restored in {time.perf_counter() - started:.3f}s. "
+        "The previous state was snapshotted first."
+    )
+    print(f"INFRABOX: 💡 Run `infrabox.py create {environment}` to review the plan.")
+    return entry
+
+
+def run(args):
+    environment = sanitize_env_name(args.environment)
+    if args.state_command == "history":
+        show_history(environment, args.limit)
+    elif args.state_command == "restore":
+        restore(environment, args.snapshot, assume_yes=args.yes)
@@ -0,0 +1,120 @@
+import os
+import time
+from pathlib import Path
+
+from cli.blob_upload import (
+    BlobClient,
+    StorageCredentials,
+    Uploader,
+    UploadManifest,
+    collect_files,
+    get_manifest_path,
+    parse_connection_string,
+)
+from cli.terraform_utils import terraform_output
+from cli.utils import ENVIRONMENTS_DIR, read_cmd_output
+
+
+def _account_key(account, env_path) -> str:
+    """The account's first access key, from AZURE_STORAGE_KEY or the Azure CLI."""
+    if os.environ.get("AZURE_STORAGE_KEY"):
+        return os.environ["AZURE_STORAGE_KEY"]
+    cmd = ["az", "storage", "account", "keys", "list", "--account-name", account]
+    try:
+        result = read_cmd_output(
+            [*cmd, "--query", "[0].value", "--output", "tsv"], cwd=env_path
+        )
+    except OSError as e:
+        raise ValueError(f"Could not run the Azure CLI: {e}") from e
+    key = result.stdout.strip()
+    if result.returncode != 0 or not key:
+        raise ValueError(f"Could not read the access key of '{account}'")
+    return key
+
+
+def resolve_credentials(env_path) -> StorageCredentials:
+    """
+    AZURE_STORAGE_CONNECTION_STRING when set (e.g. for Azurite), otherwise
+    the environment's storage account from its Terraform outputs.
+    """
+    connection_string = os.environ.get("AZURE_STORAGE_CONNECTION_STRING")
+    if connection_string:
+        return parse_connection_string(connection_string)
+    account = terraform_output(env_path).get("storage_account_name")
+    if not account:
+        raise ValueError(
+            f"No storage_account_name output. Run `infrabox.py create "
+            f"{Path(env_path).name}` first."
+        )
+    return StorageCredentials(
+        account,
+        _account_key(account, env_path),
+        f"https://{account}.blob.core.windows.net",
+    )
+
+
+def _mib(size) -> str:
+    return f"{size / 1024 / 1024:.1f} MiB"
+
+
+def run(args):
+    env_path = ENVIRONMENTS_DIR / args.environment
+    source = Path(args.path).expanduser()
+    if not env_path.is_dir():
+        print(
+            f"INFRABOX: ❌ Environment directory '{args.environment}' does not exist."
+        )
+        return None
+    if not source.exists():
+        print(f"INFRABOX: ❌ '{source}' does not exist.")
+        return None
+
+    started = time.perf_counter()
+    try:
+        credentials = resolve_credentials(env_path)
+        client = BlobClient(credentials)
+        files = collect_files(source, args.prefix)
+        manifest = UploadManifest(
+            get_manifest_path(args.environment, credentials.account, args.container)
+        )
+        uploader = Uploader(
+            client,
+            args.container,
+            manifest,
+            chunk_size=args.chunk_size * 1024 * 1024,
+            workers=args.workers,
+        )
+        if not args.dry_run and client.create_container(args.container):
+            print(f"INFRABOX: 🪣 Created container '{args.container}'.")
+        pending, unchanged = uploader.plan(files)
+    # BlobStorageError and a failed terraform output are both RuntimeErrors
+    except (RuntimeError, OSError, ValueError) as e:
+        print(f"INFRABOX: ❌ {e}")
+        return None
+
+    total = sum(item.size for item in pending)
+    print(
+        f"INFRABOX: ☁️ {len(pending)} of {len(files)} files ({_mib(total)}) to "
+        f"upload to {credentials.endpoint}/{args.container}, {unchanged} unchanged."
+    )
+    if args.dry_run:
+        for item in pending:
+            print(f"  {item.blob} ({_mib(item.size)})")
+        return {}
+
+    failed = uploader.upload(pending)
+    seconds = time.perf_counter() - started
+    for blob, error in sorted(failed.items()):
+        print(f"INFRABOX: ❌ {blob}: {error}")
+    rate = uploader.sent_bytes / 1024 / 1024 / seconds if seconds else 0.0
+    print(
+        f"INFRABOX: {'⚠️' if failed else '✅'} Uploaded "
+        f"{len(pending) - len(failed)} files, {_mib(uploader.sent_bytes)} sent in "
+        f"{seconds:.1f}s ({rate:.1f} MiB/s)."
+    )
+    if failed:
+        print(
+            "INFRABOX: 💡 Run the same command again to resume. Blocks already "
+            "sent are not sent again."
+        )
+    return failed
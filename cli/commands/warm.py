@@ -0,0 +1,111 @@
+import os
+import subprocess  # nosec B404
+import sys
+from pathlib import Path
+
+from cli.catalog import load_catalog
+from cli.parallel import print_summary, run_parallel
+from cli.refresh_policy import DEFAULT_REFRESH_TTL_SECONDS, use_cached_state
+from cli.regions import INIT_PHASES, PLAN_PHASES, check_result
+from cli.run_history import expected_durations
+from cli.terraform_utils import (
+    TERRAFORM_CHANGES_DETECTED_CODE,
+    terraform_init,
+    terraform_refresh_plan,
+    terraform_validate,
+)
+from cli.utils import ENVIRONMENTS_DIR
+from cli.warm import WARM_NICENESS, get_warm_dir, is_warm
+
+
+def select_environments(args):
+    """The environments to warm that exist on disk, in a stable order."""
+    names = sorted(load_catalog(ENVIRONMENTS_DIR)) if args.all else args.environments
+    selected = []
+    for name in dict.fromkeys(names):
+        if (ENVIRONMENTS_DIR / name).is_dir():
+            selected.append(name)
+        else:
+            print(
+                f"INFRABOX: ⚠️ Environment directory '{name}' does not exist, skipped."
+            )
+    return selected
+
+
+def is_ready(env_path, args) -> bool:
+    """Whether the later commands would find nothing left to warm."""
+    if not is_warm(env_path, "init"):
+        return False
+    if args.validate and not is_warm(env_path, "validate"):
+        return False
+    if args.refresh:
+        return use_cached_state(env_path, "auto", DEFAULT_REFRESH_TTL_SECONDS)[0]
+    return True
+
+
+def _warm_job(env_path, args):
+    def job():
+        check_result(terraform_init(env_path), "init")
+        if args.validate:
+            check_result(terraform_validate(env_path), "validate")
+        if args.refresh:
+            result = terraform_refresh_plan(env_path)
+            # Drift is reported, not treated as a failure
+            if result.returncode != TERRAFORM_CHANGES_DETECTED_CODE:
+                check_result(result, "plan -refresh-only")
+
+    return job
+
+
+def _spawn(args, names):
+    """Re-run this command detached, at low priority, with output to a log."""
+    log_path = get_warm_dir() / "warm.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, str(Path(sys.argv[0]).resolve()), "warm", *names]
+    cmd += ["--foreground", "--workers", str(args.workers)]
+    cmd += ["--validate"] * args.validate + ["--refresh"] * args.refresh
+    with log_path.open("a") as log:
+        process = subprocess.Popen(  # nosec B603
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    print(
+        f"INFRABOX: 🔥 Warming {', '.join(names)} in the background "
+        f"(pid {process.pid}). Log: {log_path}"
+    )
+    return process
+
+
+def run(args):
+    if not args.all and not args.environments:
+        print("INFRABOX: ❌ Name the environments to warm, or use --all.")
+        return None
+
+    names = select_environments(args)
+    pending = []
+    for name in names:
+        if is_ready(ENVIRONMENTS_DIR / name, args):
+            print(f"INFRABOX: ✅ {name} is already warm.")
+        else:
+            pending.append(name)
+    if not pending:
+        return {}
+    if not args.foreground:
+        _spawn(args, pending)
+        return None
+
+    try:
+        os.nice(WARM_NICENESS)
+    except OSError:
+        pass
+    phases = PLAN_PHASES if args.refresh else INIT_PHASES
+    results = run_parallel(
+        [(name, _warm_job(ENVIRONMENTS_DIR / name, args)) for name in pending],
+        max_workers=args.workers,
+        expected=expected_durations(pending, phases),
+    )
+    print_summary("Warm summary", results)
+    return results
@@ -0,0 +1,182 @@
+import time
+from pathlib import Path
+
+from cli.env_config import HCLParseError, load_environment_config
+from cli.file_watch import InotifyWatcher, debounced_changes, make_watcher
+from cli.infrastructure_templates import TEMPLATES_DIR
+from cli.infrastructure_templates import env as template_env
+from cli.metrics import flush_or_warn
+from cli.parallel import print_summary, run_parallel
+from cli.plan_cache import INPUT_PATTERNS, module_directories
+from cli.regions import check_result
+from cli.state import INFRA_ROOT
+from cli.terraform_utils import terraform_fmt, terraform_validate
+from cli.utils import ENVIRONMENTS_DIR
+from cli.workspaces import terraform_dir
+
+MODULES_DIR = INFRA_ROOT / "modules"
+DEFAULT_DEBOUNCE_SECONDS = 0.2
+TEMPLATE_SUFFIX = ".j2"
+TERRAFORM_SUFFIXES = tuple(pattern.lstrip("*") for pattern in INPUT_PATTERNS)
+
+
+def _is_under(path: Path, directory: Path) -> bool:
+    return directory == path or directory in path.parents
+
+
+class WatchSession:
+    """
+    Works out what a batch of file changes affects and checks only that:
+    changed templates are re-rendered into the environments generated from
+    them, and fmt/validate run for the touched directories and the
+    environments that use them.
+    """
+
+    def __init__(self, environments_dir, modules_dir, templates_dir):
+        self.environments_dir = Path(environments_dir).resolve()
+        self.modules_dir = Path(modules_dir).resolve()
+        self.templates_dir = Path(templates_dir).resolve()
+        # Template sources as last seen, to recognize untouched generated files
+        self.template_sources = {
+            path.name: path.read_text()
+            for path in sorted(self.templates_dir.glob(f"*{TEMPLATE_SUFFIX}"))
+        }
+        # Files this session wrote, so their change events are not rechecked
+        self.own_writes = {}
+
+    def environments(self):
+        if not self.environments_dir.is_dir():
+            return []
+        return sorted(p for p in self.environments_dir.iterdir() if p.is_dir())
+
+    def _is_own_write(self, path):
+        expected = self.own_writes.pop(path, None)
+        return expected is not None and path.exists() and path.read_text() == expected
+
+    def rerender(self, template_name):
+        """
+        Re-render a changed template into every environment whose file still
+        matches what the previous template version produced; hand-edited
+        files are left alone. Returns the environments that changed.
+        """
+        path = self.templates_dir / template_name
+        previous = self.template_sources.get(template_name)
+        current = path.read_text() if path.exists() else None
+        self.template_sources[template_name] = current
+        if previous is None or current is None:
+            return set()
+
+        output_name = template_name[: -len(TEMPLATE_SUFFIX)]
+        rerendered = set()
+        for env_path in self.environments():
+            output = env_path / output_name
+            if not output.exists():
+                continue
+            try:
+                context = load_environment_config(env_path).template_context()
+            except HCLParseError:
+                continue
+            if output.read_text() != template_env.from_string(previous).render(context):
+                print(
+                    f"INFRABOX: ⏭️ {env_path.name}/{output_name} was edited by hand, "
+                    "not re-rendered."
+                )
+                continue
+            rendered = template_env.from_string(current).render(context)
+            output.write_text(rendered)
+            self.own_writes[output] = rendered
+            print(f"INFRABOX: 📝 Re-rendered {env_path.name}/{output_name}")
+            rerendered.add(env_path)
+        return rerendered
+
+    def affected(self, changed):
+        """Return (environments to validate, directories to fmt-check)."""
+        environments, fmt_dirs, changed_modules = set(), set(), set()
+        for path in sorted(Path(p).resolve() for p in changed):
+            if self._is_own_write(path):
+                continue
+            if _is_under(path, self.templates_dir) and path.suffix == TEMPLATE_SUFFIX:
+                environments |= self.rerender(path.name)
+            elif not path.name.endswith(TERRAFORM_SUFFIXES):
+                continue
+            elif _is_under(path, self.environments_dir):
+                relative = path.relative_to(self.environments_dir)
+                environments.add(self.environments_dir / relative.parts[0])
+                fmt_dirs.add(path.parent)
+            elif _is_under(path, self.modules_dir):
+                fmt_dirs.add(path.parent)
+                changed_modules.add(path.parent)
+
+        if changed_modules:
+            for env_path in self.environments():
+                used = module_directories(env_path)
+                if any(
+                    _is_under(changed, module)
+                    for changed in changed_modules
+                    for module in used
+                ):
+                    environments.add(env_path)
+        return environments, fmt_dirs
+
+    def check(self, changed):
+        started = time.monotonic()
+        environments, fmt_dirs = self.affected(changed)
+        environments = {env for env in environments if env.is_dir()}
+        if not environments and not fmt_dirs:
+            return None
+
+        names = ", ".join(env.name for env in sorted(environments)) or "none"
+        print(f"\nINFRABOX: 👀 Change detected, affected environments: {names}")
+        jobs = [
+            (f"fmt {path.relative_to(path.parents[1])}", _fmt_job(path))
+            for path in sorted(fmt_dirs)
+            if path.is_dir()
+        ]
+        for env_path in sorted(environments):
+            if (Path(terraform_dir(env_path)) / ".terraform").is_dir():
+                jobs.append((f"validate {env_path.name}", _validate_job(env_path)))
+            else:
+                print(
+                    f"INFRABOX: 💡 {env_path.name} is not initialized yet, "
+                    "skipping validate."
+                )
+        results = run_parallel(jobs)
+        if results:
+            print_summary("Watch check", results)
+        print(f"INFRABOX: ⏱️ Checked in {time.monotonic() - started:.1f}s")
+        return results
+
+
+def _fmt_job(path):
+    def job():
+        check_result(terraform_fmt(path), "fmt")
+
+    return job
+
+
+def _validate_job(env_path):
+    def job():
+        check_result(terraform_validate(env_path), "validate")
+
+    return job
+
+
+def run(args):
+    roots = [ENVIRONMENTS_DIR, MODULES_DIR]
+    if TEMPLATES_DIR.is_dir():
+        roots.append(TEMPLATES_DIR)
+    session = WatchSession(ENVIRONMENTS_DIR, MODULES_DIR, TEMPLATES_DIR)
+    watcher = make_watcher(roots, poll=args.poll)
+    mode = "inotify" if isinstance(watcher, InotifyWatcher) else "polling"
+    print(
+        f"INFRABOX: 👀 Watching {', '.join(str(root) for root in roots)} "
+        f"({mode}). Press Ctrl+C to stop."
+    )
+    try:
+        for changed in debounced_changes(watcher, args.debounce):
+            if session.check(changed) is not None:
+                flush_or_warn()
+    except KeyboardInterrupt:
+        print("\nINFRABOX: 👋 Stopped watching.")
+    finally:
+        watcher.close()
@@ -0,0 +1,636 @@
+import argparse
+import hmac
+import json
+import os
+import re
+import secrets
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse, urlsplit
+
+from cli import metrics
+from cli.commands import create, destroy, initialize
+from cli.env_config import scan_environment_configs
+from cli.infrastructure_templates import env as template_env
+from cli.parallel import routed_stdout
+from cli.parser import new_environment, new_region_environments, positive_int
+from cli.profiles import DEFAULT_PROFILE, PROFILES
+from cli.refresh_policy import (
+    DEFAULT_REFRESH_POLICY,
+    DEFAULT_REFRESH_TTL_SECONDS,
+    REFRESH_POLICIES,
+)
+from cli.regions import (
+    APPLY_PHASES,
+    DESTROY_PHASES,
+    INIT_PHASES,
+    PLAN_PHASES,
+    check_result,
+    parse_regions,
+    region_environment,
+)
+from cli.run_history import expected_seconds
+from cli.state import get_state_dir
+from cli.terraform_utils import terraform_init, terraform_output, terraform_validate
+from cli.tf_json import OUTPUT_FORMATS
+from cli.utils import (
+    ENVIRONMENTS_DIR,
+    answer_prompts,
+    get_env_path,
+    sanitize_input,
+    validate_environment,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+# Finished jobs kept in memory for status queries
+MAX_FINISHED_JOBS = 200
+JOB_COMMANDS = ("initialize", "create", "destroy", "validate", "outputs")
+MAX_REQUEST_BYTES = 64 * 1024
+JOB_PATH_RE = re.compile(r"^/jobs/(\w+)(/events)?/?$")
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+# Job parameters that must be positive integers when given
+FLEET_COUNT_PARAMS = ("min_instances", "max_instances", "instances")
+# Job parameters that must be JSON booleans when given
+FLAG_PARAMS = (
+    "dry_run",
+    "trace_provider",
+    "timings",
+    "resume",
+    "no_cache",
+    "skip_preflight",
+    "fleet",
+    "workspace",
+    "auto_approve",
+)
+# Paths a TCP client may call without the bearer token
+PUBLIC_PATHS = ("/health",)
+# Terraform commands each job runs, used to look up expected durations
+JOB_PHASES = {
+    "initialize": INIT_PHASES,
+    "create": (*PLAN_PHASES, *APPLY_PHASES),
+    "destroy": (*PLAN_PHASES, *DESTROY_PHASES),
+    "validate": INIT_PHASES,
+    "outputs": ("output",),
+}
+
+
+class Job:
+    """A queued command and everything it has printed so far."""
+
+    def __init__(self, command, environment, params):
+        self.id = uuid.uuid4().hex[:12]
+        self.command = command
+        self.environment = environment
+        self.params = params
+        # Environment directories the job works in, each run by one job at a time
+        self.environments = tuple(
+            region_environment(environment, region)
+            for region in params.get("regions") or ()
+        ) or (environment,)
+        self.expected_seconds = None
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.lines = []
+        self.changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def append_line(self, line):
+        with self.changed:
+            self.lines.append(line)
+            self.changed.notify_all()
+
+    def set_status(self, status, **fields):
+        with self.changed:
+            self.status = status
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.changed.notify_all()
+
+    def wait_for_lines(self, offset, timeout=1.0):
+        """Return lines after offset, waiting briefly if there are none yet."""
+        with self.changed:
+            if offset >= len(self.lines) and not self.done:
+                self.changed.wait(timeout)
+            return self.lines[offset:]
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "command": self.command,
+            "environment": self.environment,
+            "params": self.params,
+            "status": self.status,
+            "expected_seconds": self.expected_seconds,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "lines": len(self.lines),
+        }
+
+
+def _command_args(job):
+    return SimpleNamespace(
+        environment=job.environment,
+        dry_run=bool(job.params.get("dry_run", False)),
+        trace_provider=bool(job.params.get("trace_provider", False)),
+        timings=bool(job.params.get("timings", False)),
+        resume=bool(job.params.get("resume", False)),
+        refresh=job.params.get("refresh", DEFAULT_REFRESH_POLICY),
+        refresh_ttl=int(job.params.get("refresh_ttl", DEFAULT_REFRESH_TTL_SECONDS)),
+        no_cache=bool(job.params.get("no_cache", False)),
+        skip_preflight=bool(job.params.get("skip_preflight", False)),
+        regions=job.params.get("regions") or None,
+        output_format=job.params.get("format", "hcl"),
+        profile=job.params.get("profile", DEFAULT_PROFILE),
+        fleet=bool(job.params.get("fleet", False)),
+        min_instances=job.params.get("min_instances"),
+        max_instances=job.params.get("max_instances"),
+        instances=job.params.get("instances"),
+        workspace=bool(job.params.get("workspace", False)),
+    )
+
+
+def _deploy_result(result):
+    """Raise for failed applies so the job is reported as failed."""
+    if isinstance(result, dict):
+        failed = [name for name, outcome in result.items() if not outcome["ok"]]
+        if failed:
+            raise RuntimeError(f"Failed regions: {', '.join(failed)}")
+        return {name: outcome["ok"] for name, outcome in result.items()}
+    check_result(result, "apply")
+    return None
+
+
+def run_job_command(job):
+    """Run a job's command in the current thread and return its result."""
+    args = _command_args(job)
+    if job.command == "initialize":
+        with answer_prompts(job.params.get("answers")):
+            initialize.run(args)
+        return None
+    if job.command in ("create", "destroy"):
+        command = create if job.command == "create" else destroy
+        with answer_prompts(approve=bool(job.params.get("auto_approve", False))):
+            return _deploy_result(command.run(args))
+
+    env_path = get_env_path(job.environment)
+    if job.command == "validate":
+        check_result(terraform_init(env_path, dry_run=args.dry_run), "init")
+        check_result(terraform_validate(env_path, dry_run=args.dry_run), "validate")
+        return None
+    return terraform_output(env_path, dry_run=args.dry_run)
+
+
+def _check_instance_counts(params):
+    """Parse fleet instance counts as --min-instances and friends would."""
+    for name in FLEET_COUNT_PARAMS:
+        if params.get(name) is not None:
+            try:
+                params[name] = positive_int(str(params[name]))
+            except argparse.ArgumentTypeError as e:
+                raise ValueError(f"Invalid {name}: {e}") from e
+
+
+def _check_params(params):
+    """
+    Check and normalize job parameters as the CLI's parser would, so a bad
+    job is rejected when it is submitted instead of failing when it runs.
+    Raises ValueError.
+    """
+    if params.get("regions"):
+        regions = params["regions"]
+        if isinstance(regions, list):
+            regions = ",".join(str(region) for region in regions)
+        try:
+            params["regions"] = parse_regions(str(regions))
+        except argparse.ArgumentTypeError as e:
+            raise ValueError(str(e)) from e
+    flags = [
+        name for name in FLAG_PARAMS if not isinstance(params.get(name, False), bool)
+    ]
+    if flags:
+        raise ValueError(f"Invalid {flags[0]}: expected true or false")
+    if params.get("refresh", DEFAULT_REFRESH_POLICY) not in REFRESH_POLICIES:
+        raise ValueError(f"Invalid refresh policy: {params['refresh']}")
+    if "refresh_ttl" in params:
+        try:
+            params["refresh_ttl"] = int(str(params["refresh_ttl"]))
+        except ValueError as e:
+            raise ValueError(f"Invalid refresh_ttl: {params['refresh_ttl']}") from e
+    if params.get("format", "hcl") not in OUTPUT_FORMATS:
+        raise ValueError(f"Invalid output format: {params['format']}")
+    if params.get("profile", DEFAULT_PROFILE) not in PROFILES:
+        raise ValueError(f"Invalid performance profile: {params['profile']}")
+    answers = params.get("answers") or {}
+    if not hasattr(answers, "items"):
+        raise ValueError("Invalid answers: expected an object")
+    _check_instance_counts(params)
+
+
+class JobManager:
+    """
+    Run jobs on a bounded worker pool. Jobs for the same environment wait in
+    a per-environment queue and run one at a time, in submission order, so
+    they never hold a worker while waiting; other environments run alongside.
+    A --regions job waits in the queue of every <environment>-<region> it
+    works in, and starts once it is first in all of them.
+    When workers are busy, the ready job with the longest expected duration
+    (from the run history) starts next.
+    Use as a context manager: job output is routed while it is open.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, runner=run_job_command):
+        self.workers = workers
+        self.runner = runner
+        self.jobs = {}
+        self.env_queues = {}
+        # Jobs at the head of their environment's queue, waiting for a worker
+        self.ready = []
+        self.running = 0
+        self.lock = threading.Lock()
+        self.pool = None
+        self.closing = False
+        self.router = None
+        self._output = None
+
+    def __enter__(self):
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._output = routed_stdout()
+        self.router = self._output.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.closing = True
+            # Everything not handed to a worker yet
+            waiting = {
+                job
+                for queue in self.env_queues.values()
+                for job in queue
+                if job in self.ready or not self._first_in_queues(job)
+            }
+            for job in waiting:
+                job.set_status(
+                    "failed", finished_at=time.time(), error="Daemon shut down"
+                )
+        self.pool.shutdown(wait=True)
+        self._output.__exit__(*exc_info)
+
+    def submit(self, command, environment, params=None):
+        if command not in JOB_COMMANDS:
+            raise ValueError(f"Unsupported command: {command}")
+        params = dict(params or {})
+        _check_params(params)
+        environment = sanitize_input(str(environment).lower())
+        if command != "initialize":
+            validate_environment(environment)
+        else:
+            try:
+                new_environment(environment)
+                new_region_environments(environment, params.get("regions") or ())
+            except argparse.ArgumentTypeError as e:
+                raise ValueError(str(e)) from e
+
+        job = Job(command, environment, params)
+        job.expected_seconds = expected_seconds(environment, JOB_PHASES[command])
+        with self.lock:
+            if self.closing:
+                raise RuntimeError("Daemon is shutting down")
+            self._forget_old_jobs()
+            self.jobs[job.id] = job
+            for name in job.environments:
+                self.env_queues.setdefault(name, deque()).append(job)
+            if self._first_in_queues(job):
+                self.ready.append(job)
+                self._dispatch()
+        return job
+
+    def _first_in_queues(self, job):
+        return all(self.env_queues[name][0] is job for name in job.environments)
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def _forget_old_jobs(self):
+        finished = [job for job in self.jobs.values() if job.done]
+        for job in finished[: max(len(finished) - MAX_FINISHED_JOBS + 1, 0)]:
+            del self.jobs[job.id]
+
+    def _dispatch(self):
+        """Start ready jobs, longest expected first, while workers are free."""
+        while self.ready and self.running < self.workers and not self.closing:
+            job = max(self.ready, key=lambda ready: ready.expected_seconds or 0.0)
+            self.ready.remove(job)
+            self.running += 1
+            self.pool.submit(self._run, job)
+
+    def _run(self, job):
+        self.router.route(job.append_line)
+        job.set_status("running", started_at=time.time())
+        try:
+            with metrics.track_command(job.command):
+                result = self.runner(job)
+        # A failing job must never take its worker or the daemon down
+        except (Exception, SystemExit) as e:  # noqa: BLE001
+            print(f"INFRABOX: ❌ {e}")
+            status, fields = "failed", {"error": str(e) or type(e).__name__}
+        else:
+            status, fields = "succeeded", {"result": result}
+        finally:
+            sys.stdout.flush()
+            self.router.route(None)
+        metrics.flush_or_warn()
+        job.set_status(status, finished_at=time.time(), **fields)
+        print(f"INFRABOX: 🏁 Job {job.id} ({job.command} {job.environment}) {status}")
+
+        with self.lock:
+            self.running -= 1
+            for name in job.environments:
+                queue = self.env_queues[name]
+                queue.popleft()
+                if not queue:
+                    del self.env_queues[name]
+            for name in job.environments:
+                queue = self.env_queues.get(name)
+                if (
+                    queue
+                    and not self.closing
+                    and queue[0] not in self.ready
+                    and self._first_in_queues(queue[0])
+                ):
+                    self.ready.append(queue[0])
+            self._dispatch()
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API:
+      POST /jobs                 submit {"command", "environment", ...params}
+      GET  /jobs                 list jobs
+      GET  /jobs/<id>            job status and result
+      GET  /jobs/<id>/events     stream output as NDJSON until the job ends
+      GET  /health               liveness check
+      GET  /metrics              Prometheus metrics (text exposition format)
+    """
+
+    server_version = "InfraBox"
+
+    @property
+    def manager(self):
+        return self.server.manager
+
+    def log_message(self, *_args):
+        # Requests are not logged; job start and end are
+        return
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_metrics(self):
+        try:
+            body = metrics.flush().encode()
+        except OSError as e:
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _host_allowed(self):
+        # Browsers cannot reach a Unix socket
+        if self.server.allowed_host is None:
+            return True
+        try:
+            host = urlsplit(f"//{self.headers.get('Host', '')}").hostname
+        except ValueError:
+            return False
+        return host in (*LOOPBACK_HOSTS, self.server.allowed_host)
+
+    def _authorized(self, path):
+        """
+        Refuse requests a web page could forge: browsers send Origin on
+        cross-origin requests and the Host they resolved (DNS rebinding).
+        TCP clients also need the bearer token; a Unix socket is guarded by
+        its file mode.
+        """
+        if self.headers.get("Origin") is not None or not self._host_allowed():
+            self._send_json(HTTPStatus.FORBIDDEN, {"error": "Forbidden"})
+            return False
+        token = self.server.token
+        if token is None or path.rstrip("/") in PUBLIC_PATHS:
+            return True
+        supplied = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+            self._send_json(HTTPStatus.UNAUTHORIZED, {"error": "Missing or bad token"})
+            return False
+        return True
+
+    def _job_or_404(self, job_id):
+        job = self.manager.get(job_id)
+        if job is None:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown job {job_id}"})
+        return job
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not self._authorized(url.path):
+            return
+        job_path = JOB_PATH_RE.match(url.path)
+        if url.path.rstrip("/") == "/health":
+            self._send_json(HTTPStatus.OK, {"status": "ok"})
+        elif url.path.rstrip("/") == "/metrics":
+            self._send_metrics()
+        elif url.path.rstrip("/") == "/jobs":
+            jobs = [job.to_dict() for job in self.manager.list()]
+            self._send_json(HTTPStatus.OK, {"jobs": jobs})
+        elif job_path:
+            job = self._job_or_404(job_path.group(1))
+            if job is None:
+                return
+            if job_path.group(2):
+                offset = parse_qs(url.query).get("offset", ["0"])[0]
+                if not offset.isdigit():
+                    self._send_json(HTTPStatus.BAD_REQUEST, {"error": "Bad offset"})
+                    return
+                self._stream_events(job, int(offset))
+            else:
+                self._send_json(HTTPStatus.OK, job.to_dict())
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if not self._authorized(path):
+            return
+        if path.rstrip("/") != "/jobs":
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+            return
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        if content_type != "application/json":
+            self._send_json(
+                HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+                {"error": "Content-Type must be application/json"},
+            )
+            return
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            length = -1
+        if length < 0:
+            # Reading a missing or negative length would wait for the client
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"})
+            return
+        if length > MAX_REQUEST_BYTES:
+            self._send_json(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Request too large"}
+            )
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            params = {
+                key: value
+                for key, value in request.items()
+                if key not in ("command", "environment")
+            }
+            job = self.manager.submit(
+                request.get("command"), request.get("environment", ""), params
+            )
+        except (ValueError, AttributeError, RuntimeError) as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        self._send_json(HTTPStatus.ACCEPTED, job.to_dict())
+
+    def _stream_events(self, job, offset):
+        """Send output lines as they are printed, then the final status."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            while True:
+                done = job.done
+                lines = job.wait_for_lines(offset)
+                for line in lines:
+                    self.wfile.write(json.dumps({"line": line}).encode() + b"\n")
+                offset += len(lines)
+                self.wfile.flush()
+                if done and not lines:
+                    break
+            final = {"status": job.status, "result": job.result, "error": job.error}
+            self.wfile.write(json.dumps(final).encode() + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _address = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ("local", 0)
+
+
+def get_token_path() -> Path:
+    return get_state_dir() / "daemon.token"
+
+
+def load_or_create_token() -> str:
+    """The bearer token TCP clients must send, created with mode 0600."""
+    path = get_token_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return path.read_text().strip()
+    token = secrets.token_urlsafe(32)
+    with os.fdopen(fd, "w") as token_file:
+        token_file.write(token)
+    return token
+
+
+def _remove_stale_socket(socket_path: Path):
+    """
+    Remove a socket left by a daemon that is gone. Anything else at the
+    path, including a socket still being served, is never removed.
+    """
+    if not socket_path.exists():
+        return
+    if not stat.S_ISSOCK(socket_path.stat().st_mode):
+        raise FileExistsError(f"{socket_path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(socket_path))
+    except ConnectionRefusedError:
+        socket_path.unlink()
+        return
+    finally:
+        probe.close()
+    raise FileExistsError(f"Another daemon is already serving on {socket_path}")
+
+
+def make_server(manager, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    """
+    Create the API server on a Unix socket, or on host:port otherwise.
+    Over TCP every request but /health needs the token from get_token_path().
+    """
+    if socket_path:
+        socket_path = Path(socket_path)
+        _remove_stale_socket(socket_path)
+        # Only the daemon's user may talk to it, from the moment it exists
+        previous_umask = os.umask(0o077)
+        try:
+            server = _UnixHTTPServer(str(socket_path), _RequestHandler)
+        finally:
+            os.umask(previous_umask)
+        server.token = None
+        server.allowed_host = None
+    else:
+        server = ThreadingHTTPServer((host, port), _RequestHandler)
+        server.daemon_threads = True
+        server.token = load_or_create_token()
+        server.allowed_host = host
+    server.manager = manager
+    return server
+
+
+def warm_caches():
+    """Compile every template and parse every environment's configuration."""
+    for name in template_env.list_templates():
+        template_env.get_template(name)
+    return len(scan_environment_configs(ENVIRONMENTS_DIR))
@@ -0,0 +1,392 @@
+import json
+import re
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from cli.fleet import fleet_context_from_variables
+from cli.metrics import record_cache_lookup
+from cli.profiles import DEFAULT_PROFILE, profile_context
+from cli.state import get_state_dir
+from cli.tf_json import TF_JSON_SUFFIX, parse_json_variable_defaults
+from cli.workspaces import WORKSPACE_TFVARS, is_shared_root, shared_root
+
+CONFIG_CACHE_VERSION = 1
+CIDR_LITERAL_RE = re.compile(r'"(\d{1,3}(?:\.\d{1,3}){3}/\d{1,2})"')
+TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>\#[^\n]*|//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<number>-?\d+(?:\.\d+)?(?![\w.]))
+  | (?P<ident>[A-Za-z_][\w\-.]*(?:\[(?:\d+|\*)\][\w\-.]*)*)
+  | (?P<punct>[{}\[\]()=,:?])
+  | (?P<space>\s+)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+KEYWORDS = {"true": True, "false": False, "null": None}
+
+
+class HCLParseError(ValueError):
+    """Raised when a file uses HCL outside the subset InfraBox generates."""
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if not match:
+            raise HCLParseError(f"Unexpected character {text[position]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        if kind not in ("comment", "space"):
+            tokens.append((kind, match.group()))
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser for blocks, attributes and literal values."""
+
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self, expected=None):
+        kind, value = self.peek()
+        if kind is None or (expected is not None and value != expected):
+            raise HCLParseError(f"Expected {expected or 'a token'}, found {value!r}")
+        self.position += 1
+        return kind, value
+
+    def body(self, closing=None):
+        """Parse attributes and nested blocks until the closing brace."""
+        attributes, blocks = {}, []
+        while self.peek()[1] != closing:
+            _kind, name = self.take()
+            if self.peek()[1] in ("=", ":"):
+                self.take()
+                attributes[name] = self.value()
+                continue
+            labels = []
+            while self.peek()[0] == "string":
+                labels.append(json.loads(self.take()[1]))
+            self.take("{")
+            block_attributes, nested = self.body("}")
+            self.take("}")
+            blocks.append((name, labels, block_attributes, nested))
+        return attributes, blocks
+
+    def value(self):
+        start = self.position
+        value = self._primary()
+        if self.peek()[1] != "?":
+            return value
+        self.take("?")
+        self.value()
+        self.take(":")
+        self.value()
+        # Conditionals are kept as raw expressions, like function calls
+        return " ".join(text for _kind, text in self.tokens[start : self.position])
+
+    def _primary(self):
+        kind, text = self.take()
+        if kind == "string":
+            return json.loads(text)
+        if kind == "number":
+            return float(text) if "." in text else int(text)
+        if kind == "ident":
+            return self._identifier(text)
+        if text == "[":
+            return self._list()
+        if text == "{":
+            return self._map()
+        raise HCLParseError(f"Unsupported expression starting with {text!r}")
+
+    def _identifier(self, token):
+        if token in KEYWORDS:
+            return KEYWORDS[token]
+        if self.peek()[1] == "(":
+            # Type constraints and function calls are kept as raw expressions
+            return token + self._raw_call()
+        return token
+
+    def _list(self):
+        items = []
+        while self.peek()[1] != "]":
+            items.append(self.value())
+            if self.peek()[1] == ",":
+                self.take()
+        self.take("]")
+        return items
+
+    def _map(self):
+        mapping = {}
+        while self.peek()[1] != "}":
+            _kind, key = self.take()
+            key = json.loads(key) if key.startswith('"') else key
+            self.take()  # "=" or ":"
+            mapping[key] = self.value()
+            if self.peek()[1] == ",":
+                self.take()
+        self.take("}")
+        return mapping
+
+    def _raw_call(self):
+        depth, parts = 0, []
+        while True:
+            _kind, token = self.take()
+            parts.append(token)
+            depth += {"(": 1, ")": -1}.get(token, 0)
+            if depth == 0:
+                return "".join(parts)
+
+
+def parse_blocks(text: str) -> list:
+    """Top-level blocks as (type, labels, attributes, nested blocks)."""
+    _attributes, blocks = _Parser(text).body()
+    return blocks
+
+
+def parse_variable_defaults(text: str) -> dict:
+    """Return the default of every `variable` block that declares one."""
+    return {
+        labels[0]: attributes["default"]
+        for name, labels, attributes, _nested in parse_blocks(text)
+        if name == "variable" and labels and "default" in attributes
+    }
+
+
+def parse_cidr_literals(text: str) -> list:
+    return CIDR_LITERAL_RE.findall(text)
+
+
+@dataclass(frozen=True)
+class EnvironmentConfig:
+    """Typed view of an environment's generated variables.tf defaults."""
+
+    name: str
+    name_prefix: str = ""
+    environment: str = ""
+    location: str = ""
+    vnet_address_space: tuple = ()
+    subnet_address_space: tuple = ()
+    dns_zone_name: str = ""
+    admin_username: str = ""
+    ssh_public_key_path: str = ""
+    performance_profile: str = DEFAULT_PROFILE
+    tags: dict = field(default_factory=dict)
+    # CIDR literals passed straight to modules by hand-written roots, or
+    # found in a variables file that could not be parsed
+    module_cidrs: tuple = ()
+    variables: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_variables(cls, name, variables, module_cidrs=()):
+        return cls(
+            name=name,
+            name_prefix=variables.get("name_prefix", ""),
+            environment=variables.get("environment", ""),
+            location=variables.get("location", ""),
+            vnet_address_space=tuple(variables.get("vnet_address_space", ())),
+            subnet_address_space=tuple(variables.get("subnet_address_space", ())),
+            dns_zone_name=variables.get("dns_zone_name", ""),
+            admin_username=variables.get("admin_username", ""),
+            ssh_public_key_path=variables.get("ssh_public_key_path", ""),
+            performance_profile=variables.get("performance_profile", DEFAULT_PROFILE),
+            tags=dict(variables.get("tags", {})),
+            module_cidrs=tuple(module_cidrs),
+            variables=variables,
+        )
+
+    @property
+    def cidrs(self):
+        """Every address range the environment occupies."""
+        return tuple(
+            dict.fromkeys(
+                self.vnet_address_space + self.subnet_address_space + self.module_cidrs
+            )
+        )
+
+    def template_context(self) -> dict:
+        """Rebuild the context the templates were rendered with."""
+        return {
+            "name_prefix": self.name_prefix,
+            "environment": self.environment,
+            "location": self.location,
+            "dns_zone_name": self.dns_zone_name,
+            "admin_username": self.admin_username,
+            "ssh_public_key_path": self.ssh_public_key_path,
+            "vnet_address_space": next(iter(self.vnet_address_space), ""),
+            "subnet_address_space": next(iter(self.subnet_address_space), ""),
+            # Environments from before profiles used what is now "burst"
+            **profile_context(self.performance_profile, self.variables),
+            **fleet_context_from_variables(self.variables),
+        }
+
+
+class ConfigCache:
+    """
+    Process-wide cache of parsed files backed by a JSON file in the state
+    directory. Entries are keyed on the file's mtime and size, so edits are
+    always picked up.
+    """
+
+    def __init__(self):
+        self.memory = {}
+        self.disk = None
+        self.dirty = False
+        # Long-running processes parse from several threads
+        self.lock = threading.RLock()
+        # Hit/miss counters per cache level
+        self.stats = {"memory": 0, "disk": 0, "miss": 0}
+
+    @staticmethod
+    def path() -> Path:
+        return get_state_dir() / "config_cache.json"
+
+    def _disk_entries(self):
+        if self.disk is None:
+            self.disk = {}
+            if self.path().exists():
+                try:
+                    data = json.loads(self.path().read_text())
+                except ValueError:
+                    data = {}
+                if data.get("version") == CONFIG_CACHE_VERSION:
+                    self.disk = data.get("entries", {})
+        return self.disk
+
+    def parse(self, path: Path, kind: str, parser):
+        with self.lock:
+            return self._parse(path, kind, parser)
+
+    def _parse(self, path: Path, kind: str, parser):
+        stat = path.stat()
+        signature = [stat.st_mtime_ns, stat.st_size]
+        key = f"{kind}:{path.resolve()}"
+
+        cached = self.memory.get(key)
+        if cached is not None and cached[0] == signature:
+            self.stats["memory"] += 1
+            record_cache_lookup("config", "memory")
+            return cached[1]
+
+        entry = self._disk_entries().get(key)
+        if entry is not None and entry["signature"] == signature:
+            self.stats["disk"] += 1
+            record_cache_lookup("config", "disk")
+            value = entry["value"]
+        else:
+            self.stats["miss"] += 1
+            record_cache_lookup("config", "miss")
+            value = parser(path.read_text())
+            self.disk[key] = {"signature": signature, "value": value}
+            self.dirty = True
+
+        self.memory[key] = (signature, value)
+        return value
+
+    def flush(self):
+        """Write the on-disk cache if parsing added or refreshed entries."""
+        with self.lock:
+            if not self.dirty:
+                return
+            path = self.path()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Every process writes its own temp file; the last rename wins,
+            # which for a cache only means some entries are parsed again
+            with tempfile.NamedTemporaryFile(
+                "w", dir=path.parent, prefix=f".{path.name}.", delete=False
+            ) as tmp:
+                json.dump({"version": CONFIG_CACHE_VERSION, "entries": self.disk}, tmp)
+            Path(tmp.name).replace(path)
+            self.dirty = False
+
+    def clear(self):
+        """Forget everything cached in this process (the on-disk cache is kept)."""
+        self.memory.clear()
+        self.disk = None
+        self.dirty = False
+        self.stats = dict.fromkeys(self.stats, 0)
+
+
+config_cache = ConfigCache()
+
+
+def _parse_values(path: Path, kind: str, parser):
+    """
+    Parse a file of variable values as (values, []). A file that cannot be
+    parsed gives ({}, its CIDR literals) instead, so overlap checks and the
+    address pool still see every range it holds.
+    """
+    try:
+        return config_cache.parse(path, kind, parser), []
+    except ValueError as e:
+        print(f"INFRABOX: ⚠️ Could not parse {path}: {e}")
+        return {}, config_cache.parse(path, "cidrs", parse_cidr_literals)
+
+
+def _variable_defaults(env_dir: Path):
+    variables_file = env_dir / "variables.tf"
+    json_variables_file = env_dir / f"variables{TF_JSON_SUFFIX}"
+    if variables_file.exists():
+        return _parse_values(variables_file, "variables", parse_variable_defaults)
+    if json_variables_file.exists():
+        return _parse_values(
+            json_variables_file, "json-variables", parse_json_variable_defaults
+        )
+    return {}, []
+
+
+def _load_workspace_config(env_dir: Path) -> EnvironmentConfig:
+    """The shared root's defaults overlaid with the environment's own values."""
+    values, cidrs = _parse_values(env_dir / WORKSPACE_TFVARS, "tfvars", json.loads)
+    defaults, _shared_cidrs = _variable_defaults(shared_root(env_dir.parent))
+    return EnvironmentConfig.from_variables(env_dir.name, {**defaults, **values}, cidrs)
+
+
+def _load_config(env_dir: Path) -> EnvironmentConfig:
+    if (env_dir / WORKSPACE_TFVARS).exists():
+        return _load_workspace_config(env_dir)
+    main_file = env_dir / "main.tf"
+    if not main_file.exists():
+        main_file = env_dir / f"main{TF_JSON_SUFFIX}"
+    variables, module_cidrs = _variable_defaults(env_dir)
+    if main_file.exists():
+        module_cidrs = [
+            *module_cidrs,
+            *config_cache.parse(main_file, "cidrs", parse_cidr_literals),
+        ]
+    return EnvironmentConfig.from_variables(env_dir.name, variables, module_cidrs)
+
+
+def load_environment_config(env_dir: Path) -> EnvironmentConfig:
+    """Load the typed configuration of a single environment directory."""
+    config = _load_config(env_dir)
+    config_cache.flush()
+    return config
+
+
+def scan_environment_configs(environments_dir: Path, exclude=None):
+    """
+    Load the configuration of every environment, skipping `exclude` and the
+    shared root of workspace environments.
+    """
+    configs = []
+    if environments_dir.exists():
+        for env_dir in sorted(environments_dir.iterdir()):
+            if (
+                env_dir.is_dir()
+                and env_dir.name != exclude
+                and not is_shared_root(env_dir)
+            ):
+                configs.append(_load_config(env_dir))
+    config_cache.flush()
+    return configs
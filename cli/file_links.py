@@ -0,0 +1,55 @@
+import fcntl
+import os
+import shutil
+from collections import Counter
+from pathlib import Path
+
+# ioctl(2) request that makes a file share the extents of another (Linux)
+FICLONE = 0x40049409
+
+
+def _reflink(source: Path, target: Path):
+    with source.open("rb") as src, target.open("wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            target.unlink()
+            raise
+
+
+def link_file(source: Path, target: Path) -> str:
+    """
+    Make target share source's data without copying it: a hardlink, or a
+    reflink across filesystems that support it, or a plain copy otherwise.
+    Returns the method used.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        _reflink(source, target)
+        shutil.copystat(source, target)
+        return "reflink"
+    except OSError:
+        shutil.copy2(source, target)
+        return "copy"
+
+
+def link_tree(source: Path, target: Path) -> Counter:
+    """Recreate a directory tree with link_file; symlinks are kept as symlinks."""
+    methods = Counter()
+    for path in sorted(source.rglob("*")):
+        destination = target / path.relative_to(source)
+        if path.is_symlink():
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            destination.symlink_to(os.readlink(path))
+            methods["symlink"] += 1
+        elif path.is_dir():
+            destination.mkdir(parents=True, exist_ok=True)
+        else:
+            methods[link_file(path, destination)] += 1
+    return methods
@@ -0,0 +1,172 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+# Directories whose content never matters to a watch
+IGNORED_DIRS = {".terraform", ".git", "__pycache__"}
+POLL_INTERVAL_SECONDS = 0.5
+
+
+def _watched_dirs(root: Path):
+    if not root.is_dir():
+        return []
+    dirs = [root]
+    for path in sorted(root.rglob("*")):
+        if path.is_dir() and not IGNORED_DIRS & set(path.relative_to(root).parts):
+            dirs.append(path)
+    return dirs
+
+
+class InotifyWatcher:
+    """Recursive directory watch using Linux inotify through libc."""
+
+    def __init__(self, roots):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = [Path(root) for root in roots]
+        self.dirs = {}
+        self._rescan()
+
+    def _add(self, directory: Path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = directory
+
+    def _rescan(self):
+        """Watch every directory under the roots; return all their files."""
+        files = set()
+        for root in self.roots:
+            for directory in _watched_dirs(root):
+                self._add(directory)
+                files.update(path for path in directory.iterdir() if path.is_file())
+        return files
+
+    def wait(self, timeout=None):
+        """Return the set of paths changed before timeout (empty if none)."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        return self._changed_paths(os.read(self.fd, 64 * 1024))
+
+    def _changed_paths(self, data):
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped: anything may have changed, including
+                # directories created in the meantime
+                changed |= self._rescan()
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF):
+                # The directory is gone, and its descriptor may be reused
+                self.dirs.pop(wd, None)
+                continue
+            if wd not in self.dirs or not name:
+                continue
+            path = self.dirs[wd] / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and path.name not in IGNORED_DIRS:
+                    for directory in _watched_dirs(path):
+                        self._add(directory)
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Portable fallback that compares file modification times."""
+
+    def __init__(self, roots, interval=POLL_INTERVAL_SECONDS):
+        self.roots = [Path(root) for root in roots]
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        files = {}
+        for root in self.roots:
+            for directory in _watched_dirs(root):
+                for path in directory.iterdir():
+                    if path.is_file():
+                        stat = path.stat()
+                        files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self._scan()
+            changed = {
+                path
+                for path in current.keys() | self.snapshot.keys()
+                if current.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = current
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+def make_watcher(roots, poll=False):
+    """An inotify watcher where available, a polling one otherwise."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots)
+
+
+def debounced_changes(watcher, debounce):
+    """
+    Yield sets of changed paths. After the first change, changes keep being
+    collected until none arrives for debounce seconds, so one save (or a
+    burst of them) gives a single batch.
+    """
+    while True:
+        changed = watcher.wait()
+        while True:
+            more = watcher.wait(debounce)
+            if not more:
+                break
+            changed |= more
+        yield changed
@@ -0,0 +1,59 @@
+FLEET_MIN_INSTANCES = 2
+FLEET_MAX_INSTANCES = 4
+# A Standard load balancer only accepts a Standard public IP
+FLEET_PUBLIC_IP_SKU = "Standard"
+
+
+def fleet_context(
+    enabled=False,
+    min_instances=FLEET_MIN_INSTANCES,
+    max_instances=FLEET_MAX_INSTANCES,
+    instances=None,
+) -> dict:
+    """
+    Template context values choosing a single VM or an autoscaled fleet
+    behind a load balancer. Raises ValueError for inconsistent bounds.
+    """
+    instances = min_instances if instances is None else instances
+    if enabled and not 1 <= min_instances <= instances <= max_instances:
+        raise ValueError(
+            "Fleet instance counts must satisfy 1 <= min <= instances <= max "
+            f"(got min {min_instances}, instances {instances}, max {max_instances})"
+        )
+    context = {
+        "fleet": enabled,
+        "fleet_min_instances": min_instances,
+        "fleet_max_instances": max_instances,
+        "fleet_instances": instances,
+    }
+    if enabled:
+        context["public_ip_sku"] = FLEET_PUBLIC_IP_SKU
+    return context
+
+
+def fleet_context_from_args(args) -> dict:
+    min_instances = getattr(args, "min_instances", None)
+    max_instances = getattr(args, "max_instances", None)
+    return fleet_context(
+        getattr(args, "fleet", False),
+        FLEET_MIN_INSTANCES if min_instances is None else min_instances,
+        FLEET_MAX_INSTANCES if max_instances is None else max_instances,
+        getattr(args, "instances", None),
+    )
+
+
+def fleet_context_from_variables(variables: dict) -> dict:
+    """
+    Rebuild the fleet context from an environment's variable defaults. Hand
+    edits are taken as they are, Terraform reports impossible bounds.
+    """
+    if "fleet_min_instances" not in variables:
+        return fleet_context()
+    min_instances = variables["fleet_min_instances"]
+    return {
+        "fleet": True,
+        "fleet_min_instances": min_instances,
+        "fleet_max_instances": variables.get("fleet_max_instances", min_instances),
+        "fleet_instances": variables.get("fleet_instances", min_instances),
+        "public_ip_sku": FLEET_PUBLIC_IP_SKU,
+    }
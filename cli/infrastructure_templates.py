@@ -1,12 +1,16 @@
+import json
 from pathlib import Path
 
 from jinja2 import Environment, FileSystemLoader
 
-from cli.utils import INFRA_ROOT
+from cli.bundle import archive_template_loader
+from cli.env_config import parse_variable_defaults
+from cli.state import BUNDLE_ROOT, IN_ARCHIVE
+from cli.workspaces import WORKSPACE_TFVARS, is_shared_root
 
-TEMPLATES_DIR = INFRA_ROOT / "templates"
+TEMPLATES_DIR = BUNDLE_ROOT / "templates"
 env = Environment(
-    loader=FileSystemLoader(TEMPLATES_DIR),
+    loader=archive_template_loader() if IN_ARCHIVE else FileSystemLoader(TEMPLATES_DIR),
     autoescape=True,
     trim_blocks=True,
     lstrip_blocks=True,
@@ -17,8 +21,10 @@ def render_template(
     template_name: str, context: dict, output_path: Path, dry_run=False
 ):
     template = env.get_template(template_name)
-    rendered_content = template.render(context)
+    _write_output(template.render(context), output_path, dry_run)
 
+
+def _write_output(rendered_content: str, output_path: Path, dry_run=False):
     if dry_run:
         print(f"INFRABOX: 🔍 Dry-run mode: {output_path.name} not written to disk.")
         print(rendered_content)
@@ -40,4 +46,18 @@ def generate_outputs_tf(env_path: Path, context: dict, dry_run=False):
 
 
 def generate_provider_tf(env_path: Path, context: dict, dry_run: bool = False):
+    context = {**context, "workspace_root": is_shared_root(env_path)}
     render_template("provider.tf.j2", context, env_path / "provider.tf", dry_run)
+
+
+def workspace_variables(context: dict) -> dict:
+    """Every variable value of an environment, as its variables.tf would default them."""
+    return parse_variable_defaults(env.get_template("variables.tf.j2").render(context))
+
+
+def generate_workspace_tfvars(env_path: Path, context: dict, dry_run=False):
+    _write_output(
+        json.dumps(workspace_variables(context), indent=2) + "\n",
+        env_path / WORKSPACE_TFVARS,
+        dry_run,
+    )
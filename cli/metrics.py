@@ -0,0 +1,243 @@
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from cli.state import get_state_dir
+
+DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+METRICS = {
+    "infrabox_command_duration_seconds": (
+        "histogram",
+        "Duration of InfraBox commands, by command and status.",
+    ),
+    "infrabox_phase_duration_seconds": (
+        "histogram",
+        "Duration of Terraform commands, by environment and phase.",
+    ),
+    "infrabox_phase_runs_total": (
+        "counter",
+        "Terraform commands run, by environment, phase and exit code.",
+    ),
+    "infrabox_cache_lookups_total": (
+        "counter",
+        "Cache lookups, by cache and result.",
+    ),
+    "infrabox_resources_changed_total": (
+        "counter",
+        "Resources changed by applies, by environment and action.",
+    ),
+}
+RESOURCES_RE = re.compile(
+    r"Resources: (?:(\d+) added, (\d+) changed, )?(\d+) destroyed"
+)
+
+
+def get_metrics_dir() -> Path:
+    return get_state_dir() / "metrics"
+
+
+def get_textfile_path() -> Path:
+    """Where the Prometheus textfile is written (INFRABOX_METRICS_FILE)."""
+    default = get_metrics_dir() / "infrabox.prom"
+    return Path(os.environ.get("INFRABOX_METRICS_FILE", default))
+
+
+def _label_key(labels) -> str:
+    return json.dumps(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """
+    In-memory metric updates since the last flush. Updates are plain dict
+    operations under a lock; files are only touched by flush().
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            entry = series.setdefault(
+                _label_key(labels),
+                {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0},
+            )
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    entry["buckets"][index] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def take(self):
+        """Return and forget the updates collected so far."""
+        with self.lock:
+            updates = {"counters": self.counters, "histograms": self.histograms}
+            self.counters, self.histograms = {}, {}
+        return updates
+
+    def clear(self):
+        self.take()
+
+
+registry = MetricsRegistry()
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def record_cache_lookup(cache, result):
+    """Count a cache lookup; result is "hit", "miss" or a cache level."""
+    registry.inc("infrabox_cache_lookups_total", cache=cache, result=result)
+
+
+@contextmanager
+def track_command(command):
+    """Time an InfraBox command; failures (exceptions) are labelled error."""
+    started = time.monotonic()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        registry.observe(
+            "infrabox_command_duration_seconds",
+            time.monotonic() - started,
+            command=command,
+            status=status,
+        )
+
+
+def observe_output(environment, line):
+    """Count resources from Terraform's 'Apply/Destroy complete!' line."""
+    if "complete! Resources:" not in line:
+        return
+    match = RESOURCES_RE.search(line)
+    if not match:
+        return
+    added, changed, destroyed = (int(group or 0) for group in match.groups())
+    for action, count in (
+        ("added", added),
+        ("changed", changed),
+        ("destroyed", destroyed),
+    ):
+        if count:
+            registry.inc(
+                "infrabox_resources_changed_total",
+                count,
+                environment=environment,
+                action=action,
+            )
+
+
+def _merge(totals, updates):
+    for name, series in updates["counters"].items():
+        target = totals["counters"].setdefault(name, {})
+        for key, value in series.items():
+            target[key] = target.get(key, 0) + value
+    for name, series in updates["histograms"].items():
+        target = totals["histograms"].setdefault(name, {})
+        for key, entry in series.items():
+            if key not in target:
+                target[key] = entry
+                continue
+            merged = target[key]
+            for index, count in enumerate(entry["buckets"]):
+                merged["buckets"][index] += count
+            merged["sum"] += entry["sum"]
+            merged["count"] += entry["count"]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=None):
+    labels = [*json.loads(key), *(extra or [])]
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def render(totals) -> str:
+    """Prometheus text exposition format (also accepted by OpenMetrics scrapers)."""
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        series = totals[f"{kind}s"].get(name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, value in sorted(series.items()):
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(key)} {value}")
+                continue
+            for index, bound in enumerate(DURATION_BUCKETS):
+                labels = _format_labels(key, [("le", str(bound))])
+                lines.append(f"{name}_bucket{labels} {value['buckets'][index]}")
+            labels = _format_labels(key, [("le", "+Inf")])
+            lines.append(f"{name}_bucket{labels} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(key)} {value['sum']:.3f}")
+            lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def flush() -> str:
+    """
+    Add the updates since the last flush to the totals kept in the state
+    directory, rewrite the textfile, and return its content. Totals are
+    shared by every CLI run and the daemon, so counters never reset.
+    """
+    updates = registry.take()
+    metrics_dir = get_metrics_dir()
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    totals_path = metrics_dir / "totals.json"
+    with (metrics_dir / ".lock").open("w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            totals = {"counters": {}, "histograms": {}}
+            if totals_path.exists():
+                try:
+                    totals = json.loads(totals_path.read_text())
+                except ValueError:
+                    pass
+            _merge(totals, updates)
+            tmp_path = totals_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(totals))
+            tmp_path.replace(totals_path)
+
+            text = render(totals)
+            textfile = get_textfile_path()
+            textfile.parent.mkdir(parents=True, exist_ok=True)
+            # The textfile collector must never see a half-written file
+            tmp_textfile = textfile.with_name(f".{textfile.name}.tmp")
+            tmp_textfile.write_text(text)
+            tmp_textfile.replace(textfile)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return text
+
+
+def flush_or_warn():
+    """flush(), reporting instead of failing when the files cannot be written."""
+    try:
+        flush()
+    except OSError as e:
+        print(f"INFRABOX: ⚠️ Could not write metrics: {e}")
@@ -0,0 +1,195 @@
+import heapq
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from cli.run_history import format_duration
+
+MAX_PARALLEL_JOBS = 4
+
+
+class ThreadRoutedStdout:
+    """
+    Stand-in for sys.stdout that hands every complete line written by a
+    thread to that thread's handler, so output of concurrent jobs can be
+    prefixed or collected separately. Threads without a handler write through.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def route(self, handler):
+        """Send this thread's lines to handler (None writes through again)."""
+        self.local.handler = handler
+        self.local.pending = ""
+
+    def current_handler(self):
+        return getattr(self.local, "handler", None) or self._write_through
+
+    def _write_through(self, line):
+        with self.lock:
+            self.stream.write(f"{line}\n")
+
+    def write(self, text):
+        handler = getattr(self.local, "handler", None)
+        if handler is None:
+            with self.lock:
+                return self.stream.write(text)
+
+        self.local.pending += text
+        *lines, self.local.pending = self.local.pending.split("\n")
+        for line in lines:
+            handler(line)
+        return len(text)
+
+    def flush(self):
+        handler = getattr(self.local, "handler", None)
+        pending = getattr(self.local, "pending", "")
+        if handler is not None and pending:
+            self.local.pending = ""
+            handler(pending)
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextmanager
+def routed_stdout():
+    """Install a ThreadRoutedStdout, reusing one that is already installed."""
+    if isinstance(sys.stdout, ThreadRoutedStdout):
+        yield sys.stdout
+        return
+    original = sys.stdout
+    router = ThreadRoutedStdout(original)
+    sys.stdout = router
+    try:
+        yield router
+    finally:
+        sys.stdout = original
+
+
+def estimate_remaining(running, pending, workers):
+    """
+    Seconds until every job is done: running jobs need their remaining time,
+    pending jobs go to the first free worker in order.
+    """
+    free_at = sorted(running)[:workers]
+    free_at += [0.0] * (workers - len(free_at))
+    heapq.heapify(free_at)
+    for seconds in pending:
+        heapq.heappush(free_at, heapq.heappop(free_at) + seconds)
+    return max(free_at)
+
+
+class _Progress:
+    """Prints an ETA each time a job finishes, from expected job durations."""
+
+    def __init__(self, names, expected, workers, output):
+        self.expected = expected
+        self.workers = workers
+        self.output = output
+        self.pending = list(names)
+        self.started = {}
+        self.done = 0
+        self.lock = threading.Lock()
+
+    def start(self, name):
+        with self.lock:
+            self.pending.remove(name)
+            self.started[name] = time.monotonic()
+
+    def finish(self, name):
+        with self.lock:
+            del self.started[name]
+            self.done += 1
+            now = time.monotonic()
+            running = [
+                max(self.expected.get(job, 0.0) - (now - started), 0.0)
+                for job, started in self.started.items()
+            ]
+            pending = [self.expected.get(job, 0.0) for job in self.pending]
+            total = self.done + len(self.started) + len(self.pending)
+            if self.done == total:
+                return
+            eta = estimate_remaining(running, pending, self.workers)
+            self.output(
+                f"INFRABOX: ⏳ {self.done}/{total} jobs done, "
+                f"about {format_duration(eta)} left"
+            )
+
+
+def run_parallel(jobs, max_workers=MAX_PARALLEL_JOBS, *, expected=None):
+    """
+    Run named jobs on a bounded thread pool.
+    jobs is a list of (name, callable) pairs, and each job's output lines are
+    prefixed with its name. Returns {name: {"ok", "result", "error", "seconds"}}
+    in the order of jobs. A failing job does not stop the others.
+    With expected ({name: seconds}), jobs start longest-expected first so a
+    long job does not start last and hold up the batch, and an ETA is printed
+    as jobs finish.
+    """
+    results = {}
+    if not jobs:
+        return results
+
+    order = list(jobs)
+    if expected:
+        order.sort(key=lambda item: expected.get(item[0], 0.0), reverse=True)
+
+    with routed_stdout() as router:
+        # Job lines go wherever the calling thread's output goes
+        parent = router.current_handler()
+        progress = None
+        if expected:
+            names = [name for name, _job in order]
+            progress = _Progress(names, expected, max_workers, parent)
+            total = estimate_remaining(
+                [], [expected.get(name, 0.0) for name in names], max_workers
+            )
+            parent(
+                f"INFRABOX: ⏳ Expected duration: about {format_duration(total)}, "
+                f"longest first: {', '.join(names)}"
+            )
+
+        def run_job(name, job):
+            router.route(lambda line: parent(f"[{name}] {line}"))
+            if progress:
+                progress.start(name)
+            started = time.monotonic()
+            try:
+                outcome = {"ok": True, "result": job(), "error": None}
+            except Exception as e:  # noqa: BLE001
+                # Any failure is one job's outcome, never the whole batch's
+                outcome = {"ok": False, "result": None, "error": e}
+                print(f"INFRABOX: ❌ {e}")
+            finally:
+                sys.stdout.flush()
+                router.route(None)
+            outcome["seconds"] = time.monotonic() - started
+            if progress:
+                progress.finish(name)
+            return outcome
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {name: pool.submit(run_job, name, job) for name, job in order}
+            for name, _job in jobs:
+                results[name] = futures[name].result()
+    return results
+
+
+def print_summary(title, results, details=None):
+    """Print one status line per job, with optional per-job detail text."""
+    details = details or {}
+    print(f"\nINFRABOX: 📋 {title}")
+    width = max(len(name) for name in results)
+    for name, outcome in results.items():
+        icon = "✅" if outcome["ok"] else "❌"
+        detail = details.get(name) or (
+            str(outcome["error"]) if outcome["error"] else ""
+        )
+        print(f"  {icon} {name:<{width}}  {outcome['seconds']:7.1f}s  {detail}")
@@ -1,4 +1,424 @@
 import argparse
+import re
+
+from cli.blob_upload import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CONTAINER,
+    MAX_CHUNK_SIZE,
+    UPLOAD_WORKERS,
+)
+from cli.catalog import load_catalog, rescan
+from cli.fleet import FLEET_MAX_INSTANCES, FLEET_MIN_INSTANCES
+from cli.pool import DEFAULT_LEASE_TTL_SECONDS, POOL_WORKERS
+from cli.profiles import DEFAULT_PROFILE, PROFILES
+from cli.refresh_policy import (
+    DEFAULT_REFRESH_POLICY,
+    DEFAULT_REFRESH_TTL_SECONDS,
+    REFRESH_POLICIES,
+)
+from cli.regions import parse_regions, region_environment
+from cli.run_history import HISTORY_SAMPLES
+from cli.tf_json import OUTPUT_FORMATS
+from cli.utils import ENVIRONMENTS_DIR, VALID_ENVIRONMENTS, is_known_environment
+from cli.warm import WARM_WORKERS
+
+ENVIRONMENT_NAME_RE = re.compile(r"^[a-z0-9][a-z0-9-]*$")
+# The storage account is named after the default "Infrabox" prefix, the
+# environment without its dashes and "sa01", in at most 24 characters
+MAX_ENVIRONMENT_NAME_CHARS = 24 - len("infrabox") - len("sa01")
+
+
+def _rescan_for(value) -> bool:
+    """Rescan the catalog if value was added to environments/ by hand."""
+    if not ENVIRONMENTS_DIR.joinpath(value).is_dir():
+        return False
+    try:
+        rescan(ENVIRONMENTS_DIR)
+    except OSError:
+        return False
+    return is_known_environment(value)
+
+
+def known_environment(value):
+    """argparse type: a standard or catalogued environment."""
+    if not is_known_environment(value) and not _rescan_for(value):
+        known = ", ".join(sorted(VALID_ENVIRONMENTS | set(load_catalog())))
+        raise argparse.ArgumentTypeError(
+            f"invalid choice: '{value}' (choose from {known}; "
+            "run `list --rescan` after adding environments by hand)"
+        )
+    return value
+
+
+def new_environment(value):
+    """argparse type: a name `initialize` or `clone` can create."""
+    if (
+        not ENVIRONMENT_NAME_RE.match(value)
+        or len(value.replace("-", "")) > MAX_ENVIRONMENT_NAME_CHARS
+    ):
+        raise argparse.ArgumentTypeError(
+            f"invalid environment name: '{value}' (use lowercase letters, digits "
+            f"and '-', with at most {MAX_ENVIRONMENT_NAME_CHARS} letters and digits)"
+        )
+    return value
+
+
+def new_region_environments(environment, regions):
+    """
+    The <environment>-<region> names `initialize --regions` creates, each
+    checked as new_environment checks a name given on the command line.
+    """
+    return [
+        new_environment(region_environment(environment, region)) for region in regions
+    ]
+
+
+def positive_int(value):
+    """argparse type: an integer of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: '{value}'")
+    return number
+
+
+def chunk_size_mib(value):
+    """argparse type: a block size in MiB that Azure accepts."""
+    size = positive_int(value)
+    limit = MAX_CHUNK_SIZE // 1024 // 1024
+    if size > limit:
+        raise argparse.ArgumentTypeError(f"must be at most {limit} MiB: '{value}'")
+    return size
+
+
+def _add_history_parsers(subparsers):
+    """Commands that inspect or roll back what earlier runs left behind."""
+    # Logs
+    logs_parser = subparsers.add_parser(
+        "logs", help="Show or search archived Terraform run logs"
+    )
+    logs_parser.add_argument(
+        "environment", type=known_environment, help="Target environment"
+    )
+    logs_parser.add_argument(
+        "--run", help="Only show runs whose ID starts with this prefix"
+    )
+    logs_parser.add_argument(
+        "--grep", metavar="PATTERN", help="Search run logs for a regular expression"
+    )
+
+    # History
+    history_parser = subparsers.add_parser(
+        "history", help="Show how long recent Terraform runs took"
+    )
+    history_parser.add_argument(
+        "environment", nargs="?", help="Only show this environment's runs"
+    )
+    history_parser.add_argument(
+        "--slowest",
+        action="store_true",
+        help=(
+            "Rank environment phases by the median of their last "
+            f"{HISTORY_SAMPLES} successful runs"
+        ),
+    )
+    history_parser.add_argument(
+        "--limit",
+        type=positive_int,
+        default=20,
+        help="Number of rows to show (default: 20)",
+    )
+
+    # State
+    state_parser = subparsers.add_parser(
+        "state", help="List or restore snapshots of an environment's state"
+    )
+    state_subparsers = state_parser.add_subparsers(dest="state_command", required=True)
+    state_history_parser = state_subparsers.add_parser(
+        "history", help="List an environment's state snapshots, newest first"
+    )
+    state_history_parser.add_argument(
+        "environment", type=known_environment, help="Target environment"
+    )
+    state_history_parser.add_argument(
+        "--limit",
+        type=positive_int,
+        default=20,
+        help="Number of rows to show (default: 20)",
+    )
+    state_restore_parser = state_subparsers.add_parser(
+        "restore", help="Make a snapshot the environment's current state"
+    )
+    state_restore_parser.add_argument(
+        "environment", type=known_environment, help="Target environment"
+    )
+    state_restore_parser.add_argument(
+        "snapshot", help="Snapshot number, or a prefix of its content hash"
+    )
+    state_restore_parser.add_argument(
+        "-y", "--yes", action="store_true", help="Do not ask for confirmation"
+    )
+
+
+def _add_warm_parser(subparsers):
+    warm_parser = subparsers.add_parser(
+        "warm", help="Run terraform init ahead of time, in the background"
+    )
+    warm_parser.add_argument(
+        "environments",
+        nargs="*",
+        type=known_environment,
+        metavar="environment",
+        help="Environments to warm",
+    )
+    warm_parser.add_argument(
+        "--all", action="store_true", help="Warm every catalogued environment"
+    )
+    warm_parser.add_argument(
+        "--validate", action="store_true", help="Also run terraform validate"
+    )
+    warm_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Also run a refresh-only plan, so --refresh=auto can skip refreshing",
+    )
+    warm_parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=WARM_WORKERS,
+        help=f"Environments warmed at once (default: {WARM_WORKERS})",
+    )
+    warm_parser.add_argument(
+        "--foreground",
+        action="store_true",
+        help="Wait for warming to finish instead of running it in the background",
+    )
+
+
+def _add_render_arguments(initialize_parser):
+    """What `initialize` renders: layout, file format, VM sizing and fleet shape."""
+    initialize_parser.add_argument(
+        "--workspace",
+        action="store_true",
+        help="Write only a var file and run from the Terraform workspace of one "
+        "shared, once-initialized root",
+    )
+    initialize_parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=OUTPUT_FORMATS,
+        default="hcl",
+        help="Write HCL rendered from templates/, or .tf.json built in Python "
+        "(default: hcl)",
+    )
+    initialize_parser.add_argument(
+        "--profile",
+        choices=PROFILES,
+        default=DEFAULT_PROFILE,
+        help="Performance profile: VM size, OS disk, accelerated networking and "
+        "proximity placement (default: burst)",
+    )
+    initialize_parser.add_argument(
+        "--fleet",
+        action="store_true",
+        help="Run an autoscaled scale set behind a Standard load balancer instead "
+        "of a single VM",
+    )
+    initialize_parser.add_argument(
+        "--min-instances",
+        type=positive_int,
+        default=FLEET_MIN_INSTANCES,
+        help=f"Fewest fleet instances autoscale keeps (default: {FLEET_MIN_INSTANCES})",
+    )
+    initialize_parser.add_argument(
+        "--max-instances",
+        type=positive_int,
+        default=FLEET_MAX_INSTANCES,
+        help=f"Most fleet instances autoscale adds (default: {FLEET_MAX_INSTANCES})",
+    )
+    initialize_parser.add_argument(
+        "--instances",
+        type=positive_int,
+        help="Fleet instances to start with (default: --min-instances)",
+    )
+
+
+def _add_pool_parsers(subparsers):
+    """Commands that lease ready-made environments from a warm pool."""
+    lease_parser = subparsers.add_parser(
+        "lease", help="Take an already applied environment from the pool"
+    )
+    lease_parser.add_argument(
+        "--owner", help="Who the environment is tagged for (default: current user)"
+    )
+    lease_parser.add_argument(
+        "--ttl",
+        type=positive_int,
+        default=DEFAULT_LEASE_TTL_SECONDS,
+        help="Seconds until the lease expires and the next `pool maintain` "
+        f"destroys the environment (default: {DEFAULT_LEASE_TTL_SECONDS})",
+    )
+    lease_parser.add_argument(
+        "--no-refill",
+        action="store_true",
+        help="Do not refill the pool in the background",
+    )
+
+    pool_parser = subparsers.add_parser(
+        "pool", help="Show, refill or reap the pool of leasable environments"
+    )
+    pool_subparsers = pool_parser.add_subparsers(dest="pool_command", required=True)
+    pool_subparsers.add_parser("status", help="List pool environments and leases")
+    maintain_parser = pool_subparsers.add_parser(
+        "maintain", help="Destroy expired leases and provision replacements"
+    )
+    maintain_parser.add_argument(
+        "--size",
+        type=positive_int,
+        help="Ready environments to keep (saved for later runs)",
+    )
+    maintain_parser.add_argument(
+        "--base",
+        type=known_environment,
+        help="Environment new pool environments are cloned from (saved for later "
+        "runs)",
+    )
+    maintain_parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=POOL_WORKERS,
+        help=f"Environments provisioned or destroyed at once (default: {POOL_WORKERS})",
+    )
+    maintain_parser.add_argument(
+        "--foreground",
+        action="store_true",
+        help="Wait for the run to finish instead of running it in the background",
+    )
+    maintain_parser.add_argument(
+        "--interval",
+        type=positive_int,
+        help="Keep running, every this many seconds (implies --foreground)",
+    )
+    release_parser = pool_subparsers.add_parser(
+        "release", help="End a lease now, so the environment is destroyed"
+    )
+    release_parser.add_argument("environment", help="Leased pool environment")
+    release_parser.add_argument(
+        "--no-refill",
+        action="store_true",
+        help="Do not reap and refill the pool in the background",
+    )
+
+
+def _add_list_parser(subparsers):
+    list_parser = subparsers.add_parser(
+        "list", help="List environments with their location, CIDRs and last run"
+    )
+    list_parser.add_argument(
+        "--rescan",
+        action="store_true",
+        help="Rebuild the catalog from the environments directory first",
+    )
+
+
+def _add_upload_parser(subparsers):
+    upload_parser = subparsers.add_parser(
+        "upload", help="Upload files to an environment's storage account"
+    )
+    upload_parser.add_argument(
+        "environment", type=known_environment, help="Environment to upload to"
+    )
+    upload_parser.add_argument("path", help="File or directory to upload")
+    upload_parser.add_argument(
+        "--container",
+        default=DEFAULT_CONTAINER,
+        help=f"Blob container, created if missing (default: {DEFAULT_CONTAINER})",
+    )
+    upload_parser.add_argument(
+        "--prefix", default="", help="Prepended to every blob name"
+    )
+    upload_parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=UPLOAD_WORKERS,
+        help=f"Concurrent requests (default: {UPLOAD_WORKERS})",
+    )
+    upload_parser.add_argument(
+        "--chunk-size",
+        type=chunk_size_mib,
+        default=DEFAULT_CHUNK_SIZE // 1024 // 1024,
+        help="Block size in MiB for files larger than it (default: "
+        f"{DEFAULT_CHUNK_SIZE // 1024 // 1024})",
+    )
+    upload_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only list the files that differ from the container",
+    )
+
+
+def _add_fleet_parser(subparsers):
+    fleet_parser = subparsers.add_parser(
+        "fleet", help="Show the instance counts of an environment's VM fleet"
+    )
+    fleet_parser.add_argument(
+        "environment", type=known_environment, help="Environment to inspect"
+    )
+
+
+def _add_plan_arguments(command_parser):
+    """Options `create` and `destroy` share: how Terraform plans and applies."""
+    command_parser.add_argument(
+        "--trace-provider",
+        action="store_true",
+        help="Run Terraform with TF_LOG=TRACE and report provider call latencies",
+    )
+    command_parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Stream Terraform's JSON events and report per-resource apply times",
+    )
+    command_parser.add_argument(
+        "--refresh",
+        choices=REFRESH_POLICIES,
+        default=DEFAULT_REFRESH_POLICY,
+        help="When to refresh state during plan: auto skips it if the last refresh "
+        f"is recent and the state is unchanged (default: {DEFAULT_REFRESH_POLICY})",
+    )
+    command_parser.add_argument(
+        "--refresh-ttl",
+        type=int,
+        default=DEFAULT_REFRESH_TTL_SECONDS,
+        metavar="SECONDS",
+        help="How long a refresh stays fresh for --refresh=auto (default: "
+        f"{DEFAULT_REFRESH_TTL_SECONDS})",
+    )
+    command_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=(
+            "Always run init, validate and a plan, even if they already "
+            "succeeded for the current files"
+        ),
+    )
+    command_parser.add_argument(
+        "--skip-preflight",
+        action="store_true",
+        help="Do not run the offline pre-flight checks before Terraform",
+    )
+    command_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the last completed step of an interrupted run",
+    )
+    command_parser.add_argument(
+        "--regions",
+        type=parse_regions,
+        metavar="REGION[,REGION...]",
+        help="Run the environment in every listed region concurrently",
+    )
 
 
 def parse_arguments():
@@ -12,16 +432,18 @@ def parse_arguments():
     # Create
     create_parser = subparsers.add_parser("create", help="Create an environment")
     create_parser.add_argument(
-        "environment", choices=["dev", "stage", "prod"], help="Target environment"
+        "environment", type=known_environment, help="Target environment"
     )
     create_parser.add_argument("--dry-run", action="store_true", help="Dry run only")
+    _add_plan_arguments(create_parser)
 
     # Destroy
     destroy_parser = subparsers.add_parser("destroy", help="Destroy an environment")
     destroy_parser.add_argument(
-        "environment", choices=["dev", "stage", "prod"], help="Target environment"
+        "environment", type=known_environment, help="Target environment"
     )
     destroy_parser.add_argument("--dry-run", action="store_true", help="Dry run only")
+    _add_plan_arguments(destroy_parser)
 
     # Initialize
     initialize_parser = subparsers.add_parser(
@@ -29,7 +451,7 @@ def parse_arguments():
     )
     initialize_parser.add_argument(
         "environment",
-        choices=["dev", "stage", "prod"],
+        type=new_environment,
         nargs="?",
         default="dev",
         help="Target environment (default: dev)",
@@ -37,5 +459,87 @@ def parse_arguments():
     initialize_parser.add_argument(
         "--dry-run", action="store_true", help="Dry run only"
     )
+    _add_render_arguments(initialize_parser)
+    initialize_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the last completed step of an interrupted run",
+    )
+    initialize_parser.add_argument(
+        "--regions",
+        type=parse_regions,
+        metavar="REGION[,REGION...]",
+        help="Initialize one <environment>-<region> environment per listed region",
+    )
+
+    # Clone
+    clone_parser = subparsers.add_parser(
+        "clone", help="Create an environment from an existing one"
+    )
+    clone_parser.add_argument(
+        "source", type=known_environment, help="Environment to copy"
+    )
+    clone_parser.add_argument(
+        "target", type=new_environment, help="Environment to create"
+    )
+    clone_parser.add_argument(
+        "--vnet-cidr", help="VNet CIDR (default: the first free block of the pool)"
+    )
+    clone_parser.add_argument(
+        "--subnet-cidr", help="Subnet CIDR (default: the first /24 of the VNet)"
+    )
+    clone_parser.add_argument(
+        "--location", help="Azure location (default: the source's location)"
+    )
+    clone_parser.add_argument("--dry-run", action="store_true", help="Dry run only")
+
+    _add_history_parsers(subparsers)
+
+    _add_warm_parser(subparsers)
+
+    _add_fleet_parser(subparsers)
+
+    _add_pool_parsers(subparsers)
+
+    _add_upload_parser(subparsers)
+
+    _add_list_parser(subparsers)
+
+    # Watch
+    watch_parser = subparsers.add_parser(
+        "watch", help="Re-render and validate affected environments on every save"
+    )
+    watch_parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.2,
+        metavar="SECONDS",
+        help="Wait this long after the last change before checking (default: 0.2)",
+    )
+    watch_parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Poll for changes instead of using inotify",
+    )
+
+    # Serve
+    serve_parser = subparsers.add_parser(
+        "serve", help="Run jobs submitted over a local HTTP API"
+    )
+    serve_parser.add_argument(
+        "--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)"
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=8765, help="Port to listen on (default: 8765)"
+    )
+    serve_parser.add_argument(
+        "--socket", help="Listen on this Unix socket instead of host and port"
+    )
+    serve_parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=4,
+        help="Maximum number of jobs running at once (default: 4)",
+    )
 
     return parser.parse_args()
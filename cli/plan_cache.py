@@ -0,0 +1,116 @@
+import hashlib
+import json
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from cli.metrics import record_cache_lookup
+from cli.refresh_policy import read_state_metadata
+from cli.state import get_state_dir
+from cli.workspaces import terraform_dir
+
+NO_CHANGES_TTL_SECONDS = 15 * 60
+INPUT_PATTERNS = ("*.tf", "*.tf.json", "*.tfvars", "*.tfvars.json")
+LOCAL_SOURCE_RE = re.compile(r'source\s*[=:]\s*"(\.{1,2}/[^"]+)"')
+
+
+def get_plan_cache_path(environment: str) -> Path:
+    return get_state_dir() / "plan_cache" / f"{environment}.json"
+
+
+def _input_files(directory: Path):
+    files = []
+    for pattern in INPUT_PATTERNS:
+        files.extend(directory.glob(pattern))
+    return sorted(files)
+
+
+def module_directories(env_path: Path):
+    """Local module directories referenced by the environment, recursively."""
+    seen = []
+    pending = [env_path]
+    while pending:
+        directory = pending.pop()
+        for path in _input_files(directory):
+            for source in LOCAL_SOURCE_RE.findall(path.read_text()):
+                module_dir = (directory / source).resolve()
+                if module_dir.is_dir() and module_dir not in seen:
+                    seen.append(module_dir)
+                    pending.append(module_dir)
+    return sorted(seen)
+
+
+def inputs_hash(env_path) -> str:
+    """
+    Hash every Terraform input of an environment and its local modules,
+    including the shared root a workspace environment runs in.
+    """
+    env_path = Path(env_path)
+    root = Path(terraform_dir(env_path))
+    digest = hashlib.sha256()
+    files = [root / ".terraform.lock.hcl"]
+    directories = [env_path] if root == env_path else [env_path, root]
+    for directory in [*directories, *module_directories(root)]:
+        files.extend(_input_files(directory))
+    for path in files:
+        if path.is_file():
+            digest.update(str(path.resolve()).encode() + b"\0")
+            digest.update(path.read_bytes() + b"\0")
+    return digest.hexdigest()
+
+
+def plan_cache_key(env_path, destroy=False) -> str:
+    """Key of a plan outcome: Terraform inputs, state serial and lineage."""
+    key = {
+        "inputs": inputs_hash(env_path),
+        "state": read_state_metadata(env_path),
+        "operation": "destroy" if destroy else "apply",
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def record_plan_outcome(env_path, has_changes, destroy=False):
+    """Remember a 'no changes' plan; any other outcome drops the entry."""
+    path = get_plan_cache_path(Path(env_path).name)
+    if has_changes:
+        path.unlink(missing_ok=True)
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entry = {"key": plan_cache_key(env_path, destroy), "checked_at": time.time()}
+    # Readers only ever see a whole entry; concurrent writers each use their own file
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as tmp:
+        json.dump(entry, tmp, indent=2)
+    Path(tmp.name).replace(path)
+
+
+def cached_no_changes(env_path, destroy=False, ttl=NO_CHANGES_TTL_SECONDS):
+    """
+    Return the age in seconds of a matching 'no changes' plan younger than
+    ttl, or None if Terraform has to be asked again.
+    """
+    path = get_plan_cache_path(Path(env_path).name)
+    if not path.exists():
+        return None
+    entry = json.loads(path.read_text())
+    age = time.time() - entry["checked_at"]
+    if age > ttl or entry["key"] != plan_cache_key(env_path, destroy):
+        return None
+    return age
+
+
+def skip_unchanged(env_path, args, destroy=False) -> bool:
+    """Print and return True when a recent plan already found nothing to do."""
+    if args.dry_run or getattr(args, "no_cache", False):
+        return False
+    age = cached_no_changes(env_path, destroy=destroy)
+    record_cache_lookup("plan", "miss" if age is None else "hit")
+    if age is None:
+        return False
+    print(
+        f"INFRABOX: ✅ No changes detected (cached plan from {age / 60:.0f}m ago, "
+        "use --no-cache to plan again)."
+    )
+    return True
@@ -0,0 +1,240 @@
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from cli.env_config import load_environment_config
+from cli.state import get_state_dir
+
+POOL_VERSION = 1
+POOL_SIZE = 2
+POOL_BASE = "dev"
+# Short, so the storage account name derived from it stays within 24 characters
+POOL_PREFIX = "pool"
+DEFAULT_LEASE_TTL_SECONDS = 8 * 3600
+POOL_WORKERS = 4
+# Terraform loads it on its own, so the lease tags need no change to the .tf files
+LEASE_TFVARS = "lease.auto.tfvars.json"
+# A provisioning or reaping run is presumed dead once its process is gone.
+# Entries written before runs recorded their pid fall back to this age.
+STALE_SECONDS = 3600
+
+PROVISIONING = "provisioning"
+READY = "ready"
+LEASED = "leased"
+REAPING = "reaping"
+FAILED = "failed"
+BUSY_STATES = (PROVISIONING, REAPING)
+
+
+def get_pool_path() -> Path:
+    return get_state_dir() / "pool.json"
+
+
+@contextmanager
+def pool_lock():
+    """Serialize read-modify-write updates of the pool across processes."""
+    lock_path = get_state_dir() / "pool.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _empty_pool() -> dict:
+    return {
+        "version": POOL_VERSION,
+        "size": POOL_SIZE,
+        "base": POOL_BASE,
+        "next_id": 1,
+        "environments": {},
+    }
+
+
+def load_pool() -> dict:
+    path = get_pool_path()
+    if not path.exists():
+        return _empty_pool()
+    try:
+        pool = json.loads(path.read_text())
+    except ValueError:
+        return _empty_pool()
+    if pool.get("version") != POOL_VERSION:
+        return _empty_pool()
+    return pool
+
+
+def _write(pool: dict):
+    path = get_pool_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(pool, indent=2, sort_keys=True))
+    tmp_path.replace(path)
+
+
+@contextmanager
+def update_pool():
+    """Yield the pool for changes, written back once the block ends."""
+    with pool_lock():
+        pool = load_pool()
+        yield pool
+        _write(pool)
+
+
+def _set_state(entry, state, now):
+    entry["state"] = state
+    entry["updated_at"] = now
+
+
+def _process_alive(pid) -> bool:
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # It exists, but belongs to another user
+        return True
+    return True
+
+
+def _is_stale(entry, now) -> bool:
+    """Whether the run that set a busy state died before finishing."""
+    if entry["state"] not in BUSY_STATES:
+        return False
+    if "pid" in entry:
+        return not _process_alive(entry["pid"])
+    return now - entry["updated_at"] > STALE_SECONDS
+
+
+def _claim(entry, state, now):
+    _set_state(entry, state, now)
+    entry["pid"] = os.getpid()
+
+
+def set_state(name, state, now=None):
+    with update_pool() as pool:
+        entry = pool["environments"].get(name)
+        if entry is not None:
+            _set_state(entry, state, time.time() if now is None else now)
+
+
+def forget(name):
+    with update_pool() as pool:
+        pool["environments"].pop(name, None)
+
+
+def claim_work(size=None, base=None, now=None):
+    """
+    Decide what one maintenance run does, and claim it so that concurrent
+    runs do not do it twice: the environments to reap (expired leases, failed
+    or stale ones) and the new environment names that bring the pool back to
+    its size. Returns (to_reap, to_provision, base).
+    """
+    now = time.time() if now is None else now
+    with update_pool() as pool:
+        if size is not None:
+            pool["size"] = size
+        if base is not None:
+            pool["base"] = base
+        environments = pool["environments"]
+        to_reap = []
+        for name, entry in sorted(environments.items()):
+            expired = entry["state"] == LEASED and entry["expires_at"] <= now
+            if expired or _is_stale(entry, now) or entry["state"] == FAILED:
+                _claim(entry, REAPING, now)
+                to_reap.append(name)
+
+        available = sum(
+            entry["state"] in (PROVISIONING, READY) for entry in environments.values()
+        )
+        to_provision = []
+        for _ in range(pool["size"] - available):
+            name = f"{POOL_PREFIX}{pool['next_id']}"
+            pool["next_id"] += 1
+            environments[name] = {"created_at": now}
+            _claim(environments[name], PROVISIONING, now)
+            to_provision.append(name)
+        return to_reap, to_provision, pool["base"]
+
+
+def claim_lease_tags(now=None) -> list:
+    """
+    Claim the running leases whose lease tags are not applied yet, unless
+    another live maintenance run is already applying them.
+    """
+    now = time.time() if now is None else now
+    with update_pool() as pool:
+        to_tag = []
+        for name, entry in sorted(pool["environments"].items()):
+            if (
+                entry["state"] == LEASED
+                and entry["expires_at"] > now
+                and not entry.get("tags_applied", True)
+                and not _process_alive(entry.get("tagging_pid"))
+            ):
+                entry["tagging_pid"] = os.getpid()
+                to_tag.append(name)
+        return to_tag
+
+
+def finish_lease_tags(name, applied):
+    """Release the claim on a lease's tags, recording whether they are applied."""
+    with update_pool() as pool:
+        entry = pool["environments"].get(name)
+        if entry is not None:
+            entry.pop("tagging_pid", None)
+            if applied:
+                entry["tags_applied"] = True
+
+
+def lease(owner, ttl=DEFAULT_LEASE_TTL_SECONDS, now=None):
+    """
+    Hand the oldest ready environment to `owner` until now + ttl. Returns
+    (name, entry), or None when nothing is ready.
+    """
+    now = time.time() if now is None else now
+    with update_pool() as pool:
+        ready = [
+            (entry["created_at"], name)
+            for name, entry in pool["environments"].items()
+            if entry["state"] == READY
+        ]
+        if not ready:
+            return None
+        name = min(ready)[1]
+        entry = pool["environments"][name]
+        _set_state(entry, LEASED, now)
+        entry.update(
+            owner=owner, leased_at=now, expires_at=now + ttl, tags_applied=False
+        )
+        return name, dict(entry)
+
+
+def end_lease(name, now=None) -> bool:
+    """Let a lease expire now, so the next maintenance run reaps it."""
+    now = time.time() if now is None else now
+    with update_pool() as pool:
+        entry = pool["environments"].get(name)
+        if entry is None or entry["state"] != LEASED:
+            return False
+        entry["expires_at"] = now
+        return True
+
+
+def write_lease_tags(env_path, owner, expires_at):
+    """Tag a leased environment's resources with its owner and expiry."""
+    env_path = Path(env_path)
+    tags = dict(load_environment_config(env_path).variables.get("tags") or {})
+    tags["leased_by"] = owner
+    tags["lease_expires"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(expires_at))
+    (env_path / LEASE_TFVARS).write_text(
+        json.dumps({"tags": tags}, indent=2, sort_keys=True) + "\n"
+    )
+    return tags
@@ -0,0 +1,502 @@
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+from cli.env_config import HCLParseError, config_cache, parse_blocks
+from cli.state import get_state_dir
+from cli.tf_json import BLOCK_LABELS, TF_JSON_SUFFIX, parse_json_blocks
+from cli.utils import read_cmd_output, terraform_bin
+from cli.workspaces import read_workspace_variables, terraform_dir
+
+LOCK_FILE = ".terraform.lock.hcl"
+SCHEMA_ARGS = ("providers", "schema", "-json")
+# Schemas of older lock files kept around, e.g. for other environments
+SCHEMA_KEEP = 5
+# Naming rules Azure enforces but the provider schema does not describe
+NAME_RULES = {
+    "azurerm_storage_account": (
+        re.compile(r"^[a-z0-9]{3,24}$"),
+        "3-24 lowercase letters and digits",
+    ),
+    "azurerm_resource_group": (
+        re.compile(r"^[\w\-.()]{0,89}[\w\-()]$"),
+        "1-90 letters, digits, '_', '-', '.' or parentheses, not ending in '.'",
+    ),
+}
+META_ARGUMENTS = {"count", "for_each", "provider", "depends_on"}
+META_BLOCKS = {"lifecycle", "provisioner", "connection"}
+# HCL attribute values the env_config parser keeps as raw expression text
+REFERENCE_RE = re.compile(r"^(?:var|local|module|data|path)\.[\w\-.]+$")
+CALL_RE = re.compile(r"^[a-z_]\w*\(.*\)$", re.DOTALL)
+VNET_REFERENCE_RE = re.compile(r"^azurerm_virtual_network\.([\w\-]+)\.name$")
+EXPRESSION_TOKEN_RE = re.compile(
+    r"""\s*(?:
+    (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<number>-?\d+(?:\.\d+)?(?![\w.]))
+  | (?P<ident>[A-Za-z_][\w\-.]*)
+  | (?P<punct>[(),])
+    )\s*""",
+    re.VERBOSE,
+)
+# Value of anything only known after apply, such as module outputs
+UNKNOWN = object()
+
+
+def _replace(string, substring, replacement):
+    if len(substring) > 1 and substring.startswith("/") and substring.endswith("/"):
+        return UNKNOWN  # regular expression replacements are not evaluated
+    return string.replace(substring, replacement)
+
+
+FUNCTIONS = {
+    "lower": str.lower,
+    "upper": str.upper,
+    "trimspace": str.strip,
+    "replace": _replace,
+    "join": lambda separator, items: separator.join(items),
+    "pathexpand": os.path.expanduser,
+}
+
+
+def _expression_tokens(text):
+    tokens, position = [], 0
+    while position < len(text):
+        match = EXPRESSION_TOKEN_RE.match(text, position)
+        if not match or match.end() == position:
+            return None
+        position = match.end()
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+    return tokens
+
+
+def _closing_brace(text, position):
+    """Index of the brace closing an interpolation whose body starts at position."""
+    depth, in_string, escaped = 1, False, False
+    for index in range(position, len(text)):
+        char = text[index]
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            in_string = not in_string
+        elif not in_string and char == "{":
+            depth += 1
+        elif not in_string and char == "}":
+            depth -= 1
+            if depth == 0:
+                return index
+    return None
+
+
+class _Evaluator:
+    """
+    Evaluates the expressions InfraBox configurations use: literals,
+    templates, var.* references and a few string functions. Everything
+    else evaluates to UNKNOWN and is not checked.
+    """
+
+    def __init__(self, variables, root):
+        self.variables = variables
+        self.root = Path(root)
+        self.missing_files = []
+
+    def value(self, value, hcl=True):
+        if isinstance(value, list):
+            return [self.value(item, hcl) for item in value]
+        if isinstance(value, dict):
+            return {key: self.value(item, hcl) for key, item in value.items()}
+        if not isinstance(value, str):
+            return value
+        if hcl and (REFERENCE_RE.match(value) or CALL_RE.match(value)):
+            return self.expression(value)
+        return self.template(value)
+
+    def template(self, text):
+        texts, values, position = [], [], 0
+        while True:
+            start = text.find("${", position)
+            if start < 0:
+                texts.append(text[position:])
+                break
+            end = _closing_brace(text, start + 2)
+            if end is None:
+                return UNKNOWN
+            texts.append(text[position:start])
+            values.append(self.expression(text[start + 2 : end]))
+            position = end + 1
+        # A lone interpolation keeps the type of its value, e.g. a list
+        if len(values) == 1 and texts == ["", ""]:
+            return values[0]
+        if any(isinstance(value, (list, dict)) or value is UNKNOWN for value in values):
+            return UNKNOWN
+        parts = [texts[0]]
+        for index, value in enumerate(values):
+            parts += [str(value), texts[index + 1]]
+        return "".join(parts)
+
+    def expression(self, text):
+        tokens = _expression_tokens(text)
+        if not tokens:
+            return UNKNOWN
+        try:
+            value, position = self._primary(tokens, 0)
+        except (IndexError, ValueError):
+            return UNKNOWN
+        return value if position == len(tokens) else UNKNOWN
+
+    def _primary(self, tokens, position):
+        kind, text = tokens[position]
+        position += 1
+        if kind == "string":
+            return self.template(json.loads(text)), position
+        if kind == "number":
+            return (float(text) if "." in text else int(text)), position
+        if kind != "ident":
+            raise ValueError(f"Unexpected {text!r}")
+        if position < len(tokens) and tokens[position][1] == "(":
+            arguments = []
+            position += 1
+            while tokens[position][1] != ")":
+                argument, position = self._primary(tokens, position)
+                arguments.append(argument)
+                if tokens[position][1] == ",":
+                    position += 1
+            return self._call(text, arguments), position + 1
+        return self._reference(text), position
+
+    def _reference(self, name):
+        keywords = {"true": True, "false": False, "null": None}
+        if name in keywords:
+            return keywords[name]
+        if name.startswith("var.") and name.count(".") == 1:
+            return self.variables.get(name[4:], UNKNOWN)
+        return UNKNOWN
+
+    def _call(self, name, arguments):
+        if any(argument is UNKNOWN for argument in arguments):
+            return UNKNOWN
+        if name == "file" and len(arguments) == 1:
+            return self._file(arguments[0])
+        if name not in FUNCTIONS:
+            return UNKNOWN
+        try:
+            return FUNCTIONS[name](*arguments)
+        except (AttributeError, TypeError, ValueError):
+            return UNKNOWN
+
+    def _file(self, path):
+        # Terraform resolves relative paths against the root module
+        resolved = self.root / os.path.expanduser(str(path))
+        if not resolved.is_file():
+            self.missing_files.append(str(path))
+        return UNKNOWN  # the content itself is never needed
+
+
+def _directory_blocks(directory: Path):
+    """(is HCL, block) for every block of a module directory."""
+    blocks = []
+    for path in sorted(directory.glob("*.tf")):
+        blocks += [
+            (True, block) for block in config_cache.parse(path, "blocks", parse_blocks)
+        ]
+    for path in sorted(directory.glob(f"*{TF_JSON_SUFFIX}")):
+        blocks += [
+            (False, block)
+            for block in config_cache.parse(path, "json-blocks", parse_json_blocks)
+        ]
+    return blocks
+
+
+def _nested_attributes(nested):
+    for _block_type, _labels, attributes, block_nested in nested:
+        yield attributes
+        yield from _nested_attributes(block_nested)
+
+
+def _variable_defaults(blocks) -> dict:
+    return {
+        labels[0]: attributes["default"]
+        for _hcl, (block_type, labels, attributes, _nested) in blocks
+        if block_type == "variable" and labels and "default" in attributes
+    }
+
+
+def _networks(value):
+    """The networks of a list of CIDRs, None if not known before apply."""
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        return None
+    return [ipaddress.ip_network(cidr, strict=False) for cidr in value]
+
+
+def _subnet_problems(prefix, resources) -> list:
+    problems = []
+    for (resource_type, label), (values, attributes, _nested) in resources.items():
+        if resource_type != "azurerm_subnet":
+            continue
+        match = VNET_REFERENCE_RE.match(str(attributes.get("virtual_network_name")))
+        vnet = resources.get(
+            ("azurerm_virtual_network", match.group(1) if match else None)
+        )
+        if vnet is None:
+            continue
+        address = f"{prefix}azurerm_subnet.{label}"
+        try:
+            spaces = _networks(vnet[0].get("address_space"))
+            subnets = _networks(values.get("address_prefixes"))
+        except ValueError as e:
+            problems.append(f"{address}: invalid address range ({e})")
+            continue
+        for subnet in subnets or []:
+            if spaces is not None and not any(
+                subnet.version == space.version and subnet.subnet_of(space)
+                for space in spaces
+            ):
+                ranges = ", ".join(str(space) for space in spaces)
+                problems.append(f"{address}: {subnet} is outside its VNet ({ranges})")
+    return problems
+
+
+def _schema_problems(address, schema, attributes, nested) -> list:
+    """Arguments and nested blocks the provider schema does not accept."""
+    problems = []
+    known, blocks = schema.get("attributes", {}), schema.get("blocks", {})
+    for name in attributes:
+        mode = known.get(name)
+        if name in META_ARGUMENTS or name in blocks:
+            continue
+        if mode is None:
+            problems.append(f"{address}: unsupported argument '{name}'")
+        elif mode == "computed":
+            problems.append(f"{address}: '{name}' is read-only")
+    for name, mode in known.items():
+        if mode == "required" and name not in attributes:
+            problems.append(f"{address}: missing required argument '{name}'")
+
+    present = set()
+    for block_type, labels, block_attributes, block_nested in nested:
+        if block_type == "dynamic" and labels:
+            present.add(labels[0])
+            continue
+        if block_type in META_BLOCKS:
+            continue
+        present.add(block_type)
+        if block_type not in blocks:
+            problems.append(f"{address}: unsupported block '{block_type}'")
+            continue
+        problems += _schema_problems(
+            f"{address}.{block_type}",
+            blocks[block_type],
+            block_attributes,
+            block_nested,
+        )
+    for name, block in blocks.items():
+        if block.get("min_items") and name not in present and name not in attributes:
+            problems.append(f"{address}: missing required block '{name}'")
+    return problems
+
+
+def _resource_problems(address, resource_type, values, schema) -> list:
+    problems = []
+    rule = NAME_RULES.get(resource_type)
+    name = values.get("name")
+    if rule is not None and isinstance(name, str) and not rule[0].match(name):
+        problems.append(f"{address}: name '{name}' must be {rule[1]}")
+    if schema is not None and resource_type not in schema:
+        problems.append(
+            f"{address}: {resource_type} is not a resource type of the locked providers"
+        )
+    return problems
+
+
+def _check_module(directory, variables, root, schema, prefix="") -> tuple:
+    """Return (problems, resources checked) for a module and its submodules."""
+    blocks = _directory_blocks(directory)
+    evaluator = _Evaluator({**_variable_defaults(blocks), **variables}, root)
+    problems, resources, checked = [], {}, 0
+
+    for hcl, (block_type, labels, attributes, nested) in blocks:
+        if block_type == "module" and labels:
+            source = attributes.get("source")
+            if not isinstance(source, str) or not source.startswith(("./", "../")):
+                continue
+            arguments = {
+                name: evaluator.value(value, hcl)
+                for name, value in attributes.items()
+                if name != "source" and name not in META_ARGUMENTS
+            }
+            module_problems, module_checked = _check_module(
+                (directory / source).resolve(),
+                arguments,
+                root,
+                schema,
+                f"{prefix}module.{labels[0]}.",
+            )
+            problems += module_problems
+            checked += module_checked
+        elif block_type == "resource" and len(labels) == BLOCK_LABELS["resource"]:
+            address = f"{prefix}{labels[0]}.{labels[1]}"
+            evaluator.missing_files = []
+            values = {
+                name: evaluator.value(value, hcl) for name, value in attributes.items()
+            }
+            evaluator.value(list(_nested_attributes(nested)), hcl)
+            problems += [
+                f"{address}: file '{path}' does not exist"
+                for path in evaluator.missing_files
+            ]
+            problems += _resource_problems(address, labels[0], values, schema)
+            if schema is not None and labels[0] in schema and hcl:
+                problems += _schema_problems(
+                    address, schema[labels[0]], attributes, nested
+                )
+            resources[(labels[0], labels[1])] = (values, attributes, nested)
+            checked += 1
+    problems += _subnet_problems(prefix, resources)
+    return problems, checked
+
+
+def get_schemas_dir() -> Path:
+    return get_state_dir() / "schemas"
+
+
+def _lock_hash(env_path):
+    lock_file = Path(env_path) / LOCK_FILE
+    if not lock_file.is_file():
+        return None
+    return hashlib.sha256(lock_file.read_bytes()).hexdigest()
+
+
+def _schema_path(digest) -> Path:
+    return get_schemas_dir() / f"{digest}.json"
+
+
+def _reduce_block(block: dict) -> dict:
+    """Keep what the checks need: argument names and modes, nested blocks."""
+    attributes = {}
+    for name, attribute in block.get("attributes", {}).items():
+        if attribute.get("required"):
+            attributes[name] = "required"
+        elif attribute.get("optional"):
+            attributes[name] = "optional"
+        else:
+            attributes[name] = "computed"
+    return {
+        "attributes": attributes,
+        "blocks": {
+            name: {
+                "min_items": nested.get("min_items", 0),
+                **_reduce_block(nested.get("block", {})),
+            }
+            for name, nested in block.get("block_types", {}).items()
+        },
+    }
+
+
+def reduce_schema(dump: dict) -> dict:
+    """Resource type -> reduced schema, from `terraform providers schema -json`."""
+    return {
+        resource_type: _reduce_block(schema.get("block", {}))
+        for provider in dump.get("provider_schemas", {}).values()
+        for resource_type, schema in provider.get("resource_schemas", {}).items()
+    }
+
+
+def load_schema(env_path):
+    """The cached schema for the environment's lock file, or None."""
+    digest = _lock_hash(env_path)
+    if digest is None or not _schema_path(digest).exists():
+        return None
+    try:
+        return json.loads(_schema_path(digest).read_text())
+    except ValueError:
+        return None
+
+
+def refresh_schema(env_path) -> bool:
+    """
+    Dump the provider schema unless one is cached for the environment's
+    current lock file. Needs an initialized environment, so it runs after
+    init. Returns True if a schema is cached afterwards.
+    """
+    env_path = Path(env_path)
+    digest = _lock_hash(env_path)
+    if digest is None or not (env_path / ".terraform").is_dir():
+        return False
+    path = _schema_path(digest)
+    if path.exists():
+        return True
+    result = read_cmd_output([terraform_bin(), *SCHEMA_ARGS], env_path)
+    if result.returncode != 0:
+        return False
+    try:
+        schema = reduce_schema(json.loads(result.stdout))
+    except ValueError:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(schema, sort_keys=True))
+    tmp_path.replace(path)
+    print(f"INFRABOX: 📚 Cached the provider schema for {env_path.name}'s lock file.")
+    stale = sorted(get_schemas_dir().glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for old in stale[:-SCHEMA_KEEP]:
+        old.unlink(missing_ok=True)
+    return True
+
+
+def refresh_schema_quietly(env_path):
+    """refresh_schema(), warning instead of failing the init it follows."""
+    try:
+        return refresh_schema(env_path)
+    except OSError as e:
+        print(f"INFRABOX: ⚠️ Could not cache the provider schema: {e}")
+        return False
+
+
+def run_preflight(env_path) -> list:
+    """
+    Check an environment without running Terraform: resource names Azure
+    would reject, subnets outside their VNet, files read with file() that
+    do not exist and, once a provider schema is cached, arguments the
+    locked providers do not accept. Returns the problems found.
+    """
+    env_path = Path(env_path)
+    if not env_path.is_dir():
+        return []
+    started = time.monotonic()
+    # A workspace environment is the shared root with its own values
+    root = Path(terraform_dir(env_path))
+    schema = load_schema(root)
+    try:
+        problems, checked = _check_module(
+            root, read_workspace_variables(env_path), root, schema
+        )
+    except (HCLParseError, ValueError) as e:
+        print(f"INFRABOX: ⚠️ Pre-flight checks skipped, could not parse: {e}")
+        return []
+    finally:
+        config_cache.flush()
+    elapsed = (time.monotonic() - started) * 1000
+    if problems:
+        for problem in problems:
+            print(f"INFRABOX: ❌ Pre-flight: {problem}")
+    else:
+        note = "" if schema is not None else ", provider schema not cached yet"
+        print(
+            f"INFRABOX: ✈️ Pre-flight checks passed for {env_path.name} "
+            f"({checked} resources in {elapsed:.0f}ms{note})."
+        )
+    return problems
+
+
+def require_preflight(env_path, args):
+    """Abort before any Terraform command if the pre-flight checks fail."""
+    if getattr(args, "skip_preflight", False) or not run_preflight(env_path):
+        return
+    print("INFRABOX: 💡 Fix the configuration, or rerun with --skip-preflight.")
+    sys.exit(1)
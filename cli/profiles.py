@@ -0,0 +1,80 @@
+from dataclasses import asdict, dataclass, fields
+
+DEFAULT_PROFILE = "burst"
+
+
+@dataclass(frozen=True)
+class PerformanceProfile:
+    """VM, disk and networking settings that have to agree with each other."""
+
+    vm_size: str
+    os_disk_storage_account_type: str
+    os_disk_caching: str
+    ephemeral_os_disk: bool
+    accelerated_networking: bool
+    public_ip_sku: str
+    proximity_placement_group: bool
+
+    def __post_init__(self):
+        # An ephemeral OS disk lives in the VM's cache and is read-only cached
+        if self.ephemeral_os_disk and self.os_disk_caching != "ReadOnly":
+            raise ValueError("An ephemeral OS disk requires ReadOnly caching")
+        # B-series (burstable) sizes do not support accelerated networking
+        if self.accelerated_networking and self.vm_size.startswith("Standard_B"):
+            raise ValueError(f"{self.vm_size} does not support accelerated networking")
+
+
+PROFILES = {
+    # Cheapest: what every environment used before profiles existed
+    "burst": PerformanceProfile(
+        vm_size="Standard_B1s",
+        os_disk_storage_account_type="Standard_LRS",
+        os_disk_caching="ReadWrite",
+        ephemeral_os_disk=False,
+        accelerated_networking=False,
+        public_ip_sku="Basic",
+        proximity_placement_group=False,
+    ),
+    "general": PerformanceProfile(
+        vm_size="Standard_D2s_v5",
+        os_disk_storage_account_type="Premium_LRS",
+        os_disk_caching="ReadWrite",
+        ephemeral_os_disk=False,
+        accelerated_networking=True,
+        public_ip_sku="Standard",
+        proximity_placement_group=False,
+    ),
+    # Stateless compute: the OS disk lives on the host's local cache
+    "compute": PerformanceProfile(
+        vm_size="Standard_F4s_v2",
+        os_disk_storage_account_type="Standard_LRS",
+        os_disk_caching="ReadOnly",
+        ephemeral_os_disk=True,
+        accelerated_networking=True,
+        public_ip_sku="Standard",
+        proximity_placement_group=True,
+    ),
+    "io": PerformanceProfile(
+        vm_size="Standard_L8s_v3",
+        os_disk_storage_account_type="Premium_LRS",
+        os_disk_caching="ReadOnly",
+        ephemeral_os_disk=False,
+        accelerated_networking=True,
+        public_ip_sku="Standard",
+        proximity_placement_group=True,
+    ),
+}
+PROFILE_FIELDS = tuple(field.name for field in fields(PerformanceProfile))
+
+
+def profile_context(name=DEFAULT_PROFILE, overrides=None) -> dict:
+    """
+    Template context values of a profile. Settings in `overrides` (e.g. an
+    environment's variable defaults) win over the profile's.
+    """
+    profile = PROFILES.get(name, PROFILES[DEFAULT_PROFILE])
+    context = {"performance_profile": name, **asdict(profile)}
+    for key in PROFILE_FIELDS:
+        if overrides and key in overrides:
+            context[key] = overrides[key]
+    return context
@@ -0,0 +1,287 @@
+import heapq
+import math
+import re
+from datetime import datetime
+from pathlib import Path
+
+TRACE_KEEP_FILES = 5
+SLOWEST_CALLS_SHOWN = 10
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+TIMESTAMP_RE = re.compile(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d+[+-]\d{4}|\S+Z) \[")
+VERTEX_RE = re.compile(r'vertex "([^"]+)": (starting visit \((\S+)\)|visit complete)')
+REQUEST_LINE_RE = re.compile(r"^\s*(GET|PUT|POST|PATCH|DELETE|HEAD) (\S+) HTTP/")
+RESPONSE_RE = re.compile(r"AzureRM Response for (https?://\S+?):?\s*$")
+PLUGIN_START_RE = re.compile(r"provider: starting plugin: path=(\S+)")
+PLUGIN_READY_RE = re.compile(r"provider: using plugin: version=")
+ARM_TYPE_RE = re.compile(r"/providers/([^/]+/[^/]+)", re.IGNORECASE)
+
+
+def parse_timestamp(raw: str) -> datetime:
+    """Parse a Terraform log timestamp (e.g. 2024-05-01T10:00:00.123+0200)."""
+    if raw.endswith("Z"):
+        raw = raw[:-1] + "+0000"
+    return datetime.strptime(raw, "%Y-%m-%dT%H:%M:%S.%f%z")
+
+
+def api_call_key(method: str, path: str) -> str:
+    """Group an ARM request path by HTTP method and resource type."""
+    path = path.split("?", 1)[0]
+    lowered = path.lower()
+    if "/operations/" in lowered or "operationresults" in lowered:
+        return f"{method} (long-running operation poll)"
+    types = ARM_TYPE_RE.findall(path)
+    if types:
+        return f"{method} {types[-1]}"
+    segments = [s for s in path.split("/") if s]
+    return f"{method} /{segments[-2] if len(segments) > 1 else ''}".rstrip("/")
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a non-empty list of samples."""
+    ranked = sorted(samples)
+    return ranked[max(math.ceil(fraction * len(ranked)) - 1, 0)]
+
+
+def _new_histogram():
+    return [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+
+def _observe(histogram, latency_ms):
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            histogram[index] += 1
+            return
+    histogram[-1] += 1
+
+
+class _BusyTracker:
+    """Accumulate wall time during which at least one interval is open."""
+
+    def __init__(self):
+        self.open = 0
+        self.since = None
+        self.total = 0.0
+
+    def start(self, ts):
+        if self.open == 0:
+            self.since = ts
+        self.open += 1
+
+    def stop(self, ts):
+        if self.open == 0:
+            return
+        self.open -= 1
+        if self.open == 0:
+            self.total += (ts - self.since).total_seconds()
+
+
+class _TraceAnalyzer:
+    """Incrementally aggregate the events of a TF_LOG=TRACE file."""
+
+    def __init__(self, slowest):
+        self.slowest = slowest
+        self.first_ts = None
+        self.last_raw_ts = None
+        self.plugin_starts = {}
+        self.plugin_start_times = []
+        self.plugins = _BusyTracker()
+        self.api = _BusyTracker()
+        self.vertices = {}
+        self.resources = {}
+        self.pending_requests = {}
+        self.awaiting_request_line = None
+        self.calls = {}
+        self.slowest_calls = []
+
+    def feed(self, line):
+        match = TIMESTAMP_RE.match(line)
+        if not match:
+            # Continuation line of a multi-line message (HTTP dumps)
+            if self.awaiting_request_line is not None:
+                self._request_line(line)
+            return
+
+        raw_ts = match.group(1)
+        self.last_raw_ts = raw_ts
+        if self.first_ts is None:
+            self.first_ts = parse_timestamp(raw_ts)
+
+        if "AzureRM Request:" in line:
+            self.awaiting_request_line = parse_timestamp(raw_ts)
+        elif "AzureRM Response for" in line:
+            self._response(line, raw_ts)
+        elif "starting plugin:" in line:
+            self._plugin_start(line, raw_ts)
+        elif PLUGIN_READY_RE.search(line):
+            self._plugin_ready(raw_ts)
+        elif "vertex" in line:
+            self._vertex(line, raw_ts)
+
+    def _request_line(self, line):
+        request = REQUEST_LINE_RE.match(line)
+        if not request:
+            return
+        method, path = request.groups()
+        if "://" in path:
+            path = "/" + path.split("://", 1)[1].split("/", 1)[-1]
+        started = self.awaiting_request_line
+        self.pending_requests.setdefault(path.split("?", 1)[0], []).append(
+            (started, method, path)
+        )
+        self.api.start(started)
+        self.awaiting_request_line = None
+
+    def _response(self, line, raw_ts):
+        response = RESPONSE_RE.search(line)
+        if not response:
+            return
+        path = "/" + response.group(1).split("://", 1)[1].split("/", 1)[-1]
+        queue = self.pending_requests.get(path.split("?", 1)[0])
+        if not queue:
+            return
+        started, method, request_path = queue.pop(0)
+        ended = parse_timestamp(raw_ts)
+        self.api.stop(ended)
+
+        latency_ms = (ended - started).total_seconds() * 1000
+        key = api_call_key(method, request_path)
+        stats = self.calls.setdefault(
+            key, {"count": 0, "total_ms": 0.0, "histogram": _new_histogram()}
+        )
+        stats["count"] += 1
+        stats["total_ms"] += latency_ms
+        _observe(stats["histogram"], latency_ms)
+
+        entry = (latency_ms, key, request_path.split("?", 1)[0])
+        if len(self.slowest_calls) < self.slowest:
+            heapq.heappush(self.slowest_calls, entry)
+        else:
+            heapq.heappushpop(self.slowest_calls, entry)
+
+    def _plugin_start(self, line, raw_ts):
+        plugin = PLUGIN_START_RE.search(line)
+        if plugin:
+            ts = parse_timestamp(raw_ts)
+            self.plugin_starts.setdefault(plugin.group(1), []).append(ts)
+            self.plugins.start(ts)
+
+    def _plugin_ready(self, raw_ts):
+        # The handshake line does not name the plugin; match the plugin whose
+        # pending start is the earliest, whichever binary it is
+        pending = [(starts[0], path) for path, starts in self.plugin_starts.items()]
+        if not pending:
+            return
+        started, path = min(pending)
+        starts = self.plugin_starts[path]
+        starts.pop(0)
+        if not starts:
+            del self.plugin_starts[path]
+        ts = parse_timestamp(raw_ts)
+        self.plugins.stop(ts)
+        self.plugin_start_times.append((path, (ts - started).total_seconds()))
+
+    def _vertex(self, line, raw_ts):
+        vertex = VERTEX_RE.search(line)
+        if not vertex:
+            return
+        address, event, node_type = vertex.groups()
+        if event.startswith("starting"):
+            if node_type and "Resource" in node_type:
+                self.vertices[address] = parse_timestamp(raw_ts)
+        elif address in self.vertices:
+            elapsed = parse_timestamp(raw_ts) - self.vertices.pop(address)
+            self.resources.setdefault(address, []).append(elapsed.total_seconds())
+
+    def summary(self):
+        wall = 0.0
+        if self.first_ts is not None:
+            wall = (parse_timestamp(self.last_raw_ts) - self.first_ts).total_seconds()
+        return {
+            "wall_seconds": wall,
+            "api_busy_seconds": self.api.total,
+            "plugin_busy_seconds": self.plugins.total,
+            "plugin_starts": self.plugin_start_times,
+            "resources": {
+                address: {
+                    "count": len(visits),
+                    "total_seconds": sum(visits),
+                    "p50_seconds": percentile(visits, 0.5),
+                    "p95_seconds": percentile(visits, 0.95),
+                }
+                for address, visits in self.resources.items()
+            },
+            "api_calls": self.calls,
+            "slowest_calls": sorted(self.slowest_calls, reverse=True),
+        }
+
+
+def summarize_trace(trace_path: Path, slowest=SLOWEST_CALLS_SHOWN) -> dict:
+    """
+    Stream a TF_LOG=TRACE file line by line and aggregate provider plugin
+    startup, per-resource visit times and Azure API call latencies.
+    Only aggregates and in-flight requests are held in memory.
+    """
+    analyzer = _TraceAnalyzer(slowest)
+    with trace_path.open("r", errors="replace") as trace:
+        for line in trace:
+            analyzer.feed(line)
+    return analyzer.summary()
+
+
+def _format_histogram(histogram):
+    labels = [f"≤{bound}ms" for bound in LATENCY_BUCKETS_MS] + ["slower"]
+    return "  ".join(
+        f"{labels[index]}:{count}" for index, count in enumerate(histogram) if count
+    )
+
+
+def print_trace_report(summary: dict):
+    """Print a provider-call latency breakdown for a summarized trace."""
+    wall = summary["wall_seconds"]
+    api_busy = summary["api_busy_seconds"]
+    plugin_busy = summary["plugin_busy_seconds"]
+    other = max(wall - api_busy - plugin_busy, 0.0)
+
+    print("\nINFRABOX: 📊 Provider trace breakdown")
+    print(f"  Total traced time:      {wall:8.2f}s")
+    print(f"  Azure API round-trips:  {api_busy:8.2f}s")
+    print(f"  Provider plugin start:  {plugin_busy:8.2f}s")
+    print(f"  Graph walk / other:     {other:8.2f}s")
+
+    for path, seconds in summary["plugin_starts"]:
+        print(f"  🔌 {Path(path).name} started in {seconds:.2f}s")
+
+    if summary["resources"]:
+        print("\nINFRABOX: ⏱️ Time per resource")
+        ranked = sorted(
+            summary["resources"].items(), key=lambda i: -i[1]["total_seconds"]
+        )
+        for address, stats in ranked:
+            print(
+                f"  {stats['total_seconds']:8.2f}s  {address}: "
+                f"{stats['count']} visit(s), p50 {stats['p50_seconds']:.2f}s, "
+                f"p95 {stats['p95_seconds']:.2f}s"
+            )
+
+    if summary["api_calls"]:
+        print("\nINFRABOX: 🌐 Azure API calls")
+        ranked = sorted(summary["api_calls"].items(), key=lambda i: -i[1]["total_ms"])
+        for key, stats in ranked:
+            average = stats["total_ms"] / stats["count"]
+            print(
+                f"  {key}: {stats['count']} call(s), avg {average:.0f}ms"
+                f"\n    {_format_histogram(stats['histogram'])}"
+            )
+
+    if summary["slowest_calls"]:
+        print("\nINFRABOX: 🐢 Slowest API calls")
+        for latency_ms, key, path in summary["slowest_calls"]:
+            print(f"  {latency_ms:8.0f}ms  {key}  {path}")
+
+
+def prune_traces(trace_dir: Path, keep=TRACE_KEEP_FILES):
+    """Keep only the newest trace files of an environment."""
+    traces = sorted(trace_dir.glob("*.log"))
+    for path in traces[:-keep] if keep else traces:
+        path.unlink()
@@ -0,0 +1,88 @@
+import json
+import re
+import time
+from pathlib import Path
+
+from cli.state import get_state_dir
+from cli.utils import read_cmd_output, terraform_bin
+from cli.workspaces import state_file, terraform_dir, terraform_env
+
+REFRESH_POLICIES = ("auto", "always", "never")
+DEFAULT_REFRESH_POLICY = "always"
+DEFAULT_REFRESH_TTL_SECONDS = 15 * 60
+BACKEND_RE = re.compile(r'backend\s+"(\w+)"')
+
+
+def get_refresh_record_path(environment: str) -> Path:
+    return get_state_dir() / "refresh" / f"{environment}.json"
+
+
+def _configured_backend(env_path: Path):
+    for path in env_path.glob("*.tf"):
+        match = BACKEND_RE.search(path.read_text())
+        if match:
+            return match.group(1)
+    return None
+
+
+def read_state_metadata(env_path) -> dict:
+    """
+    Return the serial and lineage of the environment's current state, or {}
+    if there is no state yet. Local state is read directly; remote state is
+    pulled without echoing or logging its content.
+    """
+    env_path = Path(env_path)
+    backend = _configured_backend(Path(terraform_dir(env_path)))
+    if backend in (None, "local"):
+        local_state = state_file(env_path)
+        if not local_state.exists():
+            return {}
+        state = json.loads(local_state.read_text())
+    else:
+        result = read_cmd_output(
+            [terraform_bin(), "state", "pull"],
+            cwd=terraform_dir(env_path),
+            env=terraform_env(env_path) or None,
+        )
+        if result is None or result.returncode != 0 or not result.stdout.strip():
+            return {}
+        state = json.loads(result.stdout)
+    return {"serial": state.get("serial"), "lineage": state.get("lineage")}
+
+
+def record_refresh(env_path):
+    """Remember that the environment's state was just refreshed against Azure."""
+    env_path = Path(env_path)
+    path = get_refresh_record_path(env_path.name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    record = {"refreshed_at": time.time(), **read_state_metadata(env_path)}
+    path.write_text(json.dumps(record, indent=2))
+
+
+def use_cached_state(env_path, policy, ttl=DEFAULT_REFRESH_TTL_SECONDS):
+    """
+    Decide whether a plan may skip refreshing (-refresh=false).
+    Returns (use_cached, reason). With "auto", cached state is used only if
+    the last refresh or apply is younger than ttl and the state serial and
+    lineage have not changed since.
+    """
+    if policy == "always":
+        return False, "refresh policy is 'always'"
+    if policy == "never":
+        return True, "refresh policy is 'never'"
+
+    env_path = Path(env_path)
+    path = get_refresh_record_path(env_path.name)
+    if not path.exists():
+        return False, "no previous refresh recorded"
+    record = json.loads(path.read_text())
+    age = time.time() - record["refreshed_at"]
+    if age > ttl:
+        return False, f"last refresh {age / 60:.0f}m ago is older than {ttl}s"
+    current = read_state_metadata(env_path)
+    if (current.get("serial"), current.get("lineage")) != (
+        record.get("serial"),
+        record.get("lineage"),
+    ):
+        return False, "state changed since the last refresh"
+    return True, f"refreshed {age / 60:.1f}m ago, state serial {current.get('serial')}"
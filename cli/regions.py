@@ -0,0 +1,178 @@
+import argparse
+import re
+
+from cli.checkpoints import Checkpoint
+from cli.parallel import print_summary, run_parallel
+from cli.plan_cache import skip_unchanged
+from cli.preflight import run_preflight
+from cli.run_history import expected_durations
+from cli.terraform_utils import (
+    TERRAFORM_CHANGES_DETECTED_CODE,
+    TerraformOptions,
+    plan_has_changes,
+    terraform_apply,
+    terraform_init,
+    terraform_plan,
+    terraform_state_has_changes,
+    terraform_validate,
+)
+from cli.utils import ENVIRONMENTS_DIR, prompt_user_confirmation
+
+REGION_RE = re.compile(r"^[a-z0-9]+$")
+# Terraform commands each job runs, used to look up expected durations
+INIT_PHASES = ("init", "validate")
+PLAN_PHASES = (*INIT_PHASES, "plan")
+APPLY_PHASES = ("apply",)
+DESTROY_PHASES = ("destroy",)
+
+
+def parse_regions(value: str) -> list:
+    """argparse type for a comma-separated list of Azure regions."""
+    regions = [region.strip().lower() for region in value.split(",") if region.strip()]
+    if not regions:
+        raise argparse.ArgumentTypeError("expected at least one region")
+    for region in regions:
+        if not REGION_RE.match(region):
+            raise argparse.ArgumentTypeError(f"invalid region name: '{region}'")
+    return list(dict.fromkeys(regions))
+
+
+def region_environment(environment: str, region: str) -> str:
+    """Name of the environment directory holding one region of an environment."""
+    return f"{environment}-{region}"
+
+
+def check_result(result, step):
+    """Raise if a Terraform command ran and failed (dry runs return None)."""
+    if result is not None and result.returncode not in (0, None):
+        raise RuntimeError(
+            f"terraform {step} failed with exit code {result.returncode}"
+        )
+
+
+def _region_has_changes(
+    env_path, destroy=False, dry_run=False, plan_file=None, options=None
+):
+    """
+    terraform_state_has_changes for one region, except that a failed plan
+    raises, so the region is reported as failed instead of unchanged.
+    """
+    if dry_run:
+        return terraform_state_has_changes(
+            env_path, destroy=destroy, dry_run=True, options=options
+        )
+    result = terraform_plan(
+        env_path, destroy=destroy, plan_file=plan_file, options=options
+    )
+    if result.returncode != TERRAFORM_CHANGES_DETECTED_CODE:
+        check_result(result, "plan")
+    return plan_has_changes(env_path, result, destroy=destroy)
+
+
+def _plan_job(checkpoint, args, destroy):
+    env_path = checkpoint.env_path
+
+    def job():
+        if checkpoint.completed("applied"):
+            print("INFRABOX: ✅ Already applied, skipping.")
+            return False
+        if skip_unchanged(env_path, args, destroy=destroy):
+            return False
+        if not getattr(args, "skip_preflight", False) and run_preflight(env_path):
+            raise RuntimeError("pre-flight checks failed")
+        check_result(
+            checkpoint.step(
+                "initialized",
+                terraform_init,
+                env_path,
+                dry_run=args.dry_run,
+                no_cache=getattr(args, "no_cache", False),
+            ),
+            "init",
+        )
+        check_result(
+            checkpoint.step(
+                "validated",
+                terraform_validate,
+                env_path,
+                dry_run=args.dry_run,
+                no_cache=getattr(args, "no_cache", False),
+            ),
+            "validate",
+        )
+        return checkpoint.plan(
+            _region_has_changes,
+            env_path,
+            destroy=destroy,
+            dry_run=args.dry_run,
+            options=TerraformOptions.from_args(args),
+        )
+
+    return job
+
+
+def _apply_job(checkpoint, args, destroy):
+    def job():
+        check_result(
+            checkpoint.apply(
+                terraform_apply,
+                checkpoint.env_path,
+                destroy=destroy,
+                dry_run=args.dry_run,
+                options=TerraformOptions.from_args(args),
+            ),
+            "apply",
+        )
+
+    return job
+
+
+def deploy_regions(args, destroy=False):
+    """
+    Plan every region of an environment concurrently, ask for a single
+    confirmation, then apply the regions with changes concurrently.
+    """
+    checkpoints = {}
+    for region in args.regions:
+        name = region_environment(args.environment, region)
+        env_path = ENVIRONMENTS_DIR / name
+        if not env_path.exists():
+            print(f"INFRABOX: ❌ Environment directory '{name}' does not exist.")
+            print(
+                "INFRABOX: 💡 You may need to run: `infrabox.py initialize "
+                f"{args.environment} --regions {','.join(args.regions)}` first."
+            )
+            return None
+        checkpoints[name] = Checkpoint.for_run(
+            name, env_path, "destroy" if destroy else "apply", args
+        )
+
+    plans = run_parallel(
+        [
+            (name, _plan_job(checkpoint, args, destroy))
+            for name, checkpoint in checkpoints.items()
+        ],
+        expected=expected_durations(checkpoints, PLAN_PHASES),
+    )
+    print_summary(
+        "Plan summary",
+        plans,
+        {
+            name: "changes detected" if outcome["result"] else "no changes"
+            for name, outcome in plans.items()
+            if outcome["ok"]
+        },
+    )
+
+    changed = [name for name, outcome in plans.items() if outcome["result"]]
+    if not changed or not prompt_user_confirmation():
+        return plans
+
+    applies = run_parallel(
+        [(name, _apply_job(checkpoints[name], args, destroy)) for name in changed],
+        expected=expected_durations(
+            changed, DESTROY_PHASES if destroy else APPLY_PHASES
+        ),
+    )
+    print_summary("Destroy summary" if destroy else "Apply summary", applies)
+    return applies
@@ -0,0 +1,171 @@
+import sqlite3
+import statistics
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+from cli.state import get_state_dir
+
+HISTORY_SAMPLES = 10
+# plan exits with 2 when it detects changes; that still counts as a normal run
+SUCCESS_CODES = (0, 2)
+# Bump along with a migration in SCHEMA whenever the tables change
+SCHEMA_VERSION = 1
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS phase_runs (
+    id INTEGER PRIMARY KEY,
+    environment TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    returncode INTEGER NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phase_runs_lookup
+    ON phase_runs (environment, phase, finished_at);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+
+_recorded_phase = threading.local()
+
+
+def get_history_path() -> Path:
+    return get_state_dir() / "history.sqlite3"
+
+
+def _connect():
+    path = get_history_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Concurrent jobs write from several threads and processes
+    connection = sqlite3.connect(path, timeout=10)
+    # Only a new or older database needs the schema script and its commit
+    (version,) = connection.execute("PRAGMA user_version").fetchone()
+    if version < SCHEMA_VERSION:
+        connection.executescript(SCHEMA)
+    return connection
+
+
+@contextmanager
+def recording_as(phase):
+    """
+    Record the commands this thread runs as `phase`, e.g. "destroy" for an
+    apply whose saved plan destroys.
+    """
+    previous = getattr(_recorded_phase, "name", None)
+    _recorded_phase.name = phase
+    try:
+        yield
+    finally:
+        _recorded_phase.name = previous
+
+
+def phase_for(cmd) -> str:
+    """The Terraform subcommand a command line runs (init, plan, apply...)."""
+    recorded = getattr(_recorded_phase, "name", None)
+    if recorded is not None:
+        return recorded
+    return cmd[1] if len(cmd) > 1 else cmd[0]
+
+
+def record_phase(environment, phase, seconds, returncode):
+    try:
+        with closing(_connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO phase_runs "
+                "(environment, phase, seconds, returncode, finished_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (environment, phase, seconds, returncode, time.time()),
+            )
+    except sqlite3.Error as e:
+        print(f"INFRABOX: ⚠️ Could not record run history: {e}")
+
+
+def _recent_seconds(connection, phase, environment=None):
+    query = "SELECT seconds FROM phase_runs WHERE phase = ? AND returncode IN (?, ?)"
+    params = [phase, *SUCCESS_CODES]
+    if environment is not None:
+        query += " AND environment = ?"
+        params.append(environment)
+    query += " ORDER BY finished_at DESC LIMIT ?"
+    params.append(HISTORY_SAMPLES)
+    return [row[0] for row in connection.execute(query, params)]
+
+
+def expected_seconds(environment, phases):
+    """
+    Expected duration of running phases in an environment: the median of its
+    recent successful runs of each phase, or of every environment's runs for
+    phases it never ran. None if no phase was ever recorded.
+    """
+    if not get_history_path().exists():
+        return None
+    total, known = 0.0, False
+    with closing(_connect()) as connection:
+        for phase in phases:
+            samples = _recent_seconds(connection, phase, environment)
+            samples = samples or _recent_seconds(connection, phase)
+            if samples:
+                total += statistics.median(samples)
+                known = True
+    return total if known else None
+
+
+def expected_durations(environments, phases) -> dict:
+    """expected_seconds for several environments, leaving out unknown ones."""
+    durations = {}
+    for environment in environments:
+        seconds = expected_seconds(environment, phases)
+        if seconds is not None:
+            durations[environment] = seconds
+    return durations
+
+
+def recent_runs(environment=None, limit=20):
+    """The latest recorded phases, newest first."""
+    if not get_history_path().exists():
+        return []
+    query = (
+        "SELECT environment, phase, seconds, returncode, finished_at FROM phase_runs"
+    )
+    params = []
+    if environment is not None:
+        query += " WHERE environment = ?"
+        params.append(environment)
+    query += " ORDER BY finished_at DESC LIMIT ?"
+    params.append(limit)
+    with closing(_connect()) as connection:
+        return list(connection.execute(query, params))
+
+
+def slowest_phases(environment=None, limit=10):
+    """
+    (environment, phase, runs, median, max) of the last HISTORY_SAMPLES
+    successful runs of each environment phase, slowest median first.
+    """
+    if not get_history_path().exists():
+        return []
+    # Only the latest samples leave the database, however long the history
+    query = (
+        "SELECT environment, phase, seconds FROM ("
+        "SELECT environment, phase, seconds, ROW_NUMBER() OVER ("
+        "PARTITION BY environment, phase ORDER BY finished_at DESC"
+        ") AS recent FROM phase_runs "
+        "WHERE returncode IN (?, ?) AND (? IS NULL OR environment = ?)"
+        ") WHERE recent <= ?"
+    )
+    params = [*SUCCESS_CODES, environment, environment, HISTORY_SAMPLES]
+    grouped = {}
+    with closing(_connect()) as connection:
+        for env, phase, seconds in connection.execute(query, params):
+            grouped.setdefault((env, phase), []).append(seconds)
+    rows = [
+        (env, phase, len(samples), statistics.median(samples), max(samples))
+        for (env, phase), samples in grouped.items()
+    ]
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows[:limit]
+
+
+def format_duration(seconds) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
@@ -0,0 +1,90 @@
+import gzip
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+RUN_LOG_SUFFIX = ".log.gz"
+RUN_LOG_MAX_AGE_DAYS = 30
+RUN_LOG_MAX_BYTES = 50 * 1024 * 1024
+
+
+def new_run_id(cmd) -> str:
+    """Build a sortable run ID from the current UTC time and the subcommand."""
+    now_ns = time.time_ns()
+    timestamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now_ns // 10**9))
+    timestamp += f"{now_ns % 10**9 // 1000:06d}Z"
+    subcommand = re.sub(r"[^\w\-]", "", cmd[1] if len(cmd) > 1 else cmd[0])
+    return f"{timestamp}-{subcommand}"
+
+
+@contextmanager
+def open_run_log(logs_dir: Path, cmd):
+    """
+    Open a gzip-compressed log for a single command run.
+    Output is compressed as it is written, so long applies never sit in memory.
+    """
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    run_id = new_run_id(cmd)
+    with gzip.open(logs_dir / f"{run_id}{RUN_LOG_SUFFIX}", "wt") as log:
+        log.write(f"# cmd: {' '.join(cmd)}\n")
+        yield log
+
+
+def list_runs(logs_dir: Path):
+    """Return the archived run log files for an environment, oldest first."""
+    if not logs_dir.is_dir():
+        return []
+    return sorted(logs_dir.glob(f"*{RUN_LOG_SUFFIX}"))
+
+
+def run_id_for(log_path: Path) -> str:
+    return log_path.name[: -len(RUN_LOG_SUFFIX)]
+
+
+def find_runs(logs_dir: Path, run_id=None):
+    """Return the run logs matching a run ID prefix (all runs if no ID is given)."""
+    runs = list_runs(logs_dir)
+    if run_id is None:
+        return runs
+    return [path for path in runs if run_id_for(path).startswith(run_id)]
+
+
+def rotate_run_logs(
+    logs_dir: Path, max_age_days=RUN_LOG_MAX_AGE_DAYS, max_bytes=RUN_LOG_MAX_BYTES
+):
+    """
+    Drop run logs older than max_age_days, then the oldest remaining ones
+    until the environment's archive fits in max_bytes. The newest log is
+    always kept, even when it alone is larger than max_bytes.
+    """
+    cutoff = time.time() - max_age_days * 86400
+    kept = []
+    for path in list_runs(logs_dir):
+        if path.stat().st_mtime < cutoff:
+            path.unlink()
+        else:
+            kept.append(path)
+
+    total = sum(path.stat().st_size for path in kept)
+    for path in kept[:-1]:
+        if total <= max_bytes:
+            break
+        total -= path.stat().st_size
+        path.unlink()
+
+
+def iter_run_lines(log_path: Path):
+    """Yield the lines of a run log, decompressing as it goes."""
+    with gzip.open(log_path, "rt", errors="replace") as log:
+        for line in log:
+            yield line.rstrip("\n")
+
+
+def search_runs(logs_dir: Path, pattern: str, run_id=None):
+    """Yield (run_id, line_number, line) for every line matching pattern."""
+    regex = re.compile(pattern)
+    for log_path in find_runs(logs_dir, run_id):
+        for line_number, line in enumerate(iter_run_lines(log_path), start=1):
+            if regex.search(line):
+                yield run_id_for(log_path), line_number, line
@@ -0,0 +1,32 @@
+import os
+from pathlib import Path
+
+# Where infrabox.py, templates/ and modules/ are shipped: a source checkout,
+# or the .pyz file itself when running as a zipapp
+BUNDLE_ROOT = Path(__file__).resolve().parent.parent
+IN_ARCHIVE = BUNDLE_ROOT.is_file()
+# Where environments and local state live. A zipapp works in the current
+# directory unless INFRABOX_ROOT says otherwise.
+INFRA_ROOT = (
+    Path(os.environ.get("INFRABOX_ROOT") or Path.cwd()) if IN_ARCHIVE else BUNDLE_ROOT
+)
+
+
+def get_state_dir() -> Path:
+    """Return the directory holding local InfraBox data (run logs, caches)."""
+    return Path(os.environ.get("INFRABOX_STATE_DIR", INFRA_ROOT / ".infrabox"))
+
+
+def get_run_logs_dir(env) -> Path:
+    """Get the directory holding the archived run logs of an environment."""
+    return get_state_dir() / "logs" / env
+
+
+def get_timings_dir(env) -> Path:
+    """Get the directory holding the saved apply timings of an environment."""
+    return get_state_dir() / "timings" / env
+
+
+def get_traces_dir(env) -> Path:
+    """Get the directory holding the Terraform provider traces of an environment."""
+    return get_state_dir() / "traces" / env
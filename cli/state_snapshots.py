@@ -0,0 +1,224 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from cli.plan_cache import get_plan_cache_path
+from cli.refresh_policy import get_refresh_record_path
+from cli.state import get_state_dir
+from cli.workspaces import state_file
+
+OBJECT_SUFFIX = ".tfstate.gz"
+# Retention: a snapshot is kept while it is one of an environment's newest
+# SNAPSHOT_KEEP_LAST or younger than SNAPSHOT_KEEP_DAYS
+SNAPSHOT_KEEP_LAST = 20
+SNAPSHOT_KEEP_DAYS = 7
+
+
+def get_snapshots_dir() -> Path:
+    return get_state_dir() / "snapshots"
+
+
+def _objects_dir() -> Path:
+    return get_snapshots_dir() / "objects"
+
+
+def _refs_path(environment) -> Path:
+    return get_snapshots_dir() / "refs" / f"{environment}.json"
+
+
+def object_path(digest) -> Path:
+    return _objects_dir() / digest[:2] / f"{digest}{OBJECT_SUFFIX}"
+
+
+@contextmanager
+def snapshots_lock():
+    """
+    Serialize changes to the snapshot store across processes, so garbage
+    collection never sees an object that is stored but not referenced yet.
+    """
+    lock_path = get_snapshots_dir() / "snapshots.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def retention_policy():
+    """(keep_last, keep_days), overridable with INFRABOX_SNAPSHOT_KEEP_*."""
+    return (
+        int(os.environ.get("INFRABOX_SNAPSHOT_KEEP_LAST", SNAPSHOT_KEEP_LAST)),
+        float(os.environ.get("INFRABOX_SNAPSHOT_KEEP_DAYS", SNAPSHOT_KEEP_DAYS)),
+    )
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique name per writer, so concurrent threads never share a temp file
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    ) as tmp:
+        tmp.write(data)
+    Path(tmp.name).replace(path)
+
+
+def store_object(data: bytes) -> str:
+    """Store state content once, however many snapshots refer to it."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = object_path(digest)
+    if not path.exists():
+        # mtime=0 keeps the compressed bytes identical for identical states
+        _write_atomic(path, gzip.compress(data, mtime=0))
+    return digest
+
+
+def read_object(digest) -> bytes:
+    return gzip.decompress(object_path(digest).read_bytes())
+
+
+def list_snapshots(environment):
+    """An environment's snapshots, oldest first."""
+    path = _refs_path(environment)
+    if not path.exists():
+        return []
+    try:
+        return json.loads(path.read_text()).get("snapshots", [])
+    except ValueError:
+        return []
+
+
+def _save_refs(environment, snapshots):
+    payload = json.dumps({"snapshots": snapshots}, indent=2).encode()
+    _write_atomic(_refs_path(environment), payload)
+
+
+def _describe(data: bytes) -> dict:
+    try:
+        state = json.loads(data)
+    except ValueError:
+        return {}
+    return {
+        "serial": state.get("serial"),
+        "lineage": state.get("lineage"),
+        "resources": len(state.get("resources", [])),
+    }
+
+
+def snapshot_state(env_path, reason):
+    """
+    Snapshot the environment's local state. Nothing is recorded if there is
+    no local state, or if it is unchanged since the previous snapshot (the
+    state before an apply usually is the state after the last one).
+    Returns the new snapshot entry, or None.
+    """
+    env_path = Path(env_path)
+    local_state = state_file(env_path)
+    if not local_state.is_file():
+        return None
+    data = local_state.read_bytes()
+    with snapshots_lock():
+        return _record_snapshot(env_path.name, data, reason)
+
+
+def _record_snapshot(environment, data, reason):
+    digest = store_object(data)
+    snapshots = list_snapshots(environment)
+    if snapshots and snapshots[-1]["object"] == digest:
+        return None
+    entry = {
+        "id": snapshots[-1]["id"] + 1 if snapshots else 1,
+        "object": digest,
+        "reason": reason,
+        "taken_at": time.time(),
+        "size": len(data),
+        **_describe(data),
+    }
+    snapshots.append(entry)
+    kept = apply_retention(snapshots)
+    _save_refs(environment, kept)
+    if len(kept) < len(snapshots):
+        _collect_garbage()
+    return entry
+
+
+def apply_retention(snapshots, policy=None, now=None):
+    """The snapshots to keep under the retention policy, oldest first."""
+    keep_last, keep_days = policy or retention_policy()
+    cutoff = (now or time.time()) - keep_days * 86400
+    newest = {entry["id"] for entry in snapshots[-keep_last:]} if keep_last else set()
+    return [
+        entry
+        for entry in snapshots
+        if entry["id"] in newest or entry["taken_at"] >= cutoff
+    ]
+
+
+def collect_garbage():
+    """Delete objects no environment's snapshot refers to. Returns the count."""
+    with snapshots_lock():
+        return _collect_garbage()
+
+
+def _collect_garbage():
+    refs_dir = get_snapshots_dir() / "refs"
+    referenced = set()
+    if refs_dir.is_dir():
+        for path in refs_dir.glob("*.json"):
+            referenced |= {entry["object"] for entry in list_snapshots(path.stem)}
+    removed = 0
+    if _objects_dir().is_dir():
+        for path in _objects_dir().glob(f"*/*{OBJECT_SUFFIX}"):
+            if path.name[: -len(OBJECT_SUFFIX)] not in referenced:
+                path.unlink()
+                removed += 1
+    return removed
+
+
+def find_snapshot(environment, snapshot_id):
+    """Look a snapshot up by ID, or by a prefix of its content hash."""
+    snapshots = list_snapshots(environment)
+    if str(snapshot_id).isdigit():
+        matches = [entry for entry in snapshots if entry["id"] == int(snapshot_id)]
+    else:
+        matches = [
+            entry for entry in snapshots if entry["object"].startswith(snapshot_id)
+        ]
+    if len({entry["object"] for entry in matches}) != 1:
+        return None
+    return matches[-1]
+
+
+def restore_snapshot(env_path, entry):
+    """
+    Make a snapshot the environment's current state. The current state is
+    snapshotted first, so a restore can itself be undone. The object is
+    already local, so nothing is downloaded and Terraform is not run. The
+    state is decompressed and written beside the state file, which is then
+    replaced with one atomic rename.
+    """
+    env_path = Path(env_path)
+    # Read first: snapshotting the current state may prune the entry's object
+    data = read_object(entry["object"])
+    snapshot_state(env_path, "pre-restore")
+    _write_atomic(state_file(env_path), data)
+    # Cached plan outcomes and refreshes describe the replaced state
+    get_plan_cache_path(env_path.name).unlink(missing_ok=True)
+    get_refresh_record_path(env_path.name).unlink(missing_ok=True)
+    return snapshot_state(env_path, f"restore of #{entry['id']}")
+
+
+def snapshot_quietly(env_path, reason):
+    """snapshot_state(), warning instead of failing the apply it brackets."""
+    try:
+        return snapshot_state(env_path, reason)
+    except OSError as e:
+        print(f"INFRABOX: ⚠️ Could not snapshot state: {e}")
+        return None
@@ -1,71 +1,403 @@
-from cli.utils import run_cmd
+import json
+import subprocess  # nosec B404
+from dataclasses import dataclass
+from pathlib import Path
+
+from cli.apply_timings import (
+    ApplyEventRecorder,
+    parse_graph,
+    print_timing_report,
+    save_timings,
+)
+from cli.catalog import record_run
+from cli.metrics import record_cache_lookup
+from cli.plan_cache import record_plan_outcome
+from cli.preflight import refresh_schema_quietly
+from cli.provider_trace import print_trace_report, prune_traces, summarize_trace
+from cli.refresh_policy import (
+    DEFAULT_REFRESH_POLICY,
+    DEFAULT_REFRESH_TTL_SECONDS,
+    record_refresh,
+    use_cached_state,
+)
+from cli.run_history import recording_as
+from cli.run_logs import new_run_id
+from cli.state import get_timings_dir, get_traces_dir
+from cli.state_snapshots import snapshot_quietly
+from cli.utils import read_cmd_output, run_cmd, terraform_bin
+from cli.warm import environment_lock, is_warm, mark_warm
+from cli.workspaces import (
+    is_workspace_environment,
+    terraform_dir,
+    terraform_env,
+    var_file_args,
+    workspace_exists,
+)
 
 TERRAFORM_NO_CHANGES_DETECTED_CODE = 0
 TERRAFORM_CHANGES_DETECTED_CODE = 2
 
 
-def terraform_init(env_path, dry_run=False):
+@dataclass(frozen=True)
+class TerraformOptions:
+    """How plans and applies run, as chosen on the command line."""
+
+    # TF_LOG=TRACE provider latency report
+    trace: bool = False
+    # Terraform's -json event stream, shown as progress and timings
+    json_events: bool = False
+    refresh: str = DEFAULT_REFRESH_POLICY
+    refresh_ttl: int = DEFAULT_REFRESH_TTL_SECONDS
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(
+            trace=getattr(args, "trace_provider", False),
+            json_events=getattr(args, "timings", False),
+            refresh=getattr(args, "refresh", DEFAULT_REFRESH_POLICY),
+            refresh_ttl=getattr(args, "refresh_ttl", DEFAULT_REFRESH_TTL_SECONDS),
+        )
+
+
+def _location(env_path, env=None) -> dict:
     """
-    Initialize the Terraform environment.
+    The cwd (and environment variables) of a Terraform command for env_path:
+    the shared root with TF_WORKSPACE for a workspace environment.
     """
-    return run_cmd(
-        ["terraform", "init", "-input=false"],
-        cwd=env_path,
+    location = {"cwd": terraform_dir(env_path)}
+    env = {**(env or {}), **terraform_env(env_path)}
+    if env:
+        location["env"] = env
+    return location
+
+
+def _run_terraform(cmd, env_path, dry_run=False, capture_output=False, *, trace=False):
+    """
+    Run a Terraform command, optionally with TF_LOG=TRACE written to a trace
+    file that is analyzed once the command finishes.
+    """
+    if not trace or dry_run:
+        return run_cmd(
+            cmd, dry_run=dry_run, capture_output=capture_output, **_location(env_path)
+        )
+
+    trace_dir = get_traces_dir(Path(env_path).name)
+    trace_dir.mkdir(parents=True, exist_ok=True)
+    trace_path = trace_dir / f"{new_run_id(cmd)}.log"
+    result = run_cmd(
+        cmd,
         dry_run=dry_run,
-        capture_output=True,
+        capture_output=capture_output,
+        **_location(env_path, {"TF_LOG": "TRACE", "TF_LOG_PATH": str(trace_path)}),
     )
 
+    if trace_path.exists():
+        print(f"\nINFRABOX: 🔬 Provider trace written to {trace_path}")
+        print_trace_report(summarize_trace(trace_path))
+        prune_traces(trace_dir)
+    return result
+
 
-def terraform_validate(env_path, dry_run=False):
+def _run_unless_warm(step, cmd, env_path, dry_run, no_cache=False):
+    """
+    Run init or validate, skipping it when it already succeeded for the
+    current inputs (e.g. during `warm`), unless no_cache is set. Neither
+    depends on the workspace, so workspace environments share one run in
+    the shared root.
+    """
+    root = terraform_dir(env_path)
+    if dry_run:
+        return run_cmd(cmd, cwd=root, dry_run=dry_run, capture_output=True)
+    with environment_lock(env_path):
+        if not no_cache and is_warm(env_path, step):
+            print(f"INFRABOX: ⏭️ Skipping terraform {step}, inputs are unchanged.")
+            result = subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+        else:
+            result = run_cmd(cmd, cwd=root, dry_run=dry_run, capture_output=True)
+            if getattr(result, "returncode", None) == 0:
+                mark_warm(env_path, step)
+        # Pre-flight reads the schema of the providers this init locked
+        if step == "init" and getattr(result, "returncode", None) == 0:
+            refresh_schema_quietly(root)
+        return result
+
+
+def terraform_init(env_path, dry_run=False, *, no_cache=False):
+    """
+    Initialize the Terraform environment. A workspace environment initializes
+    the shared root, then gets its workspace.
+    """
+    result = _run_unless_warm(
+        "init", [terraform_bin(), "init", "-input=false"], env_path, dry_run, no_cache
+    )
+    if is_workspace_environment(env_path) and (
+        dry_run or getattr(result, "returncode", None) == 0
+    ):
+        return terraform_workspace_select(env_path, dry_run=dry_run)
+    return result
+
+
+def terraform_workspace_select(env_path, dry_run=False):
+    """
+    Create the environment's workspace in the shared root unless the local
+    backend already has it. Later commands switch to it with TF_WORKSPACE.
+    """
+    name = Path(env_path).name
+    cmd = [terraform_bin(), "workspace", "select", "-or-create=true", name]
+    if not dry_run and workspace_exists(env_path):
+        return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+    # Selecting persists in the shared .terraform/, so it must not race init
+    with environment_lock(env_path):
+        return run_cmd(
+            cmd, cwd=terraform_dir(env_path), dry_run=dry_run, capture_output=True
+        )
+
+
+def terraform_validate(env_path, dry_run=False, *, no_cache=False):
     """
     Validate the Terraform configuration.
     """
+    return _run_unless_warm(
+        "validate", [terraform_bin(), "validate"], env_path, dry_run, no_cache
+    )
+
+
+def terraform_refresh_plan(env_path, dry_run=False):
+    """
+    Run a refresh-only plan, which compares state with Azure without
+    changing anything. A successful one counts as a refresh, so a later
+    `--refresh=auto` plan can skip refreshing.
+    """
+    result = run_cmd(
+        [
+            terraform_bin(),
+            "plan",
+            "-refresh-only",
+            "-detailed-exitcode",
+            "-input=false",
+            *var_file_args(env_path),
+        ],
+        dry_run=dry_run,
+        capture_output=True,
+        **_location(env_path),
+    )
+    if not dry_run and getattr(result, "returncode", None) in (
+        TERRAFORM_NO_CHANGES_DETECTED_CODE,
+        TERRAFORM_CHANGES_DETECTED_CODE,
+    ):
+        record_refresh(env_path)
+    return result
+
+
+def terraform_fmt(path, dry_run=False):
+    """
+    Check the formatting of a directory's Terraform files, showing a diff of
+    what `terraform fmt` would change.
+    """
     return run_cmd(
-        ["terraform", "validate"], cwd=env_path, dry_run=dry_run, capture_output=True
+        [terraform_bin(), "fmt", "-check", "-diff"],
+        cwd=path,
+        dry_run=dry_run,
+        capture_output=True,
+    )
+
+
+def terraform_graph(env_path) -> dict:
+    """
+    The dependency graph of the environment's configuration, as parsed by
+    parse_graph, or {} if Terraform could not print it.
+    """
+    result = read_cmd_output([terraform_bin(), "graph"], **_location(env_path))
+    if result is None or result.returncode != 0:
+        print("INFRABOX: ⚠️ Could not read the dependency graph.")
+        return {}
+    return parse_graph(result.stdout)
+
+
+def terraform_output(env_path, dry_run=False):
+    """
+    Return the environment's Terraform outputs as a dict of name to value.
+    Sensitive values are masked and the raw output is never echoed or logged.
+    """
+    result = read_cmd_output(
+        [terraform_bin(), "output", "-json"], dry_run=dry_run, **_location(env_path)
     )
+    if result is None:
+        return {}
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"terraform output failed with exit code {result.returncode}"
+        )
+    return {
+        name: "(sensitive)" if output.get("sensitive") else output.get("value")
+        for name, output in json.loads(result.stdout or "{}").items()
+    }
 
 
-def terraform_plan(env_path, destroy=False, dry_run=False):
+def terraform_plan(
+    env_path, destroy=False, dry_run=False, plan_file=None, options=None
+):
     """
-    Generate and show an execution plan.
+    Generate and show an execution plan, saved to plan_file if given.
+    With options.json_events, Terraform's -json event stream is shown as
+    compact progress. The refresh policy decides whether the plan refreshes
+    state against Azure or trusts the state left by a recent refresh or apply.
     """
-    cmd = ["terraform", "plan", "-detailed-exitcode"]
+    options = options or TerraformOptions()
+    cmd = [terraform_bin(), "plan", "-detailed-exitcode", *var_file_args(env_path)]
     if destroy:
         cmd.append("-destroy")
-    return run_cmd(cmd, cwd=env_path, dry_run=dry_run, capture_output=False)
+    if options.json_events:
+        cmd.append("-json")
+    if plan_file is not None:
+        cmd.append(f"-out={plan_file}")
+    use_cached, reason = False, ""
+    if not dry_run:
+        use_cached, reason = use_cached_state(
+            env_path, options.refresh, options.refresh_ttl
+        )
+        if options.refresh == "auto":
+            record_cache_lookup("refresh", "hit" if use_cached else "miss")
+    if use_cached:
+        cmd.append("-refresh=false")
+    result = _run_terraform(
+        cmd,
+        env_path,
+        dry_run=dry_run,
+        capture_output=ApplyEventRecorder() if options.json_events else False,
+        trace=options.trace,
+    )
+
+    if not dry_run:
+        if use_cached:
+            print(f"INFRABOX: 💾 Plan used cached state ({reason}).")
+        else:
+            print(f"INFRABOX: 🛰️ Plan used live state ({reason}).")
+            if getattr(result, "returncode", None) in (
+                TERRAFORM_NO_CHANGES_DETECTED_CODE,
+                TERRAFORM_CHANGES_DETECTED_CODE,
+            ):
+                record_refresh(env_path)
+    return result
 
 
-def terraform_state_has_changes(env_path, destroy=False, dry_run=False):
+def terraform_state_has_changes(
+    env_path, destroy=False, dry_run=False, plan_file=None, options=None
+):
     """
     Check if there are changes in the Terraform state.
     """
-    result = terraform_plan(env_path, destroy=destroy, dry_run=dry_run)
+    result = terraform_plan(
+        env_path,
+        destroy=destroy,
+        dry_run=dry_run,
+        plan_file=plan_file,
+        options=options,
+    )
 
     if dry_run:
         print("\nINFRABOX: 🔍 Dry-run mode: Terraform state changes not checked.")
-        cmd = ["terraform", "apply", "-auto-approve"]
+        cmd = [terraform_bin(), "apply", "-auto-approve", *var_file_args(env_path)]
         if destroy:
             cmd.append("-destroy")
-        run_cmd(cmd, cwd=env_path, dry_run=True, capture_output=False)
+        run_cmd(cmd, dry_run=True, capture_output=False, **_location(env_path))
         return False
+    return plan_has_changes(env_path, result, destroy=destroy)
+
+
+def plan_has_changes(env_path, result, destroy=False) -> bool:
+    """
+    Whether a finished `plan -detailed-exitcode` found changes, remembering
+    the outcome for the plan cache unless the plan trusted cached state
+    (-refresh=false) and could have missed drift. A failed plan reports no
+    changes.
+    """
+    refreshed = "-refresh=false" not in getattr(result, "args", ())
     if result.returncode == TERRAFORM_NO_CHANGES_DETECTED_CODE:
         print("INFRABOX: ✅ No changes detected.")
+        if refreshed:
+            record_plan_outcome(env_path, has_changes=False, destroy=destroy)
         return False
     elif result.returncode == TERRAFORM_CHANGES_DETECTED_CODE:
         print("INFRABOX: ⚠️ Changes detected.")
+        if refreshed:
+            record_plan_outcome(env_path, has_changes=True, destroy=destroy)
         return True
     else:
         print("INFRABOX: ❌ Error occurred while checking for changes.")
         return False
 
 
-def terraform_apply(env_path, destroy=False, dry_run=False):
+def _record_catalog_run(env_path, operation, result):
+    returncode = getattr(result, "returncode", None)
+    if returncode is None:
+        return
+    try:
+        record_run(env_path, operation, returncode)
+    except OSError as e:
+        print(f"INFRABOX: ⚠️ Could not update the environment catalog: {e}")
+
+
+def terraform_apply(
+    env_path, destroy=False, dry_run=False, plan_file=None, options=None
+):
     """
-    Apply the changes required to reach the desired state of the configuration.
+    Apply the changes required to reach the desired state of the configuration,
+    or exactly the changes saved in plan_file.
+    With options.json_events, per-resource timings and the critical path
+    through the dependency graph are reported and saved as JSON once the
+    apply finishes.
     """
-    cmd = ["terraform", "apply", "-auto-approve"]
+    options = options or TerraformOptions()
+    cmd = [terraform_bin(), "apply", "-auto-approve"]
 
-    if destroy:
-        cmd.append("-destroy")
+    # A saved plan already records its variables, whether it destroys and
+    # whether it refreshes. Applying it reads nothing back from Azure, so
+    # only an apply that plans for itself with a refresh counts as one.
+    refreshes = plan_file is None
+    if plan_file is None:
+        cmd += var_file_args(env_path)
+        if destroy:
+            cmd.append("-destroy")
+        if (
+            not dry_run
+            and use_cached_state(env_path, options.refresh, options.refresh_ttl)[0]
+        ):
+            cmd.append("-refresh=false")
+            refreshes = False
+    if options.json_events:
+        cmd.append("-json")
+    if plan_file is not None:
+        cmd.append(str(plan_file))
 
-    return run_cmd(cmd, cwd=env_path, dry_run=dry_run, capture_output=False)
+    recorder = ApplyEventRecorder() if options.json_events else None
+    operation = "destroy" if destroy else "apply"
+    if not dry_run:
+        snapshot_quietly(env_path, f"pre-{operation}")
+    # A saved plan's apply line does not say whether it destroys
+    with recording_as(operation):
+        result = _run_terraform(
+            cmd,
+            env_path,
+            dry_run=dry_run,
+            capture_output=recorder if recorder is not None else False,
+            trace=options.trace,
+        )
+    if not dry_run:
+        snapshot_quietly(env_path, f"post-{operation}")
+        _record_catalog_run(env_path, operation, result)
+    if options.json_events and not dry_run:
+        timings = {
+            "environment": Path(env_path).name,
+            "operation": operation,
+            **recorder.to_dict(terraform_graph(env_path)),
+        }
+        print_timing_report(timings)
+        timings_path = save_timings(
+            get_timings_dir(Path(env_path).name), new_run_id(cmd), timings
+        )
+        print(f"\nINFRABOX: 💾 Timings saved to {timings_path}")
+    if refreshes and getattr(result, "returncode", None) == 0:
+        # The apply's own plan just read the state back from Azure
+        record_refresh(env_path)
+    return result
@@ -0,0 +1,290 @@
+import json
+from pathlib import Path
+
+OUTPUT_FORMATS = ("hcl", "json")
+MODULES_SOURCE = "../../modules"
+TF_JSON_SUFFIX = ".tf.json"
+# Number of labels each top-level block type takes
+BLOCK_LABELS = {"data": 2, "module": 1, "output": 1, "resource": 2, "variable": 1}
+
+
+def _module(directory, **arguments):
+    return {"source": f"{MODULES_SOURCE}/{directory}", **arguments}
+
+
+def _compute_modules(fleet: bool) -> dict:
+    """The single VM, or the scale set fronted by the networking's public IP."""
+    if fleet:
+        return {
+            "vm_fleet": _module(
+                "vm_fleet",
+                name="${var.name_prefix}-${var.environment}",
+                resource_group_name="${module.resource_group.resource_group_name}",
+                location="${var.location}",
+                subnet_id="${module.networking.subnet_id}",
+                public_ip_id="${module.networking.public_ip_id}",
+                vm_size="${var.vm_size}",
+                min_instances="${var.fleet_min_instances}",
+                max_instances="${var.fleet_max_instances}",
+                default_instances="${var.fleet_instances}",
+                os_disk_storage_account_type="${var.os_disk_storage_account_type}",
+                os_disk_caching="${var.os_disk_caching}",
+                ephemeral_os_disk="${var.ephemeral_os_disk}",
+                accelerated_networking="${var.accelerated_networking}",
+                proximity_placement_group="${var.proximity_placement_group}",
+                admin_username="${var.admin_username}-${var.environment}",
+                ssh_public_key_path="${var.ssh_public_key_path}",
+                tags="${var.tags}",
+            )
+        }
+    return {
+        "virtual_machine": _module(
+            "virtual_machine",
+            name="${var.name_prefix}-VM",
+            resource_group_name="${module.resource_group.resource_group_name}",
+            location="${var.location}",
+            vm_size="${var.vm_size}",
+            os_disk_storage_account_type="${var.os_disk_storage_account_type}",
+            os_disk_caching="${var.os_disk_caching}",
+            ephemeral_os_disk="${var.ephemeral_os_disk}",
+            proximity_placement_group="${var.proximity_placement_group}",
+            admin_username="${var.admin_username}-${var.environment}",
+            ssh_public_key_path="${var.ssh_public_key_path}",
+            network_interface_id="${module.networking.network_interface_id}",
+            tags="${var.tags}",
+        )
+    }
+
+
+def main_config(context: dict) -> dict:
+    """
+    The modules of main.tf.j2. Values come from variables; the context only
+    chooses between a single VM and a fleet.
+    """
+    fleet = bool(context.get("fleet"))
+    return {
+        "module": {
+            "resource_group": _module(
+                "resource_group",
+                name="${var.name_prefix}-${var.environment}-RG",
+                location="${var.location}",
+                tags="${var.tags}",
+            ),
+            "networking": _module(
+                "networking",
+                name="${var.name_prefix}-${var.environment}",
+                location="${var.location}",
+                resource_group_name="${module.resource_group.resource_group_name}",
+                dns_zone_name="${var.dns_zone_name}",
+                vnet_address_space="${var.vnet_address_space}",
+                subnet_address_prefixes="${var.subnet_address_space}",
+                public_ip_sku="${var.public_ip_sku}",
+                accelerated_networking="${var.accelerated_networking}",
+                create_network_interface=not fleet,
+                tags="${var.tags}",
+            ),
+            **_compute_modules(fleet),
+            "storage_account": _module(
+                "storage_account",
+                name='${lower(replace("${var.name_prefix}-${var.environment}-SA01", '
+                '"-", ""))}',
+                resource_group_name="${module.resource_group.resource_group_name}",
+                location="${var.location}",
+                account_tier="Standard",
+                account_replication_type="LRS",
+                min_tls_version="TLS1_2",
+                tags="${var.tags}",
+            ),
+        }
+    }
+
+
+def variables_config(context: dict) -> dict:
+    def variable(type_, default):
+        return {"type": type_, "default": default}
+
+    return {
+        "variable": {
+            "name_prefix": variable("string", context["name_prefix"]),
+            "environment": variable("string", context["environment"]),
+            "location": variable("string", context["location"]),
+            "vnet_address_space": variable(
+                "list(string)", [context["vnet_address_space"]]
+            ),
+            "subnet_address_space": variable(
+                "list(string)", [context["subnet_address_space"]]
+            ),
+            "dns_zone_name": variable("string", context["dns_zone_name"]),
+            "admin_username": variable("string", context["admin_username"]),
+            "ssh_public_key_path": variable("string", context["ssh_public_key_path"]),
+            "performance_profile": variable("string", context["performance_profile"]),
+            "vm_size": variable("string", context["vm_size"]),
+            "os_disk_storage_account_type": variable(
+                "string", context["os_disk_storage_account_type"]
+            ),
+            "os_disk_caching": variable("string", context["os_disk_caching"]),
+            "ephemeral_os_disk": variable("bool", context["ephemeral_os_disk"]),
+            "accelerated_networking": variable(
+                "bool", context["accelerated_networking"]
+            ),
+            "public_ip_sku": variable("string", context["public_ip_sku"]),
+            "proximity_placement_group": variable(
+                "bool", context["proximity_placement_group"]
+            ),
+            **_fleet_variables(context, variable),
+            "tags": variable(
+                "map(string)",
+                {"project": "InfraBox", "environment": context["environment"]},
+            ),
+        }
+    }
+
+
+def _fleet_variables(context: dict, variable) -> dict:
+    if not context.get("fleet"):
+        return {}
+    return {
+        name: variable("number", context[name])
+        for name in ("fleet_min_instances", "fleet_max_instances", "fleet_instances")
+    }
+
+
+def outputs_config(context: dict) -> dict:
+    if context.get("fleet"):
+        compute = {
+            "fleet_name": (
+                "Name of the VM scale set",
+                "module.vm_fleet.scale_set_name",
+            ),
+            "fleet_id": ("ID of the VM scale set", "module.vm_fleet.scale_set_id"),
+            "load_balancer_ip": (
+                "Public IP address of the load balancer",
+                "module.networking.public_ip",
+            ),
+        }
+    else:
+        compute = {
+            "vm_name": (
+                "Name of the virtual machine",
+                "module.virtual_machine.vm_name",
+            ),
+            "vm_id": ("ID of the virtual machine", "module.virtual_machine.vm_id"),
+            "vm_public_ip": (
+                "Public IP address of the VM",
+                "module.networking.public_ip",
+            ),
+        }
+    outputs = {
+        "resource_group_name": (
+            "Name of the resource group",
+            "module.resource_group.resource_group_name",
+        ),
+        **compute,
+        "dns_zone_name": ("DNS zone name", "module.networking.dns_zone_name"),
+        "storage_account_name": (
+            "Storage account name",
+            "module.storage_account.storage_account_name",
+        ),
+        "storage_account_id": (
+            "Storage account resource ID",
+            "module.storage_account.storage_account_id",
+        ),
+    }
+    return {
+        "output": {
+            name: {"description": description, "value": f"${{{reference}}}"}
+            for name, (description, reference) in outputs.items()
+        }
+    }
+
+
+def provider_config(_context: dict) -> dict:
+    return {
+        "terraform": {
+            "required_version": ">= 1.3.0",
+            "required_providers": {
+                "azurerm": {"source": "hashicorp/azurerm", "version": "~> 3.0"}
+            },
+        },
+        "provider": {"azurerm": {"features": {}}},
+    }
+
+
+CONFIGS = {
+    "main": main_config,
+    "variables": variables_config,
+    "outputs": outputs_config,
+    "provider": provider_config,
+}
+
+
+def dumps(config: dict) -> str:
+    """
+    Serialize a configuration to .tf.json text. Keys are sorted and the
+    layout is fixed, so the same configuration always gives the same bytes.
+    """
+    return json.dumps(config, indent=2, sort_keys=True, ensure_ascii=False) + "\n"
+
+
+def write_config(name: str, context: dict, env_path: Path, dry_run=False):
+    output_path = Path(env_path) / f"{name}{TF_JSON_SUFFIX}"
+    content = dumps(CONFIGS[name](context))
+    if dry_run:
+        print(f"INFRABOX: 🔍 Dry-run mode: {output_path.name} not written to disk.")
+        print(content)
+    else:
+        output_path.write_text(content)
+        print(f"INFRABOX: 📝 Generated {output_path.name}")
+
+
+def generate_tf_json(env_path: Path, context: dict, dry_run=False):
+    """Write main, variables, outputs and provider as .tf.json files."""
+    for name in CONFIGS:
+        write_config(name, context, env_path, dry_run)
+
+
+def uses_tf_json(env_path: Path) -> bool:
+    return (Path(env_path) / f"main{TF_JSON_SUFFIX}").exists()
+
+
+def parse_json_variable_defaults(text: str) -> dict:
+    """Variable defaults of a variables.tf.json file."""
+    variables = json.loads(text).get("variable", {})
+    # Terraform also accepts a list of single-variable objects
+    if isinstance(variables, list):
+        merged = {}
+        for item in variables:
+            merged.update(item)
+        variables = merged
+    return {
+        name: block["default"]
+        for name, block in variables.items()
+        if isinstance(block, dict) and "default" in block
+    }
+
+
+def _labelled(body, depth, labels):
+    if depth == 0:
+        return [(labels, body)]
+    return [
+        item
+        for label, nested in body.items()
+        for item in _labelled(nested, depth - 1, [*labels, label])
+    ]
+
+
+def parse_json_blocks(text: str) -> list:
+    """
+    Top-level blocks of a .tf.json file, shaped like env_config.parse_blocks().
+    Without the provider schema nested blocks cannot be told apart from map
+    arguments, so every key of a block is returned as an attribute.
+    """
+    blocks = []
+    for block_type, body in json.loads(text).items():
+        depth = BLOCK_LABELS.get(block_type, 0)
+        for item in body if isinstance(body, list) else [body]:
+            blocks.extend(
+                (block_type, labels, attributes, [])
+                for labels, attributes in _labelled(item, depth, [])
+            )
+    return blocks
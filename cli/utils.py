@@ -1,16 +1,34 @@
+import contextlib
 import ipaddress
 import os
 import re
 import subprocess  # nosec B404
 import sys
+import threading
+import time
 from pathlib import Path
 
+from cli import catalog, metrics, run_history, run_logs
+from cli.cidr_allocator import allocation_lock, reserved_cidrs
+from cli.env_config import scan_environment_configs
+from cli.state import INFRA_ROOT, get_run_logs_dir
+
 VALID_ENVIRONMENTS = {"dev", "stage", "prod"}
-INFRA_ROOT = Path(__file__).resolve().parent.parent
 ENVIRONMENTS_DIR = INFRA_ROOT / "environments"
 DEFAULT_VNET = "10.0.0.0/16"
 DEFAULT_SUBNET = "10.0.1.0/24"
 
+# Preset prompt answers for the current thread (see answer_prompts)
+_preset_answers = threading.local()
+
+
+def terraform_bin() -> str:
+    """
+    The Terraform executable to run: `terraform` from the PATH, unless
+    INFRABOX_TERRAFORM_BIN names another one (e.g. a local stand-in).
+    """
+    return os.environ.get("INFRABOX_TERRAFORM_BIN") or "terraform"
+
 
 def sanitize_input(value: str) -> str:
     """Sanitize CLI input to avoid injection or path traversal."""
@@ -22,8 +40,13 @@ def sanitize_env_name(name):
     return "".join(c for c in name if c.isalnum() or c in ("-", "_")).lower()
 
 
+def is_known_environment(env) -> bool:
+    """One of the standard environments, or one recorded in the catalog."""
+    return env in VALID_ENVIRONMENTS or catalog.contains(env)
+
+
 def validate_environment(env, allow_new=False):
-    if not allow_new and env not in VALID_ENVIRONMENTS:
+    if not allow_new and not is_known_environment(env):
         raise ValueError(f"Invalid environment: {env}")
 
 
@@ -56,35 +79,64 @@ def check_cidr_overlap(new_cidr: str, current_env: str, environments_dir: Path)
     )
     new_network = ipaddress.IPv4Network(new_cidr, strict=True)
 
-    for env_dir in environments_dir.iterdir():
-        if not env_dir.is_dir() or env_dir.name == current_env:
-            continue
-
-        variables_file = env_dir / "variables.tf"
-        if not variables_file.exists():
-            continue
-
-        content = variables_file.read_text()
-        matches = re.findall(r'vnet_cidr\s*=\s*["\']([^"\']+)["\']', content)
-
-        for match in matches:
-            existing_net = ipaddress.IPv4Network(match, strict=True)
-            if new_network.overlaps(existing_net):
-                print(
-                    f"INFRABOX: Overlap found: {new_network} overlaps {existing_net} in {env_dir.name}"
-                )
+    # Blocks handed out to runs that have not written their files yet count too
+    with allocation_lock():
+        for config in scan_environment_configs(environments_dir, exclude=current_env):
+            for cidr in config.cidrs:
+                existing_net = ipaddress.IPv4Network(cidr, strict=True)
+                if new_network.overlaps(existing_net):
+                    print(
+                        f"INFRABOX: Overlap found: {new_network} overlaps {existing_net} in {config.name}"
+                    )
+                    raise ValueError(
+                        f"CIDR {new_network} overlaps with {existing_net} in environment '{config.name}'"
+                    )
+        for env, cidr in reserved_cidrs(environments_dir, current_env):
+            reserved_net = ipaddress.IPv4Network(cidr, strict=False)
+            if new_network.overlaps(reserved_net):
                 raise ValueError(
-                    f"CIDR {new_network} overlaps with {existing_net} in environment '{env_dir.name}'"
+                    f"CIDR {new_network} overlaps with {reserved_net} reserved for environment '{env}'"
                 )
 
 
-def run_cmd(cmd, cwd, dry_run=False, capture_output=True):
-    """Run a command in a specified directory."""
+def run_cmd(cmd, cwd, dry_run=False, capture_output=True, *, env=None):
+    """
+    Run a command in a specified directory.
+    Extra environment variables passed in env are added to the current ones.
+    capture_output may also be a callable, which receives each output line as
+    it is produced instead of the line being echoed.
+    """
     print(f"\nINFRABOX: 📦 Running command: {' '.join(cmd)} in {cwd}")
     if dry_run:
         print("INFRABOX: 🔍 Dry-run mode: command not executed.")
         return
 
+    environment = _environment_for(cwd, env)
+    if env is not None:
+        env = {**os.environ, **env}
+
+    if environment is not None or callable(capture_output):
+        captured = []
+        if callable(capture_output):
+            sink = capture_output
+        elif capture_output:
+            sink = captured.append
+        else:
+            sink = _echo
+        if environment:
+            sink = _observing(environment, sink)
+        logs_dir = get_run_logs_dir(environment) if environment else None
+        started = time.monotonic()
+        returncode = _stream_cmd(cmd, cwd, sink, env=env, logs_dir=logs_dir)
+        if environment:
+            _record_run(environment, cmd, time.monotonic() - started, returncode)
+        result = subprocess.CompletedProcess(
+            cmd, returncode, stdout="".join(captured), stderr=""
+        )
+        if capture_output is True:
+            print(result.stdout)
+        return result
+
     # subprocess call is safe — shell=False and cmd is a validated list
 
     result = subprocess.run(
@@ -92,14 +144,139 @@ def run_cmd(cmd, cwd, dry_run=False, capture_output=True):
         cwd=cwd,
         capture_output=capture_output,
         text=True,
+        errors="replace",
         shell=False,
         check=False,
+        env=env,
     )  # nosec: B603
     if capture_output:
         print(result.stdout)
     return result
 
 
+def read_cmd_output(cmd, cwd, dry_run=False, *, env=None):
+    """
+    Run a command for its stdout (e.g. JSON or a secret), which is returned
+    without being echoed and kept out of the environment's run logs and run
+    history. stderr is returned separately, so warnings never end up in what
+    the caller parses.
+    """
+    print(f"\nINFRABOX: 📦 Running command: {' '.join(cmd)} in {cwd}")
+    if dry_run:
+        print("INFRABOX: 🔍 Dry-run mode: command not executed.")
+        return None
+    if env is not None:
+        env = {**os.environ, **env}
+    # subprocess call is safe — shell=False and cmd is a validated list
+    return subprocess.run(
+        cmd,
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        errors="replace",
+        shell=False,
+        check=False,
+        env=env,
+    )  # nosec: B603
+
+
+def _echo(line):
+    sys.stdout.write(line)
+    sys.stdout.flush()
+
+
+def _observing(environment, sink):
+    """sink, also feeding each line to the environment's output metrics."""
+
+    def observe(line):
+        metrics.observe_output(environment, line)
+        sink(line)
+
+    return observe
+
+
+def _record_run(environment, cmd, seconds, returncode):
+    phase = run_history.phase_for(cmd)
+    run_history.record_phase(environment, phase, seconds, returncode)
+    metrics.observe(
+        "infrabox_phase_duration_seconds", seconds, environment=environment, phase=phase
+    )
+    metrics.inc(
+        "infrabox_phase_runs_total",
+        environment=environment,
+        phase=phase,
+        code=str(returncode),
+    )
+
+
+def _environment_for(cwd, env=None):
+    """
+    Return the environment name if cwd is an environment directory, or the
+    workspace a command in the shared root runs for.
+    """
+    if env and env.get("TF_WORKSPACE"):
+        return env["TF_WORKSPACE"]
+    path = Path(cwd).resolve()
+    if path.parent == ENVIRONMENTS_DIR.resolve():
+        return path.name
+    return None
+
+
+def _stream_cmd(cmd, cwd, on_line, *, env=None, logs_dir=None) -> int:
+    """
+    Run a command, handing each line of its combined output to on_line and,
+    when logs_dir is set, to the environment's compressed run log. Returns
+    the command's exit code.
+    """
+    log_context = (
+        run_logs.open_run_log(logs_dir, cmd) if logs_dir else contextlib.nullcontext()
+    )
+
+    with log_context as log:
+        # subprocess call is safe — shell=False and cmd is a validated list
+        process = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            shell=False,
+            env=env,
+        )  # nosec: B603
+        try:
+            for line in process.stdout:
+                if log is not None:
+                    log.write(line)
+                on_line(line)
+            returncode = process.wait()
+        except KeyboardInterrupt:
+            # Let Terraform release its state lock instead of orphaning it
+            process.terminate()
+            process.wait()
+            raise
+        finally:
+            process.stdout.close()
+
+    if logs_dir:
+        run_logs.rotate_run_logs(logs_dir)
+    return returncode
+
+
+@contextlib.contextmanager
+def answer_prompts(answers=None, approve=False):
+    """
+    Answer prompts raised in this thread without reading stdin.
+    prompt_with_default uses answers[prompt_text] or the default, and
+    prompt_user_confirmation returns approve.
+    """
+    _preset_answers.value = (answers or {}, approve)
+    try:
+        yield
+    finally:
+        _preset_answers.value = None
+
+
 def prompt_input(prompt, default=""):
     """Ask user for input with a default fallback."""
     response = input(f"{prompt} [{default}]: ").strip()
@@ -108,6 +285,11 @@ def prompt_input(prompt, default=""):
 
 def prompt_with_default(prompt_text: str, default: str) -> str:
     """Prompt user for input, return sanitized string or default."""
+    preset = getattr(_preset_answers, "value", None)
+    if preset is not None:
+        user_input = str(preset[0].get(prompt_text, "")).strip()
+        print(f"{prompt_text} [default: {default}]: {user_input}")
+        return sanitize_input(user_input) if user_input else default
     user_input = input(f"{prompt_text} [default: {default}]: ").strip()
     return sanitize_input(user_input) if user_input else default
 
@@ -115,6 +297,10 @@ def prompt_with_default(prompt_text: str, default: str) -> str:
 def prompt_user_confirmation(message="INFRABOX: Proceed?", default=False):
     """Prompt the user for confirmation with a default option."""
     suffix = "[Y/n]" if default else "[y/N]"
+    preset = getattr(_preset_answers, "value", None)
+    if preset is not None:
+        print(f"{message} {suffix}: {'y' if preset[1] else 'n'}")
+        return preset[1]
     answer = input(f"{message} {suffix}: ").strip().lower()
     if not answer:
         return default
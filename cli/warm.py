@@ -0,0 +1,106 @@
+import fcntl
+import hashlib
+import json
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+
+from cli.plan_cache import inputs_hash
+from cli.state import get_state_dir
+from cli.utils import terraform_bin
+from cli.workspaces import terraform_dir
+
+# Background warming must not starve interactive runs
+WARM_WORKERS = 2
+WARM_NICENESS = 10
+WARM_STEPS = ("init", "validate")
+
+
+def get_warm_dir() -> Path:
+    return get_state_dir() / "warm"
+
+
+def _record_path(env_path: Path) -> Path:
+    # Workspace environments share the record of the root they run in
+    return get_warm_dir() / f"{Path(terraform_dir(env_path)).name}.json"
+
+
+def _file_identity(path: Path, name) -> str:
+    stat = path.stat()
+    return f"{name}\0{stat.st_size}\0{stat.st_mtime_ns}\0"
+
+
+def warm_key(env_path) -> str:
+    """
+    What a successful init or validate depends on: the Terraform inputs,
+    the installed provider binaries and the Terraform executable. A deleted
+    or replaced provider, or an upgraded Terraform, changes the key.
+    """
+    root = Path(env_path)
+    digest = hashlib.sha256(inputs_hash(root).encode())
+    providers = root / ".terraform" / "providers"
+    if providers.is_dir():
+        for path in sorted(providers.rglob("*")):
+            if path.is_file():
+                name = path.relative_to(root)
+                digest.update(_file_identity(path, name).encode())
+    executable = shutil.which(terraform_bin())
+    if executable:
+        digest.update(_file_identity(Path(executable), executable).encode())
+    return digest.hexdigest()
+
+
+def _read_record(env_path) -> dict:
+    path = _record_path(env_path)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text())
+    except ValueError:
+        return {}
+
+
+def is_warm(env_path, step) -> bool:
+    """
+    True if `step` succeeded for exactly the current warm_key (the
+    environment's files, its local modules, the provider lock file, the
+    installed providers and Terraform itself) and .terraform/ is still there.
+    """
+    env_path = Path(terraform_dir(env_path))
+    recorded = _read_record(env_path).get(step)
+    return (
+        recorded is not None
+        and (env_path / ".terraform").is_dir()
+        and recorded == warm_key(env_path)
+    )
+
+
+def mark_warm(env_path, step):
+    env_path = Path(terraform_dir(env_path))
+    record = _read_record(env_path)
+    # A new init invalidates everything that ran against the old one
+    if step == "init":
+        record = {}
+    record[step] = warm_key(env_path)
+    path = _record_path(env_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(record, indent=2))
+    tmp_path.replace(path)
+
+
+@contextmanager
+def environment_lock(env_path):
+    """
+    Serialize init/validate of one environment across processes, so a
+    command started while `warm` is still running waits for it and then
+    finds the environment ready instead of initializing it a second time.
+    """
+    lock_path = get_warm_dir() / f"{Path(terraform_dir(env_path)).name}.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
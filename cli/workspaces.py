@@ -0,0 +1,90 @@
+import json
+from pathlib import Path
+
+# environments/_shared holds the one Terraform root (and .terraform/) that
+# every workspace environment is planned and applied from
+SHARED_ROOT = "_shared"
+WORKSPACE_TFVARS = "workspace.tfvars.json"
+# Where the local backend keeps the state of workspaces other than default
+WORKSPACE_STATE_DIR = "terraform.tfstate.d"
+STATE_FILE = "terraform.tfstate"
+
+
+def is_workspace_environment(env_path) -> bool:
+    """Whether the environment is a workspace of the shared root."""
+    return (Path(env_path) / WORKSPACE_TFVARS).is_file()
+
+
+def is_shared_root(path) -> bool:
+    return Path(path).name == SHARED_ROOT
+
+
+def shared_root(environments_dir) -> Path:
+    return Path(environments_dir) / SHARED_ROOT
+
+
+def terraform_dir(env_path):
+    """The directory Terraform runs in for the environment."""
+    if is_workspace_environment(env_path):
+        return shared_root(Path(env_path).parent)
+    return env_path
+
+
+def terraform_env(env_path) -> dict:
+    """
+    TF_WORKSPACE for a workspace environment. It selects the workspace for
+    one command only, so parallel runs against the shared root never switch
+    each other's workspace.
+    """
+    if is_workspace_environment(env_path):
+        return {"TF_WORKSPACE": Path(env_path).name}
+    return {}
+
+
+def var_file_args(env_path) -> list:
+    """The -var-file argument passing a workspace environment's values."""
+    if is_workspace_environment(env_path):
+        return [f"-var-file={(Path(env_path) / WORKSPACE_TFVARS).resolve()}"]
+    return []
+
+
+def state_file(env_path) -> Path:
+    """The environment's local state file, wherever its workspace keeps it."""
+    env_path = Path(env_path)
+    if is_workspace_environment(env_path):
+        return (
+            terraform_dir(env_path) / WORKSPACE_STATE_DIR / env_path.name / STATE_FILE
+        )
+    return env_path / STATE_FILE
+
+
+def workspace_exists(env_path) -> bool:
+    """
+    Whether the local backend already has the environment's workspace.
+    Always False for remote backends, whose workspaces are not on disk.
+    """
+    return state_file(env_path).parent.is_dir()
+
+
+def read_workspace_variables(env_path) -> dict:
+    """The variable values of a workspace environment, or {}."""
+    path = Path(env_path) / WORKSPACE_TFVARS
+    if not path.is_file():
+        return {}
+    return json.loads(path.read_text())
+
+
+def workspace_from_args(args, fleet) -> bool:
+    """
+    Whether `initialize` uses the workspace layout. Raises ValueError for
+    options the single shared root cannot serve.
+    """
+    if not getattr(args, "workspace", False):
+        return False
+    if getattr(args, "output_format", "hcl") != "hcl":
+        raise ValueError("--workspace shares an HCL root and cannot use --format json")
+    if fleet.get("fleet"):
+        raise ValueError(
+            "--workspace shares a single-VM root and cannot be combined with --fleet"
+        )
+    return True
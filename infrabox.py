@@ -1,21 +1,82 @@
 # CLI entry point for InfraBox
 # This script serves as the command-line interface for managing InfraBox resources.
 
-from cli.commands import create, destroy, initialize
+from cli.bundle import ensure_modules
+from cli.commands import (
+    clone,
+    create,
+    destroy,
+    fleet,
+    history,
+    initialize,
+    lease,
+    list_environments,
+    logs,
+    pool,
+    serve,
+    state,
+    upload,
+    warm,
+    watch,
+)
+from cli.metrics import flush_or_warn, track_command
 from cli.parser import parse_arguments
 
+# Long-running or read-only commands are not timed as one operation
+UNTRACKED_COMMANDS = ("fleet", "history", "list", "logs", "pool", "serve", "watch")
+# Commands that may run `terraform init`, which reads modules/ from disk
+TERRAFORM_COMMANDS = (
+    "create",
+    "destroy",
+    "initialize",
+    "pool",
+    "serve",
+    "warm",
+    "watch",
+)
+
+
+# The module whose run(args) handles each command
+COMMANDS = {
+    "create": create,
+    "destroy": destroy,
+    "initialize": initialize,
+    "clone": clone,
+    "list": list_environments,
+    "history": history,
+    "logs": logs,
+    "state": state,
+    "serve": serve,
+    "warm": warm,
+    "watch": watch,
+    "fleet": fleet,
+    "lease": lease,
+    "pool": pool,
+    "upload": upload,
+}
+
+
+def run_command(args):
+    command = COMMANDS.get(args.command)
+    if command is None:
+        print("INFRABOX: ❌ Unsupported command.")
+        return
+    command.run(args)
+
 
 def main():
     args = parse_arguments()
+    if args.command in TERRAFORM_COMMANDS:
+        ensure_modules()
 
-    if args.command == "create":
-        create.run(args)
-    elif args.command == "destroy":
-        destroy.run(args)
-    elif args.command == "initialize":
-        initialize.run(args)
-    else:
-        print("INFRABOX: ❌ Unsupported command.")
+    if args.command in UNTRACKED_COMMANDS:
+        run_command(args)
+        return
+    try:
+        with track_command(args.command):
+            run_command(args)
+    finally:
+        flush_or_warn()
 
 
 if __name__ == "__main__":
@@ -29,15 +29,17 @@ resource "azurerm_public_ip" "this" {
   resource_group_name = var.resource_group_name
   location            = var.location
   allocation_method   = "Static"
-  sku                 = "Basic"
+  sku                 = var.public_ip_sku
   tags                = var.tags
 }
 
 resource "azurerm_network_interface" "this" {
-  name                = "${var.name}-NIC"
-  location            = var.location
-  resource_group_name = var.resource_group_name
-  tags                = var.tags
+  count                         = var.create_network_interface ? 1 : 0
+  name                          = "${var.name}-NIC"
+  location                      = var.location
+  resource_group_name           = var.resource_group_name
+  enable_accelerated_networking = var.accelerated_networking
+  tags                          = var.tags
 
   ip_configuration {
     name                          = "internal"
@@ -47,6 +49,12 @@ resource "azurerm_network_interface" "this" {
   }
 }
 
+# The NIC became optional; keep existing single-VM environments' NIC in place
+moved {
+  from = azurerm_network_interface.this
+  to   = azurerm_network_interface.this[0]
+}
+
 resource "azurerm_dns_zone" "this" {
   name                = var.dns_zone_name
   resource_group_name = var.resource_group_name
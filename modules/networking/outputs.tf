@@ -3,7 +3,11 @@ output "subnet_id" {
 }
 
 output "network_interface_id" {
-  value = azurerm_network_interface.this.id
+  value = one(azurerm_network_interface.this[*].id)
+}
+
+output "public_ip_id" {
+  value = azurerm_public_ip.this.id
 }
 
 output "public_ip" {
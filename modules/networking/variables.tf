@@ -30,6 +30,24 @@ variable "subnet_address_prefixes" {
   default     = ["10.0.1.0/24"]
 }
 
+variable "public_ip_sku" {
+  description = "SKU of the public IP (Basic or Standard)"
+  type        = string
+  default     = "Basic"
+}
+
+variable "accelerated_networking" {
+  description = "Enable accelerated networking on the NIC (not supported by B-series sizes)"
+  type        = bool
+  default     = false
+}
+
+variable "create_network_interface" {
+  description = "Create a NIC holding the public IP for a single VM (false when a load balancer fronts a fleet)"
+  type        = bool
+  default     = true
+}
+
 variable "tags" {
   description = "Tags to apply to the networking resources"
   type        = map(string)
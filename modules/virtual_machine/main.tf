@@ -9,14 +9,23 @@ terraform {
   }
 }
 
+resource "azurerm_proximity_placement_group" "this" {
+  count               = var.proximity_placement_group ? 1 : 0
+  name                = "${var.name}-PPG"
+  location            = var.location
+  resource_group_name = var.resource_group_name
+  tags                = var.tags
+}
+
 resource "azurerm_linux_virtual_machine" "this" {
-  name                  = var.name
-  resource_group_name   = var.resource_group_name
-  location              = var.location
-  size                  = var.vm_size
-  admin_username        = var.admin_username
-  network_interface_ids = [var.network_interface_id]
-  tags                  = var.tags
+  name                         = var.name
+  resource_group_name          = var.resource_group_name
+  location                     = var.location
+  size                         = var.vm_size
+  admin_username               = var.admin_username
+  network_interface_ids        = [var.network_interface_id]
+  proximity_placement_group_id = one(azurerm_proximity_placement_group.this[*].id)
+  tags                         = var.tags
 
   admin_ssh_key {
     username   = var.admin_username
@@ -24,8 +33,15 @@ resource "azurerm_linux_virtual_machine" "this" {
   }
 
   os_disk {
-    caching              = "ReadWrite"
-    storage_account_type = "Standard_LRS"
+    caching              = var.os_disk_caching
+    storage_account_type = var.os_disk_storage_account_type
+
+    dynamic "diff_disk_settings" {
+      for_each = var.ephemeral_os_disk ? ["Local"] : []
+      content {
+        option = diff_disk_settings.value
+      }
+    }
   }
 
   source_image_reference {
@@ -5,3 +5,7 @@ output "vm_id" {
 output "vm_name" {
   value = azurerm_linux_virtual_machine.this.name
 }
+
+output "proximity_placement_group_id" {
+  value = one(azurerm_proximity_placement_group.this[*].id)
+}
@@ -19,6 +19,30 @@ variable "vm_size" {
   default     = "Standard_B1s"
 }
 
+variable "os_disk_storage_account_type" {
+  description = "Storage type of the OS disk (Standard_LRS, StandardSSD_LRS, Premium_LRS)."
+  type        = string
+  default     = "Standard_LRS"
+}
+
+variable "os_disk_caching" {
+  description = "Caching of the OS disk (None, ReadOnly, ReadWrite)."
+  type        = string
+  default     = "ReadWrite"
+}
+
+variable "ephemeral_os_disk" {
+  description = "Place the OS disk on the host's local cache. Requires ReadOnly caching."
+  type        = bool
+  default     = false
+}
+
+variable "proximity_placement_group" {
+  description = "Create a proximity placement group and place the virtual machine in it."
+  type        = bool
+  default     = false
+}
+
 variable "admin_username" {
   description = "Admin username for the virtual machine."
   type        = string
@@ -0,0 +1,205 @@
+terraform {
+  required_version = ">= 1.3.0"
+
+  required_providers {
+    azurerm = {
+      source  = "hashicorp/azurerm"
+      version = "~> 3.0"
+    }
+  }
+}
+
+resource "azurerm_proximity_placement_group" "this" {
+  count               = var.proximity_placement_group ? 1 : 0
+  name                = "${var.name}-PPG"
+  location            = var.location
+  resource_group_name = var.resource_group_name
+  tags                = var.tags
+}
+
+resource "azurerm_lb" "this" {
+  name                = "${var.name}-LB"
+  location            = var.location
+  resource_group_name = var.resource_group_name
+  sku                 = "Standard"
+  tags                = var.tags
+
+  frontend_ip_configuration {
+    name                 = "public"
+    public_ip_address_id = var.public_ip_id
+  }
+}
+
+resource "azurerm_lb_backend_address_pool" "this" {
+  name            = "${var.name}-Pool"
+  loadbalancer_id = azurerm_lb.this.id
+}
+
+resource "azurerm_lb_probe" "this" {
+  name                = "${var.name}-Probe"
+  loadbalancer_id     = azurerm_lb.this.id
+  protocol            = var.health_probe_protocol
+  port                = var.backend_port
+  request_path        = var.health_probe_path
+  interval_in_seconds = 5
+  number_of_probes    = 2
+}
+
+resource "azurerm_lb_rule" "this" {
+  name                           = "${var.name}-Rule"
+  loadbalancer_id                = azurerm_lb.this.id
+  protocol                       = "Tcp"
+  frontend_port                  = var.frontend_port
+  backend_port                   = var.backend_port
+  frontend_ip_configuration_name = "public"
+  backend_address_pool_ids       = [azurerm_lb_backend_address_pool.this.id]
+  probe_id                       = azurerm_lb_probe.this.id
+  disable_outbound_snat          = true
+}
+
+resource "azurerm_lb_outbound_rule" "this" {
+  name                    = "${var.name}-Outbound"
+  loadbalancer_id         = azurerm_lb.this.id
+  protocol                = "All"
+  backend_address_pool_id = azurerm_lb_backend_address_pool.this.id
+
+  frontend_ip_configuration {
+    name = "public"
+  }
+}
+
+# Standard load balancers only let in what a security group allows
+resource "azurerm_network_security_group" "this" {
+  name                = "${var.name}-NSG"
+  location            = var.location
+  resource_group_name = var.resource_group_name
+  tags                = var.tags
+
+  security_rule {
+    name                       = "AllowBackendPort"
+    priority                   = 100
+    direction                  = "Inbound"
+    access                     = "Allow"
+    protocol                   = "Tcp"
+    source_port_range          = "*"
+    destination_port_range     = var.backend_port
+    source_address_prefix      = "*"
+    destination_address_prefix = "*"
+  }
+}
+
+resource "azurerm_linux_virtual_machine_scale_set" "this" {
+  name                         = "${var.name}-VMSS"
+  resource_group_name          = var.resource_group_name
+  location                     = var.location
+  sku                          = var.vm_size
+  instances                    = var.default_instances
+  admin_username               = var.admin_username
+  upgrade_mode                 = "Automatic"
+  health_probe_id              = azurerm_lb_probe.this.id
+  proximity_placement_group_id = one(azurerm_proximity_placement_group.this[*].id)
+  tags                         = var.tags
+
+  admin_ssh_key {
+    username   = var.admin_username
+    public_key = file(var.ssh_public_key_path)
+  }
+
+  os_disk {
+    caching              = var.os_disk_caching
+    storage_account_type = var.os_disk_storage_account_type
+
+    dynamic "diff_disk_settings" {
+      for_each = var.ephemeral_os_disk ? ["Local"] : []
+      content {
+        option = diff_disk_settings.value
+      }
+    }
+  }
+
+  source_image_reference {
+    publisher = "Canonical"
+    offer     = "0001-com-ubuntu-server-focal"
+    sku       = "20_04-lts"
+    version   = "latest"
+  }
+
+  network_interface {
+    name                          = "${var.name}-NIC"
+    primary                       = true
+    enable_accelerated_networking = var.accelerated_networking
+    network_security_group_id     = azurerm_network_security_group.this.id
+
+    ip_configuration {
+      name                                   = "internal"
+      primary                                = true
+      subnet_id                              = var.subnet_id
+      load_balancer_backend_address_pool_ids = [azurerm_lb_backend_address_pool.this.id]
+    }
+  }
+
+  # Autoscale owns the instance count once the scale set exists
+  lifecycle {
+    ignore_changes = [instances]
+  }
+
+  depends_on = [azurerm_lb_rule.this]
+}
+
+resource "azurerm_monitor_autoscale_setting" "this" {
+  name                = "${var.name}-Autoscale"
+  resource_group_name = var.resource_group_name
+  location            = var.location
+  target_resource_id  = azurerm_linux_virtual_machine_scale_set.this.id
+  tags                = var.tags
+
+  profile {
+    name = "cpu"
+
+    capacity {
+      default = var.default_instances
+      minimum = var.min_instances
+      maximum = var.max_instances
+    }
+
+    rule {
+      metric_trigger {
+        metric_name        = "Percentage CPU"
+        metric_resource_id = azurerm_linux_virtual_machine_scale_set.this.id
+        time_grain         = "PT1M"
+        statistic          = "Average"
+        time_window        = "PT5M"
+        time_aggregation   = "Average"
+        operator           = "GreaterThan"
+        threshold          = var.scale_out_cpu_threshold
+      }
+
+      scale_action {
+        direction = "Increase"
+        type      = "ChangeCount"
+        value     = "1"
+        cooldown  = "PT5M"
+      }
+    }
+
+    rule {
+      metric_trigger {
+        metric_name        = "Percentage CPU"
+        metric_resource_id = azurerm_linux_virtual_machine_scale_set.this.id
+        time_grain         = "PT1M"
+        statistic          = "Average"
+        time_window        = "PT10M"
+        time_aggregation   = "Average"
+        operator           = "LessThan"
+        threshold          = var.scale_in_cpu_threshold
+      }
+
+      scale_action {
+        direction = "Decrease"
+        type      = "ChangeCount"
+        value     = "1"
+        cooldown  = "PT10M"
+      }
+    }
+  }
+}
@@ -0,0 +1,15 @@
+output "scale_set_id" {
+  value = azurerm_linux_virtual_machine_scale_set.this.id
+}
+
+output "scale_set_name" {
+  value = azurerm_linux_virtual_machine_scale_set.this.name
+}
+
+output "load_balancer_id" {
+  value = azurerm_lb.this.id
+}
+
+output "autoscale_setting_name" {
+  value = azurerm_monitor_autoscale_setting.this.name
+}
@@ -0,0 +1,130 @@
+variable "name" {
+  description = "Name prefix for the fleet's resources."
+  type        = string
+}
+
+variable "resource_group_name" {
+  description = "Resource group in which to create the fleet."
+  type        = string
+}
+
+variable "location" {
+  description = "Azure region for the fleet."
+  type        = string
+}
+
+variable "subnet_id" {
+  description = "Subnet the instances are placed in."
+  type        = string
+}
+
+variable "public_ip_id" {
+  description = "Standard SKU public IP used as the load balancer's frontend."
+  type        = string
+}
+
+variable "vm_size" {
+  description = "Size of every instance."
+  type        = string
+  default     = "Standard_B1s"
+}
+
+variable "min_instances" {
+  description = "Fewest instances autoscale may scale in to."
+  type        = number
+  default     = 2
+}
+
+variable "max_instances" {
+  description = "Most instances autoscale may scale out to."
+  type        = number
+  default     = 4
+}
+
+variable "default_instances" {
+  description = "Instances to start with, and to run when no CPU metrics are available."
+  type        = number
+  default     = 2
+}
+
+variable "scale_out_cpu_threshold" {
+  description = "Average CPU percentage over 5 minutes above which an instance is added."
+  type        = number
+  default     = 70
+}
+
+variable "scale_in_cpu_threshold" {
+  description = "Average CPU percentage over 10 minutes below which an instance is removed."
+  type        = number
+  default     = 30
+}
+
+variable "frontend_port" {
+  description = "Port the load balancer listens on."
+  type        = number
+  default     = 80
+}
+
+variable "backend_port" {
+  description = "Port the instances serve on."
+  type        = number
+  default     = 80
+}
+
+variable "health_probe_protocol" {
+  description = "Health probe protocol (Tcp, Http or Https)."
+  type        = string
+  default     = "Tcp"
+}
+
+variable "health_probe_path" {
+  description = "Request path of Http(s) health probes."
+  type        = string
+  default     = null
+}
+
+variable "os_disk_storage_account_type" {
+  description = "Storage type of the instances' OS disks."
+  type        = string
+  default     = "Standard_LRS"
+}
+
+variable "os_disk_caching" {
+  description = "Caching of the instances' OS disks."
+  type        = string
+  default     = "ReadWrite"
+}
+
+variable "ephemeral_os_disk" {
+  description = "Place OS disks on the hosts' local cache. Requires ReadOnly caching."
+  type        = bool
+  default     = false
+}
+
+variable "accelerated_networking" {
+  description = "Enable accelerated networking on the instances' NICs."
+  type        = bool
+  default     = false
+}
+
+variable "proximity_placement_group" {
+  description = "Create a proximity placement group and place the instances in it."
+  type        = bool
+  default     = false
+}
+
+variable "admin_username" {
+  description = "Admin username for the instances."
+  type        = string
+}
+
+variable "ssh_public_key_path" {
+  description = "Path to the SSH public key for the instances."
+  type        = string
+}
+
+variable "tags" {
+  description = "Tags to apply to the fleet's resources."
+  type        = map(string)
+  default     = {}
+}
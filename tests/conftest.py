@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+import pytest
+
+from cli import metrics
+from cli.env_config import config_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_state_dir(monkeypatch, tmp_path_factory):
+    # Keep run logs and caches written during tests out of the repository
+    state_dir = tmp_path_factory.mktemp("infrabox_state")
+    monkeypatch.setenv("INFRABOX_STATE_DIR", str(state_dir))
+    config_cache.clear()
+    metrics.registry.clear()
+    return state_dir
+
+
+@pytest.fixture
+def make_args(request):
+    """
+    Build a command's parsed arguments: the test module's DEFAULT_ARGS,
+    overridden by keyword.
+    """
+
+    def make(**overrides):
+        return SimpleNamespace(**{**request.module.DEFAULT_ARGS, **overrides})
+
+    return make
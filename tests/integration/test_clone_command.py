@@ -0,0 +1,152 @@
+import os
+
+import pytest
+
+import cli.commands.clone as clone_mod
+from cli.env_config import load_environment_config
+from cli.infrastructure_templates import generate_main_tf, generate_variables_tf
+from cli.profiles import profile_context
+from cli.tf_json import generate_tf_json
+
+PROVIDER = "registry.terraform.io/hashicorp/azurerm/3.117.0/linux_amd64"
+
+
+@pytest.fixture
+def environments(monkeypatch, tmp_path):
+    monkeypatch.setattr(clone_mod, "ENVIRONMENTS_DIR", tmp_path)
+    source = tmp_path / "dev"
+    source.mkdir()
+    context = {
+        "name_prefix": "Infrabox",
+        "environment": "dev",
+        "location": "westeurope",
+        "dns_zone_name": "infrabox-dev.com",
+        "admin_username": "azureuser",
+        "ssh_public_key_path": "~/.ssh/id_rsa_infrabox.pub",
+        "vnet_address_space": "10.0.0.0/16",
+        "subnet_address_space": "10.0.1.0/24",
+        **profile_context(),
+    }
+    generate_variables_tf(source, context)
+    generate_main_tf(source, context)
+    provider_dir = source / ".terraform" / "providers" / PROVIDER
+    provider_dir.mkdir(parents=True)
+    (provider_dir / "terraform-provider-azurerm").write_bytes(b"\x7fELF binary")
+    (source / ".terraform" / "modules").mkdir()
+    (source / ".terraform" / "modules" / "modules.json").write_text('{"Modules":[]}')
+    (source / ".terraform" / "terraform.tfstate").write_text("{}")
+    (source / ".terraform.lock.hcl").write_text("# lock\n")
+    return tmp_path
+
+
+DEFAULT_ARGS = {
+    "source": "dev",
+    "target": "stage",
+    "vnet_cidr": None,
+    "subnet_cidr": None,
+    "location": None,
+    "dry_run": False,
+}
+
+
+def test_clone_renders_new_environment_and_links_providers(
+    environments, capsys, make_args
+):
+    clone_mod.run(make_args(location="northeurope"))
+
+    target = environments / "stage"
+    config = load_environment_config(target)
+    assert config.environment == "stage"
+    assert config.location == "northeurope"
+    assert config.dns_zone_name == "infrabox-stage.com"
+    assert config.vnet_address_space == ("10.1.0.0/16",)
+    assert config.subnet_address_space == ("10.1.0.0/24",)
+
+    source_binary = environments / "dev/.terraform/providers" / PROVIDER
+    target_binary = target / ".terraform/providers" / PROVIDER
+    source_stat = os.stat(source_binary / "terraform-provider-azurerm")
+    assert os.stat(target_binary / "terraform-provider-azurerm").st_ino == (
+        source_stat.st_ino
+    )
+    # Terraform rewrites modules.json in place, a hardlink would share edits
+    modules_json = target / ".terraform" / "modules" / "modules.json"
+    assert modules_json.read_text() == '{"Modules":[]}'
+    assert modules_json.stat().st_ino != (
+        (environments / "dev/.terraform/modules/modules.json").stat().st_ino
+    )
+    # The backend settings would point the clone at the source's state
+    assert not (target / ".terraform" / "terraform.tfstate").exists()
+    assert (target / ".terraform.lock.hcl").read_text() == "# lock\n"
+
+    out = capsys.readouterr().out
+    assert "Cloned 'dev' into 'stage'" in out
+    assert "1 hardlink" in out
+
+
+def test_clone_with_explicit_cidrs_rejects_overlap(environments, capsys, make_args):
+    clone_mod.run(make_args(vnet_cidr="10.0.0.0/16"))
+
+    assert not (environments / "stage").exists()
+    assert "overlaps" in capsys.readouterr().out
+
+
+def test_clone_refuses_existing_target(environments, capsys, make_args):
+    (environments / "stage").mkdir()
+    clone_mod.run(make_args())
+    assert "already exist" in capsys.readouterr().out
+
+
+@pytest.mark.usefixtures("environments")
+def test_clone_missing_source(capsys, make_args):
+    clone_mod.run(make_args(source="prod"))
+    assert "'prod' does not exist" in capsys.readouterr().out
+
+
+def test_clone_dry_run_writes_nothing(environments, capsys, make_args):
+    clone_mod.run(make_args(dry_run=True))
+    assert not (environments / "stage").exists()
+    assert 'default = "stage"' in capsys.readouterr().out
+
+
+def test_clone_keeps_tf_json_format(environments, make_args):
+    source = environments / "dev"
+    context = load_environment_config(source).template_context()
+    for path in source.glob("*.tf"):
+        path.unlink()
+    generate_tf_json(source, context)
+
+    clone_mod.run(make_args())
+
+    target = environments / "stage"
+    assert sorted(path.name for path in target.glob("*.tf*")) == [
+        "main.tf.json",
+        "outputs.tf.json",
+        "provider.tf.json",
+        "variables.tf.json",
+    ]
+    assert load_environment_config(target).environment == "stage"
+
+
+def test_clone_context_keeps_values_and_applies_overrides():
+    context = {"environment": "dev", "dns_zone_name": "example.com", "location": "x"}
+    cloned = clone_mod.clone_context(context, "dev", "prod", {"location": None})
+    assert cloned == {
+        "environment": "prod",
+        "dns_zone_name": "prod.example.com",
+        "location": "x",
+    }
+
+
+@pytest.mark.parametrize(
+    ("zone", "expected"),
+    [
+        ("infrabox-dev.com", "infrabox-stage.com"),
+        ("dev.example.com", "stage.example.com"),
+        ("devops-dev.com", "devops-stage.com"),
+        ("devops.com", "stage.devops.com"),
+    ],
+)
+def test_clone_context_renames_whole_name_in_dns_zone(zone, expected):
+    context = {"environment": "dev", "dns_zone_name": zone}
+    cloned = clone_mod.clone_context(context, "dev", "stage", {})
+    assert cloned["dns_zone_name"] == expected
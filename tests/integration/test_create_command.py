@@ -3,12 +3,25 @@ from unittest import mock
 import pytest
 
 import cli.commands.create as create_cmd
+from cli.plan_cache import record_plan_outcome
+from cli.terraform_utils import TerraformOptions
 
 
 class DummyArgs:
-    def __init__(self, environment="dev", dry_run=False):
+    # Options a test does not pass keep their command-line defaults
+    regions = None
+    resume = False
+    trace_provider = False
+    timings = False
+    refresh = "always"
+    refresh_ttl = 900
+    no_cache = False
+
+    def __init__(self, environment="dev", dry_run=False, **options):
         self.environment = environment
         self.dry_run = dry_run
+        for name, value in options.items():
+            setattr(self, name, value)
 
 
 @pytest.fixture
@@ -37,13 +50,24 @@ def test_run_happy_path_apply(monkeypatch, patch_all):
     create_cmd.run(args)
 
     patch_all["get_env_path"].assert_called_once_with("dev")
-    patch_all["terraform_init"].assert_called_once_with("env_path", dry_run=False)
-    patch_all["terraform_validate"].assert_called_once_with("env_path", dry_run=False)
+    patch_all["terraform_init"].assert_called_once_with(
+        "env_path", dry_run=False, no_cache=False
+    )
+    patch_all["terraform_validate"].assert_called_once_with(
+        "env_path", dry_run=False, no_cache=False
+    )
     patch_all["terraform_state_has_changes"].assert_called_once_with(
-        "env_path", dry_run=False
+        "env_path",
+        dry_run=False,
+        plan_file=mock.ANY,
+        options=TerraformOptions(),
     )
     patch_all["prompt_user_confirmation"].assert_called_once_with()
-    patch_all["terraform_apply"].assert_called_once_with("env_path", dry_run=False)
+    patch_all["terraform_apply"].assert_called_once_with(
+        "env_path",
+        dry_run=False,
+        options=TerraformOptions(),
+    )
     assert monkeypatch is not None
 
 
@@ -82,12 +106,22 @@ def test_run_dry_run(monkeypatch, patch_all):
 
     create_cmd.run(args)
 
-    patch_all["terraform_init"].assert_called_once_with("env_path", dry_run=True)
-    patch_all["terraform_validate"].assert_called_once_with("env_path", dry_run=True)
+    patch_all["terraform_init"].assert_called_once_with(
+        "env_path", dry_run=True, no_cache=False
+    )
+    patch_all["terraform_validate"].assert_called_once_with(
+        "env_path", dry_run=True, no_cache=False
+    )
     patch_all["terraform_state_has_changes"].assert_called_once_with(
-        "env_path", dry_run=True
+        "env_path",
+        dry_run=True,
+        options=TerraformOptions(),
+    )
+    patch_all["terraform_apply"].assert_called_once_with(
+        "env_path",
+        dry_run=True,
+        options=TerraformOptions(),
     )
-    patch_all["terraform_apply"].assert_called_once_with("env_path", dry_run=True)
 
     assert monkeypatch is not None
 
@@ -101,6 +135,18 @@ def test_run_get_env_path_raises(monkeypatch, patch_all):
     assert monkeypatch is not None
 
 
+def test_run_preflight_failure_stops_before_terraform(monkeypatch, patch_all, capsys):
+    args = DummyArgs()
+    patch_all["get_env_path"].return_value = "env_path"
+    monkeypatch.setattr(
+        "cli.preflight.run_preflight", mock.Mock(return_value=["bad name"])
+    )
+    with pytest.raises(SystemExit):
+        create_cmd.run(args)
+    patch_all["terraform_init"].assert_not_called()
+    assert "--skip-preflight" in capsys.readouterr().out
+
+
 def test_run_terraform_init_raises(monkeypatch, patch_all):
     args = DummyArgs()
     patch_all["get_env_path"].return_value = "env_path"
@@ -140,3 +186,46 @@ def test_run_terraform_apply_raises(monkeypatch, patch_all):
     assert monkeypatch is not None
     with pytest.raises(RuntimeError, match="apply fail"):
         create_cmd.run(args)
+
+
+def test_run_resume_skips_completed_steps(monkeypatch, patch_all, tmp_path):
+    env_path = tmp_path / "dev"
+    (env_path / ".terraform").mkdir(parents=True)
+    (env_path / "main.tf").write_text("# main")
+    patch_all["get_env_path"].return_value = env_path
+    completed = mock.Mock(returncode=0)
+    patch_all["terraform_init"].return_value = completed
+    patch_all["terraform_validate"].return_value = completed
+    patch_all["terraform_state_has_changes"].side_effect = RuntimeError("plan fail")
+
+    with pytest.raises(RuntimeError, match="plan fail"):
+        create_cmd.run(DummyArgs())
+
+    patch_all["terraform_init"].reset_mock()
+    patch_all["terraform_validate"].reset_mock()
+    patch_all["terraform_state_has_changes"].reset_mock(side_effect=True)
+    patch_all["terraform_state_has_changes"].return_value = False
+    create_cmd.run(DummyArgs(resume=True))
+
+    patch_all["terraform_init"].assert_not_called()
+    patch_all["terraform_validate"].assert_not_called()
+    patch_all["terraform_state_has_changes"].assert_called_once()
+    assert monkeypatch is not None
+
+
+def test_run_skips_plan_when_cached_no_changes(
+    monkeypatch, patch_all, tmp_path, capsys
+):
+    env_path = tmp_path / "dev"
+    env_path.mkdir()
+    (env_path / "main.tf").write_text("# main")
+    patch_all["get_env_path"].return_value = env_path
+    record_plan_outcome(env_path, has_changes=False)
+    assert create_cmd.run(DummyArgs()) is None
+    patch_all["terraform_init"].assert_not_called()
+    patch_all["terraform_state_has_changes"].assert_not_called()
+    assert "use --no-cache" in capsys.readouterr().out
+
+    create_cmd.run(DummyArgs(no_cache=True))
+    patch_all["terraform_state_has_changes"].assert_called_once()
+    assert monkeypatch is not None
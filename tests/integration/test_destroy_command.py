@@ -3,12 +3,24 @@ from unittest import mock
 import pytest
 
 import cli.commands.destroy as destroy_cmd
+from cli.terraform_utils import TerraformOptions
 
 
 class DummyArgs:
-    def __init__(self, environment="dev", dry_run=False):
+    # Options a test does not pass keep their command-line defaults
+    regions = None
+    resume = False
+    trace_provider = False
+    timings = False
+    refresh = "always"
+    refresh_ttl = 900
+    no_cache = False
+
+    def __init__(self, environment="dev", dry_run=False, **options):
         self.environment = environment
         self.dry_run = dry_run
+        for name, value in options.items():
+            setattr(self, name, value)
 
 
 @pytest.fixture
@@ -37,14 +49,25 @@ def test_run_happy_path_apply(monkeypatch, patch_all):
     destroy_cmd.run(args)
 
     patch_all["get_env_path"].assert_called_once_with("dev")
-    patch_all["terraform_init"].assert_called_once_with("env_path", dry_run=False)
-    patch_all["terraform_validate"].assert_called_once_with("env_path", dry_run=False)
+    patch_all["terraform_init"].assert_called_once_with(
+        "env_path", dry_run=False, no_cache=False
+    )
+    patch_all["terraform_validate"].assert_called_once_with(
+        "env_path", dry_run=False, no_cache=False
+    )
     patch_all["terraform_state_has_changes"].assert_called_once_with(
-        "env_path", destroy=True, dry_run=False
+        "env_path",
+        destroy=True,
+        dry_run=False,
+        plan_file=mock.ANY,
+        options=TerraformOptions(),
     )
     patch_all["prompt_user_confirmation"].assert_called_once_with()
     patch_all["terraform_apply"].assert_called_once_with(
-        "env_path", destroy=True, dry_run=False
+        "env_path",
+        destroy=True,
+        dry_run=False,
+        options=TerraformOptions(),
     )
 
     assert monkeypatch is not None
@@ -85,13 +108,23 @@ def test_run_dry_run(monkeypatch, patch_all):
 
     destroy_cmd.run(args)
 
-    patch_all["terraform_init"].assert_called_once_with("env_path", dry_run=True)
-    patch_all["terraform_validate"].assert_called_once_with("env_path", dry_run=True)
+    patch_all["terraform_init"].assert_called_once_with(
+        "env_path", dry_run=True, no_cache=False
+    )
+    patch_all["terraform_validate"].assert_called_once_with(
+        "env_path", dry_run=True, no_cache=False
+    )
     patch_all["terraform_state_has_changes"].assert_called_once_with(
-        "env_path", destroy=True, dry_run=True
+        "env_path",
+        destroy=True,
+        dry_run=True,
+        options=TerraformOptions(),
     )
     patch_all["terraform_apply"].assert_called_once_with(
-        "env_path", destroy=True, dry_run=True
+        "env_path",
+        destroy=True,
+        dry_run=True,
+        options=TerraformOptions(),
     )
 
     assert monkeypatch is not None
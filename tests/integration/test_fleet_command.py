@@ -0,0 +1,101 @@
+import json
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.fleet as fleet_cmd
+
+FLEET_VARIABLES = """
+variable "fleet_min_instances" {
+  default = 2
+}
+
+variable "fleet_max_instances" {
+  default = 4
+}
+"""
+OUTPUTS = {"fleet_name": "InfraBox-web-VMSS", "resource_group_name": "InfraBox-web-RG"}
+
+
+@pytest.fixture
+def environments(monkeypatch, tmp_path):
+    monkeypatch.setattr(fleet_cmd, "ENVIRONMENTS_DIR", tmp_path)
+    (tmp_path / "web").mkdir()
+    (tmp_path / "web" / "variables.tf").write_text(FLEET_VARIABLES)
+    (tmp_path / "dev").mkdir()
+    (tmp_path / "dev" / "variables.tf").write_text("")
+    return tmp_path
+
+
+def fake_az(responses):
+    """read_cmd_output stand-in answering `az` calls by their subcommand."""
+    calls = []
+
+    def read_cmd_output(cmd, cwd):
+        calls.append(cmd)
+        assert cwd.name == "web"
+        response = responses.get(cmd[2])
+        if response is None:
+            return subprocess.CompletedProcess(cmd, 1, stdout="", stderr="")
+        return subprocess.CompletedProcess(
+            cmd, 0, stdout=json.dumps(response), stderr="WARNING: preview command\n"
+        )
+
+    return read_cmd_output, calls
+
+
+@pytest.mark.usefixtures("environments")
+def test_fleet_shows_desired_and_current_counts(monkeypatch, capsys):
+    read_cmd_output, calls = fake_az(
+        {
+            "show": {"sku": {"capacity": 3}},
+            "list-instances": [
+                {"provisioningState": "Succeeded"},
+                {"provisioningState": "Succeeded"},
+                {"provisioningState": "Creating"},
+            ],
+        }
+    )
+    monkeypatch.setattr(fleet_cmd, "read_cmd_output", read_cmd_output)
+    monkeypatch.setattr(fleet_cmd, "terraform_output", lambda _path: OUTPUTS)
+
+    fleet_cmd.run(SimpleNamespace(environment="web"))
+
+    out = capsys.readouterr().out
+    assert "Fleet of environment 'web' (InfraBox-web-VMSS)" in out
+    assert "Bounds:  2-4 instances" in out
+    assert "Desired: 3" in out
+    assert "Current: 2 running, 1 Creating" in out
+    assert calls[0][:3] == ["az", "vmss", "show"]
+    assert "InfraBox-web-RG" in calls[0]
+
+
+@pytest.mark.usefixtures("environments")
+def test_fleet_without_azure_cli(monkeypatch, capsys):
+    read_cmd_output, _calls = fake_az({})
+    monkeypatch.setattr(fleet_cmd, "read_cmd_output", read_cmd_output)
+    monkeypatch.setattr(fleet_cmd, "terraform_output", lambda _path: OUTPUTS)
+
+    fleet_cmd.run(SimpleNamespace(environment="web"))
+
+    out = capsys.readouterr().out
+    assert "Desired: unknown" in out
+    assert "Could not query Azure" in out
+
+
+@pytest.mark.usefixtures("environments")
+def test_fleet_not_created_yet(monkeypatch, capsys):
+    monkeypatch.setattr(fleet_cmd, "terraform_output", lambda _path: {})
+
+    fleet_cmd.run(SimpleNamespace(environment="web"))
+
+    out = capsys.readouterr().out
+    assert "Bounds:  2-4 instances" in out
+    assert "infrabox.py create web" in out
+
+
+@pytest.mark.usefixtures("environments")
+def test_fleet_of_single_vm_environment(capsys):
+    fleet_cmd.run(SimpleNamespace(environment="dev"))
+    assert "runs a single VM" in capsys.readouterr().out
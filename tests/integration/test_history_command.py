@@ -0,0 +1,44 @@
+import cli.commands.history as history_cmd
+from cli.run_history import record_phase
+
+DEFAULT_ARGS = {"environment": None, "slowest": False, "limit": 20}
+
+
+def test_history_empty(make_args, capsys):
+    history_cmd.run(make_args(slowest=True))
+    assert "No run history recorded yet" in capsys.readouterr().out
+
+
+def test_history_lists_recent_runs(make_args, capsys):
+    record_phase("dev", "plan", 12, 2)
+    record_phase("prod", "apply", 95, 1)
+
+    history_cmd.run(make_args(environment="prod"))
+
+    out = capsys.readouterr().out
+    assert "❌ prod  apply" in out
+    assert "1m 35s" in out
+    assert "dev" not in out.split("\n", 1)[1]
+
+
+def test_history_slowest(make_args, capsys):
+    record_phase("dev", "plan", 12, 2)
+    record_phase("prod", "apply", 300, 0)
+    record_phase("prod", "apply", 500, 0)
+
+    history_cmd.run(make_args(slowest=True))
+
+    lines = capsys.readouterr().out.splitlines()
+    assert "Slowest phases" in lines[0]
+    assert lines[1].split() == [
+        "prod",
+        "apply",
+        "6m",
+        "40s",
+        "max",
+        "8m",
+        "20s",
+        "(2",
+        "runs)",
+    ]
+    assert lines[2].split()[:3] == ["dev", "plan", "12s"]
@@ -3,6 +3,7 @@ from types import SimpleNamespace
 import pytest
 
 import cli.commands.initialize as initialize_mod
+from cli.catalog import load_catalog
 
 
 @pytest.fixture
@@ -76,6 +77,7 @@ def test_initialize_creates_files(monkeypatch, temp_env_dir):
     for fname in ["variables.tf", "main.tf", "outputs.tf", "provider.tf"]:
         assert (env_path / fname).exists()
         assert (env_path / fname).read_text().startswith("#")
+    assert "prod" in load_catalog(temp_env_dir)
 
 
 def test_initialize_aborts_if_env_exists(monkeypatch, temp_env_dir, capsys):
@@ -324,3 +326,212 @@ def test_initialize_unexpected_error_removes_env_dir(monkeypatch, temp_env_dir,
     # Assert
     assert "removed environment directory" in out.lower()
     assert not env_path.exists()
+
+
+def test_initialize_proposes_free_cidrs(monkeypatch, temp_env_dir):
+    existing = temp_env_dir / "stage"
+    existing.mkdir()
+    (existing / "variables.tf").write_text(
+        'variable "vnet_address_space" {\n  default = ["10.0.0.0/16"]\n}\n'
+    )
+    args = SimpleNamespace(environment="dev", dry_run=False)
+    prompts = {}
+
+    def recording_prompt(prompt, default):
+        prompts[prompt] = default
+        return default
+
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", recording_prompt)
+    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
+
+    initialize_mod.run(args)
+
+    assert prompts["Enter VNet CIDR"] == "10.1.0.0/16"
+    assert prompts["Enter Subnet CIDR"] == "10.1.0.0/24"
+    content = (temp_env_dir / "dev" / "variables.tf").read_text()
+    assert "10.1.0.0/16" in content
+
+
+def test_initialize_regions_renders_each_region(monkeypatch, temp_env_dir, capsys):
+    args = SimpleNamespace(
+        environment="prod", dry_run=False, regions=["eastus", "westus"]
+    )
+    prompts = []
+
+    def recording_prompt(prompt, default):
+        prompts.append(prompt)
+        return default
+
+    initialized = []
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", recording_prompt)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init", lambda path, **_k: initialized.append(path)
+    )
+    monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
+
+    initialize_mod.run(args)
+    out = capsys.readouterr().out
+
+    # Shared values are asked once, location and CIDRs come from the region list
+    assert len(prompts) == len(set(prompts))
+    assert "Enter Azure location" not in prompts
+    east = (temp_env_dir / "prod-eastus" / "variables.tf").read_text()
+    west = (temp_env_dir / "prod-westus" / "variables.tf").read_text()
+    assert '"10.0.0.0/16"' in east
+    assert "eastus.Infrabox-prod.com" in east
+    assert '"10.1.0.0/16"' in west
+    assert '"westus"' in west
+    assert sorted(p.name for p in initialized) == ["prod-eastus", "prod-westus"]
+    assert "Initialization summary" in out
+
+
+def test_initialize_regions_aborts_if_any_region_exists(
+    monkeypatch, temp_env_dir, capsys
+):
+    (temp_env_dir / "prod-westus").mkdir()
+    args = SimpleNamespace(
+        environment="prod", dry_run=False, regions=["eastus", "westus"]
+    )
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
+
+    initialize_mod.run(args)
+    out = capsys.readouterr().out
+
+    assert "prod-westus already exist" in out
+    assert not (temp_env_dir / "prod-eastus").exists()
+
+
+def test_initialize_regions_error_keeps_rendered_regions(
+    monkeypatch, temp_env_dir, capsys
+):
+    args = SimpleNamespace(
+        environment="prod", dry_run=False, regions=["eastus", "westus"]
+    )
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
+
+    def fail_for_second_region(env_path, _context, **_k):
+        if env_path.name == "prod-westus":
+            raise RuntimeError("render failed")
+
+    monkeypatch.setattr(initialize_mod, "generate_main_tf", fail_for_second_region)
+
+    with pytest.raises(RuntimeError, match="render failed"):
+        initialize_mod.run(args)
+    out = capsys.readouterr().out
+
+    # The completely rendered region is kept for --resume, the partial one is not
+    assert (temp_env_dir / "prod-eastus").exists()
+    assert not (temp_env_dir / "prod-westus").exists()
+    assert "initialize prod --regions eastus,westus --resume" in out
+
+
+def test_initialize_regions_rejects_too_long_names(monkeypatch, temp_env_dir, capsys):
+    args = SimpleNamespace(environment="prod", dry_run=False, regions=["westeurope"])
+    prompts = []
+    monkeypatch.setattr(
+        initialize_mod, "prompt_with_default", lambda prompt, _d: prompts.append(prompt)
+    )
+
+    initialize_mod.run(args)
+
+    assert "invalid environment name: 'prod-westeurope'" in capsys.readouterr().out
+    assert prompts == []
+    assert not (temp_env_dir / "prod-westeurope").exists()
+
+
+def test_initialize_resume_skips_rendering(monkeypatch, temp_env_dir, capsys):
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
+
+    def interrupted_init(*_a, **_k):
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr(initialize_mod, "terraform_init", interrupted_init)
+    initialize_mod.run(SimpleNamespace(environment="dev", dry_run=False))
+    out = capsys.readouterr().out
+
+    # Rendering had finished, so the files are kept for --resume
+    assert (temp_env_dir / "dev" / "main.tf").exists()
+    assert "initialize dev --resume" in out
+
+    def fail_prompt(*_a, **_k):
+        raise AssertionError("resumed runs must not prompt again")
+
+    called = []
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", fail_prompt)
+    monkeypatch.setattr(
+        initialize_mod, "terraform_init", lambda *_a, **_k: called.append("init")
+    )
+    monkeypatch.setattr(
+        initialize_mod,
+        "terraform_validate",
+        lambda *_a, **_k: called.append("validate"),
+    )
+    initialize_mod.run(SimpleNamespace(environment="dev", dry_run=False, resume=True))
+
+    assert called == ["init", "validate"]
+    assert "Resuming initialization" in capsys.readouterr().out
+
+
+def test_initialize_json_format(monkeypatch, temp_env_dir):
+    args = SimpleNamespace(environment="qa", dry_run=False, output_format="json")
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
+    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
+
+    initialize_mod.run(args)
+
+    env_path = temp_env_dir / "qa"
+    assert sorted(path.name for path in env_path.iterdir()) == [
+        "main.tf.json",
+        "outputs.tf.json",
+        "provider.tf.json",
+        "variables.tf.json",
+    ]
+    assert load_catalog(temp_env_dir)["qa"]["cidrs"] == ["10.0.0.0/16", "10.0.0.0/24"]
+
+
+def test_initialize_renders_selected_profile(monkeypatch, temp_env_dir):
+    args = SimpleNamespace(environment="perf", dry_run=False, profile="compute")
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
+    monkeypatch.setattr(initialize_mod, "check_cidr_overlap", lambda *_a, **_k: None)
+    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
+
+    initialize_mod.run(args)
+
+    variables = (temp_env_dir / "perf" / "variables.tf").read_text()
+    assert 'default = "compute"' in variables
+    assert 'default = "Standard_F4s_v2"' in variables
+    assert "var.ephemeral_os_disk" in (temp_env_dir / "perf" / "main.tf").read_text()
+    assert load_catalog(temp_env_dir)["perf"]["location"] == "westeurope"
+
+
+def test_initialize_renders_fleet(monkeypatch, temp_env_dir):
+    args = SimpleNamespace(
+        environment="web", dry_run=False, fleet=True, min_instances=2, max_instances=5
+    )
+    monkeypatch.setattr(initialize_mod, "prompt_with_default", mock_prompt_with_default)
+    monkeypatch.setattr(initialize_mod, "check_cidr_overlap", lambda *_a, **_k: None)
+    monkeypatch.setattr(initialize_mod, "terraform_init", lambda *_a, **_k: None)
+    monkeypatch.setattr(initialize_mod, "terraform_validate", lambda *_a, **_k: None)
+
+    initialize_mod.run(args)
+
+    main = (temp_env_dir / "web" / "main.tf").read_text()
+    assert 'module "vm_fleet"' in main
+    assert "max_instances                = var.fleet_max_instances" in main
+    variables = (temp_env_dir / "web" / "variables.tf").read_text()
+    assert "default = 5" in variables
+    assert 'default = "Standard"' in variables
+
+
+def test_initialize_rejects_inconsistent_fleet_bounds(temp_env_dir, capsys):
+    args = SimpleNamespace(
+        environment="web", dry_run=False, fleet=True, min_instances=4, max_instances=2
+    )
+
+    initialize_mod.run(args)
+
+    assert "1 <= min <= instances <= max" in capsys.readouterr().out
+    assert not (temp_env_dir / "web").exists()
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+import cli.commands.list_environments as list_cmd
+from cli.catalog import record_run
+
+
+def test_list_empty(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(list_cmd, "ENVIRONMENTS_DIR", tmp_path)
+    list_cmd.run(SimpleNamespace(rescan=False))
+    assert "No environments yet" in capsys.readouterr().out
+
+
+def test_list_shows_catalog(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(list_cmd, "ENVIRONMENTS_DIR", tmp_path)
+    env_path = tmp_path / "dev"
+    env_path.mkdir()
+    (env_path / "variables.tf").write_text(
+        'variable "location" {\n  default = "westeurope"\n}\n'
+    )
+    (env_path / "terraform.tfstate").write_text('{"serial": 3}')
+    record_run(env_path, "apply", 0)
+    (tmp_path / "qa").mkdir()
+
+    list_cmd.run(SimpleNamespace(rescan=True))
+
+    lines = capsys.readouterr().out.splitlines()
+    assert "Catalog rebuilt" in lines[0]
+    assert lines[1].split() == ["NAME", "LOCATION", "CIDRS", "SERIAL", "LAST", "RUN"]
+    assert lines[2].split()[:4] == ["dev", "westeurope", "-", "3"]
+    assert "applied" in lines[2]
+    assert lines[3].split() == ["qa", "-", "-", "-", "never"]
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.logs as logs_cmd
+from cli import run_logs
+
+
+@pytest.fixture
+def logs_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(logs_cmd, "get_run_logs_dir", lambda env: tmp_path / env)
+    return tmp_path / "dev"
+
+
+def write_run(logs_dir, cmd, lines):
+    with run_logs.open_run_log(logs_dir, cmd) as log:
+        for line in lines:
+            log.write(f"{line}\n")
+
+
+def test_logs_no_runs(logs_dir, capsys):
+    logs_cmd.run(SimpleNamespace(environment="dev", run=None, grep=None))
+    assert "No archived runs" in capsys.readouterr().out
+    assert logs_dir is not None
+
+
+def test_logs_lists_runs(logs_dir, capsys):
+    write_run(logs_dir, ["terraform", "apply"], ["Apply complete!"])
+    logs_cmd.run(SimpleNamespace(environment="dev", run=None, grep=None))
+    out = capsys.readouterr().out
+    assert "Archived runs" in out
+    assert "-apply" in out
+
+
+def test_logs_shows_single_run(logs_dir, capsys):
+    write_run(logs_dir, ["terraform", "plan"], ["Plan: 2 to add"])
+    [log_path] = run_logs.list_runs(logs_dir)
+    run_id = run_logs.run_id_for(log_path)
+
+    logs_cmd.run(SimpleNamespace(environment="dev", run=run_id, grep=None))
+
+    out = capsys.readouterr().out
+    assert "Plan: 2 to add" in out
+
+
+def test_logs_grep(logs_dir, capsys):
+    write_run(logs_dir, ["terraform", "apply"], ["creating", "Error: boom"])
+    logs_cmd.run(SimpleNamespace(environment="dev", run=None, grep="Error"))
+    out = capsys.readouterr().out
+    assert ":3: Error: boom" in out
+    assert "1 matching line(s)" in out
+
+
+def test_logs_grep_rejects_invalid_pattern(logs_dir, capsys):
+    write_run(logs_dir, ["terraform", "apply"], ["Error: boom"])
+    logs_cmd.run(SimpleNamespace(environment="dev", run=None, grep="Error("))
+    out = capsys.readouterr().out
+    assert "INFRABOX: ❌ Invalid --grep pattern 'Error('" in out
+    assert "matching line(s)" not in out
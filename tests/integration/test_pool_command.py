@@ -0,0 +1,171 @@
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.clone as clone_mod
+import cli.commands.lease as lease_cmd
+import cli.commands.pool as pool_cmd
+from cli import pool
+from cli.catalog import load_catalog
+from cli.infrastructure_templates import (
+    generate_main_tf,
+    generate_outputs_tf,
+    generate_provider_tf,
+    generate_variables_tf,
+)
+from cli.profiles import profile_context
+
+# Stands in for Terraform: logs its calls and keeps a local state file
+FAKE_TERRAFORM = """#!{python}
+import json
+import os
+import sys
+from pathlib import Path
+
+with open(os.environ["FAKE_TERRAFORM_LOG"], "a") as log:
+    log.write(Path.cwd().name + " " + " ".join(sys.argv[1:]) + "\\n")
+if Path.cwd().name in os.environ.get("FAKE_TERRAFORM_FAIL", "").split(","):
+    sys.exit(1)
+command = sys.argv[1]
+if command == "init":
+    Path(".terraform").mkdir(exist_ok=True)
+elif command == "apply":
+    state = Path("terraform.tfstate")
+    serial = json.loads(state.read_text())["serial"] + 1 if state.exists() else 1
+    resources = [] if "-destroy" in sys.argv else [{{"type": "azurerm_resource_group"}}]
+    state.write_text(json.dumps({{"serial": serial, "resources": resources}}))
+elif command != "validate":
+    sys.exit(1)
+"""
+
+
+@pytest.fixture
+def environments(monkeypatch, tmp_path):
+    environments_dir = tmp_path / "environments"
+    for module in (clone_mod, lease_cmd, pool_cmd):
+        monkeypatch.setattr(module, "ENVIRONMENTS_DIR", environments_dir)
+    terraform = tmp_path / "terraform"
+    terraform.write_text(FAKE_TERRAFORM.format(python=sys.executable))
+    terraform.chmod(0o755)
+    monkeypatch.setenv("INFRABOX_TERRAFORM_BIN", str(terraform))
+    monkeypatch.setenv("FAKE_TERRAFORM_LOG", str(tmp_path / "terraform.log"))
+
+    base = environments_dir / "dev"
+    base.mkdir(parents=True)
+    context = {
+        "name_prefix": "Infrabox",
+        "environment": "dev",
+        "location": "westeurope",
+        "dns_zone_name": "infrabox-dev.com",
+        "admin_username": "azureuser",
+        "ssh_public_key_path": "~/.ssh/id_rsa_infrabox.pub",
+        "vnet_address_space": "10.0.0.0/16",
+        "subnet_address_space": "10.0.1.0/24",
+        **profile_context(),
+    }
+    for generate in (
+        generate_variables_tf,
+        generate_main_tf,
+        generate_outputs_tf,
+        generate_provider_tf,
+    ):
+        generate(base, context)
+    return environments_dir
+
+
+def terraform_calls(tmp_path):
+    return (tmp_path / "terraform.log").read_text().splitlines()
+
+
+def states():
+    return {
+        name: entry["state"] for name, entry in pool.load_pool()["environments"].items()
+    }
+
+
+def test_pool_fill_lease_and_reap(environments, tmp_path, capsys):
+    results = pool_cmd.maintain(size=2, base="dev")
+
+    assert all(outcome["ok"] for outcome in results.values())
+    assert states() == {"pool1": pool.READY, "pool2": pool.READY}
+    assert "pool1 apply -auto-approve" in terraform_calls(tmp_path)
+    catalog = load_catalog(environments)
+    assert catalog["pool1"]["cidrs"] != catalog["pool2"]["cidrs"]
+
+    name, _entry = lease_cmd.run(SimpleNamespace(owner="alice", ttl=60, no_refill=True))
+
+    assert name == "pool1"
+    tfvars = json.loads((environments / "pool1" / pool.LEASE_TFVARS).read_text())
+    assert tfvars["tags"]["leased_by"] == "alice"
+    assert tfvars["tags"]["environment"] == "pool1"
+    assert "Leased 'pool1' to alice" in capsys.readouterr().out
+
+    assert pool_cmd.release("pool1")
+    pool_cmd.maintain()
+
+    assert states() == {"pool2": pool.READY, "pool3": pool.READY}
+    assert "pool1 apply -auto-approve -destroy" in terraform_calls(tmp_path)
+    assert not (environments / "pool1").exists()
+    assert "pool1" not in load_catalog(environments)
+
+
+def test_maintain_applies_the_lease_tags(environments, tmp_path, monkeypatch):
+    monkeypatch.setattr(lease_cmd, "spawn_maintenance", lambda: None)
+    pool_cmd.maintain(size=1, base="dev")
+    lease_cmd.run(SimpleNamespace(owner="alice", ttl=60, no_refill=False))
+
+    results = pool_cmd.maintain()
+
+    assert results["pool1"]["ok"]
+    applies = [call for call in terraform_calls(tmp_path) if call.startswith("pool1 ")]
+    # Once when provisioned, once for the lease tags
+    assert [call for call in applies if " apply " in call] == [
+        "pool1 apply -auto-approve"
+    ] * 2
+    assert pool.load_pool()["environments"]["pool1"]["tags_applied"]
+    assert (environments / "pool1" / pool.LEASE_TFVARS).exists()
+
+
+def test_failed_provisioning_is_reaped(environments, monkeypatch):
+    monkeypatch.setenv("FAKE_TERRAFORM_FAIL", "pool1")
+
+    results = pool_cmd.maintain(size=1, base="dev")
+
+    assert not results["pool1"]["ok"]
+    assert states() == {"pool1": pool.FAILED}
+
+    monkeypatch.delenv("FAKE_TERRAFORM_FAIL")
+    pool_cmd.maintain()
+
+    assert states() == {"pool2": pool.READY}
+    assert not (environments / "pool1").exists()
+
+
+@pytest.mark.usefixtures("environments")
+def test_lease_from_empty_pool(capsys):
+    assert lease_cmd.run(SimpleNamespace(owner=None, ttl=60, no_refill=True)) is None
+    assert "No ready environment" in capsys.readouterr().out
+
+
+@pytest.mark.usefixtures("environments")
+def test_maintain_in_background(monkeypatch):
+    spawned = []
+    monkeypatch.setattr(
+        pool_cmd, "spawn_maintenance", lambda *args: spawned.append(args)
+    )
+
+    pool_cmd.run(
+        SimpleNamespace(
+            pool_command="maintain",
+            size=3,
+            base="dev",
+            workers=2,
+            foreground=False,
+            interval=None,
+        )
+    )
+
+    assert spawned == [(3, "dev")]
+    assert pool.load_pool()["environments"] == {}
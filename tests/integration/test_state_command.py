@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import cli.commands.state as state_cmd
+from cli.state_snapshots import list_snapshots, snapshot_state
+
+DEFAULT_ARGS = {
+    "state_command": "history",
+    "environment": "dev",
+    "limit": 20,
+    "snapshot": None,
+    "yes": True,
+}
+# Serials of the states the env_path fixture snapshots, oldest first
+SERIALS = (1, 2)
+
+
+@pytest.fixture
+def env_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(state_cmd, "ENVIRONMENTS_DIR", tmp_path)
+    path = tmp_path / "dev"
+    path.mkdir()
+    for serial in SERIALS:
+        (path / "terraform.tfstate").write_text(
+            json.dumps({"serial": serial, "resources": []})
+        )
+        snapshot_state(path, "post-apply")
+    return path
+
+
+def test_state_history_empty(capsys, make_args):
+    state_cmd.run(make_args(environment="stage"))
+    assert "No state snapshots for environment 'stage'" in capsys.readouterr().out
+
+
+@pytest.mark.usefixtures("env_path")
+def test_state_history_lists_newest_first(capsys, make_args):
+    state_cmd.run(make_args())
+
+    lines = capsys.readouterr().out.splitlines()
+    assert "State snapshots for environment 'dev'" in lines[0]
+    assert lines[1].split()[0] == "#2"
+    assert lines[2].split()[0] == "#1"
+    assert "serial 1, 0 resources" in lines[2]
+
+
+def test_state_restore(capsys, env_path, make_args):
+    state_cmd.run(make_args(state_command="restore", snapshot="1"))
+
+    out = capsys.readouterr().out
+    assert "Restoring state #1" in out
+    assert "State restored" in out
+    assert json.loads((env_path / "terraform.tfstate").read_text())["serial"] == 1
+    assert list_snapshots("dev")[-1]["reason"] == "restore of #1"
+
+
+def test_state_restore_cancelled(monkeypatch, capsys, env_path, make_args):
+    monkeypatch.setattr("builtins.input", lambda _prompt: "n")
+
+    state_cmd.run(make_args(state_command="restore", snapshot="1", yes=False))
+
+    assert "Restore cancelled" in capsys.readouterr().out
+    assert (
+        json.loads((env_path / "terraform.tfstate").read_text())["serial"]
+        == SERIALS[-1]
+    )
+
+
+@pytest.mark.usefixtures("env_path")
+def test_state_restore_unknown_snapshot(capsys, make_args):
+    state_cmd.run(make_args(state_command="restore", snapshot="42"))
+    assert "No single snapshot '42'" in capsys.readouterr().out
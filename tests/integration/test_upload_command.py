@@ -0,0 +1,281 @@
+import base64
+import hashlib
+import hmac
+import math
+import threading
+import urllib.parse
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.upload as upload_cmd
+from cli.blob_upload import AZURITE_ACCOUNT, AZURITE_KEY, md5_base64
+
+MIB = 1024 * 1024
+
+
+class FakeBlobService(ThreadingHTTPServer):
+    """
+    An Azurite stand-in: path-style URLs, Shared Key checked independently
+    of the client, and the Blob calls an upload makes.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.lock = threading.Lock()
+        self.containers = {}
+        self.blocks = {}
+        self.requests = []
+        self.fail_blocks = set()
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/{AZURITE_ACCOUNT}"
+
+    def count(self, operation):
+        return sum(request == operation for request in self.requests)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *_args):
+        pass
+
+    def _reply(self, status, headers=None, code=None):
+        self.send_response(status)
+        if code:
+            self.send_header("x-ms-error-code", code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _authorized(self, url):
+        length = self.headers.get("Content-Length", "")
+        ms_headers = sorted(
+            (name.lower(), value)
+            for name, value in self.headers.items()
+            if name.lower().startswith("x-ms-")
+        )
+        query = urllib.parse.parse_qs(url.query)
+        string_to_sign = "\n".join(
+            [
+                self.command,
+                "",
+                "",
+                "" if length == "0" else length,
+                self.headers.get("Content-MD5", ""),
+                self.headers.get("Content-Type", ""),
+                *[""] * 6,
+            ]
+        )
+        string_to_sign += "\n" + "".join(f"{n}:{v}\n" for n, v in ms_headers)
+        string_to_sign += f"/{AZURITE_ACCOUNT}{url.path}"
+        string_to_sign += "".join(
+            f"\n{name}:{','.join(values)}" for name, values in sorted(query.items())
+        )
+        signature = hmac.new(
+            base64.b64decode(AZURITE_KEY), string_to_sign.encode(), hashlib.sha256
+        ).digest()
+        expected = f"SharedKey {AZURITE_ACCOUNT}:{base64.b64encode(signature).decode()}"
+        return self.headers.get("Authorization") == expected
+
+    def _parse(self):
+        url = urllib.parse.urlsplit(self.path)
+        parts = urllib.parse.unquote(url.path).split("/", 3)[2:]
+        query = {
+            key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()
+        }
+        return url, parts[0], (parts[1] if len(parts) > 1 else None), query
+
+    def do_HEAD(self):
+        url, container, blob, _query = self._parse()
+        if not self._authorized(url):
+            return self._reply(403, code="AuthenticationFailed")
+        self.server.requests.append("head")
+        stored = self.server.containers.get(container, {}).get(blob)
+        if stored is None:
+            return self._reply(404, code="BlobNotFound")
+        return self._reply(200, {"Content-MD5": stored["md5"]})
+
+    def do_PUT(self):
+        url, container, blob, query = self._parse()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        md5 = self.headers.get("Content-MD5")
+        if not self._authorized(url):
+            self._reply(403, code="AuthenticationFailed")
+        elif md5 and md5 != md5_base64(body):
+            self._reply(400, code="Md5Mismatch")
+        else:
+            with self.server.lock:
+                self._put(container, blob, query, body)
+
+    def _put(self, container, blob, query, body):
+        if query.get("restype") == "container":
+            return self._create_container(container)
+        blobs = self.server.containers.get(container)
+        if blobs is None:
+            return self._reply(404, code="ContainerNotFound")
+        if query.get("comp") == "block":
+            return self._put_block(container, blob, query["blockid"], body)
+        if query.get("comp") == "blocklist":
+            return self._put_block_list(blobs, container, blob, body)
+        self.server.requests.append("put_blob")
+        blobs[blob] = {"data": body, "md5": md5_base64(body)}
+        return self._reply(201)
+
+    def _create_container(self, container):
+        server = self.server
+        server.requests.append("create_container")
+        if container in server.containers:
+            return self._reply(409, code="ContainerAlreadyExists")
+        server.containers[container] = {}
+        return self._reply(201)
+
+    def _put_block(self, container, blob, block_id, body):
+        server = self.server
+        server.requests.append("put_block")
+        if (blob, block_id) in server.fail_blocks:
+            server.fail_blocks.discard((blob, block_id))
+            return self._reply(400, code="InjectedFailure")
+        server.blocks.setdefault((container, blob), {})[block_id] = body
+        return self._reply(201)
+
+    def _put_block_list(self, blobs, container, blob, body):
+        server = self.server
+        server.requests.append("put_block_list")
+        uncommitted = server.blocks.pop((container, blob), {})
+        ids = [item.text for item in ET.fromstring(body)]
+        if any(block_id not in uncommitted for block_id in ids):
+            return self._reply(400, code="InvalidBlockList")
+        blobs[blob] = {
+            "data": b"".join(uncommitted[block_id] for block_id in ids),
+            "md5": self.headers["x-ms-blob-content-md5"],
+        }
+        return self._reply(201)
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    server = FakeBlobService()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(upload_cmd, "ENVIRONMENTS_DIR", tmp_path / "environments")
+    (tmp_path / "environments" / "dev").mkdir(parents=True)
+    monkeypatch.setenv(
+        "AZURE_STORAGE_CONNECTION_STRING",
+        f"DefaultEndpointsProtocol=http;AccountName={AZURITE_ACCOUNT};"
+        f"AccountKey={AZURITE_KEY};BlobEndpoint={server.endpoint};",
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    root = tmp_path / "dist"
+    (root / "web" / "static").mkdir(parents=True)
+    (root / "web" / "index.html").write_text("<h1>InfraBox</h1>")
+    (root / "web" / "static" / "app v1.js").write_text("console.log(1)")
+    (root / "image.bin").write_bytes(bytes(range(256)) * (10 * 1024))  # 2.5 MiB
+    return root
+
+
+def upload(path, **kwargs):
+    defaults = {
+        "environment": "dev",
+        "path": str(path),
+        "container": "artifacts",
+        "prefix": "",
+        "workers": 4,
+        "chunk_size": 1,
+        "dry_run": False,
+    }
+    return upload_cmd.run(SimpleNamespace(**{**defaults, **kwargs}))
+
+
+def test_upload_directory_in_blocks(service, artifacts, capsys):
+    assert upload(artifacts, prefix="build/42") == {}
+
+    blobs = service.containers["artifacts"]
+    assert sorted(blobs) == [
+        "build/42/image.bin",
+        "build/42/web/index.html",
+        "build/42/web/static/app v1.js",
+    ]
+    assert blobs["build/42/image.bin"]["data"] == (artifacts / "image.bin").read_bytes()
+    image_size = (artifacts / "image.bin").stat().st_size
+    assert service.count("put_block") == math.ceil(image_size / (1024 * 1024))
+    assert service.count("put_block_list") == 1
+    # The files below the 1 MiB chunk size are sent whole
+    assert service.count("put_blob") == len(blobs) - 1
+    out = capsys.readouterr().out
+    assert "Created container 'artifacts'" in out
+    assert "3 of 3 files" in out
+
+
+def test_unchanged_files_are_skipped(service, artifacts, capsys):
+    upload(artifacts)
+    (artifacts / "web" / "index.html").write_text("<h1>InfraBox 2</h1>")
+    service.requests.clear()
+
+    upload(artifacts)
+
+    assert service.count("put_blob") == 1
+    assert service.count("put_block") == 0
+    assert "1 of 3 files" in capsys.readouterr().out
+    assert service.containers["artifacts"]["web/index.html"]["data"] == (
+        b"<h1>InfraBox 2</h1>"
+    )
+
+
+def test_interrupted_upload_resumes(service, artifacts, capsys):
+    image = artifacts / "image.bin"
+    block_id = base64.b64encode(b"000001").decode()
+    service.fail_blocks.add(("image.bin", block_id))
+
+    failed = upload(image)
+
+    assert list(failed) == ["image.bin"]
+    assert "image.bin" not in service.containers["artifacts"]
+    assert "Run the same command again to resume" in capsys.readouterr().out
+
+    service.requests.clear()
+    assert upload(image) == {}
+
+    assert service.count("put_block") == 1
+    assert service.containers["artifacts"]["image.bin"]["data"] == image.read_bytes()
+
+
+def test_dry_run_uploads_nothing(service, artifacts, capsys):
+    assert upload(artifacts, dry_run=True) == {}
+    assert service.containers == {}
+    assert "image.bin (2.5 MiB)" in capsys.readouterr().out
+
+
+def test_wrong_key_is_reported(service, artifacts, monkeypatch, capsys):
+    monkeypatch.setenv(
+        "AZURE_STORAGE_CONNECTION_STRING",
+        f"AccountName={AZURITE_ACCOUNT};AccountKey={base64.b64encode(b'x').decode()};"
+        f"BlobEndpoint={service.endpoint}",
+    )
+
+    assert upload(artifacts) is None
+    assert "403 AuthenticationFailed" in capsys.readouterr().out
+
+
+def test_account_comes_from_terraform_outputs(monkeypatch, tmp_path):
+    monkeypatch.delenv("AZURE_STORAGE_CONNECTION_STRING", raising=False)
+    monkeypatch.setenv("AZURE_STORAGE_KEY", AZURITE_KEY)
+    monkeypatch.setattr(
+        upload_cmd,
+        "terraform_output",
+        lambda _path: {"storage_account_name": "infraboxdevsa01"},
+    )
+
+    credentials = upload_cmd.resolve_credentials(tmp_path)
+
+    assert credentials.account == "infraboxdevsa01"
+    assert credentials.endpoint == "https://infraboxdevsa01.blob.core.windows.net"
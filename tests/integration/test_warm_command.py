@@ -0,0 +1,88 @@
+from unittest import mock
+
+import pytest
+
+import cli.commands.warm as warm_cmd
+from cli.warm import is_warm
+
+DEFAULT_ARGS = {
+    "environments": ["dev"],
+    "all": False,
+    "validate": False,
+    "refresh": False,
+    "workers": 2,
+    "foreground": True,
+}
+ENVIRONMENTS = ("dev", "stage")
+
+
+@pytest.fixture
+def environments(monkeypatch, tmp_path):
+    monkeypatch.setattr(warm_cmd, "ENVIRONMENTS_DIR", tmp_path)
+    monkeypatch.setattr(warm_cmd.os, "nice", lambda _increment: 0)
+    for name in ENVIRONMENTS:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "main.tf").write_text(f"# {name}\n")
+    return tmp_path
+
+
+def fake_terraform(cmd, cwd, **_kwargs):
+    (cwd / ".terraform").mkdir(exist_ok=True)
+    return mock.Mock(returncode=0, cmd=cmd)
+
+
+def test_warm_requires_environments(capsys, make_args):
+    assert warm_cmd.run(make_args(environments=[])) is None
+    assert "Name the environments to warm" in capsys.readouterr().out
+
+
+def test_warm_initializes_then_skips(environments, capsys, make_args):
+    with mock.patch(
+        "cli.terraform_utils.run_cmd", side_effect=fake_terraform
+    ) as run_cmd:
+        results = warm_cmd.run(make_args(all=True, validate=True))
+        again = warm_cmd.run(make_args(all=True, validate=True))
+
+    assert [name for name, outcome in results.items() if outcome["ok"]] == list(
+        ENVIRONMENTS
+    )
+    # One init and one validate per environment, none on the second run
+    steps = [call.args[0][1] for call in run_cmd.call_args_list]
+    assert sorted(steps) == ["init"] * len(ENVIRONMENTS) + ["validate"] * len(
+        ENVIRONMENTS
+    )
+    assert again == {}
+    assert "stage is already warm" in capsys.readouterr().out
+    assert is_warm(environments / "dev", "validate")
+
+
+@pytest.mark.usefixtures("environments")
+def test_warm_refresh_accepts_drift(make_args):
+    def terraform(cmd, cwd, **kwargs):
+        result = fake_terraform(cmd, cwd, **kwargs)
+        if "-refresh-only" in cmd:
+            result.returncode = 2
+        return result
+
+    with mock.patch("cli.terraform_utils.run_cmd", side_effect=terraform):
+        results = warm_cmd.run(make_args(refresh=True))
+
+    assert results["dev"]["ok"]
+
+
+@pytest.mark.usefixtures("environments")
+def test_warm_skips_missing_environment(capsys, make_args):
+    warm_cmd.run(make_args(environments=["prod"]))
+    assert "'prod' does not exist, skipped" in capsys.readouterr().out
+
+
+@pytest.mark.usefixtures("environments")
+def test_warm_spawns_background_process(capsys, make_args):
+    with mock.patch.object(warm_cmd.subprocess, "Popen") as popen:
+        popen.return_value.pid = 4242
+        warm_cmd.run(make_args(environments=["stage"], foreground=False, refresh=True))
+
+    cmd = popen.call_args[0][0]
+    assert cmd[2:] == ["warm", "stage", "--foreground", "--workers", "2", "--refresh"]
+    assert popen.call_args[1]["start_new_session"] is True
+    assert "in the background (pid 4242)" in capsys.readouterr().out
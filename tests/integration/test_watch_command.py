@@ -0,0 +1,90 @@
+from unittest import mock
+
+import pytest
+
+import cli.commands.watch as watch_cmd
+from cli.infrastructure_templates import env as template_env
+
+VARIABLES_TEMPLATE = 'variable "environment" {\n  default = "{{ environment }}"\n}\n'
+MAIN_TEMPLATE = (
+    '# {{ environment }}\nmodule "network" {\n  source = "../../modules/network"\n}\n'
+)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    (templates / "variables.tf.j2").write_text(VARIABLES_TEMPLATE)
+    (templates / "main.tf.j2").write_text(MAIN_TEMPLATE)
+    (tmp_path / "modules" / "network").mkdir(parents=True)
+    (tmp_path / "modules" / "network" / "main.tf").write_text("# vnet\n")
+    (tmp_path / "modules" / "vm").mkdir()
+    (tmp_path / "modules" / "vm" / "main.tf").write_text("# vm\n")
+
+    for name in ("dev", "stage"):
+        env_path = tmp_path / "environments" / name
+        env_path.mkdir(parents=True)
+        context = {"environment": name}
+        for template in ("variables.tf", "main.tf"):
+            rendered = template_env.from_string(
+                (templates / f"{template}.j2").read_text()
+            ).render(context)
+            (env_path / template).write_text(rendered)
+        (env_path / ".terraform").mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def session(tree):
+    return watch_cmd.WatchSession(
+        tree / "environments", tree / "modules", tree / "templates"
+    )
+
+
+def test_module_change_affects_environments_using_it(tree, session):
+    environments, fmt_dirs = session.affected({tree / "modules/network/main.tf"})
+    assert environments == {tree / "environments/dev", tree / "environments/stage"}
+    assert fmt_dirs == {tree / "modules/network"}
+
+    assert session.affected({tree / "modules/vm/main.tf"}) == (
+        set(),
+        {tree / "modules/vm"},
+    )
+
+
+def test_environment_change_affects_only_that_environment(tree, session):
+    environments, _ = session.affected(
+        {tree / "environments/dev/main.tf", tree / "environments/dev/terraform.tfstate"}
+    )
+    assert environments == {tree / "environments/dev"}
+
+
+def test_template_change_rerenders_untouched_files_only(tree, session, capsys):
+    (tree / "environments/stage/main.tf").write_text("# edited by hand\n")
+    (tree / "templates/main.tf.j2").write_text(f"# v2\n{MAIN_TEMPLATE}")
+
+    environments, _ = session.affected({tree / "templates/main.tf.j2"})
+
+    assert environments == {tree / "environments/dev"}
+    assert (tree / "environments/dev/main.tf").read_text().startswith("# v2\n# dev")
+    assert (tree / "environments/stage/main.tf").read_text() == "# edited by hand\n"
+    assert "stage/main.tf was edited by hand" in capsys.readouterr().out
+    # The re-rendered file's own change event is not checked again
+    assert session.affected({tree / "environments/dev/main.tf"}) == (set(), set())
+
+
+def test_check_runs_fmt_and_validate_for_affected_roots(tree, session, monkeypatch):
+    ok = mock.Mock(returncode=0)
+    fmt = mock.Mock(return_value=ok)
+    validate = mock.Mock(return_value=ok)
+    monkeypatch.setattr(watch_cmd, "terraform_fmt", fmt)
+    monkeypatch.setattr(watch_cmd, "terraform_validate", validate)
+    (tree / "environments/stage/.terraform").rmdir()
+
+    results = session.check({tree / "modules/network/main.tf"})
+
+    fmt.assert_called_once_with(tree / "modules/network")
+    validate.assert_called_once_with(tree / "environments/dev")
+    assert set(results) == {"fmt modules/network", "validate dev"}
+    assert session.check({tree / "README.md"}) is None
@@ -0,0 +1,154 @@
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import cli.commands.clone as clone_mod
+import cli.commands.create as create_cmd
+import cli.commands.initialize as initialize_mod
+from cli import utils
+from cli.catalog import load_catalog
+from cli.env_config import load_environment_config
+from cli.workspaces import SHARED_ROOT, WORKSPACE_TFVARS
+
+# Stands in for Terraform: logs its calls and keeps per-workspace local state
+FAKE_TERRAFORM = """#!{python}
+import json
+import os
+import sys
+from pathlib import Path
+
+workspace = os.environ.get("TF_WORKSPACE")
+with open(os.environ["FAKE_TERRAFORM_LOG"], "a") as log:
+    log.write(f"{{Path.cwd().name}} {{workspace or '-'}} {{' '.join(sys.argv[1:])}}\\n")
+command = sys.argv[1]
+state_dir = Path("terraform.tfstate.d", workspace) if workspace else Path(".")
+if workspace and not state_dir.is_dir():
+    sys.exit(f"Currently selected workspace {{workspace!r}} does not exist")
+state = state_dir / "terraform.tfstate"
+if command == "init":
+    Path(".terraform").mkdir(exist_ok=True)
+    Path(".terraform.lock.hcl").write_text("# locked\\n")
+elif command == "workspace":
+    Path("terraform.tfstate.d", sys.argv[-1]).mkdir(parents=True, exist_ok=True)
+elif command == "plan":
+    for arg in sys.argv:
+        if arg.startswith("-out="):
+            Path(arg[5:]).write_text("plan")
+    sys.exit(0 if state.exists() else 2)
+elif command == "apply":
+    serial = json.loads(state.read_text())["serial"] + 1 if state.exists() else 1
+    state.write_text(json.dumps({{"serial": serial, "lineage": "x", "resources": []}}))
+elif command != "validate":
+    sys.exit(1)
+"""
+
+
+@pytest.fixture
+def environments(monkeypatch, tmp_path):
+    environments_dir = tmp_path / "environments"
+    environments_dir.mkdir()
+    for module in (clone_mod, initialize_mod, utils):
+        monkeypatch.setattr(module, "ENVIRONMENTS_DIR", environments_dir)
+    terraform = tmp_path / "terraform"
+    terraform.write_text(FAKE_TERRAFORM.format(python=sys.executable))
+    terraform.chmod(0o755)
+    monkeypatch.setenv("INFRABOX_TERRAFORM_BIN", str(terraform))
+    monkeypatch.setenv("FAKE_TERRAFORM_LOG", str(tmp_path / "terraform.log"))
+    return environments_dir
+
+
+def terraform_calls(tmp_path):
+    return (tmp_path / "terraform.log").read_text().splitlines()
+
+
+def initialize(environment, **kwargs):
+    with utils.answer_prompts():
+        initialize_mod.run(
+            SimpleNamespace(
+                environment=environment, dry_run=False, workspace=True, **kwargs
+            )
+        )
+
+
+def test_workspaces_share_one_initialized_root(environments, tmp_path):
+    initialize("dev")
+    initialize("stage")
+
+    assert sorted(p.name for p in (environments / "dev").iterdir()) == [
+        WORKSPACE_TFVARS
+    ]
+    shared = environments / SHARED_ROOT
+    assert (shared / "main.tf").exists()
+    assert 'required_version = ">= 1.4.0"' in (shared / "provider.tf").read_text()
+    calls = terraform_calls(tmp_path)
+    assert [call for call in calls if " init " in call] == [
+        "_shared - init -input=false"
+    ]
+    assert "_shared - workspace select -or-create=true stage" in calls
+
+    dev = load_environment_config(environments / "dev")
+    stage = load_environment_config(environments / "stage")
+    assert dev.vnet_address_space != stage.vnet_address_space
+    assert stage.tags["environment"] == "stage"
+    assert sorted(load_catalog(environments)) == ["dev", "stage"]
+
+
+def test_create_runs_in_the_environment_workspace(environments, tmp_path):
+    initialize("dev")
+    args = SimpleNamespace(
+        environment="dev",
+        regions=None,
+        dry_run=False,
+        resume=False,
+        trace_provider=False,
+        timings=False,
+        refresh="always",
+        refresh_ttl=900,
+        no_cache=False,
+        skip_preflight=True,
+    )
+
+    with utils.answer_prompts(approve=True):
+        create_cmd.run(args)
+
+    var_file = environments / "dev" / WORKSPACE_TFVARS
+    plans = [call for call in terraform_calls(tmp_path) if " plan " in call]
+    assert plans[0].startswith("_shared dev plan -detailed-exitcode")
+    assert f"-var-file={var_file.resolve()}" in plans[0]
+    state = (
+        environments / SHARED_ROOT / "terraform.tfstate.d" / "dev" / "terraform.tfstate"
+    )
+    assert json.loads(state.read_text())["serial"] == 1
+    assert not (environments / SHARED_ROOT / "terraform.tfstate").exists()
+    assert load_catalog(environments)["dev"]["last_applied_serial"] == 1
+
+
+def test_clone_of_a_workspace_environment_is_a_var_file(environments, capsys):
+    initialize("dev")
+
+    clone_mod.run(
+        SimpleNamespace(
+            source="dev",
+            target="qa",
+            location=None,
+            vnet_cidr=None,
+            subnet_cidr=None,
+            dry_run=False,
+        )
+    )
+
+    assert [p.name for p in (environments / "qa").iterdir()] == [WORKSPACE_TFVARS]
+    assert load_environment_config(environments / "qa").environment == "qa"
+    assert "'qa' is a workspace" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize(
+    "options", [{"fleet": True}, {"output_format": "json"}], ids=["fleet", "json"]
+)
+def test_workspace_rejects_other_root_shapes(environments, capsys, options):
+    initialize("dev", **options)
+
+    assert "--workspace" in capsys.readouterr().out
+    assert not (environments / "dev").exists()
@@ -0,0 +1,184 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from cli import apply_timings
+
+
+def event(event_type, ts, **fields):
+    return json.dumps({"type": event_type, "@timestamp": ts, **fields}) + "\n"
+
+
+def hook(address, action="create", **extra):
+    return {"resource": {"addr": address}, "action": action, **extra}
+
+
+RG = "module.resource_group.azurerm_resource_group.this"
+IP = "module.networking.azurerm_public_ip.this"
+VM = "module.virtual_machine.azurerm_linux_virtual_machine.this"
+SA = "module.storage_account.azurerm_storage_account.this"
+PROVIDER = '"[root] provider[\\"registry.terraform.io/hashicorp/azurerm\\"]"'
+# Terraform before 1.7 links resources through variable and output nodes
+GRAPH = f"""digraph {{
+\tsubgraph "root" {{
+\t\t"[root] {IP} (expand)" -> "[root] module.networking.var.rg_name (expand)"
+\t\t"[root] module.networking.var.rg_name (expand)" -> "[root] {RG} (expand)"
+\t\t"[root] {SA} (expand)" -> "[root] {RG} (expand)"
+\t\t"[root] {VM} (expand)" -> "[root] module.networking.output.ip_id (expand)"
+\t\t"[root] module.networking.output.ip_id (expand)" -> "[root] {IP} (expand)"
+\t\t"[root] {RG} (expand)" -> {PROVIDER}
+\t}}
+}}
+"""
+
+
+@pytest.fixture
+def recorder(capsys):
+    recorder = apply_timings.ApplyEventRecorder()
+    for line in [
+        event("version", "2024-05-01T10:00:00.000000Z"),
+        event("apply_start", "2024-05-01T10:00:00.000000Z", hook=hook(RG)),
+        event("apply_complete", "2024-05-01T10:00:05.000000Z", hook=hook(RG)),
+        event("apply_start", "2024-05-01T10:00:05.200000Z", hook=hook(IP)),
+        event("apply_start", "2024-05-01T10:00:05.300000Z", hook=hook(SA)),
+        event("apply_complete", "2024-05-01T10:00:09.000000Z", hook=hook(IP)),
+        event("apply_complete", "2024-05-01T10:00:30.000000Z", hook=hook(SA)),
+        event("apply_start", "2024-05-01T10:00:09.500000Z", hook=hook(VM)),
+        event("apply_complete", "2024-05-01T10:01:09.500000Z", hook=hook(VM)),
+    ]:
+        recorder(line)
+    capsys.readouterr()
+    return recorder
+
+
+def test_parse_event_timestamp_with_nanoseconds():
+    ts = apply_timings.parse_event_timestamp("2024-05-01T10:00:00.123456789-04:00")
+    assert ts == datetime(
+        2024, 5, 1, 10, 0, 0, 123456, tzinfo=timezone(timedelta(hours=-4))
+    )
+
+
+def test_parse_graph():
+    dependencies = apply_timings.parse_graph(GRAPH)
+    assert dependencies[SA] == {RG}
+    assert dependencies[RG] == {'provider["registry.terraform.io/hashicorp/azurerm"]'}
+    # Terraform 1.7 and later print resource nodes only, without decoration
+    assert apply_timings.parse_graph(f'  "{VM}" -> "{IP}"\n') == {VM: {IP}}
+
+
+def test_config_address():
+    assert (
+        apply_timings.config_address('module.vm["a"].azurerm_nic.this[0]')
+        == "module.vm.azurerm_nic.this"
+    )
+
+
+def test_recorder_durations(recorder):
+    assert recorder.duration((VM, "create")) == pytest.approx(60.0)
+    assert recorder.duration((SA, "create")) == pytest.approx(24.7)
+    assert recorder.total_seconds() == pytest.approx(69.5)
+
+
+def test_recorder_critical_path(recorder):
+    dependencies = apply_timings.parse_graph(GRAPH)
+    assert recorder.critical_path(dependencies) == [
+        [RG, "create"],
+        [IP, "create"],
+        [VM, "create"],
+    ]
+
+
+def test_critical_path_ignores_unrelated_timing(recorder):
+    # IP finishes just before VM starts, but VM only depends on RG
+    dependencies = {VM: {RG}, IP: {RG}, SA: {RG}}
+    assert recorder.critical_path(dependencies) == [[RG, "create"], [VM, "create"]]
+    assert recorder.critical_path({}) == []
+
+
+def test_critical_path_of_destroy_follows_dependents(capsys):
+    recorder = apply_timings.ApplyEventRecorder()
+    for address, start, end in ((VM, 0, 30), (SA, 0, 10), (IP, 30, 35), (RG, 35, 50)):
+        recorder(
+            event(
+                "apply_start",
+                f"2024-05-01T10:00:{start:02}Z",
+                hook=hook(address, "delete"),
+            )
+        )
+        recorder(
+            event(
+                "apply_complete",
+                f"2024-05-01T10:00:{end:02}Z",
+                hook=hook(address, "delete"),
+            )
+        )
+    capsys.readouterr()
+    assert recorder.critical_path(apply_timings.parse_graph(GRAPH)) == [
+        [VM, "delete"],
+        [IP, "delete"],
+        [RG, "delete"],
+    ]
+
+
+def test_replace_records_delete_and_create(capsys):
+    recorder = apply_timings.ApplyEventRecorder()
+    for action, start, end in (("delete", 0, 10), ("create", 10, 15)):
+        recorder(
+            event("apply_start", f"2024-05-01T10:00:{start:02}Z", hook=hook(IP, action))
+        )
+        recorder(
+            event(
+                "apply_complete", f"2024-05-01T10:00:{end:02}Z", hook=hook(IP, action)
+            )
+        )
+    capsys.readouterr()
+    timings = recorder.to_dict({IP: set()})
+    assert [(r["action"], r["seconds"]) for r in timings["resources"]] == [
+        ("delete", 10.0),
+        ("create", 5.0),
+    ]
+    assert timings["critical_path"] == [[IP, "delete"], [IP, "create"]]
+
+
+def test_recorder_prints_compact_progress(capsys):
+    recorder = apply_timings.ApplyEventRecorder()
+    recorder(
+        event(
+            "apply_complete",
+            "2024-05-01T10:00:05Z",
+            hook=hook(RG, elapsed_seconds=5),
+        )
+    )
+    recorder("not json\n")
+    out = capsys.readouterr().out
+    assert f"✅ {RG} (create) in 5s" in out
+    assert "not json" in out
+
+
+def test_recorder_marks_errors(capsys):
+    recorder = apply_timings.ApplyEventRecorder()
+    recorder(event("apply_start", "2024-05-01T10:00:00Z", hook=hook(VM)))
+    recorder(event("apply_errored", "2024-05-01T10:00:03Z", hook=hook(VM)))
+    [resource] = recorder.to_dict()["resources"]
+    assert resource["status"] == "errored"
+    assert "❌" in capsys.readouterr().out
+
+
+def test_print_timing_report(recorder, capsys):
+    apply_timings.print_timing_report(
+        recorder.to_dict(apply_timings.parse_graph(GRAPH))
+    )
+    out = capsys.readouterr().out
+    assert "Apply time per resource" in out
+    assert out.index(VM) < out.index(SA)
+    assert "Critical path (68.8s)" in out
+    assert f"→ {VM} (create, 60.0s)" in out
+
+
+def test_save_timings(tmp_path, recorder):
+    timings = recorder.to_dict(apply_timings.parse_graph(GRAPH))
+    path = apply_timings.save_timings(tmp_path / "dev", "run-1", timings)
+    saved = json.loads(path.read_text())
+    assert saved["run_id"] == "run-1"
+    assert saved["critical_path"] == [[RG, "create"], [IP, "create"], [VM, "create"]]
@@ -0,0 +1,113 @@
+import urllib.error
+from email.message import Message
+from unittest import mock
+
+import pytest
+
+from cli import blob_upload
+from cli.blob_upload import (
+    AZURITE_BLOB_ENDPOINT,
+    AZURITE_KEY,
+    BlobClient,
+    BlobStorageError,
+    StorageCredentials,
+    UploadManifest,
+    collect_files,
+    file_md5,
+    parse_connection_string,
+)
+
+
+def test_development_storage_is_azurite():
+    credentials = parse_connection_string("UseDevelopmentStorage=true")
+    assert credentials.endpoint == AZURITE_BLOB_ENDPOINT
+    assert credentials.key == AZURITE_KEY
+
+
+def test_connection_string_endpoint_from_suffix():
+    credentials = parse_connection_string(
+        "DefaultEndpointsProtocol=https;AccountName=acct;AccountKey=a2V5==;"
+        "EndpointSuffix=core.chinacloudapi.cn"
+    )
+    assert credentials.key == "a2V5=="
+    assert credentials.endpoint == "https://acct.blob.core.chinacloudapi.cn"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "AccountName=acct",
+        "AccountName=acct;AccountKey=a2V5;BlobEndpoint=file:///tmp/blobs",
+    ],
+)
+def test_invalid_connection_strings(text):
+    with pytest.raises(ValueError):
+        parse_connection_string(text)
+
+
+def test_collect_files(tmp_path):
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "c.txt").write_text("c")
+    (tmp_path / "a.txt").write_text("a")
+
+    assert collect_files(tmp_path, "/release/") == [
+        (tmp_path / "a.txt", "release/a.txt"),
+        (tmp_path / "b" / "c.txt", "release/b/c.txt"),
+    ]
+    assert collect_files(tmp_path / "a.txt") == [(tmp_path / "a.txt", "a.txt")]
+
+
+def test_manifest_reuses_md5_of_unchanged_files(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("a")
+    manifest = UploadManifest(tmp_path / "manifest.json")
+    stat = path.stat()
+    manifest.update("a.txt", size=stat.st_size, mtime_ns=stat.st_mtime_ns, md5="x")
+    manifest.save()
+
+    reloaded = UploadManifest(tmp_path / "manifest.json")
+
+    assert reloaded.local_md5("a.txt", stat) == "x"
+    path.write_text("ab")
+    assert reloaded.local_md5("a.txt", path.stat()) is None
+    assert file_md5(path) == blob_upload.md5_base64(b"ab")
+
+
+def test_string_to_sign_for_path_style_endpoint():
+    client = BlobClient(
+        StorageCredentials("acct", "a2V5", "http://127.0.0.1:10000/acct")
+    )
+
+    signed = client._string_to_sign(
+        "PUT",
+        "/acct/files/a b.txt",
+        {"comp": "block", "blockid": "MDA="},
+        {"Content-Length": "3", "x-ms-version": "2020-10-02", "x-ms-date": "D"},
+    )
+
+    assert signed == (
+        "PUT\n\n\n3\n\n\n\n\n\n\n\n\n"
+        "x-ms-date:D\nx-ms-version:2020-10-02\n"
+        "/acct/acct/files/a%20b.txt\nblockid:MDA=\ncomp:block"
+    )
+
+
+def test_server_errors_are_retried(monkeypatch):
+    client = BlobClient(StorageCredentials("acct", "a2V5", "https://acct.example"))
+    busy = urllib.error.HTTPError("https://acct.example", 503, "Busy", Message(), None)
+    monkeypatch.setattr(blob_upload.time, "sleep", lambda _seconds: None)
+
+    with mock.patch.object(client, "_send", side_effect=[busy, {"Content-MD5": "x"}]):
+        assert client.blob_md5("files", "a.txt") == "x"
+
+    missing = urllib.error.HTTPError(
+        "https://acct.example", 404, "Gone", Message(), None
+    )
+    with mock.patch.object(client, "_send", side_effect=[missing]):
+        assert client.blob_md5("files", "a.txt") is None
+
+    denied = urllib.error.HTTPError("https://acct.example", 403, "No", Message(), None)
+    send_denied = mock.patch.object(client, "_send", side_effect=[denied])
+    with send_denied as send, pytest.raises(BlobStorageError):
+        client.blob_md5("files", "a.txt")
+    assert send.call_count == 1
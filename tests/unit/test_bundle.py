@@ -0,0 +1,94 @@
+import json
+import subprocess
+import sys
+import zipfile
+from contextlib import nullcontext
+from types import SimpleNamespace
+
+import pytest
+from jinja2 import Environment
+
+import infrabox
+from cli import build_zipapp, bundle
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "infrabox.pyz"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(bundle.BUILD_INFO, json.dumps({"build_id": "abc"}))
+        zf.writestr("templates/main.tf.j2", "name = {{ name }}\n")
+        zf.writestr("modules/networking/main.tf", "# vnet\n")
+    return path
+
+
+def test_read_bundled_text_from_archive_and_checkout(archive, tmp_path):
+    assert bundle.read_bundled_text("modules/networking/main.tf", archive) == "# vnet\n"
+    assert bundle.read_bundled_text("missing.txt", archive) is None
+    (tmp_path / "notes.txt").write_text("hi")
+    assert bundle.read_bundled_text("notes.txt", tmp_path) == "hi"
+
+
+def test_archive_template_loader(archive):
+    env = Environment(loader=bundle.archive_template_loader(archive), autoescape=True)
+    assert env.get_template("main.tf.j2").render(name="dev") == "name = dev"
+
+
+def test_ensure_modules_extracts_once_per_build(archive, tmp_path, capsys):
+    root = tmp_path / "work"
+    assert bundle.ensure_modules(archive, root) is True
+    assert (root / "modules/networking/main.tf").read_text() == "# vnet\n"
+    assert "Extracted Terraform modules" in capsys.readouterr().out
+
+    (root / "modules/networking/main.tf").write_text("# edited\n")
+    assert bundle.ensure_modules(archive, root) is False
+    (root / "modules" / bundle.MODULES_STAMP).write_text("old\n")
+    assert bundle.ensure_modules(archive, root) is True
+    assert (root / "modules/networking/main.tf").read_text() == "# vnet\n"
+
+
+def test_ensure_modules_is_a_no_op_in_a_checkout(tmp_path):
+    assert bundle.ensure_modules(tmp_path, tmp_path / "work") is False
+
+
+def test_build_zipapp_bundles_code_data_and_bytecode(tmp_path):
+    output = build_zipapp.build(tmp_path / "dist" / "infrabox.pyz")
+
+    with zipfile.ZipFile(output) as zf:
+        names = set(zf.namelist())
+        info = json.loads(zf.read(bundle.BUILD_INFO))
+    assert {"__main__.py", "infrabox.py", "cli/utils.py", "cli/utils.pyc"} <= names
+    assert "templates/main.tf.j2" in names
+    assert "modules/networking/main.tf" in names
+    assert "jinja2/__init__.pyc" in names
+    assert not {"cli/build_zipapp.py", "cli/build_zipapp.pyc"} & names
+    assert not any(name.endswith(".so") or "__pycache__" in name for name in names)
+    assert info["python"] == f"{sys.version_info.major}.{sys.version_info.minor}"
+
+    result = subprocess.run(
+        [sys.executable, str(output), "--help"],
+        capture_output=True,
+        text=True,
+        cwd=tmp_path,
+        check=False,
+    )
+    assert result.returncode == 0
+    assert "InfraBox CLI" in result.stdout
+
+
+@pytest.mark.parametrize(("command", "extracted"), [("create", True), ("logs", False)])
+def test_main_extracts_modules_only_for_terraform_commands(
+    monkeypatch, command, extracted
+):
+    calls = []
+    monkeypatch.setattr(
+        infrabox, "parse_arguments", lambda: SimpleNamespace(command=command)
+    )
+    monkeypatch.setattr(infrabox, "ensure_modules", lambda: calls.append("extract"))
+    monkeypatch.setattr(infrabox, "run_command", lambda _args: None)
+    monkeypatch.setattr(infrabox, "track_command", lambda _command: nullcontext())
+    monkeypatch.setattr(infrabox, "flush_or_warn", lambda: None)
+
+    infrabox.main()
+
+    assert calls == (["extract"] if extracted else [])
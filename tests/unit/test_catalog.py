@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from cli import catalog
+
+
+def write_env(environments_dir, name, location="westeurope", vnet="10.1.0.0/16"):
+    env_path = environments_dir / name
+    env_path.mkdir(parents=True)
+    (env_path / "variables.tf").write_text(
+        f'variable "location" {{\n  default = "{location}"\n}}\n'
+        f'variable "vnet_address_space" {{\n  default = ["{vnet}"]\n}}\n'
+    )
+    return env_path
+
+
+@pytest.fixture
+def environments_dir(tmp_path):
+    return tmp_path / "environments"
+
+
+def test_load_catalog_scans_once(monkeypatch, environments_dir):
+    write_env(environments_dir, "dev")
+
+    environments = catalog.load_catalog(environments_dir)
+
+    assert environments["dev"]["location"] == "westeurope"
+    assert environments["dev"]["cidrs"] == ["10.1.0.0/16"]
+    assert environments["dev"]["last_run_status"] is None
+    # Later lookups read the catalog file instead of walking the tree
+    monkeypatch.setattr(catalog, "scan_environment_configs", None)
+    write_env(environments_dir, "qa")
+    assert set(catalog.load_catalog(environments_dir)) == {"dev"}
+    assert not catalog.contains("qa")
+
+
+def test_contains_parses_catalog_once(monkeypatch, environments_dir):
+    write_env(environments_dir, "dev")
+    catalog.load_catalog(environments_dir)
+    assert catalog.contains("dev")
+
+    monkeypatch.setattr(catalog, "_read", None)
+    assert catalog.contains("dev")
+    monkeypatch.undo()
+    # A rewritten catalog is parsed again
+    write_env(environments_dir, "qa")
+    catalog.rescan(environments_dir)
+    assert catalog.contains("qa")
+
+
+def test_register_and_unregister(environments_dir):
+    catalog.load_catalog(environments_dir)
+    env_path = write_env(environments_dir, "qa", location="northeurope")
+
+    catalog.register_environment(env_path)
+    assert catalog.load_catalog()["qa"]["location"] == "northeurope"
+
+    catalog.unregister_environment("qa")
+    assert "qa" not in catalog.load_catalog()
+
+
+def test_record_run_keeps_status_across_rescan(environments_dir):
+    env_path = write_env(environments_dir, "dev")
+    serial = 7
+    (env_path / "terraform.tfstate").write_text(json.dumps({"serial": serial}))
+
+    catalog.record_run(env_path, "apply", 0)
+    entry = catalog.load_catalog()["dev"]
+    assert entry["last_run_status"] == "applied"
+    assert entry["last_applied_serial"] == serial
+
+    catalog.record_run(env_path, "destroy", 1)
+    environments = catalog.rescan(environments_dir)
+    assert environments["dev"]["last_run_status"] == "destroy failed"
+    assert environments["dev"]["last_applied_serial"] == serial
+
+
+def test_rescan_drops_removed_environments(environments_dir):
+    write_env(environments_dir, "dev")
+    catalog.load_catalog(environments_dir)
+    (environments_dir / "dev" / "variables.tf").unlink()
+    (environments_dir / "dev").rmdir()
+
+    assert catalog.rescan(environments_dir) == {}
+
+
+def test_corrupt_catalog_is_rebuilt(environments_dir):
+    write_env(environments_dir, "dev")
+    path = catalog.get_catalog_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("{not json")
+
+    assert set(catalog.load_catalog(environments_dir)) == {"dev"}
+    assert json.loads(path.read_text())["version"] == catalog.CATALOG_VERSION
@@ -0,0 +1,138 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from cli import checkpoints
+
+
+def ok():
+    return SimpleNamespace(returncode=0)
+
+
+@pytest.fixture
+def env_path(tmp_path):
+    path = tmp_path / "dev"
+    (path / ".terraform").mkdir(parents=True)
+    (path / "main.tf").write_text('resource "x" "y" {}\n')
+    return path
+
+
+def make_checkpoint(env_path, operation="apply", resume=True):
+    return checkpoints.Checkpoint("dev", env_path, operation, resume=resume)
+
+
+def test_step_is_skipped_when_resuming(env_path, capsys):
+    calls = []
+    make_checkpoint(env_path).step("initialized", lambda: calls.append(1) or ok())
+
+    result = make_checkpoint(env_path).step(
+        "initialized", lambda: calls.append(2) or ok()
+    )
+
+    assert calls == [1]
+    assert result is None
+    assert "Skipping 'initialized' step" in capsys.readouterr().out
+
+
+def test_step_runs_again_without_resume(env_path):
+    calls = []
+    make_checkpoint(env_path).step("initialized", lambda: calls.append(1) or ok())
+    make_checkpoint(env_path, resume=False).step(
+        "initialized", lambda: calls.append(2) or ok()
+    )
+    assert calls == [1, 2]
+
+
+def test_failed_step_is_not_recorded(env_path):
+    checkpoint = make_checkpoint(env_path)
+    checkpoint.step("initialized", lambda: SimpleNamespace(returncode=1))
+    assert not make_checkpoint(env_path).completed("initialized")
+
+
+def test_config_change_invalidates_steps(env_path):
+    checkpoint = make_checkpoint(env_path)
+    checkpoint.record("rendered")
+    checkpoint.record("initialized")
+    (env_path / "main.tf").write_text('resource "x" "z" {}\n')
+
+    assert not make_checkpoint(env_path).completed("rendered")
+    assert not make_checkpoint(env_path).completed("initialized")
+
+
+def test_missing_terraform_dir_invalidates_later_steps(env_path):
+    checkpoint = make_checkpoint(env_path)
+    checkpoint.record("initialized")
+    checkpoint.record("validated")
+    (env_path / ".terraform").rmdir()
+
+    assert not make_checkpoint(env_path).completed("validated")
+
+
+def test_record_forgets_later_steps(env_path, isolated_state_dir):
+    checkpoint = make_checkpoint(env_path)
+    checkpoint.record("validated")
+    checkpoint.record("applied")
+    checkpoint.record("initialized")
+
+    saved = json.loads((isolated_state_dir / "checkpoints" / "dev.json").read_text())
+    assert set(saved["steps"]) == {"initialized"}
+
+
+def test_plan_saves_and_reuses_plan_file(env_path):
+    def has_changes(_env_path, plan_file, **_kwargs):
+        plan_file.write_bytes(b"plan")
+        return True
+
+    assert make_checkpoint(env_path).plan(has_changes, env_path) is True
+
+    def must_not_plan(*_a, **_k):
+        raise AssertionError("plan should be reused")
+
+    assert make_checkpoint(env_path).plan(must_not_plan, env_path) is True
+
+
+def test_tampered_plan_file_is_not_reused(env_path):
+    def has_changes(_env_path, plan_file, **_kwargs):
+        plan_file.write_bytes(b"plan")
+        return True
+
+    checkpoint = make_checkpoint(env_path)
+    checkpoint.plan(has_changes, env_path)
+    checkpoint.plan_file.write_bytes(b"other plan")
+
+    assert not make_checkpoint(env_path).completed("planned")
+
+
+def test_plan_of_other_operation_is_not_reused(env_path):
+    def has_changes(_env_path, plan_file, **_kwargs):
+        plan_file.write_bytes(b"plan")
+        return True
+
+    make_checkpoint(env_path, "apply").plan(has_changes, env_path)
+    assert not make_checkpoint(env_path, "destroy").completed("planned")
+
+
+def test_apply_uses_saved_plan_and_records(env_path):
+    checkpoint = make_checkpoint(env_path)
+    checkpoint.plan_file.parent.mkdir(parents=True, exist_ok=True)
+    checkpoint.plan_file.write_bytes(b"plan")
+    seen = {}
+
+    def apply(_env_path, **kwargs):
+        seen.update(kwargs)
+        return ok()
+
+    checkpoint.apply(apply, env_path, dry_run=False)
+
+    assert seen["plan_file"] == checkpoint.plan_file
+    assert not checkpoint.plan_file.exists()
+    assert make_checkpoint(env_path).completed("applied")
+
+
+def test_disabled_checkpoint_never_records(env_path, isolated_state_dir):
+    args = SimpleNamespace(dry_run=True, resume=True)
+    checkpoint = checkpoints.Checkpoint.for_run("dev", env_path, "apply", args)
+    checkpoint.step("initialized", ok)
+    checkpoint.plan(lambda _path, **kwargs: kwargs.get("plan_file"), env_path)
+    assert not (isolated_state_dir / "checkpoints" / "dev.json").exists()
@@ -0,0 +1,173 @@
+import ipaddress
+import json
+import shutil
+
+import pytest
+
+from cli import cidr_allocator
+
+
+def make_env(environments_dir, name, vnet, subnet):
+    env_dir = environments_dir / name
+    env_dir.mkdir(parents=True)
+    (env_dir / "variables.tf").write_text(
+        'variable "vnet_address_space" {\n'
+        "  type    = list(string)\n"
+        f'  default = ["{vnet}"]\n'
+        "}\n\n"
+        'variable "subnet_address_space" {\n'
+        "  type    = list(string)\n"
+        f'  default = ["{subnet}"]\n'
+        "}\n"
+    )
+    return env_dir
+
+
+def test_allocate_first_block_of_empty_pool():
+    pool = cidr_allocator.AddressPool("10.0.0.0/8")
+    assert pool.allocate(16) == "10.0.0.0/16"
+    assert pool.allocate(16) == "10.1.0.0/16"
+
+
+def test_allocate_skips_used_blocks_and_stays_aligned():
+    pool = cidr_allocator.AddressPool("10.0.0.0/8")
+    pool.mark_used("10.0.0.0/16")
+    pool.mark_used("10.1.5.0/24")
+    assert pool.allocate(16) == "10.2.0.0/16"
+    assert pool.allocate(24) == "10.1.0.0/24"
+
+
+def test_allocate_fills_gaps_first():
+    pool = cidr_allocator.AddressPool("10.0.0.0/8")
+    pool.mark_used("10.0.0.0/16")
+    pool.mark_used("10.2.0.0/16")
+    assert pool.allocate(16) == "10.1.0.0/16"
+
+
+def test_mark_used_ignores_blocks_outside_pool():
+    pool = cidr_allocator.AddressPool("10.0.0.0/8")
+    pool.mark_used("192.168.0.0/16")
+    assert pool.allocate(8) == "10.0.0.0/8"
+
+
+def test_allocate_exhausted_pool():
+    pool = cidr_allocator.AddressPool("10.0.0.0/15")
+    pool.allocate(16)
+    pool.allocate(16)
+    with pytest.raises(ValueError, match="No free /16 block"):
+        pool.allocate(16)
+
+
+def test_allocate_with_thousands_of_used_blocks():
+    pool = cidr_allocator.AddressPool("10.0.0.0/8")
+    for subnet in list(ipaddress.IPv4Network("10.0.0.0/8").subnets(new_prefix=20))[
+        :3000
+    ]:
+        pool.mark_used(str(subnet))
+    allocated = ipaddress.IPv4Network(pool.allocate(16))
+    assert allocated == ipaddress.IPv4Network("10.188.0.0/16")
+
+
+def test_mark_free_returns_block_to_pool():
+    pool = cidr_allocator.AddressPool("10.0.0.0/8")
+    pool.mark_used("10.0.0.0/15")
+    pool.mark_free("10.1.0.0/16")
+    assert pool.allocate(16) == "10.1.0.0/16"
+    assert pool.allocate(16) == "10.2.0.0/16"
+
+
+def test_set_owner_keeps_blocks_other_owners_use():
+    pool = cidr_allocator.AddressPool("10.0.0.0/8")
+    pool.set_owner("env:dev", ["10.0.0.0/16"])
+    pool.set_owner("reservation:qa", ["10.0.1.0/24"])
+    pool.set_owner("env:dev", ())
+    assert pool.allocate(24) == "10.0.0.0/24"
+    assert pool.allocate(24) == "10.0.2.0/24"
+
+
+def test_tree_round_trips_through_encoding():
+    pool = cidr_allocator.AddressPool("10.0.0.0/8")
+    for cidr in ("10.0.0.0/16", "10.2.0.0/16", "10.3.4.0/24"):
+        pool.mark_used(cidr)
+    decoded = cidr_allocator.AddressPool("10.0.0.0/8")
+    decoded.root = cidr_allocator._Node.decode(pool.root.encode(), 8)
+    assert [decoded.allocate(16), decoded.allocate(16)] == [
+        "10.1.0.0/16",
+        "10.4.0.0/16",
+    ]
+
+
+def test_saved_pool_is_updated_without_a_full_scan(tmp_path, monkeypatch):
+    make_env(tmp_path, "dev", "10.0.0.0/16", "10.0.1.0/24")
+    assert cidr_allocator.allocate_vnet_cidr("stage", tmp_path) == "10.1.0.0/16"
+
+    def no_scan(*_args, **_kwargs):
+        raise AssertionError("the saved tree should have been used")
+
+    monkeypatch.setattr(cidr_allocator, "scan_environment_configs", no_scan)
+    make_env(tmp_path, "qa", "10.2.0.0/16", "10.2.0.0/24")
+    assert cidr_allocator.allocate_vnet_cidr("prod", tmp_path) == "10.3.0.0/16"
+
+    shutil.rmtree(tmp_path / "dev")
+    assert cidr_allocator.allocate_vnet_cidr("ops", tmp_path) == "10.0.0.0/16"
+    cidr_allocator.release_cidrs("stage")
+    assert cidr_allocator.allocate_vnet_cidr("web", tmp_path) == "10.1.0.0/16"
+
+
+def test_allocate_vnet_cidr_avoids_hardcoded_module_cidrs(tmp_path):
+    env_dir = tmp_path / "dev"
+    env_dir.mkdir()
+    (env_dir / "main.tf").write_text('vnet_address_space = ["10.0.0.0/16"]\n')
+    assert cidr_allocator.allocate_vnet_cidr("stage", tmp_path) == "10.1.0.0/16"
+
+
+def test_allocate_vnet_cidr_avoids_existing_environments(tmp_path):
+    make_env(tmp_path, "dev", "10.0.0.0/16", "10.0.1.0/24")
+    assert cidr_allocator.allocate_vnet_cidr("stage", tmp_path) == "10.1.0.0/16"
+
+
+def test_allocate_vnet_cidr_reserves_block(tmp_path):
+    first = cidr_allocator.allocate_vnet_cidr("stage", tmp_path)
+    second = cidr_allocator.allocate_vnet_cidr("prod", tmp_path)
+    assert first != second
+    # Re-allocating for the same environment reuses its own reservation
+    assert cidr_allocator.allocate_vnet_cidr("stage", tmp_path) == first
+
+
+def test_allocate_vnet_cidr_without_reservation(tmp_path):
+    first = cidr_allocator.allocate_vnet_cidr("stage", tmp_path, reserve=False)
+    assert cidr_allocator.allocate_vnet_cidr("prod", tmp_path) == first
+
+
+def test_allocate_vnet_cidrs_gives_each_environment_its_own_block(tmp_path):
+    make_env(tmp_path, "dev", "10.0.0.0/16", "10.0.1.0/24")
+    cidrs = cidr_allocator.allocate_vnet_cidrs(
+        ["prod-westeurope", "prod-northeurope"], tmp_path, reserve=False
+    )
+    assert cidrs == {
+        "prod-westeurope": "10.1.0.0/16",
+        "prod-northeurope": "10.2.0.0/16",
+    }
+
+
+def test_release_cidrs(tmp_path, isolated_state_dir):
+    cidr_allocator.reserve_cidrs("stage", ["10.0.0.0/16", "10.0.1.0/24"])
+    cidr_allocator.release_cidrs("stage")
+    reservations = json.loads(
+        (isolated_state_dir / "cidr_reservations.json").read_text()
+    )
+    assert "stage" not in reservations
+    assert cidr_allocator.allocate_vnet_cidr("prod", tmp_path) == "10.0.0.0/16"
+
+
+def test_first_subnet():
+    assert cidr_allocator.first_subnet("10.3.0.0/16") == "10.3.0.0/24"
+    assert cidr_allocator.first_subnet("10.3.0.0/26") == "10.3.0.0/26"
+
+
+def test_allocation_lock_is_reentrant_within_a_thread(tmp_path):
+    with cidr_allocator.allocation_lock():
+        cidr_allocator.reserve_cidrs("stage", ["10.0.0.0/16"])
+        with cidr_allocator.allocation_lock():
+            pass
+        assert cidr_allocator.allocate_vnet_cidr("prod", tmp_path) == "10.1.0.0/16"
@@ -0,0 +1,372 @@
+import http.client
+import json
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+from types import SimpleNamespace
+
+import pytest
+
+from cli import daemon
+from cli.utils import prompt_user_confirmation
+
+JOB_RESULT = 42
+PROD_SECONDS = 600
+PRIVATE_MODE = 0o600
+
+
+def wait_for(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.done:
+        assert time.monotonic() < deadline, f"job {job.id} did not finish"
+        time.sleep(0.01)
+    return job
+
+
+def fake_runner(job):
+    print(f"running {job.command} {job.environment}")
+    if job.params.get("fail"):
+        raise RuntimeError("terraform apply failed")
+    return {"ok": True}
+
+
+@contextmanager
+def running_server():
+    # Started inside the test so that stdout routing survives output capture
+    with daemon.JobManager(workers=2, runner=fake_runner) as manager:
+        http_server = daemon.make_server(manager, port=0)
+        thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield http_server
+        finally:
+            http_server.shutdown()
+            http_server.server_close()
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    payload = json.dumps(body).encode() if body is not None else None
+    headers = {
+        "Authorization": f"Bearer {server.token}",
+        "Content-Type": "application/json",
+        **(headers or {}),
+    }
+    connection.request(method, path, body=payload, headers=headers)
+    response = connection.getresponse()
+    return response.status, response.read().decode()
+
+
+def test_job_manager_runs_job_and_collects_output():
+    with daemon.JobManager(
+        runner=lambda _job: print("hello\nworld") or JOB_RESULT
+    ) as manager:
+        job = wait_for(manager.submit("validate", "dev"))
+
+    assert job.status == "succeeded"
+    assert job.result == JOB_RESULT
+    assert job.lines == ["hello", "world"]
+
+
+def test_job_manager_reports_failures_and_exits():
+    def runner(_job):
+        raise SystemExit(1)
+
+    with daemon.JobManager(runner=runner) as manager:
+        job = wait_for(manager.submit("create", "dev"))
+
+    assert job.status == "failed"
+    assert job.error == "1"
+
+
+def test_job_manager_serializes_jobs_per_environment():
+    running = {"dev": 0, "stage": 0}
+    overlaps = []
+    order = []
+    lock = threading.Lock()
+
+    def runner(job):
+        with lock:
+            running[job.environment] += 1
+            if running[job.environment] > 1:
+                overlaps.append(job.environment)
+            order.append(job.params["n"])
+        time.sleep(0.02)
+        with lock:
+            running[job.environment] -= 1
+
+    with daemon.JobManager(workers=4, runner=runner) as manager:
+        jobs = [manager.submit("validate", "dev", {"n": n}) for n in range(4)]
+        jobs.append(manager.submit("validate", "stage", {"n": "stage"}))
+        for job in jobs:
+            wait_for(job)
+
+    assert overlaps == []
+    assert [n for n in order if n != "stage"] == [0, 1, 2, 3]
+    # The other environment did not wait behind the dev queue
+    assert order.index("stage") < order.index(3)
+
+
+def test_job_manager_serializes_jobs_per_region_environment():
+    running = set()
+    overlaps = []
+    lock = threading.Lock()
+
+    def runner(job):
+        with lock:
+            overlaps.extend(running.intersection(job.environments))
+            running.update(job.environments)
+        time.sleep(0.05)
+        with lock:
+            running.difference_update(job.environments)
+
+    with daemon.JobManager(workers=4, runner=runner) as manager:
+        regions = manager.submit("initialize", "web", {"regions": "westus,eastus"})
+        single = manager.submit("initialize", "web-eastus")
+        other = manager.submit("initialize", "web-centralus")
+        for job in (regions, single, other):
+            wait_for(job)
+
+    assert regions.environments == ("web-westus", "web-eastus")
+    assert overlaps == []
+    assert other.started_at < single.started_at
+
+
+def test_job_manager_rejects_invalid_jobs():
+    with daemon.JobManager(runner=lambda _job: None) as manager:
+        with pytest.raises(ValueError, match="Unsupported command"):
+            manager.submit("rm", "dev")
+        with pytest.raises(ValueError, match="Invalid environment"):
+            manager.submit("create", "../etc")
+        with pytest.raises(ValueError, match="invalid environment name"):
+            manager.submit("initialize", "qa_2")
+        with pytest.raises(ValueError, match="invalid region name"):
+            manager.submit("create", "prod", {"regions": ["west europe"]})
+        job = manager.submit("create", "prod", {"regions": "westeurope,northeurope"})
+        assert job.params["regions"] == ["westeurope", "northeurope"]
+        with pytest.raises(ValueError, match="Invalid refresh_ttl"):
+            manager.submit("create", "dev", {"refresh_ttl": "soon"})
+        with pytest.raises(ValueError, match="Invalid dry_run"):
+            manager.submit("create", "dev", {"dry_run": "yes"})
+        with pytest.raises(ValueError, match="Invalid answers"):
+            manager.submit("create", "dev", {"answers": ["y"]})
+
+
+@pytest.mark.parametrize("count", ["two", True, 0, 2.5])
+def test_job_manager_rejects_invalid_instance_counts(count):
+    with daemon.JobManager(runner=lambda _job: None) as manager:
+        with pytest.raises(ValueError, match="Invalid min_instances"):
+            manager.submit("initialize", "web", {"fleet": True, "min_instances": count})
+        job = manager.submit("initialize", "web", {"fleet": True, "instances": "3"})
+        assert isinstance(job.params["instances"], int)
+
+
+def test_run_job_command_create_answers_prompts(monkeypatch):
+    seen = {}
+
+    def fake_create(args):
+        seen["args"] = args
+        seen["approved"] = prompt_user_confirmation()
+        return SimpleNamespace(returncode=0)
+
+    monkeypatch.setattr(daemon.create, "run", fake_create)
+    job = daemon.Job("create", "dev", {"auto_approve": True, "dry_run": True})
+
+    daemon.run_job_command(job)
+
+    assert seen["approved"] is True
+    assert seen["args"].dry_run is True
+    assert seen["args"].regions is None
+
+
+def test_run_job_command_outputs(monkeypatch):
+    monkeypatch.setattr(daemon, "get_env_path", lambda env: f"/envs/{env}")
+    monkeypatch.setattr(
+        daemon, "terraform_output", lambda path, **_kwargs: {"path": path}
+    )
+    job = daemon.Job("outputs", "dev", {})
+    assert daemon.run_job_command(job) == {"path": "/envs/dev"}
+
+
+def test_http_submit_and_poll():
+    with running_server() as server:
+        status, body = request(
+            server, "POST", "/jobs", {"command": "validate", "environment": "dev"}
+        )
+        assert status == HTTPStatus.ACCEPTED
+        job_id = json.loads(body)["id"]
+
+        wait_for(server.manager.get(job_id))
+        status, body = request(server, "GET", f"/jobs/{job_id}")
+        job = json.loads(body)
+        assert status == HTTPStatus.OK
+        assert job["status"] == "succeeded"
+        assert job["result"] == {"ok": True}
+
+        status, body = request(server, "GET", "/jobs")
+        assert [j["id"] for j in json.loads(body)["jobs"]] == [job_id]
+
+
+def test_http_streams_events():
+    with running_server() as server:
+        _status, body = request(
+            server,
+            "POST",
+            "/jobs",
+            {"command": "create", "environment": "dev", "fail": True},
+        )
+        job_id = json.loads(body)["id"]
+
+        status, body = request(server, "GET", f"/jobs/{job_id}/events")
+        events = [json.loads(line) for line in body.splitlines()]
+
+        assert status == HTTPStatus.OK
+        assert {"line": "running create dev"} in events
+        assert events[-1]["status"] == "failed"
+        assert events[-1]["error"] == "terraform apply failed"
+
+
+@pytest.mark.parametrize(
+    "method, path, body, expected",
+    [
+        ("POST", "/jobs", {"command": "rm", "environment": "dev"}, 400),
+        ("GET", "/jobs/missing", None, 404),
+        ("GET", "/jobs/missing/events", None, 404),
+        ("GET", "/nowhere", None, 404),
+        ("GET", "/health", None, 200),
+    ],
+)
+def test_http_errors_and_health(method, path, body, expected):
+    with running_server() as server:
+        status, _body = request(server, method, path, body)
+    assert status == expected
+
+
+def test_metrics_endpoint_counts_jobs():
+    with running_server() as server:
+        _status, body = request(
+            server, "POST", "/jobs", {"command": "validate", "environment": "dev"}
+        )
+        job = wait_for(server.manager.get(json.loads(body)["id"]))
+        connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+        connection.request(
+            "GET", "/metrics", headers={"Authorization": f"Bearer {server.token}"}
+        )
+        response = connection.getresponse()
+        text = response.read().decode()
+
+    assert job.status == "succeeded"
+    assert response.status == HTTPStatus.OK
+    assert response.getheader("Content-Type").startswith("text/plain; version=0.0.4")
+    assert "# TYPE infrabox_command_duration_seconds histogram" in text
+    assert (
+        'infrabox_command_duration_seconds_count{command="validate",status="ok"} 1'
+        in text
+    )
+
+
+def test_unix_socket_server(tmp_path):
+    socket_path = tmp_path / "infrabox.sock"
+    with daemon.JobManager(runner=lambda _job: None) as manager:
+        unix_server = daemon.make_server(manager, socket_path=socket_path)
+        thread = threading.Thread(target=unix_server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(str(socket_path))
+            client.sendall(b"GET /health HTTP/1.0\r\n\r\n")
+            response = b""
+            while chunk := client.recv(4096):
+                response += chunk
+            client.close()
+        finally:
+            unix_server.shutdown()
+            unix_server.server_close()
+
+    assert response.startswith(b"HTTP/1.0 200")
+    assert response.endswith(b'{"status": "ok"}')
+    assert socket_path.stat().st_mode & 0o077 == 0
+
+
+def test_unix_socket_in_use_is_not_replaced(tmp_path):
+    socket_path = tmp_path / "infrabox.sock"
+    socket_path.write_text("not a socket")
+    with pytest.raises(FileExistsError):
+        daemon.make_server(daemon.JobManager(), socket_path=socket_path)
+    assert socket_path.read_text() == "not a socket"
+
+
+POST_JOB = {"command": "destroy", "environment": "prod", "auto_approve": True}
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({"Authorization": "Bearer wrong"}, 401),
+        ({"Content-Type": "text/plain"}, 415),
+        ({"Origin": "https://evil.example"}, 403),
+        ({"Host": "evil.example:8765"}, 403),
+    ],
+    ids=["token", "content-type", "origin", "host"],
+)
+def test_http_rejects_forgeable_requests(headers, expected):
+    with running_server() as server:
+        status, _body = request(server, "POST", "/jobs", POST_JOB, headers)
+        assert server.manager.list() == []
+    assert status == expected
+
+
+@pytest.mark.parametrize("length", ["-1", "many", None])
+def test_http_rejects_bad_content_length(length):
+    with running_server() as server:
+        connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+        connection.putrequest("POST", "/jobs")
+        connection.putheader("Authorization", f"Bearer {server.token}")
+        connection.putheader("Content-Type", "application/json")
+        if length is not None:
+            connection.putheader("Content-Length", length)
+        connection.endheaders()
+        status = connection.getresponse().status
+        assert server.manager.list() == []
+    assert status == HTTPStatus.BAD_REQUEST
+
+
+def test_token_file_is_private():
+    token = daemon.load_or_create_token()
+    assert daemon.load_or_create_token() == token
+    assert daemon.get_token_path().stat().st_mode & 0o777 == PRIVATE_MODE
+
+
+def test_warm_caches(monkeypatch, tmp_path):
+    (tmp_path / "dev").mkdir()
+    monkeypatch.setattr(daemon, "ENVIRONMENTS_DIR", tmp_path)
+    assert daemon.warm_caches() == 1
+
+
+def test_job_manager_starts_longest_expected_job_first(monkeypatch):
+    monkeypatch.setattr(
+        daemon,
+        "expected_seconds",
+        lambda environment, _phases: {"dev": 5, "stage": 60, "prod": PROD_SECONDS}[
+            environment
+        ],
+    )
+    gate = threading.Event()
+    order = []
+
+    def runner(job):
+        if job.environment == "dev":
+            gate.wait(5)
+        order.append(job.environment)
+
+    with daemon.JobManager(workers=1, runner=runner) as manager:
+        first = manager.submit("validate", "dev")
+        jobs = [manager.submit("validate", env) for env in ("stage", "prod")]
+        gate.set()
+        for job in [first, *jobs]:
+            wait_for(job)
+
+    assert order == ["dev", "prod", "stage"]
+    assert jobs[1].to_dict()["expected_seconds"] == PROD_SECONDS
@@ -0,0 +1,171 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cli import env_config
+from cli.env_config import config_cache
+
+VARIABLES_TF = """\
+# Generated by InfraBox
+variable "name_prefix" {
+  type    = string
+  default = "Infrabox"
+}
+
+variable "environment" {
+  type    = string
+  default = "stage"
+}
+
+variable "vnet_address_space" {
+  type    = list(string)
+  default = ["10.4.0.0/16"]
+}
+
+variable "subnet_address_space" {
+  type    = list(string)
+  default = ["10.4.0.0/24"]
+}
+
+variable "no_default" {
+  type = string
+}
+
+variable "tags" {
+  type = map(string)
+  default = {
+    project     = "InfraBox"
+    environment = "stage"
+  }
+}
+"""
+
+
+@pytest.fixture
+def env_dir(tmp_path):
+    env_dir = tmp_path / "stage"
+    env_dir.mkdir()
+    (env_dir / "variables.tf").write_text(VARIABLES_TF)
+    return env_dir
+
+
+def test_parse_variable_defaults():
+    defaults = env_config.parse_variable_defaults(VARIABLES_TF)
+    assert defaults["name_prefix"] == "Infrabox"
+    assert defaults["vnet_address_space"] == ["10.4.0.0/16"]
+    assert defaults["tags"] == {"project": "InfraBox", "environment": "stage"}
+    assert "no_default" not in defaults
+
+
+@pytest.mark.parametrize(
+    "literal,expected",
+    [
+        ("true", True),
+        ("null", None),
+        ("42", 42),
+        ("1.5", 1.5),
+        ('["a", "b",]', ["a", "b"]),
+        ('{ "k" : "v", other = 1 }', {"k": "v", "other": 1}),
+        ('"${var.x}-suffix"', "${var.x}-suffix"),
+    ],
+)
+def test_parse_variable_defaults_literals(literal, expected):
+    text = f'variable "x" {{\n  default = {literal}\n}}\n'
+    assert env_config.parse_variable_defaults(text) == {"x": expected}
+
+
+def test_parse_variable_defaults_skips_other_blocks():
+    text = 'locals {\n  a = "b"\n}\nvariable "x" {\n  default = "y"\n}\n'
+    assert env_config.parse_variable_defaults(text) == {"x": "y"}
+
+
+def test_parse_variable_defaults_rejects_unsupported_syntax():
+    with pytest.raises(env_config.HCLParseError):
+        env_config.parse_variable_defaults('variable "x" {\n  default = <<EOF\n')
+
+
+def test_load_environment_config(env_dir):
+    config = env_config.load_environment_config(env_dir)
+    assert config.name == "stage"
+    assert config.vnet_address_space == ("10.4.0.0/16",)
+    assert config.cidrs == ("10.4.0.0/16", "10.4.0.0/24")
+    assert config.template_context()["subnet_address_space"] == "10.4.0.0/24"
+
+
+def test_load_environment_config_reads_module_cidrs(tmp_path):
+    env_dir = tmp_path / "dev"
+    env_dir.mkdir()
+    (env_dir / "main.tf").write_text('vnet_address_space = ["10.0.0.0/16"]\n')
+    assert env_config.load_environment_config(env_dir).cidrs == ("10.0.0.0/16",)
+
+
+def test_load_environment_config_unparseable_file(tmp_path, capsys):
+    env_dir = tmp_path / "broken"
+    env_dir.mkdir()
+    (env_dir / "variables.tf").write_text("variable {")
+    config = env_config.load_environment_config(env_dir)
+    assert config.variables == {}
+    assert "Could not parse" in capsys.readouterr().out
+
+
+def test_unparseable_variables_keep_their_cidrs(tmp_path):
+    env_dir = tmp_path / "edited"
+    env_dir.mkdir()
+    (env_dir / "variables.tf").write_text(
+        'variable "vnet_address_space" {\n'
+        '  default = ["10.4.0.0/16"]\n'
+        "  validation {\n"
+        "    condition     = length(var.vnet_address_space) > 0\n"
+        '    error_message = "At least one range."\n'
+        "  }\n"
+        "}\n"
+    )
+    configs = env_config.scan_environment_configs(tmp_path)
+    assert [config.cidrs for config in configs] == [("10.4.0.0/16",)]
+
+
+def test_config_cache_memory_and_disk_hits(env_dir, isolated_state_dir):
+    env_config.load_environment_config(env_dir)
+    assert config_cache.stats["miss"] == 1
+    env_config.load_environment_config(env_dir)
+    assert config_cache.stats["memory"] == 1
+
+    cache_file = isolated_state_dir / "config_cache.json"
+    assert json.loads(cache_file.read_text())["version"] == 1
+
+    config_cache.clear()
+    config = env_config.load_environment_config(env_dir)
+    assert config_cache.stats["disk"] == 1
+    assert config.name_prefix == "Infrabox"
+
+
+def test_config_cache_concurrent_flushes_leave_valid_file(env_dir, isolated_state_dir):
+    caches = [env_config.ConfigCache() for _ in range(8)]
+    for cache in caches:
+        cache.parse(env_dir / "variables.tf", "variables", json.dumps)
+
+    with ThreadPoolExecutor(max_workers=len(caches)) as pool:
+        list(pool.map(lambda cache: cache.flush(), caches))
+
+    cache_file = isolated_state_dir / "config_cache.json"
+    assert json.loads(cache_file.read_text())["entries"]
+    assert [path.name for path in isolated_state_dir.iterdir()] == [cache_file.name]
+
+
+def test_config_cache_invalidated_by_edit(env_dir):
+    env_config.load_environment_config(env_dir)
+    variables_file = env_dir / "variables.tf"
+    variables_file.write_text(VARIABLES_TF.replace("Infrabox", "Edited"))
+    stat = variables_file.stat()
+    os.utime(variables_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    assert env_config.load_environment_config(env_dir).name_prefix == "Edited"
+
+
+def test_scan_environment_configs(tmp_path, env_dir):
+    (tmp_path / "not_a_dir").write_text("x")
+    (tmp_path / "empty").mkdir()
+    configs = env_config.scan_environment_configs(tmp_path, exclude="empty")
+    assert [c.name for c in configs] == [env_dir.name]
@@ -0,0 +1,36 @@
+import os
+
+from cli import file_links
+
+
+def test_link_file_prefers_hardlinks(tmp_path):
+    source = tmp_path / "a.bin"
+    source.write_bytes(b"data")
+    assert file_links.link_file(source, tmp_path / "out" / "b.bin") == "hardlink"
+    assert os.stat(tmp_path / "out" / "b.bin").st_ino == os.stat(source).st_ino
+
+
+def test_link_file_falls_back_when_links_fail(monkeypatch, tmp_path):
+    source = tmp_path / "a.bin"
+    source.write_bytes(b"data")
+
+    def refuse(*_args):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(file_links.os, "link", refuse)
+    monkeypatch.setattr(file_links.fcntl, "ioctl", refuse)
+    target = tmp_path / "b.bin"
+    assert file_links.link_file(source, target) == "copy"
+    assert target.read_bytes() == b"data"
+
+
+def test_link_tree_keeps_symlinks(tmp_path):
+    source = tmp_path / "src"
+    (source / "dir").mkdir(parents=True)
+    (source / "dir" / "file").write_text("x")
+    (source / "link").symlink_to("dir/file")
+
+    methods = file_links.link_tree(source, tmp_path / "dst")
+
+    assert methods == {"hardlink": 1, "symlink": 1}
+    assert os.readlink(tmp_path / "dst" / "link") == "dir/file"
@@ -0,0 +1,90 @@
+import sys
+
+import pytest
+
+from cli import file_watch
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux-only"
+)
+def test_inotify_watcher_reports_changes_in_new_directories(tmp_path):
+    (tmp_path / "modules").mkdir()
+    (tmp_path / ".terraform").mkdir()
+    watcher = file_watch.InotifyWatcher([tmp_path])
+    try:
+        (tmp_path / "main.tf").write_text("# edit\n")
+        assert tmp_path / "main.tf" in watcher.wait(1)
+
+        (tmp_path / "modules" / "vm").mkdir()
+        watcher.wait(1)
+        (tmp_path / "modules" / "vm" / "main.tf").write_text("# new module\n")
+        assert watcher.wait(1) == {tmp_path / "modules" / "vm" / "main.tf"}
+
+        (tmp_path / ".terraform" / "plugin").write_text("x")
+        assert watcher.wait(0.1) == set()
+    finally:
+        watcher.close()
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux-only"
+)
+def test_inotify_watcher_forgets_removed_directories(tmp_path):
+    (tmp_path / "modules").mkdir()
+    watcher = file_watch.InotifyWatcher([tmp_path])
+    try:
+        (tmp_path / "modules").rmdir()
+        watcher.wait(1)
+        assert list(watcher.dirs.values()) == [tmp_path]
+    finally:
+        watcher.close()
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux-only"
+)
+def test_inotify_watcher_rescans_after_an_overflow(tmp_path):
+    (tmp_path / "main.tf").write_text("# root\n")
+    watcher = file_watch.InotifyWatcher([tmp_path])
+    try:
+        # Created while events were being dropped
+        (tmp_path / "modules").mkdir()
+        (tmp_path / "modules" / "main.tf").write_text("# module\n")
+        overflow = file_watch.EVENT_HEADER.pack(-1, file_watch.IN_Q_OVERFLOW, 0, 0)
+
+        changed = watcher._changed_paths(overflow)
+
+        assert changed == {tmp_path / "main.tf", tmp_path / "modules" / "main.tf"}
+        assert tmp_path / "modules" in watcher.dirs.values()
+    finally:
+        watcher.close()
+
+
+def test_polling_watcher_reports_changes(tmp_path):
+    (tmp_path / "main.tf").write_text("a")
+    watcher = file_watch.PollingWatcher([tmp_path], interval=0.01)
+    assert watcher.wait(0) == set()
+
+    (tmp_path / "main.tf").write_text("ab")
+    (tmp_path / "new.tf").write_text("b")
+    assert watcher.wait(1) == {tmp_path / "main.tf", tmp_path / "new.tf"}
+
+
+def test_debounced_changes_merges_bursts():
+    class FakeWatcher:
+        def __init__(self):
+            self.batches = [{"a"}, {"b"}, set(), {"c"}, set()]
+
+        def wait(self, _timeout=None):
+            return self.batches.pop(0)
+
+    changes = file_watch.debounced_changes(FakeWatcher(), debounce=0.1)
+    assert next(changes) == {"a", "b"}
+    assert next(changes) == {"c"}
+
+
+def test_make_watcher_polls_on_request(tmp_path):
+    assert isinstance(
+        file_watch.make_watcher([tmp_path], poll=True), file_watch.PollingWatcher
+    )
@@ -0,0 +1,119 @@
+import shutil
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from cli import preflight
+from cli.env_config import EnvironmentConfig, parse_variable_defaults
+from cli.fleet import (
+    FLEET_MIN_INSTANCES,
+    fleet_context,
+    fleet_context_from_args,
+    fleet_context_from_variables,
+)
+from cli.infrastructure_templates import (
+    env,
+    generate_main_tf,
+    generate_outputs_tf,
+    generate_variables_tf,
+)
+from cli.profiles import profile_context
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def make_context(**fleet):
+    return {
+        "name_prefix": "InfraBox",
+        "environment": "prod",
+        "location": "westeurope",
+        "dns_zone_name": "infrabox-prod.com",
+        "admin_username": "azureuser",
+        "ssh_public_key_path": "~/.ssh/id_rsa_infrabox.pub",
+        "vnet_address_space": "10.0.0.0/16",
+        "subnet_address_space": "10.0.1.0/24",
+        **profile_context("general"),
+        **fleet_context(**fleet),
+    }
+
+
+def test_fleet_context_defaults_to_single_vm():
+    context = fleet_context()
+    assert context["fleet"] is False
+    assert "public_ip_sku" not in context
+
+
+def test_fleet_context_starts_at_min_and_needs_standard_ip():
+    min_instances = FLEET_MIN_INSTANCES + 1
+    context = fleet_context(True, min_instances, 6)
+    assert context["fleet_instances"] == min_instances
+    assert context["public_ip_sku"] == "Standard"
+
+
+@pytest.mark.parametrize(
+    ("min_instances", "max_instances", "instances"),
+    [(0, 4, None), (3, 2, None), (2, 4, 5), (2, 4, 1)],
+)
+def test_fleet_context_rejects_inconsistent_bounds(
+    min_instances, max_instances, instances
+):
+    with pytest.raises(ValueError, match="1 <= min <= instances <= max"):
+        fleet_context(True, min_instances, max_instances, instances)
+
+
+def test_bounds_are_not_checked_without_fleet():
+    assert fleet_context(False, 5, 1)["fleet"] is False
+
+
+def test_fleet_context_from_args_uses_defaults():
+    context = fleet_context_from_args(SimpleNamespace(fleet=True))
+    assert context["fleet_min_instances"] == FLEET_MIN_INSTANCES
+    assert context["fleet_instances"] == FLEET_MIN_INSTANCES
+
+
+def test_fleet_context_from_args_keeps_an_explicit_zero():
+    with pytest.raises(ValueError, match="1 <= min"):
+        fleet_context_from_args(SimpleNamespace(fleet=True, min_instances=0))
+
+
+def test_fleet_round_trips_through_variables():
+    context = make_context(enabled=True, min_instances=2, max_instances=5, instances=3)
+    variables = parse_variable_defaults(
+        env.get_template("variables.tf.j2").render(context)
+    )
+    config = EnvironmentConfig.from_variables("prod", variables)
+
+    assert fleet_context_from_variables(variables) == fleet_context(True, 2, 5, 3)
+    assert config.template_context()["public_ip_sku"] == "Standard"
+
+
+def test_single_vm_environment_has_no_fleet_variables():
+    variables = parse_variable_defaults(
+        env.get_template("variables.tf.j2").render(make_context())
+    )
+    assert "fleet_min_instances" not in variables
+    assert fleet_context_from_variables(variables)["fleet"] is False
+
+
+def test_fleet_environment_replaces_the_vm(tmp_path, capsys):
+    shutil.copytree(REPO_ROOT / "modules", tmp_path / "modules")
+    env_path = tmp_path / "environments" / "prod"
+    env_path.mkdir(parents=True)
+    key = tmp_path / "id_rsa.pub"
+    key.write_text("ssh-rsa AAAA test\n")
+    context = {
+        **make_context(enabled=True),
+        "ssh_public_key_path": str(key),
+    }
+    generate_variables_tf(env_path, context)
+    generate_main_tf(env_path, context)
+    generate_outputs_tf(env_path, context)
+
+    main = (env_path / "main.tf").read_text()
+    assert 'module "vm_fleet"' in main
+    assert 'module "virtual_machine"' not in main
+    assert "create_network_interface = false" in main
+    assert 'output "load_balancer_ip"' in (env_path / "outputs.tf").read_text()
+    assert preflight.run_preflight(env_path) == []
+    assert "Pre-flight checks passed for prod" in capsys.readouterr().out
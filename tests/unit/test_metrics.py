@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from cli import metrics
+
+
+def test_render_counters_and_histograms():
+    metrics.inc("infrabox_cache_lookups_total", cache="plan", result="hit")
+    metrics.inc("infrabox_cache_lookups_total", cache="plan", result="hit")
+    metrics.observe(
+        "infrabox_phase_duration_seconds", 7.5, environment="dev", phase="plan"
+    )
+
+    text = metrics.render(metrics.registry.take())
+
+    assert "# TYPE infrabox_cache_lookups_total counter" in text
+    assert 'infrabox_cache_lookups_total{cache="plan",result="hit"} 2' in text
+    assert "# TYPE infrabox_phase_duration_seconds histogram" in text
+    labels = 'environment="dev",phase="plan"'
+    assert f'infrabox_phase_duration_seconds_bucket{{{labels},le="5"}} 0' in text
+    assert f'infrabox_phase_duration_seconds_bucket{{{labels},le="10"}} 1' in text
+    assert f'infrabox_phase_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f"infrabox_phase_duration_seconds_sum{{{labels}}} 7.500" in text
+    assert f"infrabox_phase_duration_seconds_count{{{labels}}} 1" in text
+    # Metrics without samples are left out entirely
+    assert "infrabox_command_duration_seconds" not in text
+
+
+def test_render_escapes_label_values():
+    metrics.inc("infrabox_phase_runs_total", environment='a"b\\c', phase="plan", code=0)
+    text = metrics.render(metrics.registry.take())
+    assert 'environment="a\\"b\\\\c"' in text
+
+
+def test_flush_accumulates_across_runs(isolated_state_dir):
+    metrics.record_cache_lookup("config", "memory")
+    metrics.flush()
+    metrics.record_cache_lookup("config", "memory")
+    metrics.record_cache_lookup("config", "miss")
+    text = metrics.flush()
+
+    assert 'infrabox_cache_lookups_total{cache="config",result="memory"} 2' in text
+    assert 'infrabox_cache_lookups_total{cache="config",result="miss"} 1' in text
+    textfile = isolated_state_dir / "metrics" / "infrabox.prom"
+    assert textfile.read_text() == text
+    # Nothing left to add: flushing again keeps the totals
+    assert metrics.flush() == text
+
+
+def test_textfile_path_override(monkeypatch, tmp_path):
+    textfile = tmp_path / "collector" / "infrabox.prom"
+    monkeypatch.setenv("INFRABOX_METRICS_FILE", str(textfile))
+    metrics.record_cache_lookup("plan", "miss")
+
+    text = metrics.flush()
+
+    assert textfile.read_text() == text
+
+
+def test_flush_recovers_from_corrupt_totals(isolated_state_dir):
+    metrics_dir = isolated_state_dir / "metrics"
+    metrics_dir.mkdir()
+    (metrics_dir / "totals.json").write_text("{not json")
+    metrics.record_cache_lookup("plan", "hit")
+
+    assert 'result="hit"} 1' in metrics.flush()
+
+
+def test_track_command_labels_status():
+    with metrics.track_command("create"):
+        pass
+    with pytest.raises(RuntimeError), metrics.track_command("create"):
+        raise RuntimeError("boom")
+
+    text = metrics.render(metrics.registry.take())
+    assert (
+        'infrabox_command_duration_seconds_count{command="create",status="ok"} 1'
+        in (text)
+    )
+    assert (
+        'infrabox_command_duration_seconds_count{command="create",status="error"} 1'
+        in text
+    )
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        (
+            "Apply complete! Resources: 3 added, 1 changed, 0 destroyed.",
+            {"added": 3, "changed": 1},
+        ),
+        ("Destroy complete! Resources: 4 destroyed.", {"destroyed": 4}),
+        ("Plan: 3 to add, 0 to change, 0 to destroy.", {}),
+    ],
+)
+def test_observe_output(line, expected):
+    metrics.observe_output("dev", line)
+    series = metrics.registry.take()["counters"].get(
+        "infrabox_resources_changed_total", {}
+    )
+    found = {
+        dict(tuple(pair) for pair in json.loads(key))["action"]: value
+        for key, value in series.items()
+    }
+    assert found == expected
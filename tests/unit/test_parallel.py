@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from cli import parallel
+
+
+def test_run_parallel_collects_results_in_submission_order():
+    results = parallel.run_parallel([("b", lambda: "planned"), ("a", lambda: None)])
+    assert list(results) == ["b", "a"]
+    assert results["b"]["ok"] is True
+    assert results["b"]["result"] == "planned"
+    assert results["a"]["seconds"] >= 0
+
+
+@pytest.mark.parametrize("error", [RuntimeError, TypeError])
+def test_run_parallel_failure_does_not_stop_other_jobs(capsys, error):
+    def failing():
+        raise error("terraform init failed")
+
+    results = parallel.run_parallel([("bad", failing), ("good", lambda: "done")])
+    out = capsys.readouterr().out
+    assert results["bad"]["ok"] is False
+    assert str(results["bad"]["error"]) == "terraform init failed"
+    assert results["good"]["result"] == "done"
+    assert "[bad] INFRABOX: ❌ terraform init failed" in out
+
+
+def test_run_parallel_runs_jobs_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    results = parallel.run_parallel([("a", barrier.wait), ("b", barrier.wait)])
+    assert all(outcome["ok"] for outcome in results.values())
+
+
+def test_prefixed_output_keeps_lines_from_jobs_apart(capsys):
+    parallel.run_parallel(
+        [
+            ("one", lambda: print("first\nsecond")),
+            ("two", lambda: print("partial", end="")),
+        ]
+    )
+    lines = capsys.readouterr().out.splitlines()
+    assert "[one] first" in lines
+    assert "[one] second" in lines
+    # Unterminated output is flushed when the job ends
+    assert "[two] partial" in lines
+
+
+def test_print_summary(capsys):
+    results = {
+        "prod-westeurope": {"ok": True, "result": True, "error": None, "seconds": 1},
+        "prod-northeurope": {
+            "ok": False,
+            "result": None,
+            "error": RuntimeError("boom"),
+            "seconds": 2,
+        },
+    }
+    parallel.print_summary(
+        "Plan summary", results, {"prod-westeurope": "changes detected"}
+    )
+    out = capsys.readouterr().out
+    assert "📋 Plan summary" in out
+    assert "✅ prod-westeurope " in out
+    assert "changes detected" in out
+    assert "❌ prod-northeurope" in out
+    assert "boom" in out
+
+
+def test_run_parallel_starts_longest_expected_job_first(capsys):
+    started = []
+    jobs = [(name, lambda name=name: started.append(name)) for name in "abc"]
+
+    results = parallel.run_parallel(
+        jobs, max_workers=1, expected={"a": 1, "b": 30, "c": 5}
+    )
+
+    assert started == ["b", "c", "a"]
+    # Results keep the caller's order
+    assert list(results) == ["a", "b", "c"]
+    out = capsys.readouterr().out
+    assert "Expected duration: about 36s, longest first: b, c, a" in out
+    assert "1/3 jobs done, about 6s left" in out
+
+
+def test_estimate_remaining():
+    # The short jobs share one worker while the long one runs on the other
+    long_job = 30
+    assert parallel.estimate_remaining([], [long_job, 5, 1], workers=2) == long_job
+    # Both jobs run back to back on the idle worker, outlasting the busy one
+    running, job = 10, 8
+    assert parallel.estimate_remaining([running], [job, job], workers=2) == job * 2
+    assert parallel.estimate_remaining([], [], workers=4) == 0
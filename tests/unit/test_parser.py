@@ -4,7 +4,7 @@ from io import StringIO
 
 import pytest
 
-from cli import parser
+from cli import catalog, parser
 
 
 @pytest.mark.parametrize(
@@ -18,6 +18,14 @@ from cli import parser
             ["prog", "create", "stage", "--dry-run"],
             {"command": "create", "environment": "stage", "dry_run": True},
         ),
+        (
+            ["prog", "create", "dev", "--trace-provider"],
+            {"command": "create", "environment": "dev", "trace_provider": True},
+        ),
+        (
+            ["prog", "destroy", "dev", "--timings"],
+            {"command": "destroy", "environment": "dev", "timings": True},
+        ),
         (
             ["prog", "destroy", "dev"],
             {"command": "destroy", "environment": "dev", "dry_run": False},
@@ -38,6 +46,165 @@ from cli import parser
             ["prog", "initialize", "stage", "--dry-run"],
             {"command": "initialize", "environment": "stage", "dry_run": True},
         ),
+        (
+            ["prog", "initialize", "prod", "--regions", "westeurope, NorthEurope"],
+            {"command": "initialize", "regions": ["westeurope", "northeurope"]},
+        ),
+        (
+            ["prog", "create", "prod", "--regions", "westeurope,westeurope"],
+            {"command": "create", "regions": ["westeurope"]},
+        ),
+        (
+            ["prog", "destroy", "dev"],
+            {"command": "destroy", "regions": None},
+        ),
+        (
+            ["prog", "create", "dev", "--resume"],
+            {"command": "create", "resume": True},
+        ),
+        (
+            ["prog", "initialize", "dev"],
+            {"command": "initialize", "resume": False},
+        ),
+        (
+            ["prog", "create", "dev"],
+            {"command": "create", "refresh": "always", "refresh_ttl": 900},
+        ),
+        (
+            ["prog", "destroy", "dev", "--refresh", "auto", "--refresh-ttl", "60"],
+            {"command": "destroy", "refresh": "auto", "refresh_ttl": 60},
+        ),
+        (
+            ["prog", "create", "dev"],
+            {"command": "create", "no_cache": False},
+        ),
+        (
+            ["prog", "destroy", "dev", "--no-cache"],
+            {"command": "destroy", "no_cache": True},
+        ),
+        (
+            ["prog", "initialize", "perf", "--profile", "io"],
+            {"command": "initialize", "profile": "io"},
+        ),
+        (
+            ["prog", "initialize", "web", "--fleet", "--max-instances", "6"],
+            {
+                "command": "initialize",
+                "fleet": True,
+                "min_instances": 2,
+                "max_instances": 6,
+                "instances": None,
+            },
+        ),
+        (
+            ["prog", "initialize", "qa", "--workspace"],
+            {"command": "initialize", "workspace": True, "fleet": False},
+        ),
+        (
+            ["prog", "lease", "--owner", "alice", "--ttl", "3600"],
+            {"command": "lease", "owner": "alice", "ttl": 3600, "no_refill": False},
+        ),
+        (
+            ["prog", "pool", "maintain", "--size", "3", "--base", "dev"],
+            {
+                "command": "pool",
+                "pool_command": "maintain",
+                "size": 3,
+                "base": "dev",
+                "foreground": False,
+                "interval": None,
+            },
+        ),
+        (
+            ["prog", "upload", "dev", "dist", "--chunk-size", "8"],
+            {
+                "command": "upload",
+                "path": "dist",
+                "container": "artifacts",
+                "chunk_size": 8,
+                "workers": 8,
+            },
+        ),
+        (
+            ["prog", "fleet", "dev"],
+            {"command": "fleet", "environment": "dev"},
+        ),
+        (
+            ["prog", "create", "dev", "--skip-preflight"],
+            {"command": "create", "skip_preflight": True},
+        ),
+        (
+            ["prog", "clone", "dev", "stage", "--location", "northeurope"],
+            {"command": "clone", "source": "dev", "target": "stage", "vnet_cidr": None},
+        ),
+        (
+            ["prog", "history", "--slowest"],
+            {"command": "history", "environment": None, "slowest": True, "limit": 20},
+        ),
+        (
+            ["prog", "watch", "--debounce", "0.5"],
+            {"command": "watch", "debounce": 0.5, "poll": False},
+        ),
+        (
+            ["prog", "serve"],
+            {"command": "serve", "host": "127.0.0.1", "port": 8765, "socket": None},
+        ),
+        (
+            ["prog", "serve", "--socket", "/tmp/infrabox.sock", "--workers", "2"],
+            {"command": "serve", "socket": "/tmp/infrabox.sock", "workers": 2},
+        ),
+        (
+            ["prog", "state", "history", "dev"],
+            {
+                "command": "state",
+                "state_command": "history",
+                "environment": "dev",
+                "limit": 20,
+            },
+        ),
+        (
+            ["prog", "state", "restore", "prod", "3", "--yes"],
+            {
+                "command": "state",
+                "state_command": "restore",
+                "environment": "prod",
+                "snapshot": "3",
+                "yes": True,
+            },
+        ),
+        (
+            ["prog", "initialize", "qa-2"],
+            {"command": "initialize", "environment": "qa-2", "output_format": "hcl"},
+        ),
+        (
+            ["prog", "clone", "dev", "feature-123-ab"],
+            {"command": "clone", "target": "feature-123-ab"},
+        ),
+        (
+            ["prog", "initialize", "dev", "--format", "json"],
+            {"command": "initialize", "environment": "dev", "output_format": "json"},
+        ),
+        (["prog", "list", "--rescan"], {"command": "list", "rescan": True}),
+        (
+            ["prog", "warm", "dev", "prod", "--validate"],
+            {
+                "command": "warm",
+                "environments": ["dev", "prod"],
+                "all": False,
+                "validate": True,
+                "refresh": False,
+                "workers": 2,
+                "foreground": False,
+            },
+        ),
+        (
+            ["prog", "logs", "dev"],
+            {"command": "logs", "environment": "dev", "run": None, "grep": None},
+        ),
+        (
+            ["prog", "logs", "prod", "--run", "2024", "--grep", "Error"],
+            {"command": "logs", "environment": "prod", "run": "2024", "grep": "Error"},
+        ),
     ],
 )
 def test_parse_arguments_valid(monkeypatch, argv, expected):
@@ -47,6 +214,22 @@ def test_parse_arguments_valid(monkeypatch, argv, expected):
         assert getattr(args, k) == v
 
 
+def test_parse_arguments_accepts_catalogued_environment(monkeypatch, tmp_path):
+    (tmp_path / "qa").mkdir()
+    catalog.rescan(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["prog", "create", "qa"])
+    assert parser.parse_arguments().environment == "qa"
+
+
+def test_parse_arguments_rescans_for_uncatalogued_environment(monkeypatch, tmp_path):
+    catalog.rescan(tmp_path)
+    (tmp_path / "qa").mkdir()
+    monkeypatch.setattr(parser, "ENVIRONMENTS_DIR", tmp_path)
+    monkeypatch.setattr(sys, "argv", ["prog", "create", "qa"])
+    assert parser.parse_arguments().environment == "qa"
+    assert catalog.contains("qa")
+
+
 @pytest.mark.parametrize(
     "argv, error_text",
     [
@@ -55,7 +238,38 @@ def test_parse_arguments_valid(monkeypatch, argv, expected):
         (["prog", "destroy"], "the following arguments are required: environment"),
         (["prog", "create", "bar"], "invalid choice: 'bar'"),
         (["prog", "destroy", "pseudo"], "invalid choice: 'pseudo'"),
-        (["prog", "initialize", "foo"], "invalid choice: 'foo'"),
+        (["prog", "initialize", "Foo!"], "invalid environment name: 'Foo!'"),
+        (["prog", "clone", "dev", "../prod"], "invalid environment name"),
+        (["prog", "initialize", "qa_2"], "invalid environment name: 'qa_2'"),
+        (["prog", "clone", "dev", "integration-13"], "at most 12 letters and digits"),
+        (["prog", "create", "dev", "--refresh", "sometimes"], "invalid choice"),
+        (["prog", "warm", "nope"], "invalid choice: 'nope'"),
+        (
+            ["prog", "warm", "dev", "--workers", "0"],
+            "must be a positive integer: '0'",
+        ),
+        (["prog", "history", "--limit", "-1"], "must be a positive integer: '-1'"),
+        (["prog", "state", "history", "dev", "--limit", "0"], "positive integer"),
+        (["prog", "state", "restore", "nope", "1"], "invalid choice: 'nope'"),
+        (["prog", "serve", "--workers", "0"], "must be a positive integer: '0'"),
+        (
+            ["prog", "upload", "dev", "dist", "--chunk-size", "4001"],
+            "must be at most 4000 MiB: '4001'",
+        ),
+        (["prog", "pool", "maintain", "--base", "nope"], "invalid choice: 'nope'"),
+        (
+            ["prog", "pool", "maintain", "--workers", "0"],
+            "must be a positive integer: '0'",
+        ),
+        (
+            ["prog", "initialize", "web", "--instances", "0"],
+            "must be a positive integer: '0'",
+        ),
+        (
+            ["prog", "create", "dev", "--regions", "west/europe"],
+            "invalid region name: 'west/europe'",
+        ),
+        (["prog", "create", "dev", "--regions", ","], "expected at least one region"),
     ],
 )
 def test_parse_arguments_invalid(monkeypatch, argv, error_text):
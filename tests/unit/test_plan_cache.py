@@ -0,0 +1,88 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from cli import plan_cache
+
+
+@pytest.fixture
+def env_path(tmp_path):
+    module_dir = tmp_path / "modules" / "network"
+    module_dir.mkdir(parents=True)
+    (module_dir / "main.tf").write_text('resource "x" "vnet" {}\n')
+    path = tmp_path / "environments" / "dev"
+    path.mkdir(parents=True)
+    (path / "main.tf").write_text(
+        'module "network" {\n  source = "../../modules/network"\n}\n'
+    )
+    return path
+
+
+def write_state(env_path, serial):
+    (env_path / "terraform.tfstate").write_text(
+        json.dumps({"serial": serial, "lineage": "abc"})
+    )
+
+
+def test_module_directories_follow_local_sources(env_path):
+    assert plan_cache.module_directories(env_path) == [
+        (env_path / "../../modules/network").resolve()
+    ]
+
+
+def test_no_changes_outcome_is_reused(env_path):
+    assert plan_cache.cached_no_changes(env_path) is None
+    plan_cache.record_plan_outcome(env_path, has_changes=False)
+    assert plan_cache.cached_no_changes(env_path) < plan_cache.NO_CHANGES_TTL_SECONDS
+    # Written through a temp file that was renamed into place
+    cache_path = plan_cache.get_plan_cache_path("dev")
+    assert list(cache_path.parent.iterdir()) == [cache_path]
+    assert plan_cache.cached_no_changes(env_path, destroy=True) is None
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda env: (env / "main.tf").write_text("# edited\n"),
+        lambda env: (env.parent.parent / "modules/network/main.tf").write_text("#\n"),
+        lambda env: (env / ".terraform.lock.hcl").write_text("# lock\n"),
+        lambda env: write_state(env, 2),
+    ],
+)
+def test_input_or_state_change_invalidates(env_path, change):
+    write_state(env_path, 1)
+    plan_cache.record_plan_outcome(env_path, has_changes=False)
+    change(env_path)
+    assert plan_cache.cached_no_changes(env_path) is None
+
+
+def test_changes_and_expiry_drop_the_entry(env_path):
+    plan_cache.record_plan_outcome(env_path, has_changes=False)
+    assert plan_cache.cached_no_changes(env_path, ttl=-1) is None
+    plan_cache.record_plan_outcome(env_path, has_changes=True)
+    assert not plan_cache.get_plan_cache_path("dev").exists()
+
+
+def test_skip_unchanged(env_path, capsys, monkeypatch):
+    args = SimpleNamespace(dry_run=False, no_cache=False)
+    assert plan_cache.skip_unchanged(env_path, args) is False
+    monkeypatch.setattr(time, "time", lambda: 1000.0)
+    plan_cache.record_plan_outcome(env_path, has_changes=False)
+    monkeypatch.setattr(time, "time", lambda: 1000.0 + 180)
+
+    assert plan_cache.skip_unchanged(env_path, args) is True
+    assert "cached plan from 3m ago" in capsys.readouterr().out
+    assert (
+        plan_cache.skip_unchanged(
+            env_path, SimpleNamespace(**{**vars(args), "no_cache": True})
+        )
+        is False
+    )
+    assert (
+        plan_cache.skip_unchanged(
+            env_path, SimpleNamespace(**{**vars(args), "dry_run": True})
+        )
+        is False
+    )
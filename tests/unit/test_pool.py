@@ -0,0 +1,103 @@
+import json
+
+from cli import pool
+
+
+def fill(names_ready=(), now=0.0):
+    """Claim provisioning work for a pool of two and mark `names_ready` ready."""
+    _reap, provision, _base = pool.claim_work(size=2, base="dev", now=now)
+    for name in names_ready:
+        pool.set_state(name, pool.READY, now=now)
+    return provision
+
+
+def test_claim_work_names_new_environments():
+    assert fill() == ["pool1", "pool2"]
+    # Environments being provisioned count towards the size
+    assert pool.claim_work(now=1.0) == ([], [], "dev")
+    assert pool.load_pool()["environments"]["pool1"]["state"] == pool.PROVISIONING
+
+
+def test_lease_hands_out_the_oldest_ready_environment():
+    fill(["pool2", "pool1"])
+
+    now, ttl = 10.0, 60
+    name, entry = pool.lease("alice", ttl=ttl, now=now)
+
+    assert name == "pool1"
+    assert entry["owner"] == "alice"
+    assert entry["expires_at"] == now + ttl
+    assert pool.lease("bob", now=11.0)[0] == "pool2"
+    assert pool.lease("carol", now=12.0) is None
+
+
+def test_leased_environment_is_replaced_then_reaped_once_expired():
+    fill(["pool1", "pool2"])
+    pool.lease("alice", ttl=60, now=10.0)
+
+    assert pool.claim_work(now=20.0) == ([], ["pool3"], "dev")
+    assert pool.claim_work(now=70.0) == (["pool1"], [], "dev")
+    assert pool.load_pool()["environments"]["pool1"]["state"] == pool.REAPING
+
+
+def test_end_lease_expires_it_now():
+    fill(["pool1", "pool2"])
+    pool.lease("alice", now=10.0)
+
+    assert pool.end_lease("pool1", now=20.0)
+    assert not pool.end_lease("pool2", now=20.0)
+    assert pool.claim_work(now=20.0)[0] == ["pool1"]
+
+
+def test_failed_and_stale_environments_are_reaped(monkeypatch):
+    fill(now=0.0)
+    pool.set_state("pool1", pool.FAILED, now=0.0)
+    # The run provisioning pool2 died
+    monkeypatch.setattr(pool, "_process_alive", lambda _pid: False)
+
+    reap, provision, _base = pool.claim_work(now=1.0)
+
+    assert reap == ["pool1", "pool2"]
+    assert provision == ["pool3", "pool4"]
+
+
+def test_slow_runs_that_are_still_alive_are_not_reaped():
+    fill(now=0.0)
+
+    assert pool.claim_work(now=pool.STALE_SECONDS + 1) == ([], [], "dev")
+
+
+def test_lease_tags_are_claimed_once_until_applied():
+    fill(["pool1", "pool2"])
+    pool.lease("alice", ttl=60, now=10.0)
+
+    assert pool.claim_lease_tags(now=20.0) == ["pool1"]
+    # This process's claim is still live
+    assert pool.claim_lease_tags(now=20.0) == []
+    pool.finish_lease_tags("pool1", applied=False)
+    assert pool.claim_lease_tags(now=20.0) == ["pool1"]
+    pool.finish_lease_tags("pool1", applied=True)
+    assert pool.claim_lease_tags(now=20.0) == []
+
+
+def test_corrupt_pool_file_starts_over():
+    pool.get_pool_path().parent.mkdir(parents=True, exist_ok=True)
+    pool.get_pool_path().write_text("{not json")
+    assert pool.load_pool()["environments"] == {}
+
+
+def test_write_lease_tags_keeps_default_tags(tmp_path):
+    (tmp_path / "variables.tf").write_text(
+        'variable "tags" {\n  default = {\n    project = "InfraBox"\n  }\n}\n'
+    )
+
+    pool.write_lease_tags(tmp_path, "alice", 0)
+
+    tfvars = json.loads((tmp_path / pool.LEASE_TFVARS).read_text())
+    assert tfvars == {
+        "tags": {
+            "project": "InfraBox",
+            "leased_by": "alice",
+            "lease_expires": "1970-01-01T00:00:00Z",
+        }
+    }
@@ -0,0 +1,223 @@
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from cli import preflight, tf_json
+from cli.profiles import profile_context
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+CONTEXT = {
+    "name_prefix": "InfraBox",
+    "environment": "dev",
+    "location": "westeurope",
+    "dns_zone_name": "infrabox-dev.com",
+    "admin_username": "azureuser",
+    "vnet_address_space": "10.0.0.0/16",
+    "subnet_address_space": "10.0.1.0/24",
+    **profile_context(),
+}
+SCHEMA_DUMP = {
+    "provider_schemas": {
+        "registry.terraform.io/hashicorp/azurerm": {
+            "resource_schemas": {
+                "azurerm_resource_group": {
+                    "block": {
+                        "attributes": {
+                            "id": {"computed": True},
+                            "name": {"required": True},
+                            "location": {"required": True},
+                            "tags": {"optional": True},
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+
+
+@pytest.fixture
+def env_path(tmp_path):
+    """A dev environment using copies of the repository's modules."""
+    shutil.copytree(REPO_ROOT / "modules", tmp_path / "modules")
+    path = tmp_path / "environments" / "dev"
+    path.mkdir(parents=True)
+    for name in ("main.tf", "variables.tf"):
+        shutil.copy(REPO_ROOT / "environments" / "dev" / name, path / name)
+    key = tmp_path / "id_rsa.pub"
+    key.write_text("ssh-rsa AAAA test\n")
+    set_variable(path, "ssh_public_key_path", "~/.ssh/id_rsa_infrabox.pub", str(key))
+    return path
+
+
+def set_variable(env_path, name, old, new):
+    variables = env_path / "variables.tf"
+    text = variables.read_text()
+    assert f'"{old}"' in text, name
+    variables.write_text(text.replace(f'"{old}"', f'"{new}"'))
+
+
+def test_valid_environment_passes(env_path, capsys):
+    assert preflight.run_preflight(env_path) == []
+    out = capsys.readouterr().out
+    assert "Pre-flight checks passed for dev (10 resources" in out
+    assert "provider schema not cached yet" in out
+
+
+def test_storage_account_name_too_long(env_path):
+    set_variable(env_path, "name_prefix", "InfraBox", "InfraBoxProduction")
+
+    problems = preflight.run_preflight(env_path)
+
+    assert problems == [
+        (
+            "module.storage_account.azurerm_storage_account.this: name "
+            "'infraboxproductiondevsa01' must be 3-24 lowercase letters and digits"
+        )
+    ]
+
+
+def test_storage_account_name_invalid_characters(env_path):
+    set_variable(env_path, "name_prefix", "InfraBox", "Infra_Box")
+
+    problems = preflight.run_preflight(env_path)
+
+    assert any("'infra_boxdevsa01'" in problem for problem in problems)
+
+
+def test_subnet_outside_vnet(env_path):
+    main = env_path / "main.tf"
+    main.write_text(main.read_text().replace('["10.0.1.0/24"]', '["10.1.1.0/24"]'))
+
+    problems = preflight.run_preflight(env_path)
+
+    assert problems == [
+        (
+            "module.networking.azurerm_subnet.this: 10.1.1.0/24 is outside its VNet "
+            "(10.0.0.0/16)"
+        )
+    ]
+
+
+def test_missing_ssh_public_key(env_path, tmp_path):
+    (tmp_path / "id_rsa.pub").unlink()
+
+    problems = preflight.run_preflight(env_path)
+
+    assert problems == [
+        (
+            "module.virtual_machine.azurerm_linux_virtual_machine.this: file "
+            f"'{tmp_path / 'id_rsa.pub'}' does not exist"
+        )
+    ]
+
+
+def test_tf_json_environment(env_path, tmp_path):
+    for name in ("main.tf", "variables.tf"):
+        (env_path / name).unlink()
+    context = {
+        **CONTEXT,
+        "name_prefix": "InfraBoxProduction",
+        "ssh_public_key_path": str(tmp_path / "id_rsa.pub"),
+    }
+    tf_json.write_config("main", context, env_path)
+    tf_json.write_config("variables", context, env_path)
+
+    problems = preflight.run_preflight(env_path)
+
+    assert problems == [
+        (
+            "module.storage_account.azurerm_storage_account.this: name "
+            "'infraboxproductiondevsa01' must be 3-24 lowercase letters and digits"
+        )
+    ]
+
+
+@pytest.mark.parametrize(
+    ("expression", "expected"),
+    [
+        ('lower(replace("${var.prefix}-SA01","-",""))', "infraboxsa01"),
+        ("${var.prefix}-${var.count}", "Infra-Box-3"),
+        ("${var.ranges}", ["10.0.0.0/16"]),
+        ("var.ranges", ["10.0.0.0/16"]),
+        ("module.rg.name", preflight.UNKNOWN),
+        ("${module.rg.name}-x", preflight.UNKNOWN),
+        ('replace(var.prefix,"/-/","")', preflight.UNKNOWN),
+        ("plain text", "plain text"),
+    ],
+)
+def test_evaluator(tmp_path, expression, expected):
+    evaluator = preflight._Evaluator(
+        {"prefix": "Infra-Box", "count": 3, "ranges": ["10.0.0.0/16"]}, tmp_path
+    )
+    assert evaluator.value(expression) == expected
+
+
+def test_schema_checks_arguments(env_path):
+    (env_path / ".terraform.lock.hcl").write_text("# azurerm 3.0\n")
+    digest = preflight._lock_hash(env_path)
+    path = preflight._schema_path(digest)
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps(preflight.reduce_schema(SCHEMA_DUMP)))
+    main = env_path.parent.parent / "modules" / "resource_group" / "main.tf"
+    main.write_text(
+        main.read_text().replace("location = var.location", "lcation = var.location")
+    )
+
+    problems = preflight.run_preflight(env_path)
+
+    assert (
+        "module.resource_group.azurerm_resource_group.this: unsupported argument "
+        "'lcation'" in problems
+    )
+    assert (
+        "module.resource_group.azurerm_resource_group.this: missing required "
+        "argument 'location'" in problems
+    )
+    assert (
+        "module.storage_account.azurerm_storage_account.this: azurerm_storage_account "
+        "is not a resource type of the locked providers" in problems
+    )
+
+
+def test_refresh_schema_runs_once_per_lock_file(env_path, capsys, monkeypatch):
+    monkeypatch.setenv("INFRABOX_TERRAFORM_BIN", "/opt/terraform")
+    (env_path / ".terraform").mkdir()
+    (env_path / ".terraform.lock.hcl").write_text("# azurerm 3.0\n")
+    dump = subprocess.CompletedProcess([], 0, stdout=json.dumps(SCHEMA_DUMP))
+    with mock.patch("cli.preflight.read_cmd_output", return_value=dump) as run:
+        assert preflight.refresh_schema(env_path)
+        assert preflight.refresh_schema(env_path)
+        assert run.call_count == 1
+        assert run.call_args.args[0] == ["/opt/terraform", *preflight.SCHEMA_ARGS]
+
+        (env_path / ".terraform.lock.hcl").write_text("# azurerm 3.1\n")
+        run.reset_mock()
+        assert preflight.refresh_schema(env_path)
+        assert run.call_count == 1
+
+    schema = preflight.load_schema(env_path)
+    assert schema["azurerm_resource_group"]["attributes"]["id"] == "computed"
+    assert "Cached the provider schema" in capsys.readouterr().out
+
+
+def test_refresh_schema_needs_initialized_environment(env_path):
+    (env_path / ".terraform.lock.hcl").write_text("# azurerm 3.0\n")
+    with mock.patch("cli.preflight.read_cmd_output") as run:
+        assert not preflight.refresh_schema(env_path)
+    run.assert_not_called()
+
+
+def test_require_preflight_exits_on_problems(env_path, tmp_path, capsys):
+    (tmp_path / "id_rsa.pub").unlink()
+
+    with pytest.raises(SystemExit):
+        preflight.require_preflight(env_path, SimpleNamespace(skip_preflight=False))
+    assert "--skip-preflight" in capsys.readouterr().out
+
+    preflight.require_preflight(env_path, SimpleNamespace(skip_preflight=True))
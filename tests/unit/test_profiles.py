@@ -0,0 +1,62 @@
+import pytest
+
+from cli.env_config import EnvironmentConfig, parse_variable_defaults
+from cli.infrastructure_templates import env
+from cli.profiles import (
+    DEFAULT_PROFILE,
+    PROFILES,
+    PerformanceProfile,
+    profile_context,
+)
+
+
+def test_default_profile_matches_previous_settings():
+    profile = PROFILES[DEFAULT_PROFILE]
+    assert profile.vm_size == "Standard_B1s"
+    assert profile.os_disk_storage_account_type == "Standard_LRS"
+    assert profile.os_disk_caching == "ReadWrite"
+    assert profile.public_ip_sku == "Basic"
+    assert not profile.accelerated_networking
+
+
+@pytest.mark.parametrize(
+    ("overrides", "error"),
+    [
+        ({"ephemeral_os_disk": True}, "requires ReadOnly caching"),
+        ({"accelerated_networking": True}, "does not support accelerated"),
+    ],
+)
+def test_inconsistent_profile_rejected(overrides, error):
+    settings = {**profile_context(), **overrides}
+    settings.pop("performance_profile")
+    with pytest.raises(ValueError, match=error):
+        PerformanceProfile(**settings)
+
+
+def test_profile_context_overrides():
+    context = profile_context("compute", {"vm_size": "Standard_F8s_v2", "other": 1})
+    assert context["performance_profile"] == "compute"
+    assert context["vm_size"] == "Standard_F8s_v2"
+    assert context["ephemeral_os_disk"] is True
+    assert "other" not in context
+
+
+@pytest.mark.parametrize("name", sorted(PROFILES))
+def test_profile_round_trips_through_variables(name):
+    context = {"environment": "prod", **profile_context(name)}
+    variables = parse_variable_defaults(
+        env.get_template("variables.tf.j2").render(context)
+    )
+    config = EnvironmentConfig.from_variables("prod", variables)
+
+    assert variables["performance_profile"] == name
+    assert variables["proximity_placement_group"] is (
+        PROFILES[name].proximity_placement_group
+    )
+    assert config.template_context()["vm_size"] == PROFILES[name].vm_size
+
+
+def test_environment_without_profile_uses_default():
+    context = EnvironmentConfig.from_variables("dev", {}).template_context()
+    assert context["performance_profile"] == DEFAULT_PROFILE
+    assert context["vm_size"] == PROFILES[DEFAULT_PROFILE].vm_size
@@ -0,0 +1,123 @@
+import pytest
+
+from cli import provider_trace
+
+NODE = "(*terraform.NodeApplyableResourceInstance)"
+TRACE = """\
+2024-05-01T10:00:00.000+0000 [INFO]  Terraform version: 1.6.0
+2024-05-01T10:00:00.100+0000 [DEBUG] provider: starting plugin: path=.terraform/providers/registry.terraform.io/hashicorp/azurerm/3.0.0/linux_amd64/terraform-provider-azurerm_v3.0.0_x5 args=[]
+2024-05-01T10:00:01.100+0000 [DEBUG] provider: using plugin: version=5
+2024-05-01T10:00:01.200+0000 [TRACE] vertex "module.networking.azurerm_public_ip.this": starting visit (*terraform.NodeApplyableResourceInstance)
+2024-05-01T10:00:01.300+0000 [DEBUG] provider.terraform-provider-azurerm_v3.0.0_x5: AzureRM Request:
+PUT /subscriptions/123/resourceGroups/rg/providers/Microsoft.Network/publicIPAddresses/ip?api-version=2023-02-01 HTTP/1.1
+Host: management.azure.com
+2024-05-01T10:00:03.300+0000 [DEBUG] provider.terraform-provider-azurerm_v3.0.0_x5: AzureRM Response for https://management.azure.com/subscriptions/123/resourceGroups/rg/providers/Microsoft.Network/publicIPAddresses/ip?api-version=2023-02-01:
+HTTP/2.0 201 Created
+2024-05-01T10:00:03.400+0000 [DEBUG] provider.terraform-provider-azurerm_v3.0.0_x5: AzureRM Request:
+GET /subscriptions/123/providers/Microsoft.Network/locations/westeurope/operations/abc?api-version=2023-02-01 HTTP/1.1
+2024-05-01T10:00:03.500+0000 [DEBUG] provider.terraform-provider-azurerm_v3.0.0_x5: AzureRM Response for https://management.azure.com/subscriptions/123/providers/Microsoft.Network/locations/westeurope/operations/abc?api-version=2023-02-01:
+HTTP/2.0 200 OK
+2024-05-01T10:00:04.200+0000 [TRACE] vertex "module.networking.azurerm_public_ip.this": visit complete
+2024-05-01T10:00:05.000+0000 [TRACE] vertex "provider[\\"registry.terraform.io/hashicorp/azurerm\\"]": visit complete
+"""
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "trace.log"
+    path.write_text(TRACE)
+    return path
+
+
+def test_summarize_trace_timings(trace_file):
+    summary = provider_trace.summarize_trace(trace_file)
+    assert summary["wall_seconds"] == pytest.approx(5.0)
+    assert summary["plugin_busy_seconds"] == pytest.approx(1.0)
+    assert summary["api_busy_seconds"] == pytest.approx(2.1)
+    assert summary["resources"] == {
+        "module.networking.azurerm_public_ip.this": {
+            "count": 1,
+            "total_seconds": pytest.approx(3.0),
+            "p50_seconds": pytest.approx(3.0),
+            "p95_seconds": pytest.approx(3.0),
+        }
+    }
+
+
+def test_summarize_trace_resource_percentiles(tmp_path):
+    visits = [1, 2, 3, 4, 20]
+    lines = []
+    for second, visit in enumerate(visits):
+        start = f"2024-05-01T10:{second:02d}:00.000+0000"
+        end = f"2024-05-01T10:{second:02d}:{visit:02d}.000+0000"
+        lines += [
+            f'{start} [TRACE] vertex "azurerm_subnet.this": starting visit {NODE}',
+            f'{end} [TRACE] vertex "azurerm_subnet.this": visit complete',
+        ]
+    trace = tmp_path / "trace.log"
+    trace.write_text("\n".join(lines) + "\n")
+
+    stats = provider_trace.summarize_trace(trace)["resources"]["azurerm_subnet.this"]
+
+    assert stats["count"] == len(visits)
+    assert stats["total_seconds"] == pytest.approx(sum(visits))
+    assert stats["p50_seconds"] == pytest.approx(sorted(visits)[len(visits) // 2])
+    assert stats["p95_seconds"] == pytest.approx(max(visits))
+
+
+def test_plugin_ready_matches_the_earliest_pending_start(tmp_path):
+    azurerm = "path=.terraform/providers/terraform-provider-azurerm"
+    azuread = "path=.terraform/providers/terraform-provider-azuread"
+    trace = tmp_path / "trace.log"
+    trace.write_text(
+        f"2024-05-01T10:00:00.100+0000 [DEBUG] provider: starting plugin: {azurerm}\n"
+        "2024-05-01T10:00:00.200+0000 [DEBUG] provider: using plugin: version=5\n"
+        f"2024-05-01T10:00:00.300+0000 [DEBUG] provider: starting plugin: {azuread}\n"
+        f"2024-05-01T10:00:00.400+0000 [DEBUG] provider: starting plugin: {azurerm}\n"
+        "2024-05-01T10:00:00.600+0000 [DEBUG] provider: using plugin: version=5\n"
+    )
+
+    starts = provider_trace.summarize_trace(trace)["plugin_starts"]
+
+    assert [path.rsplit("-", 1)[1] for path, _seconds in starts] == [
+        "azurerm",
+        "azuread",
+    ]
+    assert starts[1][1] == pytest.approx(0.3)
+
+
+def test_summarize_trace_groups_api_calls(trace_file):
+    summary = provider_trace.summarize_trace(trace_file)
+    calls = summary["api_calls"]
+    assert calls["PUT Microsoft.Network/publicIPAddresses"]["count"] == 1
+    assert calls["GET (long-running operation poll)"]["count"] == 1
+    slowest_latency, slowest_key, _path = summary["slowest_calls"][0]
+    assert slowest_latency == pytest.approx(2000)
+    assert slowest_key == "PUT Microsoft.Network/publicIPAddresses"
+
+
+def test_summarize_trace_keeps_only_slowest(trace_file):
+    summary = provider_trace.summarize_trace(trace_file, slowest=1)
+    assert len(summary["slowest_calls"]) == 1
+
+
+def test_api_call_key_without_provider_segment():
+    assert (
+        provider_trace.api_call_key("GET", "/subscriptions/1/resourcegroups/rg")
+        == "GET /resourcegroups"
+    )
+
+
+def test_print_trace_report(trace_file, capsys):
+    provider_trace.print_trace_report(provider_trace.summarize_trace(trace_file))
+    out = capsys.readouterr().out
+    assert "Azure API round-trips" in out
+    assert "terraform-provider-azurerm_v3.0.0_x5 started in 1.00s" in out
+    assert "Slowest API calls" in out
+
+
+def test_prune_traces(tmp_path):
+    for i in range(4):
+        (tmp_path / f"{i}.log").write_text("trace")
+    provider_trace.prune_traces(tmp_path, keep=2)
+    assert sorted(p.name for p in tmp_path.glob("*.log")) == ["2.log", "3.log"]
@@ -0,0 +1,90 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from cli import refresh_policy
+
+
+@pytest.fixture
+def env_path(tmp_path):
+    path = tmp_path / "dev"
+    path.mkdir()
+    (path / "main.tf").write_text('resource "x" "y" {}\n')
+    return path
+
+
+def write_state(env_path, serial, lineage="abc"):
+    (env_path / "terraform.tfstate").write_text(
+        json.dumps({"version": 4, "serial": serial, "lineage": lineage})
+    )
+
+
+def test_read_local_state_metadata(env_path):
+    assert refresh_policy.read_state_metadata(env_path) == {}
+    write_state(env_path, 7)
+    assert refresh_policy.read_state_metadata(env_path) == {
+        "serial": 7,
+        "lineage": "abc",
+    }
+
+
+def test_read_remote_state_metadata_is_pulled_quietly(monkeypatch, env_path):
+    (env_path / "backend.tf").write_text('terraform {\n  backend "azurerm" {}\n}\n')
+
+    def fake_read_cmd_output(cmd, cwd, env):
+        assert cmd == ["terraform", "state", "pull"]
+        assert cwd == env_path
+        assert env is None
+        return SimpleNamespace(
+            returncode=0, stdout='{"serial": 3, "lineage": "remote"}\n'
+        )
+
+    monkeypatch.setattr(refresh_policy, "read_cmd_output", fake_read_cmd_output)
+    assert refresh_policy.read_state_metadata(env_path) == {
+        "serial": 3,
+        "lineage": "remote",
+    }
+
+
+@pytest.mark.parametrize("policy, expected", [("always", False), ("never", True)])
+def test_fixed_policies(env_path, policy, expected):
+    assert refresh_policy.use_cached_state(env_path, policy)[0] is expected
+
+
+def test_auto_uses_cached_state_after_recent_refresh(env_path):
+    write_state(env_path, 7)
+    assert refresh_policy.use_cached_state(env_path, "auto") == (
+        False,
+        "no previous refresh recorded",
+    )
+
+    refresh_policy.record_refresh(env_path)
+    use_cached, reason = refresh_policy.use_cached_state(env_path, "auto")
+
+    assert use_cached is True
+    assert "state serial 7" in reason
+
+
+def test_auto_refreshes_when_state_changed(env_path):
+    write_state(env_path, 7)
+    refresh_policy.record_refresh(env_path)
+    write_state(env_path, 8)
+
+    assert refresh_policy.use_cached_state(env_path, "auto") == (
+        False,
+        "state changed since the last refresh",
+    )
+
+
+def test_auto_refreshes_after_ttl(monkeypatch, env_path):
+    write_state(env_path, 7)
+    refresh_policy.record_refresh(env_path)
+    now = time.time()
+    monkeypatch.setattr(refresh_policy.time, "time", lambda: now + 3600)
+
+    use_cached, reason = refresh_policy.use_cached_state(env_path, "auto", ttl=900)
+
+    assert use_cached is False
+    assert "older than 900s" in reason
@@ -0,0 +1,148 @@
+import argparse
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from cli import regions
+from cli.terraform_utils import TerraformOptions
+
+DEFAULT_ARGS = {
+    "environment": "prod",
+    "regions": ["westeurope", "northeurope"],
+    "dry_run": False,
+    "trace_provider": False,
+    "timings": False,
+    "refresh": "always",
+    "refresh_ttl": 900,
+    "no_cache": False,
+}
+
+
+@pytest.fixture
+def region_envs(monkeypatch, tmp_path):
+    monkeypatch.setattr(regions, "ENVIRONMENTS_DIR", tmp_path)
+    for name in ("prod-westeurope", "prod-northeurope"):
+        (tmp_path / name).mkdir()
+    patches = {}
+    for name in [
+        "terraform_init",
+        "terraform_validate",
+        "terraform_plan",
+        "terraform_apply",
+        "prompt_user_confirmation",
+    ]:
+        patches[name] = mock.Mock(return_value=None)
+        monkeypatch.setattr(regions, name, patches[name])
+    return tmp_path, patches
+
+
+def test_parse_regions():
+    assert regions.parse_regions("westeurope, NorthEurope,westeurope") == [
+        "westeurope",
+        "northeurope",
+    ]
+    with pytest.raises(argparse.ArgumentTypeError):
+        regions.parse_regions("west europe")
+    with pytest.raises(argparse.ArgumentTypeError):
+        regions.parse_regions(" , ")
+
+
+def test_region_environment():
+    assert regions.region_environment("prod", "westeurope") == "prod-westeurope"
+
+
+def test_check_result():
+    regions.check_result(None, "init")
+    regions.check_result(SimpleNamespace(returncode=0), "init")
+    with pytest.raises(RuntimeError, match="terraform init failed with exit code 1"):
+        regions.check_result(SimpleNamespace(returncode=1), "init")
+
+
+def test_deploy_regions_applies_only_changed_regions(region_envs, make_args):
+    env_dir, patches = region_envs
+    patches["terraform_plan"].side_effect = lambda path, **_k: SimpleNamespace(
+        returncode=2 if path.name == "prod-westeurope" else 0
+    )
+    patches["prompt_user_confirmation"].return_value = True
+
+    results = regions.deploy_regions(make_args())
+
+    assert len(patches["terraform_init"].call_args_list) == len(DEFAULT_ARGS["regions"])
+    patches["prompt_user_confirmation"].assert_called_once_with()
+    patches["terraform_apply"].assert_called_once_with(
+        env_dir / "prod-westeurope",
+        destroy=False,
+        dry_run=False,
+        options=TerraformOptions(),
+    )
+    assert list(results) == ["prod-westeurope"]
+
+
+def test_deploy_regions_preflight_failure_skips_region(
+    region_envs, make_args, monkeypatch
+):
+    _env_dir, patches = region_envs
+    monkeypatch.setattr(
+        regions,
+        "run_preflight",
+        lambda path: ["bad name"] if path.name == "prod-westeurope" else [],
+    )
+
+    results = regions.deploy_regions(make_args())
+
+    patches["terraform_init"].assert_called_once()
+    assert not results["prod-westeurope"]["ok"]
+    assert str(results["prod-westeurope"]["error"]) == "pre-flight checks failed"
+
+
+def test_deploy_regions_destroy_declined(region_envs, make_args):
+    _env_dir, patches = region_envs
+    patches["terraform_plan"].return_value = SimpleNamespace(returncode=2)
+    patches["prompt_user_confirmation"].return_value = False
+
+    regions.deploy_regions(make_args(), destroy=True)
+
+    assert all(
+        call.kwargs["destroy"] is True
+        for call in patches["terraform_plan"].call_args_list
+    )
+    patches["terraform_apply"].assert_not_called()
+
+
+def test_deploy_regions_failed_plan_is_not_unchanged(region_envs, make_args, capsys):
+    _env_dir, patches = region_envs
+    patches["terraform_plan"].side_effect = lambda path, **_k: SimpleNamespace(
+        returncode=1 if path.name == "prod-northeurope" else 2
+    )
+    patches["prompt_user_confirmation"].return_value = True
+
+    results = regions.deploy_regions(make_args())
+    out = capsys.readouterr().out
+
+    assert "terraform plan failed with exit code 1" in out
+    assert "no changes" not in out
+    assert list(results) == ["prod-westeurope"]
+
+
+def test_deploy_regions_failed_init_skips_region(region_envs, make_args, capsys):
+    _env_dir, patches = region_envs
+    patches["terraform_init"].side_effect = lambda path, **_k: SimpleNamespace(
+        returncode=1 if path.name == "prod-northeurope" else 0
+    )
+    patches["terraform_plan"].return_value = SimpleNamespace(returncode=2)
+    patches["prompt_user_confirmation"].return_value = True
+
+    results = regions.deploy_regions(make_args())
+    out = capsys.readouterr().out
+
+    assert "❌ prod-northeurope" in out
+    assert list(results) == ["prod-westeurope"]
+
+
+def test_deploy_regions_missing_region(region_envs, make_args, capsys):
+    _env_dir, patches = region_envs
+    assert regions.deploy_regions(make_args(regions=["westeurope", "eastus"])) is None
+    out = capsys.readouterr().out
+    assert "Environment directory 'prod-eastus' does not exist" in out
+    patches["terraform_init"].assert_not_called()
@@ -0,0 +1,111 @@
+import sqlite3
+from statistics import median
+
+import pytest
+
+from cli import run_history
+
+PROD_APPLY_SECONDS = (10, 30, 20)
+PROD_PLAN_SECONDS = 4
+DEV_APPLY_SECONDS = 2
+
+
+@pytest.fixture
+def history():
+    for seconds in PROD_APPLY_SECONDS:
+        run_history.record_phase("prod", "apply", seconds, 0)
+    run_history.record_phase("prod", "apply", 500, 1)
+    run_history.record_phase("prod", "plan", PROD_PLAN_SECONDS, 2)
+    run_history.record_phase("dev", "apply", DEV_APPLY_SECONDS, 0)
+
+
+@pytest.mark.usefixtures("history")
+def test_expected_seconds_uses_median_of_successful_runs():
+    prod_apply = median(PROD_APPLY_SECONDS)
+    assert run_history.expected_seconds("prod", ["apply"]) == prod_apply
+    assert (
+        run_history.expected_seconds("prod", ["plan", "apply"])
+        == PROD_PLAN_SECONDS + prod_apply
+    )
+
+
+@pytest.mark.usefixtures("history")
+def test_expected_seconds_falls_back_to_other_environments():
+    # stage never ran: the median of every environment's apply runs
+    assert run_history.expected_seconds("stage", ["apply"]) == median(
+        (*PROD_APPLY_SECONDS, DEV_APPLY_SECONDS)
+    )
+    assert run_history.expected_seconds("stage", ["init"]) is None
+    assert run_history.expected_durations(["prod", "dev"], ["apply"]) == {
+        "prod": median(PROD_APPLY_SECONDS),
+        "dev": DEV_APPLY_SECONDS,
+    }
+
+
+def test_no_history_yet():
+    assert run_history.expected_seconds("prod", ["apply"]) is None
+    assert run_history.slowest_phases() == []
+    assert not run_history.get_history_path().exists()
+
+
+@pytest.mark.usefixtures("history")
+def test_slowest_phases():
+    rows = run_history.slowest_phases()
+    assert rows[0] == (
+        "prod",
+        "apply",
+        len(PROD_APPLY_SECONDS),
+        median(PROD_APPLY_SECONDS),
+        max(PROD_APPLY_SECONDS),
+    )
+    assert [row[:2] for row in rows] == [
+        ("prod", "apply"),
+        ("prod", "plan"),
+        ("dev", "apply"),
+    ]
+    assert run_history.slowest_phases("dev") == [
+        ("dev", "apply", 1, DEV_APPLY_SECONDS, DEV_APPLY_SECONDS)
+    ]
+
+
+def test_slowest_phases_uses_recent_runs():
+    run_history.record_phase("prod", "apply", 500, 0)
+    for _ in range(run_history.HISTORY_SAMPLES):
+        run_history.record_phase("prod", "apply", DEV_APPLY_SECONDS, 0)
+    assert run_history.slowest_phases() == [
+        (
+            "prod",
+            "apply",
+            run_history.HISTORY_SAMPLES,
+            DEV_APPLY_SECONDS,
+            DEV_APPLY_SECONDS,
+        )
+    ]
+
+
+def test_phase_for_and_format_duration():
+    assert run_history.phase_for(["terraform", "apply", "-auto-approve"]) == "apply"
+    assert run_history.format_duration(42.4) == "42s"
+    assert run_history.format_duration(125) == "2m 05s"
+
+
+def test_destroying_applies_are_recorded_as_destroy():
+    saved_plan = ["terraform", "apply", "-auto-approve", "dev.tfplan"]
+    with run_history.recording_as("destroy"):
+        assert run_history.phase_for(saved_plan) == "destroy"
+    assert run_history.phase_for(saved_plan) == "apply"
+
+
+def test_schema_is_created_once():
+    run_history.record_phase("dev", "plan", 1, 0)
+    with sqlite3.connect(run_history.get_history_path()) as connection:
+        connection.execute("DROP INDEX phase_runs_lookup")
+
+    run_history.record_phase("dev", "plan", 1, 0)
+
+    with sqlite3.connect(run_history.get_history_path()) as connection:
+        indexes = connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        ).fetchall()
+    # The schema version is current, so the script did not run again
+    assert indexes == []
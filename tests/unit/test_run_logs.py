@@ -0,0 +1,91 @@
+import gzip
+import os
+import time
+
+import pytest
+
+from cli import run_logs
+
+
+@pytest.fixture
+def logs_dir(tmp_path):
+    return tmp_path / "logs" / "dev"
+
+
+def write_run(logs_dir, cmd, lines):
+    with run_logs.open_run_log(logs_dir, cmd) as log:
+        for line in lines:
+            log.write(f"{line}\n")
+
+
+def test_new_run_id_contains_subcommand():
+    run_id = run_logs.new_run_id(["terraform", "apply", "-auto-approve"])
+    assert run_id.endswith("-apply")
+
+
+def test_open_run_log_writes_compressed_file(logs_dir):
+    write_run(logs_dir, ["terraform", "plan"], ["Plan: 1 to add"])
+    [log_path] = run_logs.list_runs(logs_dir)
+    with gzip.open(log_path, "rt") as f:
+        content = f.read()
+    assert "# cmd: terraform plan" in content
+    assert "Plan: 1 to add" in content
+
+
+def test_list_runs_missing_dir(tmp_path):
+    assert run_logs.list_runs(tmp_path / "missing") == []
+
+
+def test_find_runs_by_prefix(logs_dir):
+    write_run(logs_dir, ["terraform", "init"], ["init"])
+    write_run(logs_dir, ["terraform", "apply"], ["apply"])
+    runs = run_logs.list_runs(logs_dir)
+    first_id = run_logs.run_id_for(runs[0])
+    assert run_logs.find_runs(logs_dir, first_id) == [runs[0]]
+    assert run_logs.find_runs(logs_dir, "nope") == []
+    assert run_logs.find_runs(logs_dir) == runs
+
+
+def test_search_runs_streams_matches(logs_dir):
+    write_run(logs_dir, ["terraform", "apply"], ["ok", "Error: quota exceeded", "ok"])
+    matches = list(run_logs.search_runs(logs_dir, r"Error:"))
+    assert len(matches) == 1
+    _run_id, line_number, line = matches[0]
+    assert line == "Error: quota exceeded"
+    [log_path] = run_logs.list_runs(logs_dir)
+    assert list(run_logs.iter_run_lines(log_path))[line_number - 1] == line
+
+
+def test_rotate_run_logs_drops_old_runs(logs_dir):
+    write_run(logs_dir, ["terraform", "plan"], ["old"])
+    [old_path] = run_logs.list_runs(logs_dir)
+    old_time = time.time() - 40 * 86400
+    os.utime(old_path, (old_time, old_time))
+    write_run(logs_dir, ["terraform", "plan"], ["new"])
+
+    run_logs.rotate_run_logs(logs_dir, max_age_days=30)
+
+    remaining = run_logs.list_runs(logs_dir)
+    assert old_path not in remaining
+    assert len(remaining) == 1
+
+
+def test_rotate_run_logs_enforces_size(logs_dir):
+    for i in range(3):
+        write_run(logs_dir, ["terraform", "apply"], [f"run {i}"])
+    runs = run_logs.list_runs(logs_dir)
+    newest_size = runs[-1].stat().st_size
+
+    run_logs.rotate_run_logs(logs_dir, max_bytes=newest_size)
+
+    assert run_logs.list_runs(logs_dir) == [runs[-1]]
+
+
+def test_rotate_run_logs_keeps_newest_oversized_run(logs_dir):
+    write_run(logs_dir, ["terraform", "apply"], ["old"])
+    write_run(logs_dir, ["terraform", "apply"], ["new"])
+    runs = run_logs.list_runs(logs_dir)
+
+    run_logs.rotate_run_logs(logs_dir, max_bytes=1)
+
+    assert run_logs.list_runs(logs_dir) == [runs[-1]]
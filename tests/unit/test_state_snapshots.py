@@ -0,0 +1,141 @@
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cli import state_snapshots as snapshots
+
+
+def write_state(env_path, serial, resources=0):
+    state = {"serial": serial, "lineage": "abc", "resources": [{}] * resources}
+    (env_path / "terraform.tfstate").write_text(json.dumps(state))
+
+
+@pytest.fixture
+def env_path(tmp_path):
+    path = tmp_path / "dev"
+    path.mkdir()
+    return path
+
+
+def test_snapshot_without_state_is_skipped(env_path):
+    assert snapshots.snapshot_state(env_path, "pre-apply") is None
+    assert snapshots.list_snapshots("dev") == []
+
+
+def test_snapshot_records_metadata_and_compresses(env_path):
+    write_state(env_path, 4, resources=2)
+
+    entry = snapshots.snapshot_state(env_path, "pre-apply")
+
+    assert entry["id"] == 1
+    assert (entry["reason"], entry["serial"], entry["resources"]) == (
+        "pre-apply",
+        4,
+        2,
+    )
+    stored = snapshots.object_path(entry["object"]).read_bytes()
+    assert gzip.decompress(stored) == (env_path / "terraform.tfstate").read_bytes()
+    assert snapshots.list_snapshots("dev") == [entry]
+
+
+def test_unchanged_state_is_not_snapshotted_twice(env_path):
+    write_state(env_path, 1)
+    snapshots.snapshot_state(env_path, "post-apply")
+
+    assert snapshots.snapshot_state(env_path, "pre-apply") is None
+    assert len(snapshots.list_snapshots("dev")) == 1
+
+
+def test_identical_states_share_one_object(tmp_path):
+    for name in ("dev", "stage"):
+        (tmp_path / name).mkdir()
+        write_state(tmp_path / name, 1)
+        snapshots.snapshot_state(tmp_path / name, "pre-apply")
+
+    objects = list((snapshots.get_snapshots_dir() / "objects").glob("*/*"))
+    assert len(objects) == 1
+    dev, stage = snapshots.list_snapshots("dev"), snapshots.list_snapshots("stage")
+    assert dev[0]["object"] == stage[0]["object"]
+
+
+def test_apply_retention_keeps_newest_and_recent():
+    now = 1_000_000.0
+    entries = [
+        {"id": i, "object": str(i), "taken_at": now - (10 - i) * 86400}
+        for i in range(1, 11)
+    ]
+
+    kept = snapshots.apply_retention(entries, policy=(3, 4.5), now=now)
+
+    # ids 8-10 are the newest three, 6-10 are younger than 4.5 days
+    assert [entry["id"] for entry in kept] == [6, 7, 8, 9, 10]
+
+
+def test_retention_collects_unreferenced_objects(monkeypatch, env_path):
+    monkeypatch.setenv("INFRABOX_SNAPSHOT_KEEP_LAST", "2")
+    monkeypatch.setenv("INFRABOX_SNAPSHOT_KEEP_DAYS", "0")
+    for serial in range(1, 5):
+        write_state(env_path, serial)
+        snapshots.snapshot_state(env_path, "post-apply")
+
+    kept = snapshots.list_snapshots("dev")
+    assert [entry["id"] for entry in kept] == [3, 4]
+    objects = {
+        path.name.split(".")[0]
+        for path in (snapshots.get_snapshots_dir() / "objects").glob("*/*")
+    }
+    assert objects == {entry["object"] for entry in kept}
+
+
+def test_concurrent_snapshots_keep_every_referenced_object(monkeypatch, tmp_path):
+    monkeypatch.setenv("INFRABOX_SNAPSHOT_KEEP_LAST", "1")
+    monkeypatch.setenv("INFRABOX_SNAPSHOT_KEEP_DAYS", "0")
+    names = [f"env{i}" for i in range(4)]
+    for name in names:
+        (tmp_path / name).mkdir()
+
+    def snapshot_serials(name):
+        for serial in range(1, 11):
+            (tmp_path / name / "terraform.tfstate").write_text(
+                json.dumps({"serial": serial, "lineage": name, "resources": []})
+            )
+            snapshots.snapshot_state(tmp_path / name, "post-apply")
+
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        list(pool.map(snapshot_serials, names))
+
+    for name in names:
+        [entry] = snapshots.list_snapshots(name)
+        assert snapshots.object_path(entry["object"]).exists()
+    assert not list(snapshots.get_snapshots_dir().rglob("*.tmp"))
+
+
+def test_find_snapshot_by_id_or_hash_prefix(env_path):
+    write_state(env_path, 1)
+    first = snapshots.snapshot_state(env_path, "pre-apply")
+    write_state(env_path, 2)
+    snapshots.snapshot_state(env_path, "post-apply")
+
+    assert snapshots.find_snapshot("dev", "1") == first
+    assert snapshots.find_snapshot("dev", first["object"][:10]) == first
+    assert snapshots.find_snapshot("dev", "9") is None
+    assert snapshots.find_snapshot("dev", "") is None
+
+
+def test_restore_swaps_state_and_keeps_current(env_path):
+    write_state(env_path, 1)
+    first = snapshots.snapshot_state(env_path, "pre-apply")
+    write_state(env_path, 2, resources=3)
+    snapshots.get_plan_cache_path("dev").parent.mkdir(parents=True)
+    snapshots.get_plan_cache_path("dev").write_text("{}")
+
+    snapshots.restore_snapshot(env_path, first)
+
+    state = json.loads((env_path / "terraform.tfstate").read_text())
+    assert state["serial"] == 1
+    assert not snapshots.get_plan_cache_path("dev").exists()
+    reasons = [entry["reason"] for entry in snapshots.list_snapshots("dev")]
+    assert reasons == ["pre-apply", "pre-restore", "restore of #1"]
+    assert snapshots.list_snapshots("dev")[1]["serial"] == first["serial"] + 1
@@ -1,8 +1,12 @@
+import subprocess
 from unittest import mock
 
 import pytest
 
 import cli.terraform_utils as tf_utils
+from cli.run_history import phase_for
+from cli.state_snapshots import list_snapshots
+from cli.terraform_utils import TerraformOptions
 
 
 @pytest.fixture
@@ -32,6 +36,17 @@ def test_terraform_validate_calls_run_cmd(fake_env_path):
         )
 
 
+def test_terraform_fmt_checks_without_rewriting(fake_env_path):
+    with mock.patch("cli.terraform_utils.run_cmd") as run_cmd:
+        tf_utils.terraform_fmt(fake_env_path)
+        run_cmd.assert_called_once_with(
+            ["terraform", "fmt", "-check", "-diff"],
+            cwd=fake_env_path,
+            dry_run=False,
+            capture_output=True,
+        )
+
+
 @pytest.mark.parametrize(
     "destroy,expected_cmd",
     [
@@ -68,8 +83,71 @@ def test_terraform_apply_calls_run_cmd(fake_env_path, destroy, expected_cmd):
         )
 
 
+def test_terraform_init_skipped_when_warm(tmp_path, capsys):
+    env_path = tmp_path / "dev"
+    (env_path / ".terraform").mkdir(parents=True)
+    (env_path / "main.tf").write_text("# config\n")
+
+    with mock.patch(
+        "cli.terraform_utils.run_cmd", return_value=mock.Mock(returncode=0)
+    ) as run_cmd:
+        tf_utils.terraform_init(env_path)
+        result = tf_utils.terraform_init(env_path)
+        (env_path / "main.tf").write_text("# changed\n")
+        tf_utils.terraform_init(env_path)
+
+    # Run for the first call and again once main.tf changed
+    assert [call.args[0][1] for call in run_cmd.call_args_list] == ["init", "init"]
+    assert result.returncode == 0
+    assert "Skipping terraform init" in capsys.readouterr().out
+
+
+def test_terraform_init_no_cache_runs_even_when_warm(tmp_path):
+    env_path = tmp_path / "dev"
+    (env_path / ".terraform").mkdir(parents=True)
+    with mock.patch(
+        "cli.terraform_utils.run_cmd", return_value=mock.Mock(returncode=0)
+    ) as run_cmd:
+        tf_utils.terraform_init(env_path)
+        tf_utils.terraform_init(env_path, no_cache=True)
+
+    assert [call.args[0][1] for call in run_cmd.call_args_list] == ["init", "init"]
+
+
+def test_terraform_refresh_plan_records_refresh(tmp_path):
+    with mock.patch(
+        "cli.terraform_utils.run_cmd", return_value=mock.Mock(returncode=2)
+    ) as run_cmd, mock.patch("cli.terraform_utils.record_refresh") as record:
+        tf_utils.terraform_refresh_plan(tmp_path)
+
+    assert run_cmd.call_args[0][0][:3] == ["terraform", "plan", "-refresh-only"]
+    record.assert_called_once_with(tmp_path)
+
+
+def test_terraform_apply_snapshots_state_around_apply(tmp_path):
+    env_path = tmp_path / "dev"
+    env_path.mkdir()
+    state_file = env_path / "terraform.tfstate"
+    state_file.write_text('{"serial": 1, "resources": []}')
+
+    def fake_run_cmd(*_args, **_kwargs):
+        state_file.write_text('{"serial": 2, "resources": [{}]}')
+        return mock.Mock(returncode=0)
+
+    with mock.patch("cli.terraform_utils.run_cmd", side_effect=fake_run_cmd):
+        tf_utils.terraform_apply(env_path)
+    with mock.patch("cli.terraform_utils.run_cmd"):
+        tf_utils.terraform_apply(env_path, dry_run=True)
+
+    snapshots = list_snapshots("dev")
+    assert [(s["reason"], s["serial"]) for s in snapshots] == [
+        ("pre-apply", 1),
+        ("post-apply", 2),
+    ]
+
+
 def test_terraform_state_has_changes_no_changes(capsys, fake_env_path):
-    result = mock.Mock()
+    result = mock.Mock(args=["terraform", "plan"])
     result.returncode = tf_utils.TERRAFORM_NO_CHANGES_DETECTED_CODE
     with mock.patch("cli.terraform_utils.terraform_plan", return_value=result):
         changed = tf_utils.terraform_state_has_changes(fake_env_path)
@@ -79,7 +157,7 @@ def test_terraform_state_has_changes_no_changes(capsys, fake_env_path):
 
 
 def test_terraform_state_has_changes_changes_detected(capsys, fake_env_path):
-    result = mock.Mock()
+    result = mock.Mock(args=["terraform", "plan"])
     result.returncode = tf_utils.TERRAFORM_CHANGES_DETECTED_CODE
     with mock.patch("cli.terraform_utils.terraform_plan", return_value=result):
         changed = tf_utils.terraform_state_has_changes(fake_env_path)
@@ -89,7 +167,7 @@ def test_terraform_state_has_changes_changes_detected(capsys, fake_env_path):
 
 
 def test_terraform_state_has_changes_error(capsys, fake_env_path):
-    result = mock.Mock()
+    result = mock.Mock(args=["terraform", "plan"])
     result.returncode = 1
     with mock.patch("cli.terraform_utils.terraform_plan", return_value=result):
         changed = tf_utils.terraform_state_has_changes(fake_env_path)
@@ -151,3 +229,234 @@ def test_terraform_validate_returns_run_cmd_result(fake_env_path):
     with mock.patch("cli.terraform_utils.run_cmd", return_value=fake_result):
         result = tf_utils.terraform_validate(fake_env_path, dry_run=True)
         assert result is fake_result
+
+
+def test_terraform_apply_trace_sets_tf_log(monkeypatch, tmp_path, capsys):
+    env_path = tmp_path / "dev"
+    monkeypatch.setattr(tf_utils, "get_traces_dir", lambda env: tmp_path / env)
+
+    def fake_run_cmd(cmd, cwd, dry_run, capture_output, env):
+        assert cmd == ["terraform", "apply", "-auto-approve"]
+        assert (cwd, dry_run, capture_output) == (env_path, False, False)
+        assert env["TF_LOG"] == "TRACE"
+        with open(env["TF_LOG_PATH"], "w") as trace:
+            trace.write("2024-05-01T10:00:00.000+0000 [INFO] Terraform version\n")
+        return "result"
+
+    monkeypatch.setattr(tf_utils, "run_cmd", fake_run_cmd)
+    result = tf_utils.terraform_apply(env_path, options=TerraformOptions(trace=True))
+
+    assert result == "result"
+    out = capsys.readouterr().out
+    assert "Provider trace written to" in out
+    assert "Provider trace breakdown" in out
+
+
+def test_terraform_plan_trace_ignored_in_dry_run(fake_env_path):
+    with mock.patch("cli.terraform_utils.run_cmd") as run_cmd:
+        tf_utils.terraform_plan(
+            fake_env_path, dry_run=True, options=TerraformOptions(trace=True)
+        )
+        run_cmd.assert_called_once_with(
+            ["terraform", "plan", "-detailed-exitcode"],
+            cwd=fake_env_path,
+            dry_run=True,
+            capture_output=False,
+        )
+
+
+def test_terraform_apply_json_events_saves_timings(monkeypatch, tmp_path, capsys):
+    env_path = tmp_path / "dev"
+    monkeypatch.setattr(tf_utils, "get_timings_dir", lambda env: tmp_path / env)
+
+    def fake_run_cmd(cmd, cwd, dry_run, capture_output):
+        assert cmd == ["terraform", "apply", "-auto-approve", "-json"]
+        assert (cwd, dry_run) == (env_path, False)
+        capture_output(
+            '{"type": "apply_start", "@timestamp": "2024-05-01T10:00:00Z",'
+            ' "hook": {"resource": {"addr": "a.b"}, "action": "create"}}\n'
+        )
+        capture_output(
+            '{"type": "apply_complete", "@timestamp": "2024-05-01T10:00:04Z",'
+            ' "hook": {"resource": {"addr": "a.b"}, "action": "create"}}\n'
+        )
+        return "result"
+
+    def fake_read_cmd_output(cmd, cwd):
+        assert (cmd, cwd) == (["terraform", "graph"], env_path)
+        return subprocess.CompletedProcess(cmd, 0, stdout='"a.b" -> "var.x"\n')
+
+    monkeypatch.setattr(tf_utils, "run_cmd", fake_run_cmd)
+    monkeypatch.setattr(tf_utils, "read_cmd_output", fake_read_cmd_output)
+    options = TerraformOptions(json_events=True)
+    assert tf_utils.terraform_apply(env_path, options=options) == "result"
+
+    out = capsys.readouterr().out
+    assert "Apply time per resource" in out
+    assert "→ a.b (create, 4.0s)" in out
+    [saved] = (tmp_path / "dev").glob("*.json")
+    assert '"operation": "apply"' in saved.read_text()
+
+
+def test_terraform_plan_json_events_adds_flag(fake_env_path):
+    with mock.patch("cli.terraform_utils.run_cmd") as run_cmd:
+        tf_utils.terraform_plan(
+            fake_env_path, dry_run=True, options=TerraformOptions(json_events=True)
+        )
+        assert run_cmd.call_args.args[0] == [
+            "terraform",
+            "plan",
+            "-detailed-exitcode",
+            "-json",
+        ]
+
+
+def test_terraform_output_masks_sensitive_values(fake_env_path):
+    def fake_read_cmd_output(cmd, cwd, dry_run):
+        assert cmd == ["terraform", "output", "-json"]
+        assert (cwd, dry_run) == (fake_env_path, False)
+        return mock.Mock(
+            returncode=0,
+            stdout='{"vm_ip": {"sensitive": false, "value": "10.0.1.4"},\n'
+            ' "password": {"sensitive": true, "value": "hunter2"}}\n',
+        )
+
+    with mock.patch(
+        "cli.terraform_utils.read_cmd_output", side_effect=fake_read_cmd_output
+    ):
+        outputs = tf_utils.terraform_output(fake_env_path)
+
+    assert outputs == {"vm_ip": "10.0.1.4", "password": "(sensitive)"}
+
+
+def test_terraform_output_failure(fake_env_path):
+    with mock.patch(
+        "cli.terraform_utils.read_cmd_output", return_value=mock.Mock(returncode=1)
+    ), pytest.raises(RuntimeError, match="terraform output failed"):
+        tf_utils.terraform_output(fake_env_path)
+
+
+def test_terraform_plan_saves_plan_file(fake_env_path):
+    with mock.patch("cli.terraform_utils.run_cmd") as run_cmd:
+        tf_utils.terraform_plan(fake_env_path, plan_file="/state/dev.tfplan")
+    assert run_cmd.call_args.args[0] == [
+        "terraform",
+        "plan",
+        "-detailed-exitcode",
+        "-out=/state/dev.tfplan",
+    ]
+
+
+@pytest.mark.parametrize("destroy", [False, True])
+def test_terraform_apply_saved_plan(fake_env_path, destroy):
+    with mock.patch("cli.terraform_utils.run_cmd") as run_cmd:
+        tf_utils.terraform_apply(
+            fake_env_path, destroy=destroy, plan_file="/state/dev.tfplan"
+        )
+    # A saved destroy plan must not be combined with -destroy
+    assert run_cmd.call_args.args[0] == [
+        "terraform",
+        "apply",
+        "-auto-approve",
+        "/state/dev.tfplan",
+    ]
+
+
+def test_terraform_plan_with_cached_state_skips_refresh(monkeypatch, tmp_path, capsys):
+    env_path = tmp_path / "dev"
+    monkeypatch.setattr(
+        tf_utils, "use_cached_state", lambda *_a: (True, "refreshed 1.0m ago")
+    )
+    with mock.patch(
+        "cli.terraform_utils.run_cmd", return_value=mock.Mock(returncode=0)
+    ) as run_cmd:
+        tf_utils.terraform_plan(env_path, options=TerraformOptions(refresh="auto"))
+
+    assert run_cmd.call_args.args[0][-1] == "-refresh=false"
+    assert "Plan used cached state (refreshed 1.0m ago)" in capsys.readouterr().out
+
+
+def test_terraform_plan_with_live_state_records_refresh(monkeypatch, tmp_path, capsys):
+    env_path = tmp_path / "dev"
+    recorded = []
+    monkeypatch.setattr(tf_utils, "record_refresh", recorded.append)
+    with mock.patch(
+        "cli.terraform_utils.run_cmd", return_value=mock.Mock(returncode=2)
+    ) as run_cmd:
+        tf_utils.terraform_plan(env_path)
+
+    assert "-refresh=false" not in run_cmd.call_args.args[0]
+    assert recorded == [env_path]
+    assert "Plan used live state" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize(
+    ("plan_file", "cached", "refreshed"),
+    [(None, False, True), (None, True, False), ("/state/dev.tfplan", False, False)],
+    ids=["refreshing", "refresh-false", "saved-plan"],
+)
+def test_terraform_apply_records_refresh_only_when_refreshing(
+    monkeypatch, tmp_path, plan_file, cached, refreshed
+):
+    env_path = tmp_path / "dev"
+    recorded = []
+    monkeypatch.setattr(tf_utils, "record_refresh", recorded.append)
+    monkeypatch.setattr(tf_utils, "use_cached_state", lambda *_a: (cached, "reason"))
+    with mock.patch(
+        "cli.terraform_utils.run_cmd", return_value=mock.Mock(returncode=0)
+    ):
+        tf_utils.terraform_apply(env_path, plan_file=plan_file)
+    assert recorded == ([env_path] if refreshed else [])
+
+
+@pytest.mark.parametrize(
+    ("returncode", "recorded"),
+    [(0, [False]), (2, [True]), (1, [])],
+)
+def test_terraform_state_has_changes_records_plan_outcome(
+    monkeypatch, fake_env_path, returncode, recorded
+):
+    outcomes = []
+    monkeypatch.setattr(
+        tf_utils,
+        "record_plan_outcome",
+        lambda _env_path, has_changes, **_kwargs: outcomes.append(has_changes),
+    )
+    with mock.patch(
+        "cli.terraform_utils.terraform_plan",
+        return_value=subprocess.CompletedProcess(["terraform", "plan"], returncode),
+    ):
+        tf_utils.terraform_state_has_changes(fake_env_path)
+    assert outcomes == recorded
+
+
+@pytest.mark.parametrize("returncode", [0, 2])
+def test_plan_against_cached_state_is_not_cached(
+    monkeypatch, fake_env_path, returncode
+):
+    outcomes = []
+    monkeypatch.setattr(
+        tf_utils,
+        "record_plan_outcome",
+        lambda _env_path, has_changes, **_kwargs: outcomes.append(has_changes),
+    )
+    result = subprocess.CompletedProcess(
+        ["terraform", "plan", "-detailed-exitcode", "-refresh=false"], returncode
+    )
+
+    assert tf_utils.plan_has_changes(fake_env_path, result) is bool(returncode)
+    assert outcomes == []
+
+
+def test_terraform_apply_of_a_destroy_plan_is_recorded_as_destroy(
+    monkeypatch, tmp_path
+):
+    phases = []
+
+    def run_cmd(cmd, **_kwargs):
+        phases.append(phase_for(cmd))
+        return mock.Mock(returncode=0)
+
+    monkeypatch.setattr(tf_utils, "run_cmd", run_cmd)
+    tf_utils.terraform_apply(tmp_path / "dev", destroy=True, plan_file="dev.tfplan")
+    assert phases == ["destroy"]
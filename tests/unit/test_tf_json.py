@@ -0,0 +1,114 @@
+import json
+import re
+
+import pytest
+
+from cli import tf_json
+from cli.env_config import load_environment_config, parse_variable_defaults
+from cli.fleet import fleet_context
+from cli.infrastructure_templates import env
+from cli.profiles import profile_context
+
+CONTEXT = {
+    "name_prefix": "Infrabox",
+    "environment": "dev",
+    "location": "westeurope",
+    "dns_zone_name": "infrabox-dev.com",
+    "admin_username": "azureuser",
+    "ssh_public_key_path": "~/.ssh/id_rsa_infrabox.pub",
+    "vnet_address_space": "10.0.0.0/16",
+    "subnet_address_space": "10.0.1.0/24",
+    **profile_context(),
+    **fleet_context(),
+}
+FLEET_CONTEXT = {**CONTEXT, **fleet_context(True, 2, 5, 3)}
+
+
+def block_names(kind, text):
+    return set(re.findall(rf'^{kind} "(\w+)"', text, re.MULTILINE))
+
+
+def test_dumps_is_deterministic():
+    first = tf_json.dumps({"b": 1, "a": {"y": [1, 2], "x": "é"}})
+    second = tf_json.dumps({"a": {"x": "é", "y": [1, 2]}, "b": 1})
+    assert first == second
+    assert first.endswith("}\n")
+    assert tf_json.dumps(tf_json.main_config(CONTEXT)) == tf_json.dumps(
+        tf_json.main_config(dict(CONTEXT))
+    )
+
+
+@pytest.mark.parametrize("context", [CONTEXT, FLEET_CONTEXT])
+def test_variables_match_hcl_template(context):
+    hcl = env.get_template("variables.tf.j2").render(context)
+    json_text = tf_json.dumps(tf_json.variables_config(context))
+    assert tf_json.parse_json_variable_defaults(json_text) == parse_variable_defaults(
+        hcl
+    )
+
+
+@pytest.mark.parametrize("context", [CONTEXT, FLEET_CONTEXT])
+def test_modules_and_outputs_match_hcl_templates(context):
+    main_hcl = env.get_template("main.tf.j2").render(context)
+    outputs_hcl = env.get_template("outputs.tf.j2").render(context)
+    modules = tf_json.main_config(context)["module"]
+    assert set(modules) == block_names("module", main_hcl)
+    assert set(tf_json.outputs_config(context)["output"]) == block_names(
+        "output", outputs_hcl
+    )
+    for name, arguments in modules.items():
+        hcl_block = main_hcl.split(f'module "{name}" {{', 1)[1].split("\n}", 1)[0]
+        assert set(arguments) == set(
+            re.findall(r"^\s+(\w+)\s+=", hcl_block, re.MULTILINE)
+        )
+
+
+def test_parse_json_variable_defaults_list_form():
+    text = json.dumps({"variable": [{"a": {"default": 1}}, {"b": {"type": "string"}}]})
+    assert tf_json.parse_json_variable_defaults(text) == {"a": 1}
+
+
+def test_parse_json_blocks_labels():
+    blocks = tf_json.parse_json_blocks(
+        json.dumps(
+            {
+                "module": {"rg": {"source": "../rg"}},
+                "resource": {"azurerm_subnet": {"this": {"name": "x"}}},
+            }
+        )
+    )
+    assert blocks == [
+        ("module", ["rg"], {"source": "../rg"}, []),
+        ("resource", ["azurerm_subnet", "this"], {"name": "x"}, []),
+    ]
+
+
+def test_generate_tf_json_writes_files(tmp_path, capsys):
+    tf_json.generate_tf_json(tmp_path, CONTEXT)
+
+    names = sorted(path.name for path in tmp_path.iterdir())
+    assert names == [
+        "main.tf.json",
+        "outputs.tf.json",
+        "provider.tf.json",
+        "variables.tf.json",
+    ]
+    assert tf_json.uses_tf_json(tmp_path)
+    provider = json.loads((tmp_path / "provider.tf.json").read_text())
+    assert provider["provider"] == {"azurerm": {"features": {}}}
+    assert "Generated main.tf.json" in capsys.readouterr().out
+
+
+def test_generate_tf_json_dry_run(tmp_path, capsys):
+    tf_json.generate_tf_json(tmp_path, CONTEXT, dry_run=True)
+    assert list(tmp_path.iterdir()) == []
+    assert "main.tf.json not written to disk" in capsys.readouterr().out
+
+
+def test_environment_config_reads_tf_json(tmp_path):
+    tf_json.generate_tf_json(tmp_path, CONTEXT)
+
+    config = load_environment_config(tmp_path)
+
+    assert config.template_context() == CONTEXT
+    assert config.cidrs == ("10.0.0.0/16", "10.0.1.0/24")
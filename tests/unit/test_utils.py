@@ -1,10 +1,12 @@
 import os
-import re
+import subprocess
+import sys
 import types
 
 import pytest
 
-from cli import utils
+from cli import catalog, cidr_allocator, metrics, run_history, run_logs, utils
+from cli.env_config import parse_variable_defaults
 
 
 def test_sanitize_input_normal():
@@ -40,6 +42,12 @@ def test_validate_environment_invalid():
         utils.validate_environment("invalid")
 
 
+def test_validate_environment_catalogued(tmp_path):
+    (tmp_path / "qa").mkdir()
+    catalog.rescan(tmp_path)
+    utils.validate_environment("qa")
+
+
 def test_validate_environment_allow_new():
     # Should not raise
     utils.validate_environment("UserAcceptance", allow_new=True)
@@ -83,7 +91,9 @@ def test_validate_cidr_edge_hostmask():
 def make_env_dir_with_cidr(tmp_path, env_name, cidr):
     env_dir = tmp_path / env_name
     env_dir.mkdir()
-    (env_dir / "variables.tf").write_text(f'vnet_cidr = "{cidr}"\n')
+    (env_dir / "variables.tf").write_text(
+        f'variable "vnet_address_space" {{\n  default = ["{cidr}"]\n}}\n'
+    )
     return env_dir
 
 
@@ -104,13 +114,21 @@ def test_check_cidr_overlap_with_overlap(tmp_path):
     # Overlapping CIDRs: both /24
     make_env_dir_with_cidr(tmp_path, "env1", "10.0.0.0/24")
     content = (tmp_path / "env1" / "variables.tf").read_text()
-    matches = re.findall(r'vnet_cidr\s*=\s*["\']([^"\']+)["\']', content)
-    assert matches == ["10.0.0.0/24"], f"Regex did not match: {content}"
+    defaults = parse_variable_defaults(content)
+    assert defaults == {"vnet_address_space": ["10.0.0.0/24"]}, content
     with pytest.raises(ValueError) as e:
         utils.check_cidr_overlap("10.0.0.0/24", "env2", tmp_path)
     assert "overlaps" in str(e.value)
 
 
+def test_check_cidr_overlap_with_reservation(tmp_path):
+    # Reserved by a concurrent run that has not written its files yet
+    cidr_allocator.reserve_cidrs("env1", ["10.3.0.0/16"])
+    with pytest.raises(ValueError, match="reserved for environment 'env1'"):
+        utils.check_cidr_overlap("10.3.1.0/24", "env2", tmp_path)
+    utils.check_cidr_overlap("10.3.1.0/24", "env1", tmp_path)
+
+
 def test_run_cmd_normal(monkeypatch, tmp_path):
     fake_result = types.SimpleNamespace(stdout="output", returncode=0)
     monkeypatch.setattr("subprocess.run", lambda *_a, **_k: fake_result)
@@ -136,6 +154,101 @@ def test_run_cmd_capture_output_false(monkeypatch, tmp_path):
     assert result.stdout == "output"
 
 
+def test_run_cmd_logs_environment_runs(monkeypatch, tmp_path, capsys):
+    env_dir = tmp_path / "dev"
+    env_dir.mkdir()
+    monkeypatch.setattr(utils, "ENVIRONMENTS_DIR", tmp_path)
+    monkeypatch.setenv("INFRABOX_STATE_DIR", str(tmp_path / "state"))
+
+    result = utils.run_cmd(
+        [sys.executable, "-c", "print('hello from terraform')"],
+        env_dir,
+        capture_output=False,
+    )
+
+    assert result.returncode == 0
+    assert "hello from terraform" in capsys.readouterr().out
+    [log_path] = run_logs.list_runs(tmp_path / "state" / "logs" / "dev")
+    assert "hello from terraform" in "\n".join(run_logs.iter_run_lines(log_path))
+
+
+def test_run_cmd_logged_capture_output(monkeypatch, tmp_path):
+    env_dir = tmp_path / "dev"
+    env_dir.mkdir()
+    monkeypatch.setattr(utils, "ENVIRONMENTS_DIR", tmp_path)
+    monkeypatch.setenv("INFRABOX_STATE_DIR", str(tmp_path / "state"))
+
+    result = utils.run_cmd([sys.executable, "-c", "print('captured')"], env_dir)
+
+    assert result.stdout == "captured\n"
+
+
+def test_run_cmd_replaces_undecodable_output(tmp_path):
+    script = "import sys; sys.stdout.buffer.write(b'caf\\xe9 ok\\n')"
+
+    result = utils.run_cmd([sys.executable, "-c", script], tmp_path)
+
+    assert result.stdout == "caf\ufffd ok\n"
+
+
+def test_run_cmd_stops_the_command_on_interrupt(monkeypatch, tmp_path):
+    started = []
+    popen = subprocess.Popen
+
+    def spy(*args, **kwargs):
+        started.append(popen(*args, **kwargs))
+        return started[-1]
+
+    def interrupt(_line):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(utils.subprocess, "Popen", spy)
+    script = "import time; print('started', flush=True); time.sleep(60)"
+
+    with pytest.raises(KeyboardInterrupt):
+        utils.run_cmd(
+            [sys.executable, "-c", script], tmp_path, capture_output=interrupt
+        )
+
+    assert started[0].returncode is not None
+
+
+def test_run_cmd_records_run_history(monkeypatch, tmp_path):
+    env_dir = tmp_path / "dev"
+    env_dir.mkdir()
+    monkeypatch.setattr(utils, "ENVIRONMENTS_DIR", tmp_path)
+
+    utils.run_cmd([sys.executable, "-c", "pass"], env_dir)
+    utils.read_cmd_output([sys.executable, "-c", "pass"], env_dir)
+
+    [(env, phase, seconds, returncode, _finished)] = run_history.recent_runs()
+    assert (env, phase, returncode) == ("dev", "-c", 0)
+    assert seconds >= 0
+
+
+def test_run_cmd_records_metrics(monkeypatch, tmp_path):
+    env_dir = tmp_path / "dev"
+    env_dir.mkdir()
+    monkeypatch.setattr(utils, "ENVIRONMENTS_DIR", tmp_path)
+    script = "print('Apply complete! Resources: 2 added, 0 changed, 1 destroyed.')"
+
+    utils.run_cmd([sys.executable, "-c", script], env_dir)
+
+    text = metrics.flush()
+    assert 'infrabox_phase_runs_total{code="0",environment="dev",phase="-c"} 1' in text
+    assert 'infrabox_phase_duration_seconds_count{environment="dev",phase="-c"} 1' in (
+        text
+    )
+    assert (
+        'infrabox_resources_changed_total{action="added",environment="dev"} 2' in text
+    )
+    assert (
+        'infrabox_resources_changed_total{action="destroyed",environment="dev"} 1'
+        in text
+    )
+    assert 'action="changed"' not in text
+
+
 def test_prompt_input_normal(monkeypatch):
     monkeypatch.setattr("builtins.input", lambda _prompt: "foo")
     assert utils.prompt_input("Prompt", default="bar") == "foo"
@@ -169,3 +282,18 @@ def test_prompt_with_default_default(monkeypatch):
 def test_prompt_user_confirmation(monkeypatch, user_input, default, expected):
     monkeypatch.setattr("builtins.input", lambda _prompt: user_input)
     assert utils.prompt_user_confirmation("Proceed?", default=default) == expected
+
+
+def test_answer_prompts_uses_preset_answers(monkeypatch):
+    def fail(_prompt):
+        raise AssertionError("stdin must not be read")
+
+    monkeypatch.setattr("builtins.input", fail)
+    with utils.answer_prompts({"Enter name prefix": "portal!"}, approve=True):
+        assert utils.prompt_with_default("Enter name prefix", "Infrabox") == "portal"
+        assert utils.prompt_with_default("Enter Azure location", "westeurope") == (
+            "westeurope"
+        )
+        assert utils.prompt_user_confirmation() is True
+    with utils.answer_prompts():
+        assert utils.prompt_user_confirmation(default=True) is False
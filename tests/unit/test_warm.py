@@ -0,0 +1,70 @@
+import pytest
+
+from cli import warm
+
+
+@pytest.fixture
+def env_path(tmp_path):
+    path = tmp_path / "dev"
+    (path / ".terraform").mkdir(parents=True)
+    (path / "main.tf").write_text('module "rg" {\n  source = "../modules/rg"\n}\n')
+    return path
+
+
+def test_not_warm_without_record(env_path):
+    assert not warm.is_warm(env_path, "init")
+
+
+def test_mark_warm_and_invalidate_on_change(env_path):
+    warm.mark_warm(env_path, "init")
+    assert warm.is_warm(env_path, "init")
+
+    (env_path / ".terraform.lock.hcl").write_text("# upgraded providers\n")
+    assert not warm.is_warm(env_path, "init")
+
+
+def test_module_change_invalidates(env_path):
+    module_dir = env_path.parent / "modules" / "rg"
+    module_dir.mkdir(parents=True)
+    (module_dir / "main.tf").write_text("# v1\n")
+    warm.mark_warm(env_path, "init")
+
+    (module_dir / "main.tf").write_text("# v2\n")
+
+    assert not warm.is_warm(env_path, "init")
+
+
+def test_missing_terraform_dir_is_cold(env_path):
+    warm.mark_warm(env_path, "init")
+    (env_path / ".terraform").rmdir()
+    assert not warm.is_warm(env_path, "init")
+
+
+def test_new_init_forgets_validate(env_path):
+    warm.mark_warm(env_path, "init")
+    warm.mark_warm(env_path, "validate")
+    assert warm.is_warm(env_path, "validate")
+
+    warm.mark_warm(env_path, "init")
+
+    assert not warm.is_warm(env_path, "validate")
+
+
+def test_provider_or_terraform_change_invalidates(env_path, monkeypatch, tmp_path):
+    provider = env_path / ".terraform" / "providers" / "azurerm" / "provider"
+    provider.parent.mkdir(parents=True)
+    provider.write_bytes(b"v1")
+    terraform = tmp_path / "terraform"
+    terraform.write_text("#!/bin/sh\n")
+    terraform.chmod(0o755)
+    monkeypatch.setenv("INFRABOX_TERRAFORM_BIN", str(terraform))
+    warm.mark_warm(env_path, "init")
+    assert warm.is_warm(env_path, "init")
+
+    provider.unlink()
+    assert not warm.is_warm(env_path, "init")
+
+    provider.write_bytes(b"v1")
+    warm.mark_warm(env_path, "init")
+    terraform.write_text("#!/bin/sh\n# upgraded\n")
+    assert not warm.is_warm(env_path, "init")
@@ -0,0 +1,78 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from cli.env_config import scan_environment_configs
+from cli.workspaces import (
+    SHARED_ROOT,
+    WORKSPACE_TFVARS,
+    state_file,
+    terraform_dir,
+    terraform_env,
+    var_file_args,
+    workspace_from_args,
+)
+
+
+@pytest.fixture
+def environments(tmp_path):
+    shared = tmp_path / SHARED_ROOT
+    shared.mkdir()
+    (shared / "variables.tf").write_text(
+        'variable "location" {\n  default = "westeurope"\n}\n'
+        'variable "environment" {\n  default = "dev"\n}\n'
+    )
+    (tmp_path / "dev").mkdir()
+    (tmp_path / "dev" / WORKSPACE_TFVARS).write_text(
+        json.dumps({"environment": "dev", "vnet_address_space": ["10.0.0.0/16"]})
+    )
+    (tmp_path / "prod").mkdir()
+    (tmp_path / "prod" / "main.tf").write_text("")
+    return tmp_path
+
+
+def test_workspace_environment_runs_in_the_shared_root(environments):
+    dev = environments / "dev"
+
+    assert terraform_dir(dev) == environments / SHARED_ROOT
+    assert terraform_env(dev) == {"TF_WORKSPACE": "dev"}
+    assert var_file_args(dev) == [f"-var-file={(dev / WORKSPACE_TFVARS).resolve()}"]
+    assert state_file(dev) == (
+        environments / SHARED_ROOT / "terraform.tfstate.d" / "dev" / "terraform.tfstate"
+    )
+
+
+def test_directory_environment_is_unchanged(environments):
+    prod = environments / "prod"
+
+    assert terraform_dir(prod) == prod
+    assert terraform_env(prod) == {}
+    assert var_file_args(prod) == []
+    assert state_file(prod) == prod / "terraform.tfstate"
+
+
+def test_workspace_config_overlays_shared_defaults(environments):
+    configs = {config.name: config for config in scan_environment_configs(environments)}
+
+    assert sorted(configs) == ["dev", "prod"]
+    assert configs["dev"].location == "westeurope"
+    assert configs["dev"].cidrs == ("10.0.0.0/16",)
+
+
+@pytest.mark.parametrize(
+    ("options", "fleet", "expected"),
+    [
+        ({}, False, False),
+        ({"workspace": True}, False, True),
+        ({"workspace": True, "output_format": "json"}, False, None),
+        ({"workspace": True}, True, None),
+    ],
+)
+def test_workspace_from_args(options, fleet, expected):
+    args = SimpleNamespace(**options)
+    if expected is None:
+        with pytest.raises(ValueError):
+            workspace_from_args(args, {"fleet": fleet})
+    else:
+        assert workspace_from_args(args, {"fleet": fleet}) is expected